@@ -0,0 +1,199 @@
+"""Execution of approved AI Action Requests.
+
+Bulk approval flips the selected Pending requests to Approved in one UPDATE
+and stamps them with a batch id; execution then runs in background jobs of
+CHUNK_SIZE requests. Inside a job, requests are processed COMMIT_EVERY at a
+time: the rows are re-read with FOR UPDATE (so two jobs never execute the
+same request), each request is inserted under its own savepoint (a failing
+payload rolls back only itself), and the resulting statuses are written with
+one bulk UPDATE per table before committing.
+
+Only rows still in status Approved are picked up, so re-running a batch after
+a worker died simply continues where it stopped.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+import frappe
+from frappe.utils import add_to_date, now_datetime, strip_html
+
+from alphax_ai_platform.alphax_ai.realtime import stream
+
+CHUNK_SIZE = 200
+COMMIT_EVERY = 50
+STALL_MINUTES = 60
+SUPPORTED_ACTIONS = {"Create Draft"}
+PROGRESS_EVENT = "alphax_ai_action_batch"
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def approve(names: List[str], batch_id: str, decision_notes: Optional[str] = None) -> int:
+    """Mark Pending requests as Approved (one UPDATE per 1000 names); returns the count.
+
+    `batch_id` must be new: the returned count is taken over the whole batch.
+    """
+    ar = frappe.qb.DocType("AI Action Request")
+    user = frappe.session.user
+    now = now_datetime()
+    for chunk in _chunks(names, 1000):
+        query = (
+            frappe.qb.update(ar)
+            .set(ar.status, "Approved")
+            .set(ar.approver, user)
+            .set(ar.batch_id, batch_id)
+            .set(ar.error, None)
+            .set(ar.modified, now)
+            .set(ar.modified_by, user)
+            .where(ar.name.isin(chunk))
+            .where(ar.status == "Pending")
+        )
+        if decision_notes:
+            query = query.set(ar.decision_notes, decision_notes)
+        query.run()
+    return frappe.db.count("AI Action Request", {"batch_id": batch_id, "status": "Approved"})
+
+
+def enqueue_batch(batch_id: str, names: Optional[List[str]] = None) -> int:
+    """Queue execution jobs for the still-Approved requests of a batch; returns the job count."""
+    if names is None:
+        names = frappe.get_all(
+            "AI Action Request",
+            filters={"batch_id": batch_id, "status": "Approved"},
+            pluck="name",
+            order_by="name asc",
+        )
+    jobs = _chunks(sorted(names), CHUNK_SIZE)
+    for chunk in jobs:
+        frappe.enqueue(
+            "alphax_ai_platform.alphax_ai.actions.executor.execute_batch",
+            queue="long",
+            timeout=3600,
+            job_id=f"alphax_ai_actions::{batch_id}::{chunk[0]}",
+            deduplicate=True,
+            enqueue_after_commit=True,
+            batch_id=batch_id,
+            names=chunk,
+        )
+    return len(jobs)
+
+
+def _payload_docs(row) -> List[Dict[str, Any]]:
+    payload = json.loads(row.payload_json or "null")
+    docs = payload if isinstance(payload, list) else [payload]
+    if not docs or not all(isinstance(d, dict) for d in docs):
+        raise ValueError("payload_json must be a JSON object or a list of objects")
+    return [dict(d, doctype=row.target_doctype) for d in docs]
+
+
+def _error_text(exc: Exception) -> str:
+    return (strip_html(str(exc)) or exc.__class__.__name__)[:2000]
+
+
+def _execute_rows(rows) -> Dict[str, Dict[str, Any]]:
+    """Insert the payloads of `rows`; returns {request name: field updates}."""
+    updates: Dict[str, Dict[str, Any]] = {}
+    now = now_datetime()
+    for i, row in enumerate(rows):
+        if row.action_type not in SUPPORTED_ACTIONS:
+            updates[row.name] = {"status": "Failed", "error": f"Unsupported action type: {row.action_type}"}
+            continue
+        savepoint = f"alphax_ai_ar_{i}"
+        frappe.db.savepoint(savepoint)
+        try:
+            created = [frappe.get_doc(d).insert().name for d in _payload_docs(row)]
+        except Exception as e:
+            frappe.db.rollback(save_point=savepoint)
+            frappe.clear_messages()
+            updates[row.name] = {"status": "Failed", "error": _error_text(e)}
+            continue
+        updates[row.name] = {
+            "status": "Executed",
+            "executed_document": created[0],
+            "executed_on": now,
+            "error": None if len(created) == 1 else f"Created {len(created)} documents: {', '.join(created)}",
+        }
+    return updates
+
+
+def execute_batch(batch_id: Optional[str] = None, names: Optional[List[str]] = None) -> Dict[str, int]:
+    """Background job: execute the given Approved requests, committing every COMMIT_EVERY rows."""
+    counts = {"executed": 0, "failed": 0, "skipped": 0}
+    for chunk in _chunks(list(names or []), COMMIT_EVERY):
+        filters = {"name": ["in", chunk], "status": "Approved"}
+        if batch_id:
+            filters["batch_id"] = batch_id
+        rows = frappe.get_all(
+            "AI Action Request",
+            filters=filters,
+            fields=["name", "action_type", "target_doctype", "payload_json", "source_ingested_document"],
+            order_by="name asc",
+            for_update=True,
+        )
+        counts["skipped"] += len(chunk) - len(rows)
+        if not rows:
+            frappe.db.commit()
+            continue
+
+        updates = _execute_rows(rows)
+        frappe.db.bulk_update("AI Action Request", updates)
+
+        sources = {
+            r.source_ingested_document: {"status": "Draft Created", "created_document": updates[r.name]["executed_document"]}
+            for r in rows
+            if r.source_ingested_document and updates[r.name]["status"] == "Executed"
+        }
+        if sources:
+            frappe.db.bulk_update("AI Ingested Document", sources)
+        frappe.db.commit()
+
+        for u in updates.values():
+            counts["executed" if u["status"] == "Executed" else "failed"] += 1
+        if batch_id:
+            # coalesced per batch: a job's chunks inside one flush interval send one update
+            stream.emit(PROGRESS_EVENT, {"batch_id": batch_id, **counts}, key=batch_id)
+    return counts
+
+
+def batch_status(batch_id: str) -> Dict[str, Any]:
+    rows = frappe.get_all(
+        "AI Action Request",
+        filters={"batch_id": batch_id},
+        fields=["status", "count(name) as count"],
+        group_by="status",
+    )
+    failures = frappe.get_all(
+        "AI Action Request",
+        filters={"batch_id": batch_id, "status": "Failed"},
+        fields=["name", "source_ingested_document", "error"],
+        order_by="name asc",
+        limit_page_length=100,
+    )
+    counts = {r.status: r.count for r in rows}
+    return {
+        "batch_id": batch_id,
+        "counts": counts,
+        "remaining": counts.get("Approved", 0),
+        "failures": failures,
+    }
+
+
+def resume_stalled_batches() -> None:
+    """Scheduler: re-queue batches whose Approved rows have not moved for STALL_MINUTES.
+
+    Safe to over-trigger: execution locks rows and skips anything no longer Approved.
+    """
+    cutoff = add_to_date(now_datetime(), minutes=-STALL_MINUTES)
+    batches = frappe.get_all(
+        "AI Action Request",
+        filters={"status": "Approved", "batch_id": ["is", "set"], "modified": ["<", cutoff]},
+        pluck="batch_id",
+        distinct=True,
+    )
+    for batch_id in batches:
+        enqueue_batch(batch_id)
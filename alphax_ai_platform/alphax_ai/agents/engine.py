@@ -1,6 +1,9 @@
 from __future__ import annotations
 from typing import Any, Dict
 
+from alphax_ai_platform.alphax_ai.policies.model_router import escalate, route_models
+from alphax_ai_platform.alphax_ai.providers.base import ContextLengthError
+
 
 class AgentEngine:
     def __init__(self, agent_key: str, system_prompt: str, policy: Dict[str, Any], context: Dict[str, Any]):
@@ -16,7 +19,25 @@ class AgentEngine:
             {"role": "user", "content": user_message},
         ]
 
-        resp = provider.chat(messages, model=self.policy.get("model"), temperature=self.policy.get("temperature", 0.2))
+        # cheapest AI Model whose context window fits, per provider; larger ones only on demand
+        route = route_models(
+            self.agent_key,
+            messages,
+            self.policy,
+            provider_keys=list(getattr(provider, "order", None) or [getattr(provider, "key", None)]),
+        )
+        while True:
+            try:
+                resp = provider.chat(
+                    messages,
+                    model=self.policy.get("model"),
+                    temperature=self.policy.get("temperature", 0.2),
+                    models_by_provider=self.policy.get("models_by_provider"),
+                )
+                break
+            except ContextLengthError:
+                if not route or not escalate(route, self.policy):
+                    raise
 
         trace = {
             "provider": {
@@ -27,4 +48,7 @@ class AgentEngine:
             "tools": [],
             "policy": {k: v for k, v in (self.policy or {}).items() if k != "context"},
         }
+        if resp.route:
+            trace["provider"]["route"] = resp.route
+            trace["provider"]["key"] = resp.route.get("provider") or trace["provider"]["key"]
         return resp.content, trace
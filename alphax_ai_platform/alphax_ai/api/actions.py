@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+import frappe
+from frappe import _
+
+from alphax_ai_platform.alphax_ai.actions import executor
+
+# Above this many requests, execution always goes to background jobs.
+MAX_SYNC = 20
+
+
+def _parse_list(value: Any) -> Optional[List[Any]]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return list(value)
+
+
+def _check_write():
+    if not frappe.has_permission("AI Action Request", "write"):
+        frappe.throw(_("Not permitted to approve AI Action Requests"), frappe.PermissionError)
+
+
+@frappe.whitelist(methods=["POST"])
+def bulk_approve(names=None, filters=None, execute: int = 1, decision_notes: str = None) -> Dict[str, Any]:
+    """Approve many Pending AI Action Requests and (optionally) execute them in background jobs.
+
+    Pass either `names` (JSON list) or `filters` (JSON dict, e.g. all pending
+    requests of one blueprint). Returns a `batch_id`; poll `batch_status` for
+    progress and per-row failures, or listen to the `alphax_ai_action_batch`
+    realtime event.
+    """
+    _check_write()
+    names = _parse_list(names)
+    filters = json.loads(filters) if isinstance(filters, str) and filters else (filters or {})
+    if not names and not filters:
+        frappe.throw(_("names or filters is required"))
+
+    query = dict(filters, status="Pending")
+    if names:
+        query["name"] = ["in", names]
+    # get_list applies the user's permissions: only visible requests are approved
+    selected = frappe.get_list("AI Action Request", filters=query, pluck="name", limit_page_length=0)
+    if not selected:
+        return {"batch_id": None, "approved": 0, "jobs": 0}
+
+    batch_id = frappe.generate_hash(length=12)
+    approved = executor.approve(selected, batch_id, decision_notes)
+    jobs = executor.enqueue_batch(batch_id, selected) if int(execute) else 0
+    return {"batch_id": batch_id, "approved": approved, "jobs": jobs}
+
+
+@frappe.whitelist(methods=["POST"])
+def execute(names) -> Dict[str, Any]:
+    """Execute already-approved requests now (small selections only)."""
+    _check_write()
+    names = _parse_list(names) or []
+    if len(names) > MAX_SYNC:
+        frappe.throw(_("Use bulk_approve for more than {0} requests").format(MAX_SYNC))
+    readable = frappe.get_list("AI Action Request", filters={"name": ["in", names]}, pluck="name")
+    return executor.execute_batch(names=readable)
+
+
+@frappe.whitelist()
+def batch_status(batch_id: str) -> Dict[str, Any]:
+    if not frappe.has_permission("AI Action Request", "read"):
+        frappe.throw(_("Not permitted to read AI Action Requests"), frappe.PermissionError)
+    return executor.batch_status(batch_id)
+
+
+@frappe.whitelist(methods=["POST"])
+def resume_batch(batch_id: str) -> Dict[str, Any]:
+    """Re-queue the still-approved requests of a batch (e.g. after a worker was killed)."""
+    _check_write()
+    return {"batch_id": batch_id, "jobs": executor.enqueue_batch(batch_id)}
@@ -110,11 +110,11 @@ def get_blueprint(name: str) -> Dict[str, Any]:
 
 
 @frappe.whitelist()
-def test_ingest(file_url: str, blueprint_name: str) -> Dict[str, Any]:
+def test_ingest(file_url: str, blueprint_name: str, progress_id: str = None) -> Dict[str, Any]:
     if not file_url:
         frappe.throw(_("file_url is required"))
     if not blueprint_name:
         frappe.throw(_("blueprint_name is required"))
 
     from alphax_ai_platform.alphax_ai.api.ingest import ingest_file
-    return ingest_file(file_url=file_url, blueprint_name=blueprint_name, create_draft=1)
+    return ingest_file(file_url=file_url, blueprint_name=blueprint_name, create_draft=1, progress_id=progress_id)
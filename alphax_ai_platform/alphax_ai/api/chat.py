@@ -1,67 +1,206 @@
+import random
+
 import frappe
+from alphax_ai_platform.alphax_ai.caching import idempotency, prefetch as context_prefetch
+from alphax_ai_platform.alphax_ai.providers.base import ProviderError, RateLimitError
+from alphax_ai_platform.alphax_ai.providers.limiter import INTERACTIVE
 from alphax_ai_platform.alphax_ai.providers.registry import ProviderRegistry
 from alphax_ai_platform.alphax_ai.context.builder import build_context
 from alphax_ai_platform.alphax_ai.policies.engine import PolicyEngine
+from alphax_ai_platform.alphax_ai.policies.redaction import apply_redaction
+from alphax_ai_platform.alphax_ai.retrieval.index import retrieve_for_chat
 from alphax_ai_platform.alphax_ai.logs.audit import log_audit
 from alphax_ai_platform.alphax_ai.prompts.renderer import render_agent_system_prompt
 from alphax_ai_platform.alphax_ai.agents.engine import AgentEngine
+from alphax_ai_platform.alphax_ai.metrics.profiling import maybe_profile, profiling_requested
+from alphax_ai_platform.alphax_ai.metrics.store import record as record_metrics
+from alphax_ai_platform.alphax_ai.metrics.timing import StageTimer
+
+
+def _metrics_sample_rate() -> float:
+    try:
+        rate = frappe.db.get_single_value("AI Platform Settings", "chat_metrics_sample_rate", cache=True)
+    except Exception:
+        return 1.0
+    if rate in (None, ""):
+        return 1.0
+    return max(0.0, min(1.0, float(rate)))
 
 
 @frappe.whitelist(methods=["POST", "GET"])
-def chat(agent_key: str, message: str, session_id: str = None, doctype: str = None, docname: str = None):
+def chat(
+    agent_key: str,
+    message: str,
+    session_id: str = None,
+    doctype: str = None,
+    docname: str = None,
+    idempotency_key: str = None,
+):
     """AlphaX AI chat endpoint (MVP).
 
     Phase-1: single-turn assistant.
     Phase-2: multi-step tool calling + approvals.
+
+    Every phase is timed; the spans are returned in `trace["timings"]` and
+    stored with the audit log. Send `X-AlphaX-Profile: 1` (with profiling
+    enabled in AI Platform Settings) to attach a cProfile report.
+
+    A retried turn (same `idempotency_key` / Idempotency-Key header) returns
+    the first reply within the idempotency window instead of calling the
+    provider again. Without a key one is derived from the message, session,
+    document and the session's newest message: a resend that arrives while
+    the first turn is running waits for its reply, while the same text sent
+    again after that reply ("yes", "continue") is a new turn. A repeat
+    without a session (the client never got the first reply's session id) is
+    replayed for the whole window.
     """
     if not agent_key:
         frappe.throw("agent_key is required")
     if not message:
         frappe.throw("message is required")
 
-    user = frappe.session.user
+    key = idempotency.request_key(idempotency_key) or idempotency.derive_key(
+        agent_key, message, session_id, doctype, docname, _last_message(session_id)
+    )
+    return idempotency.run_once(
+        "chat",
+        key,
+        lambda: _chat(agent_key, message, session_id, doctype, docname),
+    )
 
-    # Create / fetch session
+
+def _last_message(session_id):
+    """Newest AI Chat Message of the session (session_creation_index), None without one."""
     if not session_id:
-        session = frappe.get_doc({
-            "doctype": "AI Chat Session",
-            "user": user,
-            "company": frappe.defaults.get_user_default("Company"),
-            "context_doctype": doctype or "",
-            "context_docname": docname or "",
-            "status": "Open",
-        }).insert(ignore_permissions=True)
-        session_id = session.name
-    else:
-        session = frappe.get_doc("AI Chat Session", session_id)
-
-    # Persist user message
-    frappe.get_doc({
-        "doctype": "AI Chat Message",
-        "session": session_id,
-        "role": "user",
-        "content": message,
-    }).insert(ignore_permissions=True)
-
-    context = build_context(user=user, doctype=doctype, docname=docname)
-    policy = PolicyEngine.for_user(user=user, company=session.company).evaluate(context=context)
-
-    system_prompt = render_agent_system_prompt(agent_key=agent_key, context=context, policy=policy)
-    engine = AgentEngine(agent_key=agent_key, system_prompt=system_prompt, policy=policy, context=context)
-
-    provider = ProviderRegistry.get_default_provider()
-
-    reply, trace = engine.run(provider=provider, user_message=message)
-
-    # Persist assistant message
-    frappe.get_doc({
-        "doctype": "AI Chat Message",
-        "session": session_id,
-        "role": "assistant",
-        "content": reply,
-    }).insert(ignore_permissions=True)
+        return None
+    rows = frappe.get_all(
+        "AI Chat Message",
+        filters={"session": session_id},
+        fields=["name"],
+        order_by="creation desc",
+        limit_page_length=1,
+    )
+    return rows[0].name if rows else None
+
+
+@frappe.whitelist(methods=["POST"])
+def prefetch(agent_key: str = "default", doctype: str = None, docname: str = None):
+    """Warm context, policy, prompt and retrieval scope for a chat about the open
+    document (called by the desk on form load); see caching.prefetch."""
+    if not context_prefetch.enabled():
+        return {"warm": False}
+    if doctype and docname and not frappe.has_permission(doctype, "read", docname):
+        return {"warm": False}
+    return context_prefetch.warm(agent_key or "default", doctype, docname)
+
+
+def _chat(agent_key, message, session_id, doctype, docname):
+    user = frappe.session.user
+    timer = StageTimer()
+    profile_out = {}
+
+    with maybe_profile(profiling_requested(), profile_out):
+        # Create / fetch session
+        with timer.stage("session"):
+            if not session_id:
+                session = frappe.get_doc({
+                    "doctype": "AI Chat Session",
+                    "user": user,
+                    "company": frappe.defaults.get_user_default("Company"),
+                    "context_doctype": doctype or "",
+                    "context_docname": docname or "",
+                    "status": "Open",
+                }).insert(ignore_permissions=True)
+                session_id = session.name
+            else:
+                session = frappe.get_doc("AI Chat Session", session_id)
+
+        # Persist user message
+        with timer.stage("insert_user_message"):
+            frappe.get_doc({
+                "doctype": "AI Chat Message",
+                "session": session_id,
+                "role": "user",
+                "content": message,
+            }).insert(ignore_permissions=True)
+
+        with timer.stage("prefetch"):
+            warm = context_prefetch.take(user, agent_key, doctype, docname)
+            if warm and warm["context"].get("company") != session.company:
+                warm = None
+        timer.count("prefetch_hit", 1 if warm else 0)
+
+        if warm:
+            context, policy = warm["context"], warm["policy"]
+        else:
+            with timer.stage("build_context"):
+                context = build_context(user=user, doctype=doctype, docname=docname)
+            with timer.stage("policy"):
+                policy = PolicyEngine.for_user(user=user, company=session.company).evaluate(context=context)
+
+        # Grounding passages from ingested documents (bounded by retrieval_budget_ms)
+        with timer.stage("retrieval"):
+            if warm and "retrieval_documents" in warm:
+                passages = retrieve_for_chat(message, documents=warm["retrieval_documents"])
+            else:
+                passages = retrieve_for_chat(message, doctype=doctype, docname=docname)
+            if passages and policy.get("redaction"):
+                passages = apply_redaction(passages)
+            context["passages"] = passages
+        timer.count("passages", len(passages))
+
+        with timer.stage("render_prompt"):
+            if warm and not passages:
+                system_prompt = warm["system_prompt"]
+            else:
+                system_prompt = render_agent_system_prompt(agent_key=agent_key, context=context, policy=policy)
+        engine = AgentEngine(agent_key=agent_key, system_prompt=system_prompt, policy=policy, context=context)
+
+        # Interactive class: may use the provider's reserve and jumps queued background calls
+        provider = ProviderRegistry.get_default_provider(priority=INTERACTIVE)
+
+        with timer.stage("provider"):
+            try:
+                reply, trace = engine.run(provider=provider, user_message=message)
+            except RateLimitError as e:
+                frappe.throw(str(e), title="AI Provider Busy")
+            except ProviderError as e:
+                frappe.log_error(frappe.get_traceback(), "AlphaX AI Provider Failed")
+                frappe.throw(f"The AI provider could not answer: {e}", title="AI Provider Unavailable")
+
+        # Persist assistant message
+        with timer.stage("insert_assistant_message"):
+            frappe.get_doc({
+                "doctype": "AI Chat Message",
+                "session": session_id,
+                "role": "assistant",
+                "content": reply,
+            }).insert(ignore_permissions=True)
+
+    trace["timings"] = timer.as_dict()
+    if profile_out:
+        trace["profile"] = profile_out.get("profile")
 
     # Audit log (best-effort)
-    log_audit(user=user, agent_key=agent_key, provider_meta=trace.get("provider", {}), trace=trace)
+    with timer.stage("audit"):
+        log_audit(
+            user=user,
+            agent_key=agent_key,
+            provider_meta=trace.get("provider", {}),
+            trace=trace,
+            latency_ms=trace["timings"]["total_ms"],
+        )
+
+    # The audit span cannot be part of the row it writes; add it to the response only.
+    trace["timings"] = timer.as_dict()
+
+    if random.random() < _metrics_sample_rate():
+        stages = dict(trace["timings"]["stages_ms"])
+        stages["total"] = trace["timings"]["total_ms"]
+        record_metrics(
+            "chat",
+            stages,
+            labels={"agent": agent_key, "provider": trace["provider"].get("key") or getattr(provider, "key", "unknown")},
+        )
 
     return {"session_id": session_id, "reply": reply, "trace": trace}
@@ -0,0 +1,151 @@
+"""Chat session and message history with keyset (cursor) pagination.
+
+Pages are read by position instead of OFFSET: a cursor is the (creation,
+name) of the last row returned, and the next page is "rows after it" in the
+same order, which the (session, creation) / (user, creation) indexes answer
+with a range scan however long the history is. Cursors are opaque strings;
+pass them back unchanged.
+
+Messages leave out `tool_call_json` unless `include_tool_calls=1`.
+`messages_since` is the cheap poll/resync call for the assistant UI: it
+returns only rows newer than the cursor it was given, plus the cursor to
+send next time.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+from frappe import _
+from frappe.query_builder import Order
+
+from alphax_ai_platform.alphax_ai.storage.compression import unpack
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+SESSION_FIELDS = ("name", "creation", "status", "company", "context_doctype", "context_docname")
+MESSAGE_FIELDS = ("name", "creation", "role", "content")
+
+
+def _limit(limit: Any, default: int = DEFAULT_LIMIT) -> int:
+    return max(1, min(MAX_LIMIT, int(limit or default)))
+
+
+def encode_cursor(row: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not row:
+        return None
+    raw = json.dumps([str(row["creation"]), row["name"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    if not cursor:
+        return None
+    try:
+        creation, name = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        frappe.throw(_("Invalid cursor"))
+    return str(creation), str(name)
+
+
+def _after(table, cursor: Tuple[str, str], descending: bool):
+    """Keyset condition: rows strictly after `cursor` in (creation, name) order."""
+    creation, name = cursor
+    if descending:
+        return (table.creation < creation) | ((table.creation == creation) & (table.name < name))
+    return (table.creation > creation) | ((table.creation == creation) & (table.name > name))
+
+
+def _check_session(session_id: str) -> None:
+    owner = frappe.db.get_value("AI Chat Session", session_id, "user")
+    if owner is None:
+        frappe.throw(_("AI Chat Session {0} not found").format(session_id), frappe.DoesNotExistError)
+    if owner != frappe.session.user and "System Manager" not in frappe.get_roles():
+        frappe.throw(_("Not permitted to read this chat session"), frappe.PermissionError)
+
+
+def _message_query(session_id: str, include_tool_calls: Any):
+    m = frappe.qb.DocType("AI Chat Message")
+    fields = list(MESSAGE_FIELDS) + (["tool_call_json"] if int(include_tool_calls or 0) else [])
+    return m, frappe.qb.from_(m).select(*[m[f] for f in fields]).where(m.session == session_id)
+
+
+def _page(query, table, cursor, descending: bool, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    order = Order.desc if descending else Order.asc
+    if cursor:
+        query = query.where(_after(table, cursor, descending))
+    rows = query.orderby(table.creation, order=order).orderby(table.name, order=order).limit(limit + 1).run(as_dict=True)
+    return rows[:limit], len(rows) > limit
+
+
+def _unpack_messages(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for r in rows:
+        r["content"] = unpack(r.get("content"))
+    return rows
+
+
+@frappe.whitelist()
+def list_sessions(
+    limit: int = DEFAULT_LIMIT,
+    cursor: str = None,
+    status: str = None,
+    context_doctype: str = None,
+    context_docname: str = None,
+    user: str = None,
+) -> Dict[str, Any]:
+    """The current user's chat sessions, newest first. System Managers may pass `user`."""
+    if user and user != frappe.session.user:
+        frappe.only_for("System Manager")
+    limit = _limit(limit)
+    s = frappe.qb.DocType("AI Chat Session")
+    query = frappe.qb.from_(s).select(*[s[f] for f in SESSION_FIELDS]).where(s.user == (user or frappe.session.user))
+    if status:
+        query = query.where(s.status == status)
+    if context_doctype:
+        query = query.where(s.context_doctype == context_doctype)
+    if context_docname:
+        query = query.where(s.context_docname == context_docname)
+    rows, more = _page(query, s, decode_cursor(cursor), True, limit)
+    return {"sessions": rows, "next_cursor": encode_cursor(rows[-1]) if more else None}
+
+
+@frappe.whitelist()
+def get_messages(session_id: str, limit: int = 50, before: str = None, include_tool_calls: int = 0) -> Dict[str, Any]:
+    """The latest `limit` messages of a session (or those before the `before`
+    cursor, to scroll back), in chronological order.
+
+    `before_cursor` loads the previous page; `cursor` is the newest message,
+    to pass to `messages_since`.
+    """
+    _check_session(session_id)
+    m, query = _message_query(session_id, include_tool_calls)
+    rows, more = _page(query, m, decode_cursor(before), True, _limit(limit, 50))
+    rows.reverse()
+    _unpack_messages(rows)
+    return {
+        "messages": rows,
+        "before_cursor": encode_cursor(rows[0]) if more else None,
+        # only the first (latest) page knows the head of the conversation
+        "cursor": encode_cursor(rows[-1]) if rows and not before else None,
+    }
+
+
+@frappe.whitelist()
+def messages_since(session_id: str, cursor: str = None, limit: int = 100, include_tool_calls: int = 0) -> Dict[str, Any]:
+    """Messages newer than `cursor` (all, from the start, without one), oldest first.
+
+    Returns the cursor to send next time (unchanged when nothing is new) and
+    `has_more` when the page filled up and another call should follow at once.
+    """
+    _check_session(session_id)
+    m, query = _message_query(session_id, include_tool_calls)
+    rows, more = _page(query, m, decode_cursor(cursor), False, _limit(limit, 100))
+    _unpack_messages(rows)
+    return {
+        "messages": rows,
+        "cursor": encode_cursor(rows[-1]) if rows else cursor,
+        "has_more": more,
+    }
@@ -6,16 +6,32 @@ from typing import Any, Dict, Optional
 import frappe
 from frappe import _
 
+from alphax_ai_platform.alphax_ai.caching import idempotency
+from alphax_ai_platform.alphax_ai.ingestion.dedup import (
+    DuplicateIndex,
+    fingerprint_parsed,
+    simhash,
+    text_for_simhash,
+)
 from alphax_ai_platform.alphax_ai.ingestion.extractors import extract_content
+from alphax_ai_platform.alphax_ai.ingestion import segmentation, splitter
+from alphax_ai_platform.alphax_ai.ingestion.progress import IngestProgress
+from alphax_ai_platform.alphax_ai.parsing import llm_extract
+from alphax_ai_platform.alphax_ai.parsing.normalize import compile_schema, normalize_parsed
 from alphax_ai_platform.alphax_ai.parsing.parsers import (
     parse_purchase_order,
     parse_employee,
 )
+from alphax_ai_platform.alphax_ai.mapping.resolver import resolve_purchase_order
 from alphax_ai_platform.alphax_ai.mapping.engine import (
     apply_schema_field_mapping,
     apply_mapping_template,
     validate_for_doctype,
 )
+from alphax_ai_platform.alphax_ai.metrics.store import record as record_metrics
+from alphax_ai_platform.alphax_ai.metrics.timing import StageTimer
+from alphax_ai_platform.alphax_ai.retrieval.index import enqueue_indexing
+from alphax_ai_platform.alphax_ai.storage.compression import unpack
 
 
 def _get_file_doc(file_url: Optional[str], file_name: Optional[str]):
@@ -26,7 +42,7 @@ def _get_file_doc(file_url: Optional[str], file_name: Optional[str]):
     frappe.throw(_("file_url or file_name is required"))
 
 
-def _create_ingested_doc(file_doc, target_doctype, blueprint, ocr_engine, language_hint):
+def _create_ingested_doc(file_doc, target_doctype, blueprint, ocr_engine, language_hint, status="Extracted", **extra):
     ing = frappe.get_doc(
         {
             "doctype": "AI Ingested Document",
@@ -38,7 +54,9 @@ def _create_ingested_doc(file_doc, target_doctype, blueprint, ocr_engine, langua
             "blueprint": blueprint,
             "ocr_engine": ocr_engine,
             "language_hint": language_hint,
-            "status": "Extracted",
+            "file_hash": getattr(file_doc, "content_hash", None),
+            "status": status,
+            **extra,
         }
     )
     ing.insert(ignore_permissions=False)
@@ -52,7 +70,7 @@ def _create_ocr_result(ingested_name, extracted):
             "ingested_document": ingested_name,
             "extracted_text": extracted.get("text") or "",
             "extracted_tables_json": json.dumps(
-                extracted.get("tables") or [], ensure_ascii=False
+                extracted.get("tables") or [], ensure_ascii=False, default=str
             ),
             "extraction_meta_json": json.dumps(
                 extracted.get("meta") or {}, ensure_ascii=False
@@ -87,9 +105,15 @@ def _resolve_blueprint(blueprint_name, target_doctype):
             "schema_fields": [],
             "mapping_template": None,
             "blueprint": None,
+            "duplicate_handling": "Flag",
+            "duplicate_window_days": 30,
+            "split_mode": None,
+            "split_chunk_size": None,
+            "detect_boundaries": False,
+            "extraction_mode": None,
         }
 
-    bp = frappe.get_doc("AI Intake Blueprint", blueprint_name)
+    bp = frappe.get_cached_doc("AI Intake Blueprint", blueprint_name)
     return {
         "blueprint": bp.name,
         "target_doctype": bp.target_doctype,
@@ -97,89 +121,225 @@ def _resolve_blueprint(blueprint_name, target_doctype):
         "language_hint": bp.language_hint or "auto",
         "schema_fields": bp.get("schema_fields") or [],
         "mapping_template": bp.mapping_template,
+        "duplicate_handling": bp.get("duplicate_handling") or "Flag",
+        "duplicate_window_days": bp.get("duplicate_window_days") or 30,
+        "split_mode": bp.get("split_mode"),
+        "split_chunk_size": bp.get("split_chunk_size"),
+        "detect_boundaries": bool(bp.get("detect_document_boundaries")),
+        "extraction_mode": bp.get("extraction_mode") or "Schema-first",
     }
 
 
-@frappe.whitelist()
-def ingest_file(
-    file_url=None,
-    file_name=None,
-    target_doctype="Sales Order",
-    create_draft=1,
-    mapping_template=None,
-    blueprint_name=None,
-):
-    if not frappe.has_permission("File", "read"):
-        frappe.throw(_("Not permitted to read File"))
+def _load_previous_extraction(ingested_name) -> Optional[Dict[str, Any]]:
+    """Reuse the OCR result of a byte-identical earlier ingest instead of re-extracting."""
+    row = frappe.db.get_value(
+        "AI OCR Result",
+        {"ingested_document": ingested_name},
+        ["name", "extracted_text", "extracted_tables_json", "extraction_meta_json", "pages"],
+        as_dict=True,
+    )
+    if not row:
+        return None
+    try:
+        tables = json.loads(row.extracted_tables_json or "[]")
+        meta = json.loads(row.extraction_meta_json or "{}")
+    except ValueError:
+        return None
+    meta.pop("timings", None)
+    meta["reused_from"] = row.name
+    return {"text": unpack(row.extracted_text) or "", "tables": tables, "pages": row.pages or 1, "meta": meta}
 
-    file_doc = _get_file_doc(file_url, file_name)
 
-    bp = _resolve_blueprint(blueprint_name, target_doctype)
-    target_doctype = bp.get("target_doctype") or target_doctype
+def _resolve_masters(target_doctype, parsed, schema_fields):
+    """Fuzzy-match raw supplier/item/UOM text onto master records (best-effort)."""
+    if not parsed or target_doctype != "Purchase Order":
+        return parsed
+    try:
+        return resolve_purchase_order(parsed, schema_fields)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Master Resolution Failed")
+        return parsed
 
-    ingested_name = _create_ingested_doc(
-        file_doc,
-        target_doctype,
-        bp.get("blueprint"),
-        bp.get("ocr_engine"),
-        bp.get("language_hint"),
-    )
 
-    extracted = extract_content(
-        file_doc,
-        ocr_engine=bp.get("ocr_engine"),
-        language=bp.get("language_hint"),
+def _duplicate_note(duplicate: Dict[str, Any]) -> str:
+    match = duplicate["match"]
+    if match == "near":
+        match = f"near ({duplicate['distance']} bits)"
+    return _("Possible duplicate of {0} ({1} match)").format(duplicate["name"], match)
+
+
+def _record_timings(ocr_name, extracted, timer, bp):
+    """Persist per-ingest timings into extraction_meta_json and feed the rolling histograms."""
+    timings = timer.as_dict()
+    meta = dict(extracted.get("meta") or {})
+    meta["timings"] = timings
+    frappe.db.set_value(
+        "AI OCR Result",
+        ocr_name,
+        "extraction_meta_json",
+        json.dumps(meta, ensure_ascii=False),
+        update_modified=False,
+    )
+    stages = dict(timings["stages_ms"])
+    stages["total"] = timings["total_ms"]
+    record_metrics(
+        "ingest",
+        stages,
+        labels={"blueprint": bp.get("blueprint"), "ocr_engine": bp.get("ocr_engine")},
+        counters=timings["counters"],
     )
+    return timings
+
+
+def _process_extracted(
+    ingested_name,
+    ocr_name,
+    extracted,
+    bp,
+    target_doctype,
+    create_draft,
+    mapping_template,
+    dedup_index,
+    duplicate,
+    file_hash,
+    timer,
+    progress=None,
+):
+    """Parse -> resolve -> dedup -> split / draft / action request for one extracted document.
 
-    ocr_name = _create_ocr_result(ingested_name, extracted)
+    Shared by `ingest_file` and the per-segment jobs of multi-document scans.
+    """
+    progress = progress or IngestProgress()
+    dedup_mode = bp.get("duplicate_handling") or "Flag"
+    text_hash = None
+    if dedup_index:
+        with timer.stage("dedup.simhash"):
+            text_hash = simhash(text_for_simhash(extracted))
 
     created_docname = None
     action_request = None
+    fingerprint = None
+    status = "Extracted"
 
-    if int(create_draft) == 1:
-        parsed = None
-        tables = extracted.get("tables") or []
+    parsed = None
+    llm_parsed = False
+    tables = extracted.get("tables") or []
+    split = None
+    split_rows = splitter.split_rows(extracted) if splitter.is_split(bp) and int(create_draft) == 1 else None
 
-        if bp.get("schema_fields"):
+    progress.stage("Parsing")
+    with timer.stage("parse"):
+        if bp.get("schema_fields") and not split_rows and (int(create_draft) == 1 or dedup_index):
+            normalizers = compile_schema(bp.get("schema_fields"))
             if target_doctype == "Purchase Order":
-                parsed = parse_purchase_order(extracted.get("text") or "", tables)
+                parsed = parse_purchase_order(extracted.get("text") or "", tables, normalizers=normalizers)
             elif target_doctype == "Employee":
-                parsed = parse_employee(extracted.get("text") or "", tables)
+                parsed = parse_employee(extracted.get("text") or "", tables, normalizers=normalizers)
+            elif int(create_draft) == 1 and llm_extract.applies(bp, target_doctype):
+                parsed = llm_extract.extract_one(extracted, bp, target_doctype)
+                llm_parsed = True
 
-        if parsed:
-            doc_dict = apply_schema_field_mapping(parsed, bp.get("schema_fields"))
-            doc_dict = apply_mapping_template(
-                target_doctype,
-                doc_dict,
-                bp.get("mapping_template") or mapping_template,
-            )
+    with timer.stage("normalize"):
+        unparsed = normalize_parsed(parsed, bp.get("schema_fields"))
+
+    with timer.stage("resolve_masters"):
+        parsed = _resolve_masters(target_doctype, parsed, bp.get("schema_fields"))
+
+    if dedup_index:
+        fingerprint = fingerprint_parsed(parsed)
+        if not duplicate:
+            with timer.stage("dedup.lookup"):
+                duplicate = dedup_index.find(fingerprint, text_hash, exclude=ingested_name)
+
+    if duplicate and dedup_mode == "Skip":
+        status = "Duplicate"
+    elif split_rows:
+        review_note = _duplicate_note(duplicate) if duplicate else None
+        if len(split_rows) > splitter.SYNC_ROWS:
+            splitter.enqueue_split(ingested_name, ocr_name, bp.get("blueprint"), review_note, progress.progress_id)
+            split = {"queued": True, "rows": len(split_rows)}
+            status = "Queued"
         else:
-            doc_dict = _safe_fallback_doc(target_doctype, extracted)
+            with timer.stage("split"):
+                split = splitter.run_split(ingested_name, split_rows, bp, review_note, progress=progress)
+            status = split["status"]
+            action_request = split["action_request"]
+            created_docname = split["first_document"]
+    elif int(create_draft) == 1:
+        with timer.stage("map"):
+            if parsed:
+                doc_dict = apply_schema_field_mapping(parsed, bp.get("schema_fields"))
+                if llm_parsed:
+                    doc_dict.update(llm_extract.table_values(parsed, bp.get("schema_fields")))
+                doc_dict = apply_mapping_template(
+                    target_doctype,
+                    doc_dict,
+                    bp.get("mapping_template") or mapping_template,
+                )
+            else:
+                doc_dict = _safe_fallback_doc(target_doctype, extracted)
 
-        ok, errors = validate_for_doctype(target_doctype, doc_dict)
+        progress.stage("Validating")
+        with timer.stage("validate"):
+            ok, errors = validate_for_doctype(target_doctype, doc_dict)
+        if unparsed:
+            # values the blueprint rules could not normalize were dropped: have a human look
+            ok = False
+            errors = list(errors or []) + [
+                _("Could not normalize {0}: {1}").format(label, raw) for label, raw in unparsed
+            ]
+        if duplicate:
+            # Flag mode: never auto-create a draft for a suspected resend.
+            ok = False
+            errors = [_duplicate_note(duplicate)] + list(errors or [])
 
         if not ok or not frappe.has_permission(target_doctype, "create"):
-            ar = frappe.get_doc(
-                {
-                    "doctype": "AI Action Request",
-                    "action_type": "Create Draft",
-                    "target_doctype": target_doctype,
-                    "status": "Pending",
-                    "source_ingested_document": ingested_name,
-                    "payload_json": json.dumps(doc_dict, ensure_ascii=False),
-                    "notes": "\n".join(errors or []),
-                }
-            )
-            ar.insert(ignore_permissions=False)
+            with timer.stage("insert_action_request"):
+                ar = frappe.get_doc(
+                    {
+                        "doctype": "AI Action Request",
+                        "action_type": "Create Draft",
+                        "target_doctype": target_doctype,
+                        "status": "Pending",
+                        "source_ingested_document": ingested_name,
+                        "payload_json": json.dumps(doc_dict, ensure_ascii=False),
+                        "notes": "\n".join(errors or []),
+                    }
+                )
+                ar.insert(ignore_permissions=False)
             action_request = ar.name
+            status = "Pending Approval"
         else:
-            created_docname = _create_draft_doc(target_doctype, doc_dict)
-            frappe.db.set_value(
-                "AI Ingested Document",
-                ingested_name,
-                "created_document",
-                created_docname,
-            )
+            with timer.stage("insert_draft"):
+                created_docname = _create_draft_doc(target_doctype, doc_dict)
+            status = "Draft Created"
+
+    with timer.stage("update_ingested_document"):
+        frappe.db.set_value(
+            "AI Ingested Document",
+            ingested_name,
+            {
+                "status": status,
+                "created_document": created_docname,
+                "content_fingerprint": fingerprint,
+                "simhash": f"{text_hash:016x}" if text_hash is not None else None,
+                "duplicate_of": duplicate["name"] if duplicate else None,
+                "duplicate_match": duplicate["match"] if duplicate else None,
+            },
+        )
+    if dedup_index and not duplicate:
+        # Only originals are indexed so later resends point at the first copy.
+        dedup_index.add_on_commit(ingested_name, file_hash, fingerprint, text_hash)
+    if not duplicate:
+        # Chunk for grounded chat after commit; duplicates would only repeat passages.
+        enqueue_indexing(ocr_name)
+
+    timings = _record_timings(ocr_name, extracted, timer, bp)
+    if status == "Queued":
+        # the split job sends the final update under the same progress id
+        progress.stage("Queued")
+    else:
+        progress.finish(status, created_document=created_docname, action_request=action_request)
 
     return {
         "ok": True,
@@ -187,4 +347,237 @@ def ingest_file(
         "ocr_result": ocr_name,
         "created_document": created_docname,
         "action_request": action_request,
+        "duplicate_of": duplicate["name"] if duplicate else None,
+        "duplicate_match": duplicate["match"] if duplicate else None,
+        "split": split,
+        "timings": timings,
+    }
+
+
+def _fan_out_segments(
+    file_doc,
+    ingested_name,
+    ocr_name,
+    extracted,
+    segments,
+    bp,
+    target_doctype,
+    create_draft,
+    mapping_template,
+    dedup_index,
+    timer,
+    progress=None,
+):
+    """Turn a multi-document scan into one child AI Ingested Document per segment.
+
+    The container keeps the file hash (so resends of the whole scan are still
+    caught) and gets status Split; each segment gets its own OCR result built
+    from the already-extracted page texts and is processed by its own job.
+    """
+    children = []
+    # Schema-first LLM extraction: segments that fit one prompt share a job and a provider call
+    batched = int(create_draft) == 1 and llm_extract.applies(bp, target_doctype)
+    with timer.stage("insert_segments"):
+        for i, seg in enumerate(segments):
+            child = _create_ingested_doc(
+                file_doc,
+                target_doctype,
+                bp.get("blueprint"),
+                bp.get("ocr_engine"),
+                bp.get("language_hint"),
+                file_hash=None,
+                parent_document=ingested_name,
+                segment_index=i + 1,
+                page_range=seg["page_range"],
+            )
+            child_ocr = _create_ocr_result(child, seg)
+            if not batched:
+                segmentation.enqueue_segment(
+                    child, child_ocr, bp.get("blueprint"), target_doctype, create_draft, mapping_template, ingested_name
+                )
+            children.append({"ingested_document": child, "ocr_result": child_ocr, "pages": seg["page_range"]})
+
+    if batched:
+        with timer.stage("plan_llm_batches"):
+            groups = llm_extract.plan_batches(
+                [{"id": c["ingested_document"], "text": seg["text"]} for c, seg in zip(children, segments)],
+                bp.get("schema_fields"),
+            )
+        by_name = {c["ingested_document"]: c for c in children}
+        for group in groups:
+            segmentation.enqueue_segment_batch(
+                [{"ingested_document": n, "ocr_result": by_name[n]["ocr_result"]} for n in group],
+                bp.get("blueprint"), target_doctype, create_draft, mapping_template, ingested_name,
+            )
+        timer.count("llm_batches", len(groups))
+
+    frappe.db.set_value("AI Ingested Document", ingested_name, "status", "Split")
+    if dedup_index:
+        dedup_index.add_on_commit(ingested_name, getattr(file_doc, "content_hash", None), None, None)
+
+    timer.count("segments", len(children))
+    timings = _record_timings(ocr_name, extracted, timer, bp)
+    if progress:
+        # each segment job reports its own final status with this document as parent
+        progress.finish("Split", segments=len(children))
+    return {
+        "ok": True,
+        "ingested_document": ingested_name,
+        "ocr_result": ocr_name,
+        "created_document": None,
+        "action_request": None,
+        "duplicate_of": None,
+        "duplicate_match": None,
+        "split": None,
+        "segments": children,
+        "timings": timings,
     }
+
+
+@frappe.whitelist()
+def ingest_file(
+    file_url=None,
+    file_name=None,
+    target_doctype="Sales Order",
+    create_draft=1,
+    mapping_template=None,
+    blueprint_name=None,
+    idempotency_key=None,
+    progress_id=None,
+):
+    """Ingest one File. Repeats of the same request (same `idempotency_key` /
+    Idempotency-Key header, or same file + blueprint + options when no key is
+    sent) within the idempotency window return the first result instead of
+    extracting again; concurrent repeats wait for it.
+
+    With a `progress_id`, stage updates are published to the caller as
+    `alphax_ai_ingest_progress` events (ingestion.progress) while it runs."""
+    if not frappe.has_permission("File", "read"):
+        frappe.throw(_("Not permitted to read File"))
+
+    key = idempotency.request_key(idempotency_key) or idempotency.derive_key(
+        file_url, file_name, target_doctype, int(create_draft), mapping_template, blueprint_name
+    )
+    progress = IngestProgress(progress_id)
+
+    def run():
+        try:
+            return _ingest_file(file_url, file_name, target_doctype, create_draft, mapping_template, blueprint_name, progress)
+        except Exception:
+            progress.finish("Failed")
+            raise
+
+    return idempotency.run_once("ingest", key, run)
+
+
+def _ingest_file(file_url, file_name, target_doctype, create_draft, mapping_template, blueprint_name, progress=None):
+    timer = StageTimer()
+    progress = progress or IngestProgress()
+
+    file_doc = _get_file_doc(file_url, file_name)
+
+    with timer.stage("resolve_blueprint"):
+        bp = _resolve_blueprint(blueprint_name, target_doctype)
+    target_doctype = bp.get("target_doctype") or target_doctype
+
+    dedup_mode = bp.get("duplicate_handling") or "Flag"
+    dedup_index = None
+    duplicate = None
+    if dedup_mode != "Off":
+        dedup_index = DuplicateIndex(bp.get("blueprint") or target_doctype, bp.get("duplicate_window_days"))
+        with timer.stage("dedup.file"):
+            previous = dedup_index.find_file(getattr(file_doc, "content_hash", None))
+        if previous:
+            duplicate = {"name": previous, "match": "file", "distance": 0}
+
+    if duplicate and dedup_mode == "Skip":
+        # Byte-identical resend: record it and stop before any extraction work.
+        ingested_name = _create_ingested_doc(
+            file_doc,
+            target_doctype,
+            bp.get("blueprint"),
+            bp.get("ocr_engine"),
+            bp.get("language_hint"),
+            status="Duplicate",
+        )
+        frappe.db.set_value(
+            "AI Ingested Document",
+            ingested_name,
+            {"duplicate_of": duplicate["name"], "duplicate_match": duplicate["match"]},
+        )
+        progress.ingested_document = ingested_name
+        progress.finish("Duplicate", duplicate_of=duplicate["name"])
+        return {
+            "ok": True,
+            "ingested_document": ingested_name,
+            "ocr_result": None,
+            "created_document": None,
+            "action_request": None,
+            "duplicate_of": duplicate["name"],
+            "duplicate_match": duplicate["match"],
+            "timings": timer.as_dict(),
+        }
+
+    with timer.stage("insert_ingested_document"):
+        ingested_name = _create_ingested_doc(
+            file_doc,
+            target_doctype,
+            bp.get("blueprint"),
+            bp.get("ocr_engine"),
+            bp.get("language_hint"),
+        )
+    progress.ingested_document = ingested_name
+
+    progress.stage("Extracting")
+    with timer.stage("extract"):
+        extracted = _load_previous_extraction(duplicate["name"]) if duplicate else None
+        if not extracted:
+            extracted = extract_content(
+                file_doc,
+                ocr_engine=bp.get("ocr_engine"),
+                language=bp.get("language_hint"),
+                timer=timer,
+                on_page=progress.page,
+            )
+
+    with timer.stage("insert_ocr_result"):
+        ocr_name = _create_ocr_result(ingested_name, extracted)
+
+    segments = []
+    if bp.get("detect_boundaries") and not splitter.is_split(bp) and not duplicate:
+        with timer.stage("segment"):
+            segments = segmentation.segment_extraction(extracted)
+
+    if segments:
+        return _fan_out_segments(
+            file_doc, ingested_name, ocr_name, extracted, segments, bp,
+            target_doctype, create_draft, mapping_template, dedup_index, timer, progress,
+        )
+
+    return _process_extracted(
+        ingested_name,
+        ocr_name,
+        extracted,
+        bp,
+        target_doctype,
+        create_draft,
+        mapping_template,
+        dedup_index,
+        duplicate,
+        getattr(file_doc, "content_hash", None),
+        timer,
+        progress,
+    )
+
+
+@frappe.whitelist(methods=["POST"])
+def resume_split(ingested_document):
+    """Re-queue a Failed or stalled row-per-document split; it continues after
+    its last committed chunk instead of inserting those rows again."""
+    frappe.has_permission("AI Ingested Document", "write", ingested_document, throw=True)
+    status = frappe.db.get_value("AI Ingested Document", ingested_document, "status")
+    if status not in ("Failed", "Queued"):
+        frappe.throw(_("Only Failed or Queued documents can be resumed (status: {0})").format(status))
+    if not splitter.resume_split(ingested_document, force=True):
+        frappe.throw(_("{0} has no split job to resume, or it is still running").format(ingested_document))
+    return {"ok": True, "ingested_document": ingested_document, "status": "Queued"}
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict
+
+import frappe
+from frappe import _
+
+from alphax_ai_platform.alphax_ai.mapping.resolver import (
+    DEFAULT_MIN_SCORE,
+    MASTER_SOURCES,
+    resolve_many,
+)
+
+
+@frappe.whitelist()
+def resolve(doctype: str, queries: Any, min_score: float = DEFAULT_MIN_SCORE) -> Dict[str, Any]:
+    """Batch fuzzy match raw texts (supplier names, item descriptions, UOMs) to master records."""
+    if doctype not in MASTER_SOURCES:
+        frappe.throw(_("Master resolution is not available for {0}").format(doctype))
+    if not frappe.has_permission(doctype, "read"):
+        frappe.throw(_("Not permitted to read {0}").format(doctype), frappe.PermissionError)
+    if isinstance(queries, str):
+        queries = json.loads(queries)
+    return {"matches": resolve_many(doctype, queries or [], float(min_score))}
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import frappe
+from frappe import _
+from werkzeug.wrappers import Response
+
+from alphax_ai_platform.alphax_ai.caching import warmup
+from alphax_ai_platform.alphax_ai.metrics.store import reset, summarize, to_prometheus
+from alphax_ai_platform.alphax_ai.providers.limiter import queue_depth_prometheus, queue_depths
+from alphax_ai_platform.alphax_ai.providers.router import health_snapshot
+
+
+SERIES = ("ingest", "chat", "provider_limiter", "provider_router")
+
+
+def _check_series(series: str) -> str:
+    if series not in SERIES:
+        frappe.throw(_("Unknown metrics series: {0}").format(series))
+    return series
+
+
+@frappe.whitelist()
+def get_metrics(series: str = "ingest") -> Dict[str, Any]:
+    """Rolling p50/p95/p99 per stage (ingest: per blueprint/OCR engine, chat: per agent/provider).
+
+    `provider_limiter` holds rate-limit wait times per provider and priority
+    class, plus the current queue depth; `provider_router` holds call times
+    per answering provider, failover/hedge counters and the rolling health
+    (latency, error rate, circuit) seen by the worker serving this request.
+    """
+    frappe.only_for("System Manager")
+    data = summarize(_check_series(series))
+    if series == "provider_limiter":
+        data["queue_depth"] = queue_depths()
+    elif series == "provider_router":
+        data["health"] = health_snapshot()
+    return data
+
+
+@frappe.whitelist()
+def prometheus():
+    """Prometheus text exposition of all AlphaX AI metric series."""
+    frappe.only_for("System Manager")
+    return Response(to_prometheus(SERIES) + queue_depth_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_metrics(series: str = "ingest") -> Dict[str, Any]:
+    frappe.only_for("System Manager")
+    reset(_check_series(series))
+    return {"ok": True}
+
+
+@frappe.whitelist()
+def import_report() -> Dict[str, Any]:
+    """Cold import times of the app's entry points and the heavy optional libraries.
+
+    `eager_heavy_imports` should stay empty: pandas, NumPy, PIL etc. are meant
+    to load on first use (or in worker warm-up), never when a web worker
+    imports an endpoint module. Takes a few seconds (fresh interpreters).
+    """
+    frappe.only_for("System Manager")
+    return warmup.import_report()
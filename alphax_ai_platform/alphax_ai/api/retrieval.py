@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import frappe
+from frappe import _
+
+from alphax_ai_platform.alphax_ai.retrieval.index import search as search_passages
+
+
+@frappe.whitelist()
+def search(query: str, k: int = None, ingested_document: str = None) -> Dict[str, Any]:
+    """Top passages from ingested documents the user can read."""
+    if not query:
+        frappe.throw(_("query is required"))
+    if not frappe.has_permission("AI Ingested Document", "read"):
+        frappe.throw(_("Not permitted to read AI Ingested Document"), frappe.PermissionError)
+    documents = [ingested_document] if ingested_document else None
+    return {"passages": search_passages(query, k=int(k) if k else None, documents=documents)}
+
+
+@frappe.whitelist(methods=["POST"])
+def reindex() -> Dict[str, Any]:
+    """Queue a backfill that chunks every AI OCR Result not yet indexed."""
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "alphax_ai_platform.alphax_ai.retrieval.index.reindex_all",
+        queue="long",
+        job_id="alphax_ai_retrieval::reindex_all",
+        deduplicate=True,
+    )
+    return {"ok": True}
@@ -0,0 +1,38 @@
+import frappe
+
+from alphax_ai_platform.alphax_ai.api import chat
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+
+class TestChatIdempotencyKey(PatchedTestCase):
+    def setUp(self):
+        self.messages = []
+        self.patch(chat.idempotency, "run_once", side_effect=lambda scope, key, compute: key)
+        self.patch(chat.idempotency, "request_key", side_effect=lambda explicit: explicit)
+        self.patch(frappe, "get_all", side_effect=lambda doctype, **kw: [frappe._dict(name=n) for n in self.messages[-1:]])
+
+    def _key(self, message="yes", session_id="CHAT-1", idempotency_key=None):
+        return chat.chat("erp", message, session_id=session_id, idempotency_key=idempotency_key)
+
+    def test_resend_during_the_turn_shares_the_key(self):
+        self.messages = ["MSG-1", "MSG-2"]
+        self.assertEqual(self._key(), self._key())
+
+    def test_same_text_after_the_reply_is_a_new_turn(self):
+        self.messages = ["MSG-1", "MSG-2"]
+        first = self._key()
+        self.messages += ["MSG-3", "MSG-4"]  # the "yes" turn and its reply
+        self.assertNotEqual(self._key(), first)
+
+    def test_different_session_or_text(self):
+        self.messages = ["MSG-1"]
+        self.assertNotEqual(self._key(session_id="CHAT-1"), self._key(session_id="CHAT-2"))
+        self.assertNotEqual(self._key("yes"), self._key("no"))
+
+    def test_client_key_wins(self):
+        self.assertEqual(self._key(idempotency_key="client-42"), "client-42")
+        frappe.get_all.assert_not_called()
+
+    def test_without_session_no_lookup(self):
+        self.assertEqual(self._key(session_id=None), self._key(session_id=None))
+        frappe.get_all.assert_not_called()
@@ -0,0 +1,41 @@
+import base64
+import datetime
+import unittest
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.api.history import MAX_LIMIT, _limit, decode_cursor, encode_cursor
+
+
+class TestCursor(unittest.TestCase):
+    def test_round_trip(self):
+        rows = (
+            {"creation": datetime.datetime(2026, 10, 1, 9, 30, 5, 123456), "name": "a1b2c3d4e5"},
+            {"creation": "2026-10-01 09:30:05", "name": "MSG-ÜÇ-0001"},
+            {"creation": "2026-10-01 09:30:05.000001", "name": "x" * 140},
+        )
+        for row in rows:
+            cursor = encode_cursor(row)
+            self.assertNotIn("=", cursor)
+            self.assertEqual(decode_cursor(cursor), (str(row["creation"]), row["name"]))
+
+    def test_empty(self):
+        self.assertIsNone(encode_cursor(None))
+        self.assertIsNone(encode_cursor({}))
+        self.assertIsNone(decode_cursor(None))
+        self.assertIsNone(decode_cursor(""))
+
+    def test_invalid_cursors(self):
+        def b64(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+        for cursor in ("not a cursor!", "%%%", b64("not json"), b64("[1, 2, 3]"), b64('{"a": 1}'), b64("7"), b64('["only one"]')):
+            with self.subTest(cursor=cursor), self.assertRaises(frappe.ValidationError):
+                decode_cursor(cursor)
+
+    def test_limit_bounds(self):
+        self.assertEqual(_limit(None), 20)
+        self.assertEqual(_limit("5"), 5)
+        self.assertEqual(_limit(0, 50), 50)
+        self.assertEqual(_limit(-3), 1)
+        self.assertEqual(_limit(10 ** 6), MAX_LIMIT)
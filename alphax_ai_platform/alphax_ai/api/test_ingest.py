@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.api import ingest
+from alphax_ai_platform.alphax_ai.api.ingest import _resolve_blueprint
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+
+class TestResolveBlueprint(unittest.TestCase):
+    def blueprint(self, **fields):
+        bp = frappe._dict(name="PO Intake", target_doctype="Purchase Order", **fields)
+        with mock.patch.object(frappe, "get_cached_doc", return_value=bp):
+            return _resolve_blueprint("PO Intake", None)
+
+    def test_boundary_detection_is_opt_in(self):
+        self.assertFalse(_resolve_blueprint(None, "Purchase Order")["detect_boundaries"])
+        self.assertFalse(self.blueprint()["detect_boundaries"])
+        self.assertFalse(self.blueprint(detect_document_boundaries=0)["detect_boundaries"])
+        self.assertTrue(self.blueprint(detect_document_boundaries=1)["detect_boundaries"])
+
+
+class TestResumeSplit(PatchedTestCase):
+    def setUp(self):
+        self.status = "Failed"
+        self.patch(frappe, "has_permission", return_value=True)
+        self.patch(frappe.db, "get_value", create=True, side_effect=lambda *a: self.status)
+        self.patch(ingest.splitter, "resume_split", return_value=True)
+
+    def test_failed_split_is_requeued(self):
+        self.assertEqual(ingest.resume_split("ING-1")["status"], "Queued")
+        frappe.has_permission.assert_called_once_with("AI Ingested Document", "write", "ING-1", throw=True)
+        ingest.splitter.resume_split.assert_called_once_with("ING-1", force=True)
+
+    def test_finished_or_unresumable_documents_are_refused(self):
+        self.status = "Draft Created"
+        with self.assertRaises(frappe.ValidationError):
+            ingest.resume_split("ING-1")
+        ingest.splitter.resume_split.assert_not_called()
+        self.status = "Failed"
+        ingest.splitter.resume_split.return_value = False
+        with self.assertRaises(frappe.ValidationError):
+            ingest.resume_split("ING-1")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import frappe
+from frappe import _
+
+from alphax_ai_platform.alphax_ai.policies.engine import PolicyEngine
+from alphax_ai_platform.alphax_ai.tools.runner import run_tool, tool_specs
+
+
+@frappe.whitelist()
+def list_tools() -> Dict[str, Any]:
+    """Function-calling definitions of the AI Tools the session user's policy allows."""
+    policy = PolicyEngine.for_user(user=frappe.session.user).evaluate(context={})
+    return {"tools": tool_specs(policy)}
+
+
+@frappe.whitelist(methods=["POST"])
+def run(tool_key: str, args: Any = None) -> Dict[str, Any]:
+    """Run one AI Tool as the session user (what an agent's tool call does)."""
+    if not tool_key:
+        frappe.throw(_("tool_key is required"))
+    policy = PolicyEngine.for_user(user=frappe.session.user).evaluate(context={})
+    return run_tool(tool_key, args, policy=policy)
@@ -0,0 +1,151 @@
+"""Idempotency keys and in-flight deduplication for expensive endpoints.
+
+A request carries a key (an `Idempotency-Key` header or argument, or one the
+endpoint derives from its inputs). Per user and scope:
+
+  - a finished result for the key is replayed from Redis for the idempotency
+    window instead of running the work again;
+  - while the first request is running it holds a Redis lock (SET NX PX);
+    identical requests arriving meanwhile wait for its result instead of
+    starting a second OCR run / provider call. A web request waits only
+    WEB_WAIT_S (it holds a web worker meanwhile) and then gets an "in
+    progress" error to retry on; background jobs wait up to WAIT_S;
+  - if the first request fails, its lock is dropped and a waiting request
+    takes over.
+
+Results are published only after the transaction commits, so a replay never
+points at documents that were rolled back. Redis trouble degrades to running
+the work unguarded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import frappe
+from frappe import _
+
+KEY_PREFIX = "alphax_ai:idem"
+HEADER = "Idempotency-Key"
+DEFAULT_WINDOW_S = 120
+LOCK_TTL_S = 600
+POLL_S = 0.1
+WAIT_S = 60.0
+WEB_WAIT_S = 3.0
+
+
+def window_seconds() -> int:
+    try:
+        v = frappe.db.get_single_value("AI Platform Settings", "idempotency_window_seconds", cache=True)
+    except Exception:
+        return DEFAULT_WINDOW_S
+    return DEFAULT_WINDOW_S if v in (None, "") else max(0, int(v))
+
+
+def request_key(explicit: Optional[str] = None) -> Optional[str]:
+    """The client's key: explicit argument first, then the Idempotency-Key header."""
+    if explicit:
+        return str(explicit)
+    if getattr(frappe.local, "request", None):
+        return frappe.get_request_header(HEADER) or frappe.get_request_header("X-" + HEADER)
+    return None
+
+
+def wait_seconds() -> float:
+    """How long a duplicate waits for the first request's result: short inside a web request."""
+    return WEB_WAIT_S if getattr(frappe.local, "request", None) else WAIT_S
+
+
+def derive_key(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _keys(scope: str, key: str) -> Dict[str, str]:
+    cache = frappe.cache()
+    digest = hashlib.sha1(f"{frappe.session.user}|{key}".encode("utf-8")).hexdigest()
+    base = f"{KEY_PREFIX}:{scope}:{digest}"
+    return {"result": cache.make_key(base + ":result"), "lock": cache.make_key(base + ":lock")}
+
+
+def _read(cache, keys: Dict[str, str]):
+    result, lock = cache.pipeline().get(keys["result"]).get(keys["lock"]).execute()
+    return (json.loads(result) if result else None), lock
+
+
+def _acquire(cache, keys: Dict[str, str], token: str) -> bool:
+    return bool(cache.pipeline().set(keys["lock"], token, nx=True, ex=LOCK_TTL_S).execute()[0])
+
+
+def _release(keys: Dict[str, str]) -> None:
+    try:
+        cache = frappe.cache()
+        cache.pipeline().delete(keys["lock"]).execute()
+    except Exception:
+        pass
+
+
+def _publish(keys: Dict[str, str], result: Dict[str, Any], ttl: int) -> None:
+    try:
+        cache = frappe.cache()
+        (
+            cache.pipeline()
+            .set(keys["result"], json.dumps(result, default=str), ex=max(1, ttl))
+            .delete(keys["lock"])
+            .execute()
+        )
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Idempotency Store Failed")
+
+
+def _replay(result: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(result)
+    out["idempotent_replay"] = True
+    return out
+
+
+def run_once(scope: str, key: Optional[str], compute: Callable[[], Dict[str, Any]], ttl: Optional[int] = None) -> Dict[str, Any]:
+    """Run `compute` at most once per (user, scope, key) within the idempotency window.
+
+    Replays carry `idempotent_replay: True`. A window of 0 disables the guard.
+    """
+    ttl = window_seconds() if ttl is None else ttl
+    if not key or ttl <= 0:
+        return compute()
+
+    try:
+        cache = frappe.cache()
+        keys = _keys(scope, key)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait_seconds()
+        while True:
+            result, lock = _read(cache, keys)
+            if result is not None:
+                return _replay(result)
+            if not lock and _acquire(cache, keys, token):
+                break
+            if time.monotonic() > deadline:
+                frappe.throw(
+                    _("An identical request is still being processed. Please try again shortly."),
+                    title=_("Request In Progress"),
+                )
+            time.sleep(POLL_S)
+    except frappe.ValidationError:
+        raise
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Idempotency Lock Failed")
+        return compute()
+
+    try:
+        result = compute()
+    except Exception:
+        _release(keys)
+        raise
+
+    # Visible to waiters only once the documents it names are committed.
+    frappe.db.after_commit.add(lambda: _publish(keys, result, ttl))
+    frappe.db.after_rollback.add(lambda: _release(keys))
+    return result
@@ -0,0 +1,103 @@
+"""Speculative chat context prefetch.
+
+The desk knows which document a user has open long before the first message
+is typed. When Enable Context Prefetch is on, `warm` (api.chat.prefetch,
+called on form load once the user has opened the assistant) runs the
+message-independent part of a chat turn ahead of time and caches it in Redis
+for TTL seconds, per user, agent and document:
+
+  - the context (`build_context`, which loads the document) and the
+    evaluated policy;
+  - the system prompt rendered without retrieval passages;
+  - the retrieval scope (the ingested documents behind the open record), and
+    the retrieval index of the worker is caught up.
+
+`take` hands the cached entry to `_chat` if the document was not modified
+since; the turn then only runs retrieval for the actual message (and
+re-renders the prompt when passages were found) before calling the provider.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.context.builder import build_context
+from alphax_ai_platform.alphax_ai.policies.engine import PolicyEngine
+from alphax_ai_platform.alphax_ai.prompts.renderer import render_agent_system_prompt
+
+KEY_PREFIX = "alphax_ai:prefetch"
+DEFAULT_TTL_S = 120
+
+
+def _setting(fieldname: str) -> Any:
+    try:
+        return frappe.db.get_single_value("AI Platform Settings", fieldname, cache=True)
+    except Exception:
+        return None
+
+
+def enabled() -> bool:
+    """Off unless Enable Context Prefetch is checked."""
+    v = _setting("enable_context_prefetch")
+    return v not in (None, "") and bool(int(v))
+
+
+def ttl_seconds() -> int:
+    v = _setting("context_prefetch_ttl_seconds")
+    return DEFAULT_TTL_S if v in (None, "") else max(0, int(v))
+
+
+def cache_key(user: str, agent_key: str, doctype: Optional[str], docname: Optional[str]) -> str:
+    return f"{KEY_PREFIX}:{user}:{agent_key}:{doctype or ''}:{docname or ''}"
+
+
+def _modified(doctype: Optional[str], docname: Optional[str]) -> Optional[str]:
+    if not (doctype and docname):
+        return None
+    try:
+        return str(frappe.db.get_value(doctype, docname, "modified") or "")
+    except Exception:
+        return None
+
+
+def warm(agent_key: str, doctype: Optional[str] = None, docname: Optional[str] = None) -> Dict[str, Any]:
+    """Build and cache the message-independent part of a chat turn for the session user."""
+    from alphax_ai_platform.alphax_ai.retrieval import index as retrieval
+
+    user = frappe.session.user
+    key = cache_key(user, agent_key, doctype, docname)
+    modified = _modified(doctype, docname)
+    cached = frappe.cache().get_value(key)
+    if cached and cached.get("modified") == modified:
+        return {"warm": True, "cached": True}
+
+    start = time.perf_counter()
+    context = build_context(user=user, doctype=doctype, docname=docname)
+    policy = PolicyEngine.for_user(user=user, company=context.get("company")).evaluate(context=context)
+    entry = {
+        "modified": modified,
+        "context": context,
+        "policy": policy,
+        "system_prompt": render_agent_system_prompt(agent_key=agent_key, context=context, policy=policy),
+    }
+    # left out with retrieval off, so a turn after switching it on looks the scope up itself
+    if retrieval.warm_index():
+        entry["retrieval_documents"] = retrieval.retrieval_scope(doctype, docname)
+    frappe.cache().set_value(key, entry, expires_in_sec=ttl_seconds())
+    return {"warm": True, "cached": False, "ms": round((time.perf_counter() - start) * 1000.0, 1)}
+
+
+def take(user: str, agent_key: str, doctype: Optional[str], docname: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The prefetched entry for this turn, or None (not warmed, expired or the document changed)."""
+    if not enabled():
+        return None
+    try:
+        entry = frappe.cache().get_value(cache_key(user, agent_key, doctype, docname))
+    except Exception:
+        return None
+    if not entry or entry.get("modified") != _modified(doctype, docname):
+        return None
+    return entry
@@ -0,0 +1,47 @@
+import uuid
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.caching import idempotency
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+
+class TestRunOnce(PatchedTestCase):
+    def setUp(self):
+        self.scope = f"test-{uuid.uuid4().hex[:8]}"
+        self.addCleanup(lambda: frappe.cache().pipeline().delete(*idempotency._keys(self.scope, "k").values()).execute())
+
+    def hold_lock(self):
+        """An identical request that is still running."""
+        keys = idempotency._keys(self.scope, "k")
+        self.assertTrue(idempotency._acquire(frappe.cache(), keys, "other-worker"))
+
+    def run_duplicate(self, request):
+        now = [0.0]
+
+        def sleep(s):
+            now[0] += s
+
+        with mock.patch.object(frappe.local, "request", request, create=True), \
+                mock.patch.object(idempotency.time, "monotonic", side_effect=lambda: now[0]), \
+                mock.patch.object(idempotency.time, "sleep", side_effect=sleep):
+            with self.assertRaises(frappe.ValidationError):
+                idempotency.run_once(self.scope, "k", lambda: {"ok": True}, ttl=60)
+        return now[0]
+
+    def test_web_request_gives_up_quickly(self):
+        self.hold_lock()
+        waited = self.run_duplicate(request=object())
+        self.assertGreater(waited, idempotency.WEB_WAIT_S)
+        self.assertLess(waited, idempotency.WEB_WAIT_S + 1)
+
+    def test_background_job_waits_longer(self):
+        self.hold_lock()
+        self.assertGreater(self.run_duplicate(request=None), idempotency.WAIT_S)
+
+    def test_result_of_the_first_request_is_replayed(self):
+        after_commit, _ = self.patch_commit_hooks()
+        self.assertEqual(idempotency.run_once(self.scope, "k", lambda: {"ok": 1}, ttl=60), {"ok": 1})
+        after_commit.run()
+        self.assertEqual(idempotency.run_once(self.scope, "k", lambda: {"ok": 2}, ttl=60), {"ok": 1, "idempotent_replay": True})
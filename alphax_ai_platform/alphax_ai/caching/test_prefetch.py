@@ -0,0 +1,21 @@
+import unittest
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.api import chat
+from alphax_ai_platform.alphax_ai.caching import prefetch
+
+
+class TestEnabled(unittest.TestCase):
+    def enabled(self, value):
+        with mock.patch.object(frappe.db, "get_single_value", create=True, return_value=value):
+            return prefetch.enabled()
+
+    def test_off_unless_checked(self):
+        self.assertEqual([self.enabled(v) for v in (None, "", 0, "0", 1, "1")], [False, False, False, False, True, True])
+
+    def test_disabled_prefetch_does_no_work(self):
+        with mock.patch.object(prefetch, "enabled", return_value=False), mock.patch.object(prefetch, "warm") as warm:
+            self.assertEqual(chat.prefetch("default", "Purchase Order", "PO-0001"), {"warm": False})
+        warm.assert_not_called()
@@ -0,0 +1,39 @@
+from unittest import mock
+
+from alphax_ai_platform.alphax_ai.caching import warmup
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+JOB = "alphax_ai_platform.alphax_ai.ingestion.splitter.split_job"
+
+
+class TestBeforeJob(PatchedTestCase):
+    def setUp(self):
+        warmup._warmed_pid = None
+        self.addCleanup(setattr, warmup, "_warmed_pid", None)
+        self.warm_up = self.patch(warmup, "warm_up")
+        self.patch(warmup, "enabled", return_value=True)
+
+    def test_long_lived_worker_warms_once(self):
+        with mock.patch.object(warmup, "is_work_horse", return_value=False):
+            warmup.before_job(method=JOB)
+            warmup.before_job(method=JOB)
+        self.warm_up.assert_called_once_with(imports=True, background_imports=True)
+
+    def test_forked_work_horse_skips_warm_up(self):
+        with mock.patch.object(warmup, "is_work_horse", return_value=True):
+            warmup.before_job(method=JOB)
+        self.warm_up.assert_not_called()
+
+    def test_other_apps_jobs_are_ignored(self):
+        with mock.patch.object(warmup, "is_work_horse", return_value=False):
+            warmup.before_job(method="frappe.utils.scheduler.enqueue_events")
+        self.warm_up.assert_not_called()
+
+    def test_is_work_horse(self):
+        with mock.patch("os.getsid", return_value=4242), mock.patch("os.getpid", return_value=4242):
+            with mock.patch("os.getppid", return_value=4000):
+                self.assertTrue(warmup.is_work_horse())
+            with mock.patch("os.getppid", return_value=1):
+                self.assertFalse(warmup.is_work_horse())
+        with mock.patch("os.getsid", return_value=100), mock.patch("os.getpid", return_value=4242):
+            self.assertFalse(warmup.is_work_horse())
@@ -0,0 +1,231 @@
+"""Worker warm-up and import-time report.
+
+Extractor libraries (pandas, openpyxl, PyPDF2, PIL, pytesseract) and NumPy
+stay lazily imported inside the functions that need them, so web workers
+that never ingest do not load them. Background workers can pay that cost up
+front instead of inside the first ingest:
+
+  - `before_job` (hooks.py) runs once per worker process, on the first
+    AlphaX AI job it executes: the heavy imports start on a daemon thread
+    (pure imports, no frappe context needed) and doctype meta plus
+    blueprints are primed on the job's own thread. Only workers that run
+    jobs in their own long-lived process (RQ `SimpleWorker`) do this. A
+    forking RQ worker runs every job in a fresh work horse that exits
+    afterwards, so warming there would repeat the whole cost on each job;
+    those jobs skip the warm-up and rely on the Redis-backed caches;
+  - `after_migrate` queues `warm_caches`, which refills the Redis meta and
+    document caches that a migrate clears, so the first chat and ingest
+    after a deploy do not rebuild them.
+
+`import_report()` times cold imports in a fresh interpreter and lists which
+heavy modules each entry point pulls in eagerly, so a top-level import that
+slips into a hot module shows up (api.metrics.import_report, benchmarks).
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import frappe
+
+HEAVY_MODULES = ("pandas", "openpyxl", "PyPDF2", "PIL.Image", "pytesseract", "numpy", "requests")
+ENTRY_MODULES = (
+    "alphax_ai_platform.alphax_ai.api.chat",
+    "alphax_ai_platform.alphax_ai.api.ingest",
+    "alphax_ai_platform.alphax_ai.api.actions",
+)
+APP_DOCTYPES = (
+    "AI Ingested Document",
+    "AI OCR Result",
+    "AI Action Request",
+    "AI Intake Blueprint",
+    "AI Extraction Schema Field",
+    "AI Mapping Template",
+    "AI Chat Session",
+    "AI Chat Message",
+    "AI Audit Log",
+    "AI Document Chunk",
+    "AI Agent",
+    "AI Model",
+    "AI Provider",
+)
+JOB_PREFIX = "alphax_ai_platform."
+REPORT_TIMEOUT_S = 60
+
+_warmed_pid: Optional[int] = None
+_last_report: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    try:
+        v = frappe.db.get_single_value("AI Platform Settings", "enable_worker_warmup", cache=True)
+    except Exception:
+        return True
+    return v in (None, "") or bool(int(v))
+
+
+def preload_modules(names: Iterable[str] = HEAVY_MODULES) -> Dict[str, Optional[float]]:
+    """Import each module; {name: ms} (0 if already loaded, None if not installed)."""
+    out: Dict[str, Optional[float]] = {}
+    for name in names:
+        if name in sys.modules:
+            out[name] = 0.0
+            continue
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception:
+            out[name] = None
+            continue
+        out[name] = round((time.perf_counter() - start) * 1000.0, 1)
+    return out
+
+
+def prime_caches() -> Dict[str, Any]:
+    """Load doctype meta and blueprints into the (Redis-backed) caches, plus the
+    per-process compiled normalizers of every blueprint."""
+    from alphax_ai_platform.alphax_ai.parsing.normalize import compile_schema
+
+    start = time.perf_counter()
+    doctypes = set(APP_DOCTYPES)
+    blueprints = frappe.get_all("AI Intake Blueprint", fields=["name", "target_doctype"])
+    doctypes.update(b.target_doctype for b in blueprints if b.target_doctype)
+    meta_errors = []
+    for doctype in sorted(doctypes):
+        try:
+            frappe.get_meta(doctype)
+        except Exception:
+            meta_errors.append(doctype)
+    for b in blueprints:
+        bp = frappe.get_cached_doc("AI Intake Blueprint", b.name)
+        compile_schema(bp.get("schema_fields") or [])
+    return {
+        "doctypes": len(doctypes) - len(meta_errors),
+        "missing_doctypes": meta_errors,
+        "blueprints": len(blueprints),
+        "ms": round((time.perf_counter() - start) * 1000.0, 1),
+    }
+
+
+def warm_up(imports: bool = True, background_imports: bool = False) -> Dict[str, Any]:
+    """Run the warm-up in this process; returns (and keeps) a report."""
+    report: Dict[str, Any] = {"pid": os.getpid(), "at": time.time()}
+    if imports:
+        if background_imports:
+            threading.Thread(target=_import_in_background, name="alphax_ai_warmup", daemon=True).start()
+            report["imports"] = "background"
+        else:
+            report["imports"] = preload_modules()
+    try:
+        report["caches"] = prime_caches()
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Warm-up Failed")
+        report["caches"] = None
+    with _lock:
+        _last_report.update(report)
+    return report
+
+
+def _import_in_background() -> None:
+    result = preload_modules()
+    with _lock:
+        _last_report["imports"] = result
+
+
+def is_work_horse() -> bool:
+    """True inside the per-job child of a forking RQ worker.
+
+    RQ's `Worker.fork_work_horse` calls `os.setsid()` in the child, so the
+    horse leads its own session under a live parent; a process started as a
+    service by systemd is a session leader too, but its parent is init.
+    """
+    try:
+        return os.getsid(0) == os.getpid() and os.getppid() != 1
+    except OSError:
+        return False
+
+
+def before_job(method: Optional[str] = None, kwargs: Optional[Dict[str, Any]] = None, **_ignored) -> None:
+    """hooks.py before_job: warm this worker process on its first AlphaX AI job."""
+    global _warmed_pid
+    pid = os.getpid()
+    if _warmed_pid == pid or not str(method or "").startswith(JOB_PREFIX):
+        return
+    _warmed_pid = pid
+    if enabled() and not is_work_horse():
+        warm_up(imports=True, background_imports=True)
+
+
+def after_migrate() -> None:
+    """hooks.py after_migrate: refill the caches a migrate clears, off the migrate itself."""
+    frappe.enqueue(
+        "alphax_ai_platform.alphax_ai.caching.warmup.warm_caches",
+        queue="short",
+        job_id="alphax_ai_warm_caches",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def warm_caches() -> Dict[str, Any]:
+    return warm_up(imports=False)
+
+
+def last_report() -> Dict[str, Any]:
+    with _lock:
+        return dict(_last_report)
+
+
+# --- import-time report -----------------------------------------------------
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+def _importtime(module: str, prelude: str = "", python: Optional[str] = None) -> Dict[str, Any]:
+    code = f"{prelude}\nimport {module}" if prelude else f"import {module}"
+    proc = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        timeout=REPORT_TIMEOUT_S,
+        cwd=os.getcwd(),
+    )
+    loaded: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            loaded[m.group(4)] = int(m.group(2))  # cumulative microseconds
+    if proc.returncode:
+        return {"error": (proc.stderr.strip().splitlines() or ["import failed"])[-1]}
+    return {
+        "ms": round(loaded.get(module, 0) / 1000.0, 1),
+        "modules": len(loaded),
+        "heavy": {h: round(loaded[h] / 1000.0, 1) for h in HEAVY_MODULES if h in loaded},
+    }
+
+
+def import_report(
+    entry_modules: Iterable[str] = ENTRY_MODULES,
+    heavy_modules: Iterable[str] = HEAVY_MODULES,
+    prelude: str = "",
+    python: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Cold import times measured in fresh interpreters (`python -X importtime`).
+
+    entry_modules: time plus the heavy modules each one imports eagerly (should
+    be none: they are meant to load on first use); heavy_modules: what loading
+    each one costs when it is finally needed. `prelude` runs first in each
+    interpreter (the benchmarks install their frappe shim there).
+    """
+    entries = {m: _importtime(m, prelude, python) for m in entry_modules}
+    libraries = {m: _importtime(m, "", python) for m in heavy_modules}
+    eager: List[str] = sorted({h for r in entries.values() for h in (r.get("heavy") or {})})
+    return {"entry_points": entries, "libraries": libraries, "eager_heavy_imports": eager, "worker": last_report()}
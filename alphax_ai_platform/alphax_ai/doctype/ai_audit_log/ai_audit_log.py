@@ -1,6 +1,25 @@
 import frappe
 from frappe.model.document import Document
 
+from alphax_ai_platform.alphax_ai.storage import compression
+
 
 class AIAuditLog(Document):
-    pass
+    def load_from_db(self):
+        super().load_from_db()
+        compression.unpack_fields(self)
+        return self
+
+    def validate(self):
+        compression.pack_fields(self)
+
+    def after_insert(self):
+        compression.unpack_fields(self)
+
+    def on_update(self):
+        compression.unpack_fields(self)
+
+
+def on_doctype_update():
+    # daily rollups and retention scan by creation (logs.rollup)
+    frappe.db.add_index("AI Audit Log", ["creation"], index_name="creation_index")
@@ -4,3 +4,8 @@ from frappe.model.document import Document
 
 class AIChatSession(Document):
     pass
+
+
+def on_doctype_update():
+    # a user's sessions, newest first (api.history.list_sessions)
+    frappe.db.add_index("AI Chat Session", ["user", "creation"], index_name="user_creation_index")
@@ -0,0 +1,19 @@
+import os
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from alphax_ai_platform.alphax_ai.ingestion.intake import resolve_path
+
+
+class AIIntakeSource(Document):
+    def validate(self):
+        self.path = (self.path or "").strip()
+        resolve_path(self.path)
+        if self.enabled and not os.path.isdir(self.path):
+            frappe.msgprint(_("Folder {0} does not exist (yet); scans will fail until it does").format(self.path))
+        if (self.scan_interval_minutes or 0) < 1:
+            self.scan_interval_minutes = 1
+        if (self.max_files_per_scan or 0) < 1:
+            self.max_files_per_scan = 1
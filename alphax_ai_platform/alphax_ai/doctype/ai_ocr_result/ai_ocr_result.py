@@ -1,5 +1,19 @@
 import frappe
 from frappe.model.document import Document
 
+from alphax_ai_platform.alphax_ai.storage import compression
+
 class AIOCRResult(Document):
-    pass
+    def load_from_db(self):
+        super().load_from_db()
+        compression.unpack_fields(self)
+        return self
+
+    def validate(self):
+        compression.pack_fields(self)
+
+    def after_insert(self):
+        compression.unpack_fields(self)
+
+    def on_update(self):
+        compression.unpack_fields(self)
@@ -0,0 +1,356 @@
+# Copyright (c) 2026, AlphaX
+# License: MIT (see LICENSE)
+
+"""Duplicate-document detection for incoming ingests.
+
+Three signals, cheapest first:
+  - file hash: identical bytes (File.content_hash) -> skip extraction entirely
+  - structural fingerprint: supplier + date + normalized item lines (exact)
+  - SimHash of the extracted text (near-duplicates, e.g. a re-scan)
+
+SimHashes are indexed with LSH banding: the 64-bit hash is split into
+BANDS 16-bit bands and, by pigeonhole, two hashes within MAX_DISTANCE bits
+share at least one band when MAX_DISTANCE < BANDS. A lookup therefore only
+compares against the few documents sharing a band instead of scanning all
+recent documents.
+
+The index lives in Redis with a rolling window; it is rebuilt lazily from
+AI Ingested Document rows when the cache was flushed. File and fingerprint
+keys expire on their own. The SimHash hash and the band sets are shared by
+every document of the scope, so their TTL is refreshed on each add; their
+members carry the time they were added and are removed once older than the
+window, both when a lookup meets them and by a short HSCAN sweep on each add.
+
+Ingests index their document through `add_on_commit`, so a rolled-back
+ingest leaves nothing behind, and a deleted AI Ingested Document is taken
+out again by `remove_document` (doc_events on_trash).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import frappe
+from frappe.utils import add_days, get_datetime, now_datetime
+
+
+PREFIX = "alphax_ai:dedup"
+SIMHASH_BITS = 64
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+MAX_DISTANCE = 3
+MIN_TEXT_CHARS = 40
+SHINGLE = 1
+SWEEP_BATCH = 50  # SimHash entries checked for expiry per add
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+# characters OCR engines confuse with each other hash alike (after lower-casing)
+_OCR_CONFUSABLE = str.maketrans({"0": "o", "1": "l", "i": "l", "|": "l", "5": "s", "8": "b"})
+_WS_RE = re.compile(r"\s+")
+
+
+def _norm(v: Any) -> str:
+    return _WS_RE.sub(" ", str(v or "")).strip().lower()
+
+
+def fingerprint_parsed(parsed: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Exact fingerprint of the business content of a parsed document.
+
+    Uses the party (supplier / employee name), the document date and the
+    normalized item lines; raw excerpts and formatting are ignored.
+    """
+    if not parsed:
+        return None
+    party = _norm(parsed.get("supplier") or parsed.get("employee_name") or parsed.get("national_id"))
+    date = _norm(parsed.get("transaction_date") or parsed.get("date_of_birth"))
+    lines = sorted(
+        "|".join([_norm(it.get("description") or it.get("item_code")), _norm(it.get("qty")), _norm(it.get("rate"))])
+        for it in (parsed.get("items") or [])
+        if isinstance(it, dict)
+    )
+    if not party and not lines:
+        return None
+    payload = json.dumps([parsed.get("doc_type"), party, date, lines], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _shingles(tokens: List[str]) -> Iterable[str]:
+    if len(tokens) < SHINGLE:
+        yield " ".join(tokens)
+        return
+    for i in range(len(tokens) - SHINGLE + 1):
+        yield " ".join(tokens[i:i + SHINGLE])
+
+
+# Bit-sliced counters: every simhash bit gets a 16-bit lane inside one big
+# int, so adding a shingle hash costs 8 table lookups instead of 64 branches.
+_LANE = 16
+# Enough text to characterise a document; also keeps lanes far from overflow.
+_MAX_SHINGLES = 8192
+_SPREAD = [
+    [sum(1 << ((i * 8 + j) * _LANE) for j in range(8) if (v >> j) & 1) for v in range(256)]
+    for i in range(8)
+]
+_LANE_MASK = (1 << _LANE) - 1
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over the distinct words (None for too-short text).
+
+    Single words rather than word n-grams: one misread character changes one
+    feature instead of n, which keeps a re-scan within MAX_DISTANCE bits.
+    Commonly confused characters (0/o, 1/l/i, 5/s, 8/b) are folded first.
+    """
+    text = (text or "").lower().translate(_OCR_CONFUSABLE)
+    if len(text) < MIN_TEXT_CHARS:
+        return None
+    tokens = _WORD_RE.findall(text)
+    if not tokens:
+        return None
+
+    seen = set()
+    acc = 0
+    n = 0
+    for sh in _shingles(tokens):
+        if sh in seen:
+            continue
+        seen.add(sh)
+        d = hashlib.blake2b(sh.encode("utf-8"), digest_size=8).digest()
+        acc += (
+            _SPREAD[0][d[0]] + _SPREAD[1][d[1]] + _SPREAD[2][d[2]] + _SPREAD[3][d[3]]
+            + _SPREAD[4][d[4]] + _SPREAD[5][d[5]] + _SPREAD[6][d[6]] + _SPREAD[7][d[7]]
+        )
+        n += 1
+        if n >= _MAX_SHINGLES:
+            break
+
+    # bit is set when more than half of the shingles had it set
+    out = 0
+    for bit in range(SIMHASH_BITS):
+        if 2 * ((acc >> (bit * _LANE)) & _LANE_MASK) > n:
+            out |= 1 << bit
+    return out
+
+
+def text_for_simhash(extracted: Dict[str, Any]) -> str:
+    """Extracted text, or a canonical dump of table rows for spreadsheets."""
+    text = extracted.get("text") or ""
+    if text:
+        return text
+    rows = []
+    for t in extracted.get("tables") or []:
+        if isinstance(t, dict):
+            for r in t.get("rows") or []:
+                if isinstance(r, dict):
+                    rows.append(" ".join(_norm(v) for v in r.values()))
+    return "\n".join(rows)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _bands(h: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(h >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def _timestamp(value: Any) -> Optional[int]:
+    try:
+        return int(get_datetime(value).timestamp()) if value else None
+    except Exception:
+        return None
+
+
+class DuplicateIndex:
+    """Per-scope (blueprint or target doctype) rolling duplicate index."""
+
+    def __init__(self, scope: str, window_days: int = 30):
+        self.scope = scope or "default"
+        self.window_days = max(1, int(window_days or 30))
+        self.ttl = self.window_days * 86400
+        self.cache = frappe.cache()
+
+    def _k(self, *parts: Any) -> str:
+        return self.cache.make_key(":".join([PREFIX, self.scope] + [str(p) for p in parts]))
+
+    def _get(self, key: str) -> Optional[str]:
+        # Raw-key access goes through a pipeline: RedisWrapper helpers re-prefix keys.
+        v = self.cache.pipeline().get(key).execute()[0]
+        return v.decode() if isinstance(v, bytes) else v
+
+    def _ensure_loaded(self) -> None:
+        if self._get(self._k("loaded")):
+            return
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Repopulate the index from recent AI Ingested Document rows."""
+        since = add_days(now_datetime(), -self.window_days)
+        rows = frappe.get_all(
+            "AI Ingested Document",
+            filters={"creation": [">=", since], "duplicate_of": ["is", "not set"], **self._scope_filter()},
+            fields=["name", "file_hash", "content_fingerprint", "simhash", "creation"],
+            order_by="creation asc",
+        )
+        pipe = self.cache.pipeline()
+        for r in rows:
+            self._queue_add(
+                pipe, r.name, r.file_hash, r.content_fingerprint, int(r.simhash, 16) if r.simhash else None, _timestamp(r.creation)
+            )
+        pipe.set(self._k("loaded"), 1, ex=self.ttl)
+        pipe.execute()
+
+    def _scope_filter(self) -> Dict[str, Any]:
+        if frappe.db.exists("AI Intake Blueprint", self.scope):
+            return {"blueprint": self.scope}
+        return {"target_doctype": self.scope}
+
+    def _queue_add(
+        self, pipe, name: str, file_hash: Optional[str], fingerprint: Optional[str], sh: Optional[int], added_at: Optional[int] = None
+    ) -> None:
+        if file_hash:
+            pipe.set(self._k("file", file_hash), name, ex=self.ttl)
+        if fingerprint:
+            pipe.set(self._k("fp", fingerprint), name, ex=self.ttl)
+        if sh is not None:
+            pipe.hset(self._k("simhash"), name, f"{sh:016x}:{added_at or int(time.time())}")
+            pipe.expire(self._k("simhash"), self.ttl)
+            for i, band in enumerate(_bands(sh)):
+                key = self._k("band", i, band)
+                pipe.sadd(key, name)
+                pipe.expire(key, self.ttl)
+
+    def _queue_remove(self, pipe, name: str, band_keys: Iterable[str]) -> None:
+        pipe.hdel(self._k("simhash"), name)
+        for key in band_keys:
+            pipe.srem(key, name)
+
+    def _expired(self, raw: Any, cutoff: float) -> Optional[int]:
+        """Stored SimHash of an expired entry (None if the entry is live)."""
+        hexval, _, ts = (raw.decode() if isinstance(raw, bytes) else raw).partition(":")
+        if ts and int(ts) < cutoff:
+            return int(hexval, 16)
+        return None
+
+    def sweep(self) -> int:
+        """Remove up to about SWEEP_BATCH expired SimHash entries, resuming an HSCAN; returns the count."""
+        cursor = int(self._get(self._k("sweep")) or 0)
+        cursor, entries = self.cache.pipeline().hscan(self._k("simhash"), cursor, count=SWEEP_BATCH).execute()[0]
+        cutoff = time.time() - self.ttl
+        pipe = self.cache.pipeline()
+        removed = 0
+        for name, raw in (entries or {}).items():
+            sh = self._expired(raw, cutoff)
+            if sh is not None:
+                name = name.decode() if isinstance(name, bytes) else name
+                self._queue_remove(pipe, name, [self._k("band", i, b) for i, b in enumerate(_bands(sh))])
+                removed += 1
+        pipe.set(self._k("sweep"), int(cursor), ex=self.ttl)
+        pipe.execute()
+        return removed
+
+    def add(self, name: str, file_hash: Optional[str] = None, fingerprint: Optional[str] = None, sh: Optional[int] = None) -> None:
+        try:
+            pipe = self.cache.pipeline()
+            self._queue_add(pipe, name, file_hash, fingerprint, sh)
+            pipe.execute()
+            if sh is not None:
+                self.sweep()
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), "AlphaX AI Dedup Index Update Failed")
+
+    def add_on_commit(
+        self, name: str, file_hash: Optional[str] = None, fingerprint: Optional[str] = None, sh: Optional[int] = None
+    ) -> None:
+        """`add` once the current transaction commits (nothing is indexed if it rolls back)."""
+        frappe.db.after_commit.add(lambda: self.add(name, file_hash, fingerprint, sh))
+
+    def remove(self, name: str, file_hash: Optional[str] = None, fingerprint: Optional[str] = None, sh: Optional[int] = None) -> None:
+        """Take a document out of the index (file / fingerprint keys only while they still point at it)."""
+        try:
+            keys = [self._k("file", file_hash) if file_hash else None, self._k("fp", fingerprint) if fingerprint else None]
+            keys = [k for k in keys if k]
+            pipe = self.cache.pipeline()
+            for key in keys:
+                pipe.get(key)
+            current = pipe.execute() if keys else []
+            pipe = self.cache.pipeline()
+            for key, v in zip(keys, current):
+                if (v.decode() if isinstance(v, bytes) else v) == name:
+                    pipe.delete(key)
+            if sh is not None:
+                self._queue_remove(pipe, name, [self._k("band", i, b) for i, b in enumerate(_bands(sh))])
+            pipe.execute()
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), "AlphaX AI Dedup Index Update Failed")
+
+    def find_file(self, file_hash: Optional[str]) -> Optional[str]:
+        if not file_hash:
+            return None
+        self._ensure_loaded()
+        return self._get(self._k("file", file_hash))
+
+    def find(self, fingerprint: Optional[str] = None, sh: Optional[int] = None, exclude: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return {"name", "match": "exact"|"near", "distance"} for the closest recent duplicate."""
+        self._ensure_loaded()
+        if fingerprint:
+            hit = self._get(self._k("fp", fingerprint))
+            if hit and hit != exclude:
+                return {"name": hit, "match": "exact", "distance": 0}
+
+        if sh is None:
+            return None
+
+        band_keys = [self._k("band", i, band) for i, band in enumerate(_bands(sh))]
+        pipe = self.cache.pipeline()
+        for key in band_keys:
+            pipe.smembers(key)
+        candidates = set()
+        for members in pipe.execute():
+            candidates.update(m.decode() if isinstance(m, bytes) else m for m in (members or []))
+        candidates.discard(exclude)
+        if not candidates:
+            return None
+
+        names = sorted(candidates)
+        stored = self.cache.pipeline().hmget(self._k("simhash"), names).execute()[0]
+        cutoff = time.time() - self.ttl
+        best = None
+        prune = self.cache.pipeline()
+        pruned = False
+        for name, raw in zip(names, stored):
+            if not raw:
+                # band member without a SimHash entry: left over from an earlier prune
+                self._queue_remove(prune, name, band_keys)
+                pruned = True
+                continue
+            expired = self._expired(raw, cutoff)
+            if expired is not None:
+                self._queue_remove(prune, name, [self._k("band", i, b) for i, b in enumerate(_bands(expired))])
+                pruned = True
+                continue
+            hexval = (raw.decode() if isinstance(raw, bytes) else raw).partition(":")[0]
+            dist = hamming(sh, int(hexval, 16))
+            if dist <= MAX_DISTANCE and (best is None or dist < best["distance"]):
+                best = {"name": name, "match": "near", "distance": dist}
+        if pruned:
+            try:
+                prune.execute()
+            except Exception:
+                frappe.log_error(frappe.get_traceback(), "AlphaX AI Dedup Index Update Failed")
+        return best
+
+
+def remove_document(doc, method=None) -> None:
+    """doc_events hook: drop a deleted AI Ingested Document from its scope's index once the delete commits."""
+    scope = doc.get("blueprint") or doc.get("target_doctype")
+    if not scope or not (doc.get("file_hash") or doc.get("content_fingerprint") or doc.get("simhash")):
+        return
+    sh = int(doc.simhash, 16) if doc.get("simhash") else None
+    index = DuplicateIndex(scope)
+    frappe.db.after_commit.add(lambda: index.remove(doc.name, doc.get("file_hash"), doc.get("content_fingerprint"), sh))
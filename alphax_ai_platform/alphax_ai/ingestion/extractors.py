@@ -6,10 +6,12 @@ from __future__ import annotations
 import io
 import json
 import os
-from typing import Any, Dict, Tuple, Optional
+from typing import Any, Callable, Dict, Tuple, Optional
 
 import frappe
 
+from alphax_ai_platform.alphax_ai.metrics.timing import StageTimer
+
 
 def _read_file_bytes(file_doc) -> bytes:
     if getattr(file_doc, "is_private", 0):
@@ -45,23 +47,31 @@ def detect_mime_and_ext(file_doc) -> Tuple[str, str]:
     return mime, ext
 
 
-def extract_from_pdf_text(file_bytes: bytes) -> Dict[str, Any]:
+def extract_from_pdf_text(file_bytes: bytes, on_page: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
     try:
         import PyPDF2  # type: ignore
     except Exception:
         frappe.throw("PyPDF2 is required to extract text from PDFs. Install: pip install PyPDF2")
 
     reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-    texts = []
+    page_texts = []
+    total = len(reader.pages)
     for page in reader.pages:
         try:
             t = page.extract_text() or ""
         except Exception:
             t = ""
-        if t:
-            texts.append(t)
+        page_texts.append(t)
+        if on_page:
+            on_page(len(page_texts), total)
 
-    return {"text": "\n\n".join(texts).strip(), "pages": len(reader.pages), "tables": [], "meta": {"mode": "pdf_text"}}
+    return {
+        "text": "\n\n".join(t for t in page_texts if t).strip(),
+        "pages": len(reader.pages),
+        "page_texts": page_texts,
+        "tables": [],
+        "meta": {"mode": "pdf_text"},
+    }
 
 
 def extract_from_excel(file_bytes: bytes, ext: str) -> Dict[str, Any]:
@@ -148,15 +158,14 @@ def extract_with_azure_form_recognizer(file_bytes: bytes, mime: str) -> Dict[str
             if status == "failed":
                 frappe.throw(f"Azure OCR analyze failed: {json.dumps(data, ensure_ascii=False)[:800]}")
             # Extract lines into text
-            text_lines = []
+            page_texts = []
             analyze = (data.get("analyzeResult") or {})
             for page in (analyze.get("pages") or []):
-                for line in (page.get("lines") or []):
-                    if line.get("content"):
-                        text_lines.append(line["content"])
+                page_texts.append("\n".join(line["content"] for line in (page.get("lines") or []) if line.get("content")))
             return {
-                "text": "\n".join(text_lines).strip(),
-                "pages": len(analyze.get("pages") or []) or 1,
+                "text": "\n".join(t for t in page_texts if t).strip(),
+                "pages": len(page_texts) or 1,
+                "page_texts": page_texts,
                 "tables": analyze.get("tables") or [],
                 "meta": {"mode": "ocr_azure", "raw_status": data.get("status")},
             }
@@ -165,33 +174,39 @@ def extract_with_azure_form_recognizer(file_bytes: bytes, mime: str) -> Dict[str
     frappe.throw("Azure OCR timed out while polling analyze result")
 
 
-def extract_content(file_doc, ocr_engine: str = "On-Prem", language: str = "auto") -> Dict[str, Any]:
-    """Extract content from File using either:
-      - Option A: Azure (cloud OCR)
-      - Option B: On-Prem (tesseract OCR)
-    """
-    file_bytes = _read_file_bytes(file_doc)
-    mime, ext = detect_mime_and_ext(file_doc)
-
+def _extract(
+    file_bytes: bytes,
+    mime: str,
+    ext: str,
+    ocr_engine: str,
+    language: str,
+    timer: StageTimer,
+    on_page: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
     # Excel/CSV
     if ext in [".xlsx", ".xls", ".csv"]:
-        return extract_from_excel(file_bytes, ext)
+        with timer.stage("extract.excel"):
+            return extract_from_excel(file_bytes, ext)
 
     # PDFs: try digital text first
     if mime == "application/pdf":
-        pdf = extract_from_pdf_text(file_bytes)
+        with timer.stage("extract.pdf_text"):
+            pdf = extract_from_pdf_text(file_bytes, on_page=on_page)
         if pdf.get("text"):
             return pdf
         # scanned PDF: OCR only if Azure is chosen in this phase
         if (ocr_engine or "").lower().startswith("azure"):
-            return extract_with_azure_form_recognizer(file_bytes, mime)
+            with timer.stage("extract.ocr_azure"):
+                return extract_with_azure_form_recognizer(file_bytes, mime)
         return {"text": "", "pages": pdf.get("pages") or 1, "tables": [], "meta": {"mode": "pdf_scanned_unhandled"}}
 
     # Images: OCR
     if mime.startswith("image/"):
         if (ocr_engine or "").lower().startswith("azure"):
-            return extract_with_azure_form_recognizer(file_bytes, mime)
-        return extract_from_image_tesseract(file_bytes, language=language)
+            with timer.stage("extract.ocr_azure"):
+                return extract_with_azure_form_recognizer(file_bytes, mime)
+        with timer.stage("extract.ocr_onprem"):
+            return extract_from_image_tesseract(file_bytes, language=language)
 
     # fallback: treat as text
     try:
@@ -199,3 +214,29 @@ def extract_content(file_doc, ocr_engine: str = "On-Prem", language: str = "auto
     except Exception:
         text = ""
     return {"text": text, "pages": 1, "tables": [], "meta": {"mode": "raw"}}
+
+
+def extract_content(
+    file_doc,
+    ocr_engine: str = "On-Prem",
+    language: str = "auto",
+    timer: Optional[StageTimer] = None,
+    on_page: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Extract content from File using either:
+      - Option A: Azure (cloud OCR)
+      - Option B: On-Prem (tesseract OCR)
+
+    When a `timer` is passed, file read and extractor sub-stages are recorded
+    on it together with `bytes` / `pages` counters. `on_page(k, n)` is called
+    after each page of a digital PDF (progress reporting).
+    """
+    timer = timer or StageTimer()
+    with timer.stage("file_read"):
+        file_bytes = _read_file_bytes(file_doc)
+    mime, ext = detect_mime_and_ext(file_doc)
+    timer.count("bytes", len(file_bytes))
+
+    out = _extract(file_bytes, mime, ext, ocr_engine, language, timer, on_page)
+    timer.count("pages", out.get("pages") or 1)
+    return out
@@ -0,0 +1,380 @@
+"""Scheduled intake from watch folders and Maildir inboxes (AI Intake Source).
+
+The scheduler ticks every minute (`scan_due_sources`) and queues one scan job
+per enabled source whose Scan Interval has passed. A scan picks up at most
+Max Files per Scan new files, stores each as a private File attached to the
+source, routes it to a blueprint and queues one ingest job per file on the
+long queue; whatever is left waits for the next scan, so a source never
+feeds ingestion faster than Max Files per Scan per interval.
+
+What was already seen is tracked without re-reading old files:
+
+  - Directory: a cursor (inode change time in ns, plus the names that
+    share it) stored on the source; a scan only opens files after it,
+    oldest first. The change time, unlike the modification time, is set
+    when a file arrives in the folder, so files moved in (`mv`) or copied
+    with their old mtime kept (`cp -p`, `rsync -t`) are picked up too.
+    Files younger than MIN_FILE_AGE_S are left for the next scan (they may
+    still be being written). A file that could not be read or stored is
+    kept in the cursor's retry list and tried again by the next scans, up
+    to MAX_FILE_ATTEMPTS times. With Move Processed Files the picked files
+    go to processed/, so the folder only ever lists new ones;
+  - Maildir: new/ is the queue (delivery order); handled messages are moved
+    to cur/ with the Seen flag, as a mail client would.
+
+Sources may only read folders inside the roots listed in site config
+(`alphax_ai_intake_roots`), and never one inside the bench or the site
+folder: picked files become downloadable Files and may be moved away.
+
+The cursor is saved in the same transaction as the File rows; files are moved
+only after the commit. A file that is picked up twice (a crash between the
+two, or a touched file) is caught by the ingestion duplicate check.
+"""
+
+from __future__ import annotations
+
+import email
+import email.policy
+import email.utils
+import fnmatch
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+from frappe import _
+from frappe.utils import get_datetime, now_datetime
+
+MIN_FILE_AGE_S = 10
+MAX_FILE_ATTEMPTS = 3
+PROCESSED_DIR = "processed"
+ROOTS_CONFIG = "alphax_ai_intake_roots"
+SCAN_JOB = "alphax_ai_platform.alphax_ai.ingestion.intake.scan_source"
+INGEST_JOB = "alphax_ai_platform.alphax_ai.ingestion.intake.ingest_job"
+
+
+def patterns(spec: Optional[str]) -> List[str]:
+    return [p.strip().lower() for p in (spec or "").replace("\n", ",").split(",") if p.strip()]
+
+
+def matches(name: str, pats: List[str]) -> bool:
+    return not pats or any(fnmatch.fnmatchcase((name or "").lower(), p) for p in pats)
+
+
+def route(routes: List[Any], default: Optional[str], file_name: str, sender: str = "", subject: str = "") -> Optional[str]:
+    """Blueprint of the first matching routing rule, else `default`."""
+    values = {"File Name": file_name, "Sender": sender, "Subject": subject}
+    for r in routes or []:
+        if fnmatch.fnmatchcase((values.get(r.get("match_on") or "File Name") or "").lower(), (r.get("pattern") or "").lower()):
+            return r.get("blueprint")
+    return default
+
+
+# --- folders --------------------------------------------------------------
+
+
+def _within(path: str, root: str) -> bool:
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def intake_roots() -> List[str]:
+    """Folders sources may read from (site config `alphax_ai_intake_roots`: a list or comma separated)."""
+    roots = frappe.conf.get(ROOTS_CONFIG) or []
+    if isinstance(roots, str):
+        roots = roots.replace("\n", ",").split(",")
+    return [os.path.realpath(r.strip()) for r in roots if r and r.strip() and os.path.isabs(r.strip())]
+
+
+def resolve_path(path: Optional[str]) -> str:
+    """The real path of a source folder; throws unless it lies inside an intake root
+    and outside the bench and the site folder (symlinks are resolved first)."""
+    from frappe.utils import get_bench_path
+
+    if not path or not os.path.isabs(path):
+        frappe.throw(_("Path must be an absolute folder path on the server"))
+    real = os.path.realpath(path)
+    roots = intake_roots()
+    if not roots:
+        frappe.throw(_("No intake folders are allowed on this site; list them in site config {0}").format(ROOTS_CONFIG))
+    if not any(_within(real, root) for root in roots):
+        frappe.throw(_("Folder {0} is not inside an allowed intake folder ({1})").format(path, ", ".join(roots)))
+    for protected in (get_bench_path(), frappe.get_site_path()):
+        if _within(real, os.path.realpath(protected)):
+            frappe.throw(_("Folder {0} is inside the bench or site folder and cannot be used for intake").format(path))
+    return real
+
+
+# --- scanning ---------------------------------------------------------------
+
+
+def scan_directory(
+    path: str,
+    pats: List[str],
+    cursor: Optional[Dict[str, Any]],
+    limit: int,
+    min_age_s: float = MIN_FILE_AGE_S,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+    """Files in `path` after `cursor`, oldest first: (at most `limit` files, new cursor, files left).
+
+    Files in the cursor's retry list come first and are flagged "retry"; a
+    caller that fails on a file hands it to `retry_later`.
+    """
+    cursor = cursor or {}
+    # cursors written before the switch to ctime hold an mtime, never later than the ctime
+    since = int(cursor.get("ctime_ns") or cursor.get("mtime_ns") or 0)
+    seen = set(cursor.get("names") or [])
+    retry = dict(cursor.get("retry") or {})
+    candidates = []
+    retries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False) or not matches(entry.name, pats):
+                continue
+            if entry.name in retry:
+                retries.append(entry.name)
+                continue
+            ctime_ns = entry.stat(follow_symlinks=False).st_ctime_ns
+            if ctime_ns < since or (ctime_ns == since and entry.name in seen):
+                continue
+            candidates.append((ctime_ns, entry.name))
+    candidates.sort()
+    # files gone since they failed are not retried
+    retry = {name: retry[name] for name in retries}
+
+    taken = [{"path": os.path.join(path, name), "name": name, "retry": True} for name in sorted(retries)[:limit]]
+    newest_ns = time.time_ns() - int(min_age_s * 1e9)
+    fresh = []
+    for ctime_ns, name in candidates:
+        if len(taken) + len(fresh) >= limit or ctime_ns > newest_ns:
+            break
+        fresh.append({"path": os.path.join(path, name), "name": name, "ctime_ns": ctime_ns})
+
+    new_cursor: Dict[str, Any] = {"ctime_ns": since, "names": sorted(seen)}
+    if fresh:
+        last = fresh[-1]["ctime_ns"]
+        names = {t["name"] for t in fresh if t["ctime_ns"] == last}
+        if last == since:
+            names |= seen
+        new_cursor = {"ctime_ns": last, "names": sorted(names)}
+    if retry:
+        new_cursor["retry"] = retry
+    left = len(retries) + len(candidates) - len(taken) - len(fresh)
+    return taken + fresh, new_cursor, left
+
+
+def retry_later(cursor: Dict[str, Any], name: str) -> bool:
+    """Keep a file that failed in the cursor's retry list; False once it has
+    failed MAX_FILE_ATTEMPTS times (it is dropped and not tried again)."""
+    retry = cursor.setdefault("retry", {})
+    attempts = int(retry.get(name) or 0) + 1
+    if attempts >= MAX_FILE_ATTEMPTS:
+        retry.pop(name, None)
+        if not retry:
+            cursor.pop("retry")
+        return False
+    retry[name] = attempts
+    return True
+
+
+def retry_done(cursor: Dict[str, Any], name: str) -> None:
+    """Drop a file from the cursor's retry list (no-op if it is not there)."""
+    retry = cursor.get("retry") or {}
+    retry.pop(name, None)
+    if not retry:
+        cursor.pop("retry", None)
+
+
+def scan_maildir(path: str, limit: int) -> Tuple[List[str], int]:
+    """Message files in new/, in delivery order: (at most `limit` paths, messages left)."""
+    new_dir = os.path.join(path, "new")
+    names = sorted(n for n in os.listdir(new_dir) if not n.startswith("."))
+    return [os.path.join(new_dir, n) for n in names[:limit]], max(0, len(names) - limit)
+
+
+def read_message(path: str, pats: List[str]) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        msg = email.message_from_binary_file(f, policy=email.policy.default)
+    attachments = []
+    for part in msg.walk():
+        file_name = part.get_filename()
+        if part.is_multipart() or not file_name or not matches(file_name, pats):
+            continue
+        content = part.get_payload(decode=True)
+        if content:
+            attachments.append((file_name, content))
+    return {
+        "sender": email.utils.parseaddr(str(msg.get("From") or ""))[1],
+        "subject": str(msg.get("Subject") or ""),
+        "attachments": attachments,
+    }
+
+
+def mark_seen(path: str) -> None:
+    """Maildir: new/<name> -> cur/<name>:2,S."""
+    name = os.path.basename(path)
+    cur_dir = os.path.join(os.path.dirname(os.path.dirname(path)), "cur")
+    os.makedirs(cur_dir, exist_ok=True)
+    os.rename(path, os.path.join(cur_dir, name if ":2," in name else f"{name}:2,S"))
+
+
+def _move_processed(path: str) -> None:
+    target = os.path.join(os.path.dirname(path), PROCESSED_DIR)
+    os.makedirs(target, exist_ok=True)
+    os.replace(path, os.path.join(target, os.path.basename(path)))
+
+
+# --- jobs -------------------------------------------------------------------
+
+
+def scan_due_sources() -> List[str]:
+    """Scheduler (every minute): queue a scan for each enabled source that is due."""
+    now = now_datetime()
+    queued = []
+    for s in frappe.get_all("AI Intake Source", filters={"enabled": 1}, fields=["name", "scan_interval_minutes", "last_scan_on"]):
+        interval_s = max(1, int(s.scan_interval_minutes or 5)) * 60
+        # a few seconds of slack so scheduler tick jitter does not skip a whole interval
+        if s.last_scan_on and (now - get_datetime(s.last_scan_on)).total_seconds() < interval_s - 30:
+            continue
+        enqueue_scan(s.name)
+        queued.append(s.name)
+    return queued
+
+
+def enqueue_scan(source: str) -> None:
+    frappe.enqueue(
+        SCAN_JOB,
+        queue="default",
+        timeout=900,
+        job_id=f"alphax_ai_intake_scan::{source}",
+        deduplicate=True,
+        source=source,
+    )
+
+
+def _save_file(source: str, file_name: str, content: bytes):
+    return frappe.get_doc(
+        {
+            "doctype": "File",
+            "file_name": file_name,
+            "content": content,
+            "is_private": 1,
+            "attached_to_doctype": "AI Intake Source",
+            "attached_to_name": source,
+        }
+    ).insert(ignore_permissions=True)
+
+
+def _queue_file(src, file_name: str, content: bytes, blueprint: str) -> None:
+    file_doc = _save_file(src.name, file_name, content)
+    frappe.enqueue(
+        INGEST_JOB,
+        queue="long",
+        timeout=1800,
+        job_id=f"alphax_ai_intake_ingest::{file_doc.name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        source=src.name,
+        file=file_doc.name,
+        blueprint=blueprint,
+        create_draft=int(src.create_draft or 0),
+    )
+
+
+def scan_source(source: str) -> Dict[str, Any]:
+    """Background job: pick up new files of one source and queue them for ingestion."""
+    src = frappe.get_doc("AI Intake Source", source)
+    pats = patterns(src.file_pattern)
+    limit = max(1, int(src.max_files_per_scan or 20))
+    routes = [r.as_dict() for r in src.get("routes") or []]
+    out = {"queued": 0, "skipped": 0, "failed": 0, "pending": 0}
+    state: Dict[str, Any] = {"last_scan_on": now_datetime(), "last_error": None}
+    after_commit = []
+    errors = []
+
+    try:
+        path = resolve_path(src.path)
+        if src.source_type == "Maildir":
+            messages, out["pending"] = scan_maildir(path, limit)
+            for path in messages:
+                try:
+                    msg = read_message(path, pats)
+                    for file_name, content in msg["attachments"]:
+                        blueprint = route(routes, src.default_blueprint, file_name, msg["sender"], msg["subject"])
+                        if not blueprint:
+                            out["skipped"] += 1
+                            continue
+                        _queue_file(src, file_name, content, blueprint)
+                        out["queued"] += 1
+                except Exception as e:
+                    out["failed"] += 1
+                    errors.append(f"{os.path.basename(path)}: {e}")
+                after_commit.append((mark_seen, path))
+        else:
+            cursor = json.loads(src.scan_cursor_json or "{}")
+            files, cursor, out["pending"] = scan_directory(path, pats, cursor, limit)
+            for f in files:
+                blueprint = route(routes, src.default_blueprint, f["name"])
+                if not blueprint:
+                    retry_done(cursor, f["name"])
+                    out["skipped"] += 1
+                    continue
+                # a failed file leaves no half-saved File behind; it is retried later
+                frappe.db.savepoint("alphax_ai_intake_file")
+                try:
+                    with open(f["path"], "rb") as fh:
+                        _queue_file(src, f["name"], fh.read(), blueprint)
+                    retry_done(cursor, f["name"])
+                    out["queued"] += 1
+                except Exception as e:
+                    frappe.db.rollback(save_point="alphax_ai_intake_file")
+                    out["failed"] += 1
+                    if retry_later(cursor, f["name"]):
+                        errors.append(f"{f['name']}: {e} (will retry)")
+                    else:
+                        errors.append(f"{f['name']}: {e} (gave up after {MAX_FILE_ATTEMPTS} attempts)")
+                    continue
+                if src.move_processed:
+                    after_commit.append((_move_processed, f["path"]))
+            state["scan_cursor_json"] = json.dumps(cursor)
+    except Exception as e:
+        frappe.db.rollback()
+        errors.append(str(e))
+        frappe.log_error(frappe.get_traceback(), f"AlphaX AI Intake Scan Failed: {source}")
+        after_commit = []
+
+    state.update(
+        last_scan_files=out["queued"],
+        pending_files=out["pending"],
+        total_files=int(src.total_files or 0) + out["queued"],
+        last_error="\n".join(errors)[:2000] or None,
+    )
+    frappe.db.set_value("AI Intake Source", source, state, update_modified=False)
+    frappe.db.commit()
+
+    for move, path in after_commit:
+        try:
+            move(path)
+        except OSError:
+            frappe.log_error(frappe.get_traceback(), f"AlphaX AI Intake Move Failed: {source}")
+    return out
+
+
+def ingest_job(source: str, file: str, blueprint: str, create_draft: int = 1) -> Dict[str, Any]:
+    """Background job: ingest one picked-up file (idempotent per File)."""
+    from alphax_ai_platform.alphax_ai.api.ingest import ingest_file
+
+    file_url = frappe.db.get_value("File", file, "file_url")
+    if not file_url:
+        return {"ok": False, "file": file}
+    try:
+        return ingest_file(
+            file_url=file_url,
+            blueprint_name=blueprint,
+            create_draft=create_draft,
+            idempotency_key=f"intake:{file}",
+        )
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), f"AlphaX AI Intake Ingest Failed: {source}")
+        raise
@@ -0,0 +1,64 @@
+"""Stage-level ingestion progress for the desk.
+
+Updates go out as PROGRESS_EVENT through the coalescing publisher
+(realtime.stream), keyed by `progress_id`, so only the latest stage of an
+ingest is sent when several arrive within one flush interval. Each update:
+
+    {"progress_id", "ingested_document", "parent", "stage", "done", "total",
+     "status", "final"}
+
+Stages: Extracting (page k/n), Parsing, Validating, Creating (rows k/n for
+split sheets), then a final update with the document status (Draft Created,
+Pending Approval, Duplicate, Split, Queued, Failed). Segments of a
+multi-document scan report only their final status, with the container in
+`parent`, so a 40-document scan costs about one message per document.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from alphax_ai_platform.alphax_ai.realtime import stream
+
+PROGRESS_EVENT = "alphax_ai_ingest_progress"
+
+
+class IngestProgress:
+    def __init__(
+        self,
+        progress_id: Optional[str] = None,
+        ingested_document: Optional[str] = None,
+        parent: Optional[str] = None,
+        stages: bool = True,
+    ):
+        self.progress_id = progress_id or ingested_document
+        self.ingested_document = ingested_document
+        self.parent = parent
+        # segment children report the final status only
+        self.stages = stages
+
+    def _emit(self, stage: str, done: Any = None, total: Any = None, status: Optional[str] = None, final: bool = False, **extra):
+        if not self.progress_id:
+            return
+        payload = {
+            "progress_id": self.progress_id,
+            "ingested_document": self.ingested_document,
+            "parent": self.parent,
+            "stage": stage,
+            "done": done,
+            "total": total,
+            "status": status,
+            "final": final,
+            **extra,
+        }
+        stream.emit(PROGRESS_EVENT, payload, key=self.progress_id, final=final)
+
+    def stage(self, name: str, done: Any = None, total: Any = None) -> None:
+        if self.stages:
+            self._emit(name, done, total)
+
+    def page(self, done: int, total: int) -> None:
+        self.stage("Extracting", done, total)
+
+    def finish(self, status: str, **extra) -> None:
+        self._emit("Done" if status != "Failed" else "Failed", status=status, final=True, **extra)
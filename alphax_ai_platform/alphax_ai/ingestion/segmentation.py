@@ -0,0 +1,372 @@
+"""Document boundary detection for multi-document scans.
+
+Scanners often produce one PDF holding many documents back to back (e.g. 40
+supplier invoices). This pre-pass looks only at per-page text, which the
+extractor already produced, and decides for every page whether it starts a
+new document. Evidence per page, scored against the current segment:
+
+  - page numbering, read from the first and last MARKER_LINES lines only:
+    "Page 1 of 3" / "1/3" starts a document, "Page 2 of 3" continues one,
+    and the page after a "Page 3 of 3" starts a new one. A bare "Page 2"
+    line (no total) only counts towards the score;
+  - a document title in the header lines (Invoice, Purchase Order, ...);
+  - party / document number lines (Supplier:, Invoice No:, ...) that differ
+    from, or repeat, the ones seen in the current segment; a new document
+    number outweighs a repeated supplier (consecutive invoices from one
+    supplier are the common case);
+  - a layout fingerprint: the token set of the header lines, compared with
+    the first page of the current segment (letterheads repeat on every page
+    of one document and change between suppliers).
+
+Page numbering with a total is decisive when present; otherwise the signals
+are summed and a page opens a new segment at BOUNDARY_SCORE.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.ingestion.progress import IngestProgress
+from alphax_ai_platform.alphax_ai.storage.compression import unpack
+
+HEADER_LINES = 8
+# page markers are only read from the header / footer lines (not "see page 1 of the contract" in the body)
+MARKER_LINES = 3
+BOUNDARY_SCORE = 2.0
+MIN_PAGES_PER_SEGMENT = 1
+
+_PAGE_OF_RE = re.compile(r"\b(?:page|pg\.?|صفحة)\s*(\d{1,3})\s*(?:of|/|من)\s*(\d{1,3})\b", re.I)
+# a line that is nothing but a page number ("Page 2", "- page 2 -")
+_PAGE_RE = re.compile(r"^[\s\-–]*(?:page|pg\.?|صفحة)\s*(\d{1,3})[\s\-–]*$", re.I | re.M)
+_FRACTION_RE = re.compile(r"^\s*(\d{1,3})\s*/\s*(\d{1,3})\s*$", re.M)
+_TITLE_RE = re.compile(
+    r"^\s*(?:tax\s+)?(?:invoice|purchase\s+order|quotation|quote|proforma(?:\s+invoice)?|"
+    r"delivery\s+note|credit\s+note|receipt|statement|فاتورة(?:\s+ضريبية)?|عرض\s+سعر|أمر\s+شراء)\b"
+    r"(?!\s*(?:\(\s*)?(?:(?:cont(?:inued|d)?|no|number|date)\b|#))",  # not "Invoice (continued)" / "Invoice No:"
+    re.I | re.M,
+)
+_PARTY_RE = re.compile(r"^\s*(?:supplier|vendor|from|bill\s+from|seller|المورد)\s*[:\-]\s*(.+)$", re.I | re.M)
+_DOCNO_RE = re.compile(
+    r"^\s*(?:invoice|inv|po|quotation|quote|document|doc|bill)\s*(?:no\.?|number|#)\s*[:\-]?\s*([A-Z0-9][A-Z0-9\-/]{2,})",
+    re.I | re.M,
+)
+_TOKEN_RE = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+
+
+def _norm(s: Optional[str]) -> Optional[str]:
+    return re.sub(r"\s+", " ", s).strip().lower() if s else None
+
+
+def page_features(text: str) -> Dict[str, Any]:
+    """Cheap per-page signals (regexes over the page text, tokens of the header lines)."""
+    text = text or ""
+    lines = [l for l in text.splitlines() if l.strip()]
+    header = "\n".join(lines[:HEADER_LINES])
+
+    page_no = total = None
+    margins = "\n".join(lines[:MARKER_LINES] + lines[MARKER_LINES:][-MARKER_LINES:])
+    m = _PAGE_OF_RE.search(margins) or _FRACTION_RE.search(margins)
+    if m:
+        page_no, total = int(m.group(1)), int(m.group(2))
+    else:
+        m = _PAGE_RE.search(margins)
+        if m:
+            page_no = int(m.group(1))
+
+    party = _PARTY_RE.search(text)
+    docno = _DOCNO_RE.search(text)
+    return {
+        "page_no": page_no,
+        "page_total": total if total and page_no and page_no <= total else None,
+        "title": bool(_TITLE_RE.search(header)),
+        "party": _norm(party.group(1)) if party else None,
+        "docno": _norm(docno.group(1)) if docno else None,
+        "layout": set(t.lower() for t in _TOKEN_RE.findall(header)),
+        "empty": not lines,
+    }
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _boundary_score(f: Dict[str, Any], prev: Dict[str, Any], seg: Dict[str, Any]) -> Tuple[Optional[bool], float, List[str]]:
+    """(decisive verdict or None, score, reasons) for page `f` following page `prev`."""
+    reasons: List[str] = []
+    score = 0.0
+    if f["page_total"]:
+        if f["page_no"] == 1:
+            return True, 10.0, ["page numbering restarts"]
+        if prev["page_no"] is not None and f["page_no"] == prev["page_no"] + 1 and (
+            f["page_total"] == prev.get("page_total") or not prev.get("page_total")
+        ):
+            return False, -10.0, ["page numbering continues"]
+    if prev.get("page_total") and prev["page_no"] == prev["page_total"]:
+        return True, 10.0, ["previous page was the last of its document"]
+    if f["page_no"] is not None and not f["page_total"]:
+        # bare page numbers are weaker evidence: they count, but other signals can outweigh them
+        if f["page_no"] == 1:
+            score += 1.5
+            reasons.append("page number 1")
+        elif prev["page_no"] is not None and f["page_no"] == prev["page_no"] + 1:
+            score -= 2.0
+
+    if f["title"]:
+        score += 1.0
+        reasons.append("document title in header")
+    if f["party"] and seg.get("party"):
+        if f["party"] != seg["party"]:
+            score += 2.0
+            reasons.append("different party")
+        else:
+            score -= 1.0
+    elif f["party"] and not seg.get("party") and f["title"]:
+        score += 0.5
+    if f["docno"] and seg.get("docno"):
+        if f["docno"] != seg["docno"]:
+            score += 3.0
+            reasons.append("different document number")
+        else:
+            score -= 2.0
+    similarity = _jaccard(f["layout"], seg.get("layout") or set())
+    if seg.get("layout") and f["layout"]:
+        if similarity < 0.25:
+            score += 1.0
+            reasons.append("header layout changes")
+        elif similarity > 0.6 and not f["title"]:
+            score -= 0.5
+    return None, score, reasons
+
+
+def detect_segments(page_texts: List[str]) -> List[Dict[str, Any]]:
+    """Split pages into documents.
+
+    Returns [{"start": first page index, "end": exclusive end, "reasons": [...]}];
+    a single segment means the file is one document.
+    """
+    if not page_texts:
+        return []
+    feats = [page_features(t) for t in page_texts]
+    segments = [{"start": 0, "end": 1, "reasons": ["first page"]}]
+    seg = dict(feats[0])
+    for i in range(1, len(feats)):
+        f = feats[i]
+        if f["empty"]:
+            segments[-1]["end"] = i + 1  # blank separator / back side stays with its document
+            continue
+        verdict, score, reasons = _boundary_score(f, feats[i - 1], seg)
+        starts = verdict if verdict is not None else score >= BOUNDARY_SCORE
+        if starts and i - segments[-1]["start"] >= MIN_PAGES_PER_SEGMENT:
+            segments.append({"start": i, "end": i + 1, "reasons": reasons})
+            seg = dict(f)
+        else:
+            segments[-1]["end"] = i + 1
+            # first value seen within the segment wins (letterhead of page 1)
+            for key in ("party", "docno"):
+                seg[key] = seg.get(key) or f[key]
+    return segments
+
+
+def segment_extraction(extracted: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-segment extraction dicts built from the page texts already extracted.
+
+    Returns [] when the file holds a single document (or no per-page text).
+    """
+    pages = extracted.get("page_texts") or []
+    if len(pages) < 2:
+        return []
+    segments = detect_segments(pages)
+    if len(segments) < 2:
+        return []
+    out = []
+    for s in segments:
+        chunk = pages[s["start"]:s["end"]]
+        out.append({
+            "text": "\n\n".join(t for t in chunk if t).strip(),
+            "pages": len(chunk),
+            "tables": [],
+            "meta": dict(
+                extracted.get("meta") or {},
+                segment={"pages": [s["start"] + 1, s["end"]], "reasons": s["reasons"]},
+            ),
+            "page_range": f"{s['start'] + 1}-{s['end']}" if s["end"] - s["start"] > 1 else str(s["start"] + 1),
+        })
+    return out
+
+
+def enqueue_segment(
+    ingested_document: str,
+    ocr_result: str,
+    blueprint: Optional[str],
+    target_doctype: str,
+    create_draft: int = 1,
+    mapping_template: Optional[str] = None,
+    parent_document: Optional[str] = None,
+) -> None:
+    """One job per segment so the documents of a scan are parsed in parallel by the workers."""
+    frappe.enqueue(
+        "alphax_ai_platform.alphax_ai.ingestion.segmentation.segment_job",
+        queue="default",
+        timeout=900,
+        job_id=f"alphax_ai_segment::{ingested_document}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        ingested_document=ingested_document,
+        ocr_result=ocr_result,
+        blueprint=blueprint,
+        target_doctype=target_doctype,
+        create_draft=create_draft,
+        mapping_template=mapping_template,
+        parent_document=parent_document,
+    )
+
+
+def enqueue_segment_batch(
+    segments: List[Dict[str, str]],
+    blueprint: Optional[str],
+    target_doctype: str,
+    create_draft: int = 1,
+    mapping_template: Optional[str] = None,
+    parent_document: Optional[str] = None,
+) -> None:
+    """One job per group of segments that share one LLM extraction call
+    (parsing.llm_extract); `segments` are [{"ingested_document", "ocr_result"}]."""
+    frappe.enqueue(
+        "alphax_ai_platform.alphax_ai.ingestion.segmentation.segment_batch_job",
+        queue="default",
+        timeout=900,
+        job_id=f"alphax_ai_segment_batch::{segments[0]['ingested_document']}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        segments=segments,
+        blueprint=blueprint,
+        target_doctype=target_doctype,
+        create_draft=create_draft,
+        mapping_template=mapping_template,
+        parent_document=parent_document,
+    )
+
+
+def _load_segment(ocr_result: str) -> Optional[Dict[str, Any]]:
+    row = frappe.db.get_value(
+        "AI OCR Result",
+        ocr_result,
+        ["extracted_text", "extraction_meta_json", "pages"],
+        as_dict=True,
+    )
+    if not row:
+        return None
+    return {
+        "text": unpack(row.extracted_text) or "",
+        "tables": [],
+        "pages": row.pages or 1,
+        "meta": json.loads(row.extraction_meta_json or "{}"),
+    }
+
+
+def _process_segment(
+    ingested_document: str,
+    ocr_result: str,
+    extracted: Dict[str, Any],
+    bp: Dict[str, Any],
+    target_doctype: str,
+    create_draft: int,
+    mapping_template: Optional[str],
+    parent_document: Optional[str] = None,
+) -> Dict[str, Any]:
+    from alphax_ai_platform.alphax_ai.api.ingest import _process_extracted
+    from alphax_ai_platform.alphax_ai.ingestion.dedup import DuplicateIndex
+    from alphax_ai_platform.alphax_ai.metrics.timing import StageTimer
+
+    progress = IngestProgress(ingested_document=ingested_document, parent=parent_document, stages=False)
+
+    dedup_index = None
+    if (bp.get("duplicate_handling") or "Flag") != "Off":
+        dedup_index = DuplicateIndex(bp.get("blueprint") or target_doctype, bp.get("duplicate_window_days"))
+
+    try:
+        return _process_extracted(
+            ingested_document,
+            ocr_result,
+            extracted,
+            bp,
+            target_doctype,
+            create_draft,
+            mapping_template,
+            dedup_index,
+            None,
+            None,
+            StageTimer(),
+            progress,
+        )
+    except Exception:
+        # logged and committed here, not re-raised: the job runner would roll the Failed status
+        # back and log the same error a second time
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Segment Ingest Failed")
+        frappe.db.set_value("AI Ingested Document", ingested_document, "status", "Failed")
+        frappe.db.commit()
+        progress.finish("Failed")
+        return {"ok": False, "ingested_document": ingested_document, "status": "Failed"}
+
+
+def segment_job(
+    ingested_document: str,
+    ocr_result: str,
+    blueprint: Optional[str],
+    target_doctype: str,
+    create_draft: int = 1,
+    mapping_template: Optional[str] = None,
+    parent_document: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Background job: run the normal parse/map/draft pipeline on one segment of a scan."""
+    from alphax_ai_platform.alphax_ai.api.ingest import _resolve_blueprint
+
+    extracted = _load_segment(ocr_result)
+    if not extracted:
+        return {"ok": False, "ingested_document": ingested_document}
+    bp = _resolve_blueprint(blueprint, target_doctype)
+    target_doctype = bp.get("target_doctype") or target_doctype
+    return _process_segment(
+        ingested_document, ocr_result, extracted, bp, target_doctype, create_draft, mapping_template, parent_document
+    )
+
+
+def segment_batch_job(
+    segments: List[Dict[str, str]],
+    blueprint: Optional[str],
+    target_doctype: str,
+    create_draft: int = 1,
+    mapping_template: Optional[str] = None,
+    parent_document: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Background job: extract a group of segments with one LLM call, then run
+    the pipeline on each. A failing segment does not stop the others."""
+    from alphax_ai_platform.alphax_ai.api.ingest import _resolve_blueprint
+    from alphax_ai_platform.alphax_ai.parsing import llm_extract
+
+    bp = _resolve_blueprint(blueprint, target_doctype)
+    target_doctype = bp.get("target_doctype") or target_doctype
+    loaded = [(s, _load_segment(s["ocr_result"])) for s in segments]
+    loaded = [(s, e) for s, e in loaded if e]
+    out = llm_extract.extract_documents(
+        [{"id": s["ingested_document"], "text": e["text"]} for s, e in loaded],
+        bp.get("schema_fields"),
+        target_doctype,
+    )
+    results = []
+    for s, extracted in loaded:
+        extracted["llm_fields"] = out["results"].get(s["ingested_document"])
+        llm_extract.note_outcome(extracted, out, len(loaded), ok=extracted["llm_fields"] is not None)
+        results.append(_process_segment(
+            s["ingested_document"], s["ocr_result"], extracted, bp, target_doctype, create_draft, mapping_template,
+            parent_document,
+        ))
+        frappe.db.commit()
+    return results
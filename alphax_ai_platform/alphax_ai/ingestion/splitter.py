@@ -0,0 +1,418 @@
+"""Row-per-document ingestion ("split mode") for spreadsheet blueprints.
+
+One uploaded sheet becomes one target document per row:
+
+  1. headers are matched to blueprint schema fields (key, label or target
+     field) once per file; remaining headers that are target fieldnames pass
+     through unchanged;
+  2. every column is normalized with the blueprint's compiled field rules
+     (parsing/normalize.py) and checked as a whole (memoised per distinct
+     value), Link columns are checked with one query per linked doctype and
+     Select columns against their options, so validation cost grows with
+     columns and distinct values rather than with rows x rules;
+  3. valid rows are inserted in chunks, each chunk in its own transaction
+     with a savepoint per row, so one bad row never aborts its neighbours;
+  4. every invalid row (validation or insert failure) is collected into a
+     single AI Action Request whose payload is the list of documents and
+     whose notes list the errors per sheet row.
+
+Large sheets run in a background job; the counts and throughput are stored
+on the AI Ingested Document (split_* fields). The job commits per chunk and
+records the last committed sheet row with the chunk (split_checkpoint_json),
+so a retried job resumes after it instead of inserting those rows again.
+The checkpoint also keeps the job's arguments: `resume_split` re-queues a
+Failed or stalled split from it (api.ingest.resume_split on request, and
+the hourly `resume_stalled_splits`, at most MAX_RESUMES times).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, now_datetime
+
+from alphax_ai_platform.alphax_ai.ingestion.progress import IngestProgress
+from alphax_ai_platform.alphax_ai.mapping.engine import apply_mapping_template
+from alphax_ai_platform.alphax_ai.metrics.timing import StageTimer
+from alphax_ai_platform.alphax_ai.parsing.normalize import compile_field, normalize_column
+from alphax_ai_platform.alphax_ai.parsing.parsers import _extract_tables_as_rows
+
+SPLIT_MODE = "Row per Document"
+SYNC_ROWS = 200
+DEFAULT_CHUNK_SIZE = 500
+MAX_NOTE_LINES = 500
+MAX_RESUMES = 3
+STALL_MINUTES = 60
+
+_HEADER_RE = re.compile(r"[^0-9a-z]+")
+_SKIP_FIELDTYPES = {"Section Break", "Column Break", "Tab Break", "Table", "Table MultiSelect"}
+
+
+def _norm_header(h: Any) -> str:
+    return _HEADER_RE.sub("_", str(h or "").strip().lower()).strip("_")
+
+
+def is_split(bp: Dict[str, Any]) -> bool:
+    return bp.get("split_mode") == SPLIT_MODE
+
+
+# --- mapping ---------------------------------------------------------------
+
+def _column_plan(columns: List[Any], schema_fields: List[Dict[str, Any]], meta) -> List[Dict[str, Any]]:
+    """[{column, target, label, required, convert}] for every usable header."""
+    by_header = {_norm_header(c): c for c in columns}
+    plan: List[Dict[str, Any]] = []
+    used = set()
+    for f in schema_fields or []:
+        target = f.get("maps_to")
+        if not target or "." in target or f.get("table_child"):
+            continue  # child-table fields do not apply to row-per-document
+        for cand in (f.get("field_key"), f.get("label"), target):
+            col = by_header.get(_norm_header(cand))
+            if col is not None and col not in used:
+                used.add(col)
+                plan.append({
+                    "column": col,
+                    "target": target,
+                    "label": f.get("label") or f.get("field_key"),
+                    "required": bool(f.get("required")),
+                    "convert": compile_field(f),
+                })
+                break
+
+    mapped_targets = {p["target"] for p in plan}
+    for norm, col in by_header.items():
+        if col in used or norm in mapped_targets:
+            continue
+        df = meta.get_field(norm)
+        if df and df.fieldtype not in _SKIP_FIELDTYPES:
+            plan.append({
+                "column": col,
+                "target": norm,
+                "label": df.label or norm,
+                "required": False,
+                "convert": compile_field({"data_type": {"Date": "Date", "Float": "Float", "Currency": "Float", "Int": "Int"}.get(df.fieldtype, "String")}),
+            })
+    return plan
+
+
+def map_and_validate(
+    rows: List[Dict[str, Any]],
+    target_doctype: str,
+    schema_fields: List[Dict[str, Any]],
+    defaults: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], List[List[str]]]:
+    """Map sheet rows to doc dicts and validate them column-wise.
+
+    Returns (docs, errors) aligned with `rows`; errors[i] is empty for valid rows.
+    """
+    meta = frappe.get_meta(target_doctype)
+    n = len(rows)
+    columns = list(dict.fromkeys(k for r in rows[:50] for k in r.keys()))
+    plan = _column_plan(columns, schema_fields, meta)
+
+    defaults = dict(defaults or {})
+    docs: List[Dict[str, Any]] = [dict(defaults, doctype=target_doctype) for _ in range(n)]
+    errors: List[List[str]] = [[] for _ in range(n)]
+    bad_cells = set()
+
+    for p in plan:
+        values, invalid = normalize_column([r.get(p["column"]) for r in rows], p["convert"])
+        target = p["target"]
+        for i in range(n):
+            if invalid[i]:
+                bad_cells.add((i, target))
+                errors[i].append(_("Invalid {0}: {1}").format(p["label"], rows[i].get(p["column"])))
+            elif values[i] is not None:
+                docs[i][target] = values[i]
+            elif p["required"]:
+                errors[i].append(_("Missing {0}").format(p["label"]))
+
+    mapped = {p["target"] for p in plan} | set(defaults)
+    for df in meta.fields:
+        if df.fieldtype in _SKIP_FIELDTYPES or not df.fieldname:
+            continue
+        if df.reqd and not df.default:
+            if df.fieldname not in mapped:
+                # the whole sheet lacks it: one message per row, no per-row scan needed
+                msg = _("Missing required field: {0}").format(df.label or df.fieldname)
+                for e in errors:
+                    e.append(msg)
+                continue
+            for i in range(n):
+                if docs[i].get(df.fieldname) in (None, "") and (i, df.fieldname) not in bad_cells:
+                    errors[i].append(_("Missing required field: {0}").format(df.label or df.fieldname))
+        if df.fieldname not in mapped:
+            continue
+        if df.fieldtype == "Link" and df.options:
+            distinct = {d.get(df.fieldname) for d in docs if d.get(df.fieldname) not in (None, "")}
+            if distinct:
+                found = set(frappe.get_all(df.options, filters={"name": ["in", list(distinct)]}, pluck="name"))
+                for i, d in enumerate(docs):
+                    v = d.get(df.fieldname)
+                    if v not in (None, "") and v not in found:
+                        errors[i].append(_("{0} {1} not found").format(df.options, v))
+        elif df.fieldtype == "Select" and df.options:
+            options = set(df.options.split("\n"))
+            for i, d in enumerate(docs):
+                v = d.get(df.fieldname)
+                if v not in (None, "") and v not in options:
+                    errors[i].append(_("Invalid {0}: {1}").format(df.label or df.fieldname, v))
+
+    return docs, errors
+
+
+# --- execution -------------------------------------------------------------
+
+def _insert_chunk(docs: List[Tuple[int, Dict[str, Any]]], failures: Dict[int, str]) -> List[str]:
+    created = []
+    for row_no, d in docs:
+        savepoint = f"alphax_ai_split_{row_no}"
+        frappe.db.savepoint(savepoint)
+        try:
+            created.append(frappe.get_doc(d).insert().name)
+        except Exception as e:
+            frappe.db.rollback(save_point=savepoint)
+            frappe.clear_messages()
+            failures[row_no] = str(e) or e.__class__.__name__
+    return created
+
+
+def _review_request(ingested_document: str, target_doctype: str, invalid: List[Tuple[int, Dict[str, Any], List[str]]]) -> str:
+    notes = [f"Row {row_no}: " + "; ".join(errs) for row_no, _doc, errs in invalid[:MAX_NOTE_LINES]]
+    if len(invalid) > MAX_NOTE_LINES:
+        notes.append(f"... and {len(invalid) - MAX_NOTE_LINES} more rows")
+    ar = frappe.get_doc({
+        "doctype": "AI Action Request",
+        "action_type": "Create Draft",
+        "target_doctype": target_doctype,
+        "status": "Pending",
+        "source_ingested_document": ingested_document,
+        "payload_json": json.dumps([doc for _row, doc, _errs in invalid], ensure_ascii=False, default=str),
+        "notes": "\n".join(notes),
+    })
+    ar.insert(ignore_permissions=False)
+    return ar.name
+
+
+def _load_checkpoint(ingested_document: str) -> Dict[str, Any]:
+    raw = frappe.db.get_value("AI Ingested Document", ingested_document, "split_checkpoint_json")
+    try:
+        checkpoint = json.loads(raw or "{}")
+    except ValueError:
+        return {}
+    return checkpoint if isinstance(checkpoint, dict) else {}
+
+
+def _save_checkpoint(ingested_document: str, checkpoint: Dict[str, Any]) -> None:
+    frappe.db.set_value(
+        "AI Ingested Document",
+        ingested_document,
+        "split_checkpoint_json",
+        json.dumps(checkpoint, default=str),
+        update_modified=False,
+    )
+
+
+def run_split(
+    ingested_document: str,
+    rows: List[Dict[str, Any]],
+    bp: Dict[str, Any],
+    review_note: Optional[str] = None,
+    commit: bool = False,
+    progress=None,
+) -> Dict[str, Any]:
+    """Create one document per row; returns the summary stored on the ingested document.
+
+    With `review_note` (e.g. a suspected duplicate upload) nothing is inserted:
+    every row goes to the consolidated review request. With `commit` each
+    chunk is committed together with a checkpoint, and a run that finds one
+    skips the rows up to it.
+    """
+    timer = StageTimer()
+    target = bp.get("target_doctype")
+    chunk_size = int(bp.get("split_chunk_size") or DEFAULT_CHUNK_SIZE)
+
+    with timer.stage("map_validate"):
+        defaults = apply_mapping_template(target, {}, bp.get("mapping_template"))
+        docs, errors = map_and_validate(rows, target, bp.get("schema_fields") or [], defaults)
+
+    # sheet row numbers are 1-based below the header row
+    valid = [(i + 2, d) for i, (d, e) in enumerate(zip(docs, errors)) if not e and not review_note]
+    invalid = [(i + 2, d, e or [review_note]) for i, (d, e) in enumerate(zip(docs, errors)) if e or review_note]
+
+    checkpoint = _load_checkpoint(ingested_document) if commit else {}
+    resumed_after = int(checkpoint.get("last_row") or 0)
+    created_before = int(checkpoint.get("created") or 0)
+    first_document = checkpoint.get("first_document")
+    failures: Dict[int, str] = {int(r): err for r, err in (checkpoint.get("failures") or {}).items()}
+    pending = [(row_no, d) for row_no, d in valid if row_no > resumed_after]
+    skipped = len(valid) - len(pending)
+
+    created: List[str] = []
+    with timer.stage("insert"):
+        for start in range(0, len(pending), chunk_size):
+            if progress:
+                progress.stage("Creating", skipped + start, len(valid))
+            chunk = pending[start:start + chunk_size]
+            created.extend(_insert_chunk(chunk, failures))
+            if commit:
+                _save_checkpoint(ingested_document, dict(
+                    checkpoint,
+                    last_row=chunk[-1][0],
+                    created=created_before + len(created),
+                    first_document=first_document or (created[0] if created else None),
+                    failures=failures,
+                ))
+                frappe.db.commit()
+    if failures:
+        by_row = dict(valid)
+        invalid.extend((row_no, by_row[row_no], [err]) for row_no, err in failures.items())
+        invalid.sort(key=lambda x: x[0])
+
+    action_request = None
+    if invalid:
+        with timer.stage("review_request"):
+            action_request = _review_request(ingested_document, target, invalid)
+
+    timings = timer.as_dict()
+    insert_ms = timings["stages_ms"].get("insert") or 0.0
+    summary = {
+        "rows": len(rows),
+        "created": created_before + len(created),
+        "invalid": len(invalid),
+        "action_request": action_request,
+        "first_document": first_document or (created[0] if created else None),
+        "resumed_after_row": resumed_after or None,
+        "rows_per_s": round(len(rows) / (timings["total_ms"] / 1000.0), 1) if timings["total_ms"] else None,
+        "inserts_per_s": round(len(created) / (insert_ms / 1000.0), 1) if insert_ms else None,
+        "timings": timings,
+    }
+    summary["status"] = "Pending Approval" if invalid else "Draft Created"
+
+    frappe.db.set_value(
+        "AI Ingested Document",
+        ingested_document,
+        {
+            "status": summary["status"],
+            "created_document": summary["first_document"],
+            "split_rows": summary["rows"],
+            "split_created": summary["created"],
+            "split_invalid": summary["invalid"],
+            "split_rows_per_second": summary["rows_per_s"] or 0,
+            "split_summary_json": json.dumps(summary, default=str),
+            "split_checkpoint_json": None,
+        },
+        update_modified=False,
+    )
+    if commit:
+        frappe.db.commit()
+    return summary
+
+
+def split_rows(extracted: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return _extract_tables_as_rows(extracted.get("tables") or [])
+
+
+def _job_id(ingested_document: str) -> str:
+    return f"alphax_ai_split::{ingested_document}"
+
+
+def _enqueue(
+    ingested_document: str,
+    ocr_result: str,
+    blueprint: Optional[str],
+    review_note: Optional[str] = None,
+    progress_id: Optional[str] = None,
+) -> None:
+    frappe.enqueue(
+        "alphax_ai_platform.alphax_ai.ingestion.splitter.split_job",
+        queue="long",
+        timeout=3600,
+        job_id=_job_id(ingested_document),
+        deduplicate=True,
+        enqueue_after_commit=True,
+        ingested_document=ingested_document,
+        ocr_result=ocr_result,
+        blueprint=blueprint,
+        review_note=review_note,
+        progress_id=progress_id,
+    )
+
+
+def enqueue_split(
+    ingested_document: str,
+    ocr_result: str,
+    blueprint: Optional[str],
+    review_note: Optional[str] = None,
+    progress_id: Optional[str] = None,
+) -> None:
+    # the arguments stay with the checkpoint, so a failed or lost job can be resumed
+    _save_checkpoint(ingested_document, {"job": {"ocr_result": ocr_result, "blueprint": blueprint, "review_note": review_note}})
+    _enqueue(ingested_document, ocr_result, blueprint, review_note, progress_id)
+
+
+def resume_split(ingested_document: str, force: bool = False) -> bool:
+    """Re-queue a split job from its checkpoint; it continues after the last committed chunk.
+
+    False when there is nothing to resume: no checkpoint, the job is still
+    queued or running, or (unless `force`) it was resumed MAX_RESUMES times.
+    """
+    from frappe.utils.background_jobs import is_job_enqueued
+
+    checkpoint = _load_checkpoint(ingested_document)
+    job = checkpoint.get("job")
+    if not job or is_job_enqueued(_job_id(ingested_document)):
+        return False
+    attempts = int(job.get("attempts") or 0) + 1
+    if attempts > MAX_RESUMES and not force:
+        return False
+    job["attempts"] = attempts
+    _save_checkpoint(ingested_document, checkpoint)
+    frappe.db.set_value("AI Ingested Document", ingested_document, "status", "Queued")
+    _enqueue(ingested_document, job["ocr_result"], job.get("blueprint"), job.get("review_note"))
+    return True
+
+
+def resume_stalled_splits() -> List[str]:
+    """Scheduler (hourly): resume split jobs that failed, or were lost, more than STALL_MINUTES ago."""
+    cutoff = add_to_date(now_datetime(), minutes=-STALL_MINUTES)
+    names = frappe.get_all(
+        "AI Ingested Document",
+        filters={"status": ["in", ["Failed", "Queued"]], "split_checkpoint_json": ["is", "set"], "modified": ["<", cutoff]},
+        pluck="name",
+    )
+    resumed = [name for name in names if resume_split(name)]
+    if resumed:
+        frappe.db.commit()
+    return resumed
+
+
+def split_job(
+    ingested_document: str,
+    ocr_result: str,
+    blueprint: Optional[str],
+    review_note: Optional[str] = None,
+    progress_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Background job for sheets above SYNC_ROWS rows."""
+    from alphax_ai_platform.alphax_ai.api.ingest import _resolve_blueprint
+
+    progress = IngestProgress(progress_id, ingested_document)
+    raw = frappe.db.get_value("AI OCR Result", ocr_result, "extracted_tables_json") or "[]"
+    bp = _resolve_blueprint(blueprint, None)
+    try:
+        summary = run_split(ingested_document, split_rows({"tables": json.loads(raw)}), bp, review_note, commit=True, progress=progress)
+    except Exception:
+        frappe.db.rollback()
+        frappe.db.set_value("AI Ingested Document", ingested_document, "status", "Failed")
+        frappe.db.commit()
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Split Ingest Failed")
+        progress.finish("Failed")
+        raise
+    progress.finish(summary["status"], created=summary["created"], invalid=summary["invalid"])
+    return summary
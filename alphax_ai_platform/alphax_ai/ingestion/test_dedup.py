@@ -0,0 +1,166 @@
+import time
+import unittest
+import uuid
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.ingestion import dedup
+from alphax_ai_platform.alphax_ai.ingestion.dedup import DuplicateIndex, _bands, hamming, simhash
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+
+def _invoice(number, items):
+    """A full page of invoice text as OCR returns it."""
+    lines = [
+        "TAX INVOICE",
+        "ACME Trading Co. LLC, P.O. Box 1120, Ruwi, Muscat, Sultanate of Oman",
+        "VAT No OM1100023456  Tel +968 2470 1100",
+        f"Invoice No: {number}   Date: 12/03/2026   Customer PO: PO-7781",
+        "Bill To: Globex Industrial Supplies, Al Khuwair, Muscat",
+        "Ship To: Globex Warehouse 4, Rusayl Industrial Estate",
+        "Payment Terms: Net 30 days   Delivery: within 14 days of order",
+    ]
+    lines += [f"{i}  {d}  Qty {q}  Unit Price {r:.3f}  Amount {q * r:.3f} OMR" for i, (d, q, r) in enumerate(items, 1)]
+    total = sum(q * r for _, q, r in items)
+    lines += [
+        f"Subtotal {total:.3f}",
+        f"VAT 5% {total * 0.05:.3f}",
+        f"Total Amount Due {total * 1.05:.3f} OMR",
+        "Bank: Bank Muscat, Account 0311-0456789-001, IBAN OM81 0270 0311 0456 7890 01",
+        "Goods once sold will not be taken back. E&OE.",
+        "Authorised signatory ____________  Received by ____________",
+    ]
+    return "\n".join(lines)
+
+
+INVOICE = _invoice("INV-2041", [
+    ("Steel bracket 40x40 galvanised", 12, 4.50), ("Hinge set heavy duty", 3, 11.00),
+    ("M8 hex bolt zinc plated box of 100", 5, 7.25), ("Rubber gasket 2 inch", 40, 0.85),
+    ("Angle grinder disc 115mm", 25, 1.20), ("Safety gloves size L", 10, 2.75),
+    ("PVC conduit 20mm x 3m", 30, 1.95), ("Cable ties 300mm pack of 100", 8, 3.10),
+])
+# the same page scanned again: misread characters, a split word, stray spacing
+RESCAN = (
+    INVOICE.replace("Invoice No:", "lnvoice No:").replace("0.850", "0.85O").replace("gloves", "g1oves")
+    .replace("Muscat, Sultanate", "Muscat , Sultanate").replace("Warehouse", "Ware house")
+)
+# another invoice from the same supplier, on the same template
+OTHER = _invoice("INV-2107", [
+    ("Copper pipe 15mm x 3m", 20, 6.40), ("Ball valve brass 1/2 inch", 15, 3.80),
+    ("Teflon tape roll", 50, 0.35), ("Pipe clamp 15mm", 100, 0.22),
+    ("Elbow 90 deg 15mm", 60, 0.65), ("Solder wire 500g", 4, 9.90),
+    ("Flux paste 100g", 6, 2.30), ("Tee joint 15mm", 40, 0.70),
+])
+H = 0x0123_4567_89AB_CDEF
+
+
+class TestDuplicateIndex(PatchedTestCase):
+    def setUp(self):
+        self.patch(DuplicateIndex, "_ensure_loaded")
+        self.index = DuplicateIndex(f"test-{uuid.uuid4().hex[:8]}", window_days=30)
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        keys = [self.index._k("simhash"), self.index._k("sweep")]
+        for h in (H, H ^ 0b101, H ^ (1 << 63)):
+            keys += [self.index._k("band", i, b) for i, b in enumerate(_bands(h))]
+        self.index.cache.pipeline().delete(*keys).execute()
+
+    def _stored(self, name):
+        return self.index.cache.pipeline().hmget(self.index._k("simhash"), [name]).execute()[0][0]
+
+    def _band_members(self, h):
+        pipe = self.index.cache.pipeline()
+        for i, b in enumerate(_bands(h)):
+            pipe.smembers(self.index._k("band", i, b))
+        return [{m.decode() if isinstance(m, bytes) else m for m in s} for s in pipe.execute()]
+
+    def test_exact_fingerprint(self):
+        fp = uuid.uuid4().hex
+        self.index.add("AI-DOC-1", fingerprint=fp)
+        self.addCleanup(self.index.cache.pipeline().delete(self.index._k("fp", fp)).execute)
+        self.assertEqual(self.index.find(fingerprint=fp), {"name": "AI-DOC-1", "match": "exact", "distance": 0})
+        self.assertIsNone(self.index.find(fingerprint=fp, exclude="AI-DOC-1"))
+
+    def test_near_duplicate_within_max_distance(self):
+        self.index.add("AI-DOC-1", sh=H)
+        self.assertEqual(self.index.find(sh=H ^ 0b101), {"name": "AI-DOC-1", "match": "near", "distance": 2})
+        self.assertIsNone(self.index.find(sh=H ^ 0b1111))  # 4 bits apart
+        self.assertIsNone(self.index.find(sh=H, exclude="AI-DOC-1"))
+
+    def test_find_prunes_expired_entries(self):
+        old = time.time() - 31 * 86400
+        with mock.patch.object(dedup.time, "time", return_value=old):
+            self.index.add("AI-DOC-OLD", sh=H ^ (1 << 63))
+        self.index.add("AI-DOC-NEW", sh=H)
+        self.assertEqual(self.index.find(sh=H ^ 0b101)["name"], "AI-DOC-NEW")
+        self.assertIsNone(self._stored("AI-DOC-OLD"))
+        self.assertFalse(any("AI-DOC-OLD" in m for m in self._band_members(H ^ (1 << 63))))
+        self.assertIsNotNone(self._stored("AI-DOC-NEW"))
+
+    def test_find_prunes_band_members_without_simhash(self):
+        self.index.add("AI-DOC-1", sh=H)
+        self.index.cache.pipeline().hdel(self.index._k("simhash"), "AI-DOC-1").execute()
+        self.assertIsNone(self.index.find(sh=H))
+        self.assertEqual(self._band_members(H), [set()] * dedup.BANDS)
+
+    def test_add_sweeps_expired_entries(self):
+        old = time.time() - 31 * 86400
+        with mock.patch.object(dedup.time, "time", return_value=old):
+            self.index.add("AI-DOC-OLD", sh=H ^ (1 << 63))
+        # no lookup ever meets the old entry; adding another document sweeps it
+        self.index.add("AI-DOC-NEW", sh=H)
+        self.assertIsNone(self._stored("AI-DOC-OLD"))
+        self.assertNotIn("AI-DOC-OLD", set().union(*self._band_members(H ^ (1 << 63))))
+
+    def test_indexed_only_once_the_ingest_commits(self):
+        after_commit, _ = self.patch_commit_hooks()
+        self.index.add_on_commit("AI-DOC-1", sh=H)
+        self.assertIsNone(self.index.find(sh=H))
+        self.assertEqual(len(after_commit), 1)
+        after_commit.run()
+        self.assertEqual(self.index.find(sh=H)["name"], "AI-DOC-1")
+
+    def test_deleted_document_leaves_the_index(self):
+        file_hash, fp = uuid.uuid4().hex, uuid.uuid4().hex
+        self.addCleanup(self.index.cache.pipeline().delete(self.index._k("file", file_hash), self.index._k("fp", fp)).execute)
+        self.index.add("AI-DOC-1", file_hash, fp, H)
+        doc = frappe._dict(name="AI-DOC-1", blueprint=self.index.scope, file_hash=file_hash, content_fingerprint=fp, simhash=f"{H:016x}")
+        after_commit, _ = self.patch_commit_hooks()
+        dedup.remove_document(doc)
+        self.assertEqual(self.index.find(fp, H)["name"], "AI-DOC-1")  # not before the delete commits
+        after_commit.run()
+        self.assertIsNone(self.index.find_file(file_hash))
+        self.assertIsNone(self.index.find(fp, H))
+        self.assertIsNone(self._stored("AI-DOC-1"))
+        self.assertEqual(self._band_members(H), [set()] * dedup.BANDS)
+
+    def test_remove_keeps_keys_pointing_at_another_document(self):
+        file_hash = uuid.uuid4().hex
+        self.addCleanup(self.index.cache.pipeline().delete(self.index._k("file", file_hash)).execute)
+        self.index.add("AI-DOC-2", file_hash)
+        self.index.remove("AI-DOC-1", file_hash)
+        self.assertEqual(self.index.find_file(file_hash), "AI-DOC-2")
+
+
+class TestSimhash(unittest.TestCase):
+    def test_short_text_has_no_hash(self):
+        self.assertIsNone(simhash("INV-1"))
+
+    def test_rescan_is_near_and_other_text_is_not(self):
+        base = simhash(INVOICE)
+        self.assertLessEqual(hamming(base, simhash(RESCAN)), dedup.MAX_DISTANCE)
+        self.assertGreater(hamming(base, simhash(OTHER)), dedup.MAX_DISTANCE)
+
+    def test_index_finds_the_rescan_and_not_the_other_invoice(self):
+        index = DuplicateIndex(f"test-{uuid.uuid4().hex[:8]}", window_days=30)
+        base = simhash(INVOICE)
+        self.addCleanup(
+            index.cache.pipeline().delete(index._k("simhash"), *[index._k("band", i, b) for i, b in enumerate(_bands(base))]).execute
+        )
+        with mock.patch.object(DuplicateIndex, "_ensure_loaded"):
+            index.add("AI-DOC-1", sh=base)
+            hit = index.find(sh=simhash(RESCAN))
+            self.assertEqual((hit["name"], hit["match"]), ("AI-DOC-1", "near"))
+            self.assertIsNone(index.find(sh=simhash(OTHER)))
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.ingestion import intake
+from alphax_ai_platform.alphax_ai.ingestion.intake import retry_done, retry_later, scan_directory
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+PDF = intake.patterns("*.pdf")
+
+
+class IntakeTestCase(PatchedTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="alphax_intake_test_")
+        self.addCleanup(shutil.rmtree, self.path, True)
+
+    def write(self, name, directory=None, mtime=None):
+        path = os.path.join(directory or self.path, name)
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 " + name.encode())
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def scan(self, cursor, limit=100, **kwargs):
+        kwargs.setdefault("min_age_s", 0)
+        return scan_directory(self.path, PDF, cursor, limit, **kwargs)
+
+
+class TestScanDirectory(IntakeTestCase):
+    def test_new_files_once_in_limit_sized_batches(self):
+        for i in range(5):
+            self.write(f"scan_{i}.pdf")
+        self.write("notes.txt")
+        self.write(".partial.pdf")
+        taken, cursor, left = self.scan({}, limit=3)
+        self.assertEqual(len(taken), 3)
+        self.assertEqual(left, 2)
+        more, cursor, left = self.scan(cursor, limit=3)
+        self.assertEqual(len(more), 2)
+        self.assertEqual(left, 0)
+        self.assertEqual(sorted(t["name"] for t in taken + more), [f"scan_{i}.pdf" for i in range(5)])
+        self.assertEqual(self.scan(cursor)[0], [])
+
+    def test_files_moved_in_with_an_old_mtime_are_picked_up(self):
+        self.write("first.pdf")
+        _, cursor, _ = self.scan({})
+        outside = tempfile.mkdtemp(prefix="alphax_intake_src_")
+        self.addCleanup(shutil.rmtree, outside, True)
+        year_2001 = 978307200
+        os.rename(self.write("moved.pdf", outside, mtime=year_2001), os.path.join(self.path, "moved.pdf"))
+        shutil.copy2(self.write("copied.pdf", outside, mtime=year_2001), self.path)  # cp -p
+        taken, _, _ = self.scan(cursor)
+        self.assertEqual(sorted(t["name"] for t in taken), ["copied.pdf", "moved.pdf"])
+
+    def test_legacy_mtime_cursor(self):
+        self.write("old.pdf")
+        since = os.stat(os.path.join(self.path, "old.pdf")).st_mtime_ns
+        taken, cursor, _ = self.scan({"mtime_ns": since, "names": ["old.pdf"]})
+        self.assertEqual(taken, [])
+        self.assertEqual(cursor["ctime_ns"], since)
+
+    def test_young_files_wait(self):
+        self.write("fresh.pdf")
+        taken, cursor, left = self.scan({}, min_age_s=3600)
+        self.assertEqual((taken, left), ([], 1))
+        self.assertEqual(cursor["ctime_ns"], 0)
+
+    def test_retry_files_come_first_and_vanished_ones_are_dropped(self):
+        self.write("a.pdf")
+        _, cursor, _ = self.scan({})
+        self.assertTrue(retry_later(cursor, "a.pdf"))
+        self.assertTrue(retry_later(cursor, "gone.pdf"))
+        self.write("b.pdf")
+        taken, cursor, _ = self.scan(cursor)
+        self.assertEqual([(t["name"], t.get("retry", False)) for t in taken], [("a.pdf", True), ("b.pdf", False)])
+        self.assertEqual(cursor["retry"], {"a.pdf": 1})
+        retry_done(cursor, "a.pdf")
+        self.assertNotIn("retry", cursor)
+
+    def test_retry_gives_up_after_max_attempts(self):
+        cursor = {}
+        results = [retry_later(cursor, "bad.pdf") for _ in range(intake.MAX_FILE_ATTEMPTS)]
+        self.assertEqual(results, [True] * (intake.MAX_FILE_ATTEMPTS - 1) + [False])
+        self.assertNotIn("retry", cursor)
+
+
+class TestResolvePath(IntakeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bench = tempfile.mkdtemp(prefix="alphax_intake_bench_")
+        self.addCleanup(shutil.rmtree, self.bench, True)
+        self.site = os.path.join(self.bench, "sites", "site1.local")
+        os.makedirs(self.site)
+        self.conf = {intake.ROOTS_CONFIG: [self.path, self.bench]}
+        self.patch(frappe, "conf", self.conf, create=True)
+        self.patch(frappe, "get_site_path", create=True, return_value=self.site)
+        self.patch(frappe.utils, "get_bench_path", create=True, return_value=self.bench)
+
+    def test_folders_inside_a_root(self):
+        inbox = os.path.join(self.path, "inbox")
+        os.makedirs(inbox)
+        self.assertEqual(intake.resolve_path(self.path), os.path.realpath(self.path))
+        self.assertEqual(intake.resolve_path(inbox + os.sep), os.path.realpath(inbox))
+
+    def test_relative_or_outside_the_roots(self):
+        for path in ("", None, "relative/folder", os.path.dirname(self.path), self.path + "-other", self.path + "/../"):
+            with self.subTest(path=path), self.assertRaises(frappe.ValidationError):
+                intake.resolve_path(path)
+
+    def test_no_roots_configured(self):
+        self.conf.pop(intake.ROOTS_CONFIG)
+        with self.assertRaises(frappe.ValidationError):
+            intake.resolve_path(self.path)
+
+    def test_roots_from_a_comma_separated_string(self):
+        self.conf[intake.ROOTS_CONFIG] = f" {self.path} , relative ,"
+        self.assertEqual(intake.intake_roots(), [os.path.realpath(self.path)])
+
+    def test_bench_and_site_folders_are_refused_even_inside_a_root(self):
+        for path in (self.bench, self.site, os.path.join(self.bench, "sites")):
+            with self.subTest(path=path), self.assertRaises(frappe.ValidationError):
+                intake.resolve_path(path)
+
+    def test_symlinks_are_resolved_before_the_check(self):
+        link = os.path.join(self.path, "sites")
+        os.symlink(self.site, link)
+        with self.assertRaises(frappe.ValidationError):
+            intake.resolve_path(link)
+
+
+class TestScanSource(IntakeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = frappe._dict(
+            name="Scanner", source_type="Directory", path=self.path, file_pattern="*.pdf",
+            default_blueprint="PO Intake", max_files_per_scan=10, scan_cursor_json=None, total_files=0,
+        )
+        self.saved = {}
+        self.patch(frappe, "get_doc", create=True, return_value=self.src)
+        self.patch(frappe.db, "set_value", create=True, side_effect=self._set_value)
+        for attr in ("commit", "savepoint", "rollback"):
+            self.patch(frappe.db, attr, create=True)
+        self.patch(frappe, "conf", {intake.ROOTS_CONFIG: [self.path]}, create=True)
+        self.patch(frappe, "get_site_path", create=True, return_value="/nonexistent/sites/site1.local")
+        self.patch(frappe.utils, "get_bench_path", create=True, return_value="/nonexistent")
+        # the files were just written: no minimum age
+        self.patch(intake, "scan_directory", side_effect=lambda *a: scan_directory(*a, min_age_s=0))
+
+    def _set_value(self, doctype, name, values, **kwargs):
+        self.saved = values
+        self.src.update(values)
+
+    def test_failed_file_is_retried_and_not_passed_by_the_cursor(self):
+        self.write("good.pdf")
+        self.write("bad.pdf")
+        calls = []
+
+        def queue(src, file_name, content, blueprint):
+            calls.append(file_name)
+            if file_name == "bad.pdf" and calls.count("bad.pdf") == 1:
+                raise OSError("disk full")
+
+        with mock.patch.object(intake, "_queue_file", side_effect=queue):
+            first = intake.scan_source("Scanner")
+            self.assertEqual((first["queued"], first["failed"]), (1, 1))
+            self.assertIn("bad.pdf: disk full (will retry)", self.saved["last_error"])
+            frappe.db.rollback.assert_called_with(save_point="alphax_ai_intake_file")
+            self.assertEqual(json.loads(self.saved["scan_cursor_json"])["retry"], {"bad.pdf": 1})
+
+            second = intake.scan_source("Scanner")
+        self.assertEqual((second["queued"], second["failed"]), (1, 0))
+        self.assertEqual(sorted(calls), ["bad.pdf", "bad.pdf", "good.pdf"])
+        self.assertNotIn("retry", json.loads(self.saved["scan_cursor_json"]))
+        self.assertIsNone(self.saved["last_error"])
+
+    def test_folder_outside_the_intake_roots_is_not_read(self):
+        self.write("scan.pdf")
+        frappe.conf[intake.ROOTS_CONFIG] = [os.path.join(self.path, "elsewhere")]
+        with mock.patch.object(intake, "_queue_file") as queue:
+            out = intake.scan_source("Scanner")
+        queue.assert_not_called()
+        self.assertEqual(out["queued"], 0)
+        self.assertIn("not inside an allowed intake folder", self.saved["last_error"])
@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.ingestion import segmentation
+from alphax_ai_platform.alphax_ai.ingestion.segmentation import detect_segments, page_features
+
+PO_PAGE_1 = "PURCHASE ORDER\nPO No: PO-0001\nSupplier: ACME Trading Co.\nItem A  10  5.00\nItem B  2  7.50"
+
+
+def _starts(pages):
+    return [s["start"] for s in detect_segments(pages)]
+
+
+class TestDetectSegments(unittest.TestCase):
+    def test_empty_and_single_page(self):
+        self.assertEqual(detect_segments([]), [])
+        self.assertEqual(_starts([PO_PAGE_1]), [0])
+
+    def test_page_mention_in_body_is_not_a_boundary(self):
+        pages = [PO_PAGE_1, "Item C  1  3.00\nTerms: as agreed on page 1 of the framework contract"]
+        self.assertEqual(_starts(pages), [0])
+
+    def test_page_of_total_in_footer_is_decisive(self):
+        pages = [
+            "ACME Trading Co.\nTAX INVOICE\nInvoice No: INV-1\nItem A\nPage 1 of 2",
+            "ACME Trading Co.\nInvoice (continued)\nItem B\nPage 2 of 2",
+            "ACME Trading Co.\nTAX INVOICE\nItem C\nPage 1 of 1",
+        ]
+        self.assertEqual(_starts(pages), [0, 2])
+
+    def test_bare_page_number_is_not_decisive(self):
+        # same document number on both pages outweighs a stray "Page 1" footer
+        pages = [
+            "ACME Trading Co.\nTAX INVOICE\nInvoice No: INV-7\nItem A\nPage 1",
+            "ACME Trading Co.\nTAX INVOICE\nInvoice No: INV-7\nItem B\nPage 1",
+        ]
+        self.assertEqual(_starts(pages), [0])
+        self.assertIsNone(page_features(pages[0])["page_total"])
+
+    def test_new_document_number_and_party_start_a_segment(self):
+        pages = [
+            "ACME Trading Co.\nTAX INVOICE\nInvoice No: INV-1\nSupplier: ACME Trading Co.\nItem A",
+            "Northwind Traders\nTAX INVOICE\nInvoice No: NW-99\nSupplier: Northwind Traders\nItem B",
+        ]
+        segments = detect_segments(pages)
+        self.assertEqual([s["start"] for s in segments], [0, 1])
+        self.assertIn("different document number", segments[1]["reasons"])
+
+    def test_blank_page_stays_with_its_document(self):
+        pages = [PO_PAGE_1, "", "Item C  1  3.00"]
+        self.assertEqual(detect_segments(pages), [{"start": 0, "end": 3, "reasons": ["first page"]}])
+
+    def test_generated_scan_matches_truth(self):
+        from benchmarks import corpus
+
+        pages, starts = corpus.scan_pages(40)
+        self.assertEqual(_starts(pages), starts)
+
+
+class TestProcessSegmentFailure(unittest.TestCase):
+    def test_failed_status_is_committed_and_logged_once(self):
+        calls = []
+        with mock.patch("alphax_ai_platform.alphax_ai.api.ingest._process_extracted", side_effect=RuntimeError("boom")), \
+                mock.patch.object(frappe.db, "rollback", side_effect=lambda *a, **k: calls.append("rollback")), \
+                mock.patch.object(frappe.db, "set_value", side_effect=lambda *a, **k: calls.append(("set_value",) + a[2:])), \
+                mock.patch.object(frappe.db, "commit", side_effect=lambda: calls.append("commit")), \
+                mock.patch.object(frappe, "log_error") as log_error:
+            out = segmentation._process_segment(
+                "AI-ING-1", "OCR-1", {"text": "x"}, {"duplicate_handling": "Off"}, "Purchase Order", 1, None
+            )
+        self.assertEqual(out["status"], "Failed")
+        self.assertEqual(calls, ["rollback", ("set_value", "status", "Failed"), "commit"])
+        self.assertEqual(log_error.call_count, 1)
@@ -0,0 +1,125 @@
+import json
+from unittest import mock
+
+import frappe
+import frappe.utils.background_jobs
+
+from alphax_ai_platform.alphax_ai.ingestion import splitter
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+ROWS = [{"customer": f"C{i}"} for i in range(10)]
+BP = {"target_doctype": "Customer", "split_chunk_size": 3, "schema_fields": []}
+
+
+class SplitTestCase(PatchedTestCase):
+    def setUp(self):
+        self.stored = {}
+        self.inserted = []
+        self.patch(splitter, "apply_mapping_template", return_value={})
+        self.patch(
+            splitter, "map_and_validate",
+            side_effect=lambda rows, *a: ([dict(r, doctype="Customer") for r in rows], [[] if r["customer"] != "C4" else ["Invalid"] for r in rows]),
+        )
+        self.patch(splitter, "_review_request", return_value="AR-0001")
+        self.patch(frappe.db, "get_value", create=True, side_effect=lambda dt, name, field: self.stored.get(field))
+        self.patch(frappe.db, "set_value", create=True, side_effect=self._set_value)
+        self.patch(frappe.db, "commit", create=True)
+
+    def _set_value(self, doctype, name, field, value=None, **kwargs):
+        self.stored.update(field if isinstance(field, dict) else {field: value})
+
+    def _insert_chunk(self, fail_at_row=None):
+        def insert(docs, failures):
+            if fail_at_row and any(row_no == fail_at_row for row_no, _d in docs):
+                raise RuntimeError("worker lost")
+            names = []
+            for row_no, d in docs:
+                if d["customer"] == "C7":
+                    failures[row_no] = "duplicate name"
+                    continue
+                self.inserted.append(d["customer"])
+                names.append(d["customer"])
+            return names
+        return insert
+
+
+class TestRunSplitResume(SplitTestCase):
+    def test_retry_resumes_after_the_last_committed_chunk(self):
+        # sheet rows 2..11; C4 (row 6) is invalid, C7 (row 9) fails to insert
+        with mock.patch.object(splitter, "_insert_chunk", side_effect=self._insert_chunk(fail_at_row=9)):
+            with self.assertRaises(RuntimeError):
+                splitter.run_split("ING-1", ROWS, BP, commit=True)
+        self.assertEqual(self.inserted, ["C0", "C1", "C2", "C3", "C5", "C6"])
+        checkpoint = json.loads(self.stored["split_checkpoint_json"])
+        self.assertEqual((checkpoint["last_row"], checkpoint["created"], checkpoint["first_document"]), (8, 6, "C0"))
+
+        with mock.patch.object(splitter, "_insert_chunk", side_effect=self._insert_chunk()):
+            summary = splitter.run_split("ING-1", ROWS, BP, commit=True)
+        self.assertEqual(self.inserted, ["C0", "C1", "C2", "C3", "C5", "C6", "C8", "C9"])
+        self.assertEqual((summary["created"], summary["invalid"], summary["first_document"]), (8, 2, "C0"))
+        self.assertEqual(summary["resumed_after_row"], 8)
+        self.assertEqual(self.stored["split_created"], 8)
+        self.assertIsNone(self.stored["split_checkpoint_json"])
+
+    def test_failures_before_the_checkpoint_reach_the_review_request(self):
+        self.stored["split_checkpoint_json"] = json.dumps({"last_row": 11, "created": 8, "first_document": "C0", "failures": {"9": "duplicate name"}})
+        with mock.patch.object(splitter, "_insert_chunk", side_effect=self._insert_chunk()):
+            summary = splitter.run_split("ING-1", ROWS, BP, commit=True)
+        self.assertEqual(self.inserted, [])
+        invalid = splitter._review_request.call_args[0][2]
+        self.assertEqual([(row_no, errs) for row_no, _d, errs in invalid], [(6, ["Invalid"]), (9, ["duplicate name"])])
+        self.assertEqual(summary["created"], 8)
+
+    def test_synchronous_split_ignores_checkpoints(self):
+        self.stored["split_checkpoint_json"] = json.dumps({"last_row": 11, "created": 8})
+        with mock.patch.object(splitter, "_insert_chunk", side_effect=self._insert_chunk()):
+            summary = splitter.run_split("ING-1", ROWS, BP)
+        self.assertEqual(summary["created"], 8)
+        self.assertEqual(len(self.inserted), 8)
+        self.assertIsNone(summary["resumed_after_row"])
+
+
+class TestResumeSplit(SplitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.running = False
+        self.enqueued = self.patch(frappe, "enqueue")
+        self.patch(frappe.utils.background_jobs, "is_job_enqueued", create=True, side_effect=lambda job_id: self.running)
+
+    def test_failed_job_is_resumed_with_its_arguments(self):
+        splitter.enqueue_split("ING-1", "OCR-1", "Customer Sheet", None, "progress-1")
+        self.assertEqual(self.enqueued.call_args.kwargs["job_id"], "alphax_ai_split::ING-1")
+        with mock.patch.object(splitter, "_insert_chunk", side_effect=self._insert_chunk(fail_at_row=9)):
+            with self.assertRaises(RuntimeError):
+                splitter.run_split("ING-1", ROWS, BP, commit=True)
+        self.stored["status"] = "Failed"
+
+        self.assertTrue(splitter.resume_split("ING-1"))
+        kwargs = self.enqueued.call_args.kwargs
+        self.assertEqual((kwargs["ocr_result"], kwargs["blueprint"], kwargs["review_note"]), ("OCR-1", "Customer Sheet", None))
+        self.assertEqual(self.stored["status"], "Queued")
+        checkpoint = json.loads(self.stored["split_checkpoint_json"])
+        self.assertEqual((checkpoint["last_row"], checkpoint["job"]["attempts"]), (8, 1))
+
+        with mock.patch.object(splitter, "_insert_chunk", side_effect=self._insert_chunk()):
+            summary = splitter.run_split("ING-1", ROWS, BP, commit=True)
+        self.assertEqual(summary["created"], 8)
+        self.assertEqual(self.inserted.count("C0"), 1)
+        self.assertFalse(splitter.resume_split("ING-1"))  # finished: checkpoint cleared
+
+    def test_running_job_and_attempt_limit(self):
+        splitter.enqueue_split("ING-1", "OCR-1", "Customer Sheet")
+        self.running = True
+        self.assertFalse(splitter.resume_split("ING-1"))
+        self.running = False
+        self.assertEqual([splitter.resume_split("ING-1") for _ in range(splitter.MAX_RESUMES + 1)], [True] * splitter.MAX_RESUMES + [False])
+        self.assertTrue(splitter.resume_split("ING-1", force=True))
+
+    def test_hourly_sweep_resumes_old_failed_and_queued_splits(self):
+        splitter.enqueue_split("ING-1", "OCR-1", "Customer Sheet")
+        with mock.patch.object(frappe, "get_all", return_value=["ING-1"]) as get_all:
+            self.assertEqual(splitter.resume_stalled_splits(), ["ING-1"])
+        filters = get_all.call_args.kwargs["filters"]
+        self.assertEqual(filters["status"], ["in", ["Failed", "Queued"]])
+        self.assertEqual(filters["modified"][0], "<")
+        self.assertEqual(self.enqueued.call_count, 2)
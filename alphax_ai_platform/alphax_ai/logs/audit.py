@@ -1,14 +1,27 @@
 import frappe
 
+from alphax_ai_platform.alphax_ai.policies.model_router import model_for
 
-def log_audit(user: str, agent_key: str, provider_meta: dict, trace: dict):
+
+def _routed_model(provider_meta: dict, trace: dict):
+    """The model the answering provider was asked for (after failover, not the primary's)."""
+    policy = trace.get("policy") or {}
+    answered_by = (provider_meta.get("route") or {}).get("provider")
+    if not answered_by:
+        return policy.get("model")
+    return model_for(answered_by, policy.get("model"), policy.get("models_by_provider"))
+
+
+def log_audit(user: str, agent_key: str, provider_meta: dict, trace: dict, latency_ms: float = None):
     try:
         frappe.get_doc({
             "doctype": "AI Audit Log",
             "user": user,
             "agent_key": agent_key,
             "provider": provider_meta.get("key"),
-            "model": (provider_meta.get("usage") or {}).get("model"),
+            # routed model when the provider does not report one (AI Usage Daily groups by it)
+            "model": (provider_meta.get("usage") or {}).get("model") or _routed_model(provider_meta, trace),
+            "latency_ms": latency_ms,
             "usage_json": frappe.as_json(provider_meta.get("usage")),
             "trace_json": frappe.as_json(trace),
         }).insert(ignore_permissions=True)
@@ -0,0 +1,270 @@
+"""Daily rollups, retention and archival for AI Audit Log.
+
+Every chat turn writes one AI Audit Log row with its full trace. Reporting
+and budget checks read AI Usage Daily instead: one row per day and
+(user, agent, provider, model) with calls, tokens, cost and latency
+percentiles. Providers that report no cost (all current clients) are priced
+from their AI Model's Input/Output $/1K Tokens at rollup time.
+
+  - `rollup_recent` (hourly) rebuilds today and yesterday from the raw rows
+    and backfills days that were never rolled up (oldest first, at most
+    BACKFILL_DAYS per run). Older days are final and never recomputed, so
+    they stay correct after their raw rows are gone.
+  - `apply_retention` (daily) removes raw rows older than Audit Retention
+    (Days), a day at a time: the day is rolled up first if needed, and with
+    Archive Audit Logs on its rows are appended to
+    private/alphax_ai/audit_archive/audit-YYYY-MM-DD.jsonl.gz before they are
+    deleted. Each chunk is archived, then deleted and committed, so an
+    interrupted run resumes where it stopped (at worst a chunk appears in
+    the archive twice).
+"""
+
+from __future__ import annotations
+
+import datetime
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+from frappe.utils import add_days, getdate, nowdate
+
+from alphax_ai_platform.alphax_ai.metrics.store import percentile
+from alphax_ai_platform.alphax_ai.storage.compression import unpack
+
+DEFAULT_RETENTION_DAYS = 90
+# today and yesterday are rebuilt hourly; retention never reaches them
+MIN_RETENTION_DAYS = 7
+BACKFILL_DAYS = 31
+RETENTION_DAYS_PER_RUN = 7
+ARCHIVE_CHUNK = 1000
+ARCHIVE_DIR = ("private", "alphax_ai", "audit_archive")
+ARCHIVE_FIELDS = ["name", "creation", "user", "agent_key", "provider", "model", "latency_ms", "usage_json", "trace_json"]
+GROUP_FIELDS = ("user", "agent_key", "provider", "model")
+MONTH_COST_CACHE_KEY = "alphax_ai:usage:month_cost"
+MONTH_COST_TTL_S = 300
+
+
+def _setting(fieldname: str) -> Any:
+    try:
+        return frappe.db.get_single_value("AI Platform Settings", fieldname, cache=True)
+    except Exception:
+        return None
+
+
+def retention_days() -> int:
+    """0 = keep raw rows forever."""
+    v = _setting("audit_retention_days")
+    days = DEFAULT_RETENTION_DAYS if v in (None, "") else int(v)
+    return 0 if days <= 0 else max(MIN_RETENTION_DAYS, days)
+
+
+def _day_bounds(day: datetime.date) -> Tuple[str, str]:
+    return f"{day} 00:00:00", f"{add_days(day, 1)} 00:00:00"
+
+
+def _usage(raw: Optional[str]) -> Dict[str, Any]:
+    try:
+        usage = json.loads(raw or "{}")
+    except ValueError:
+        return {}
+    return usage if isinstance(usage, dict) else {}
+
+
+# --- rollups ----------------------------------------------------------------
+
+
+def model_prices() -> Dict[Tuple[Optional[str], str], Tuple[float, float]]:
+    """($ in, $ out) per 1K tokens from AI Model, keyed by (provider, model name)
+    and by (None, model name) for rows whose provider has no AI Model of its own."""
+    prices: Dict[Tuple[Optional[str], str], Tuple[float, float]] = {}
+    for m in frappe.get_all("AI Model", fields=["provider", "model_name", "price_in_per_1k", "price_out_per_1k"]):
+        rate = (float(m.get("price_in_per_1k") or 0), float(m.get("price_out_per_1k") or 0))
+        if not m.get("model_name") or not any(rate):
+            continue
+        prices[(m.get("provider"), m["model_name"])] = rate
+        prices.setdefault((None, m["model_name"]), rate)
+    return prices
+
+
+def _rate(prices: Dict[Tuple[Optional[str], str], Tuple[float, float]], provider: Optional[str], model: Optional[str]):
+    if not model:
+        return None
+    rate = prices.get((provider, model)) or prices.get((None, model))
+    if rate:
+        return rate
+    # dated snapshots the provider reports, e.g. gpt-4o-mini-2024-07-18 for gpt-4o-mini
+    names = [name for p, name in prices if p is None and model.startswith(name + "-")]
+    return prices[(None, max(names, key=len))] if names else None
+
+
+def usage_cost(usage: Dict[str, Any], provider: Optional[str], model: Optional[str], prices=None) -> float:
+    """Cost the provider reported, else the tokens priced from `prices` (model_prices())."""
+    cost = float(usage.get("cost") or 0)
+    if cost or not prices:
+        return cost
+    rate = _rate(prices, provider, model)
+    if not rate:
+        return 0.0
+    prompt = int(usage.get("prompt_tokens") or 0)
+    completion = int(usage.get("completion_tokens") or 0)
+    if not prompt and not completion:
+        prompt = int(usage.get("total_tokens") or 0)
+    return (rate[0] * prompt + rate[1] * completion) / 1000.0
+
+
+def aggregate(rows: List[Dict[str, Any]], prices=None) -> List[Dict[str, Any]]:
+    """Audit rows -> one aggregate per (user, agent_key, provider, model).
+
+    `prices` (model_prices()) cost the rows whose provider reported none."""
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for r in rows:
+        key = tuple(r.get(f) or None for f in GROUP_FIELDS)
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = dict(zip(GROUP_FIELDS, key), calls=0, prompt_tokens=0, completion_tokens=0,
+                                   total_tokens=0, cost=0.0, _latencies=[])
+        usage = _usage(r.get("usage_json"))
+        g["calls"] += 1
+        for f in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            g[f] += int(usage.get(f) or 0)
+        g["cost"] += usage_cost(usage, r.get("provider"), r.get("model"), prices)
+        if r.get("latency_ms") is not None:
+            g["_latencies"].append(float(r["latency_ms"]))
+    out = []
+    for g in groups.values():
+        latencies = sorted(g.pop("_latencies"))
+        g["cost"] = round(g["cost"], 6)
+        if latencies:
+            g.update(
+                latency_avg_ms=round(sum(latencies) / len(latencies), 3),
+                latency_p50_ms=percentile(latencies, 0.5),
+                latency_p95_ms=percentile(latencies, 0.95),
+                latency_p99_ms=percentile(latencies, 0.99),
+                latency_max_ms=latencies[-1],
+            )
+        out.append(g)
+    return out
+
+
+def rollup_day(day) -> int:
+    """Rebuild the AI Usage Daily rows of one day from the raw audit rows; returns groups written."""
+    day = getdate(day)
+    start, end = _day_bounds(day)
+    rows = frappe.get_all(
+        "AI Audit Log",
+        filters=[["creation", ">=", start], ["creation", "<", end]],
+        fields=list(GROUP_FIELDS) + ["latency_ms", "usage_json"],
+        limit_page_length=0,
+    )
+    frappe.db.delete("AI Usage Daily", {"usage_date": day})
+    groups = aggregate(rows, model_prices())
+    for g in groups:
+        frappe.get_doc(dict(g, doctype="AI Usage Daily", usage_date=day)).insert(ignore_permissions=True)
+    return len(groups)
+
+
+def _rolled_up(day) -> bool:
+    return bool(frappe.db.exists("AI Usage Daily", {"usage_date": getdate(day)}))
+
+
+def _oldest_audit_day() -> Optional[datetime.date]:
+    rows = frappe.get_all("AI Audit Log", fields=["creation"], order_by="creation asc", limit_page_length=1)
+    return getdate(rows[0].creation) if rows else None
+
+
+def rollup_recent() -> Dict[str, Any]:
+    """Scheduler (hourly): refresh today and yesterday, backfill never-rolled days."""
+    today = getdate(nowdate())
+    done = []
+    oldest = _oldest_audit_day()
+    if oldest:
+        day = oldest
+        while day < add_days(today, -1) and len(done) < BACKFILL_DAYS:
+            # days without audit rows stay un-rolled and cost one indexed query per run
+            if not _rolled_up(day) and rollup_day(day):
+                frappe.db.commit()
+                done.append(str(day))
+            day = add_days(day, 1)
+    for day in (add_days(today, -1), today):
+        rollup_day(day)
+        done.append(str(day))
+    frappe.db.commit()
+    frappe.cache().delete_value(MONTH_COST_CACHE_KEY)
+    return {"days": done}
+
+
+# --- retention --------------------------------------------------------------
+
+
+def archive_path(day) -> str:
+    return frappe.get_site_path(*ARCHIVE_DIR, f"audit-{getdate(day)}.jsonl.gz")
+
+
+def _archive(day, rows: List[Dict[str, Any]]) -> None:
+    path = archive_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # appending adds a gzip member; gzip.open reads all members as one stream
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for r in rows:
+            r["trace_json"] = unpack(r.get("trace_json"))
+            f.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+
+
+def purge_day(day, archive: bool = True) -> int:
+    """Archive (optionally) and delete one day's raw audit rows; returns rows removed."""
+    day = getdate(day)
+    if not _rolled_up(day):
+        rollup_day(day)
+        frappe.db.commit()
+    start, end = _day_bounds(day)
+    removed = 0
+    while True:
+        rows = frappe.get_all(
+            "AI Audit Log",
+            filters=[["creation", ">=", start], ["creation", "<", end]],
+            fields=ARCHIVE_FIELDS,
+            order_by="creation asc",
+            limit_page_length=ARCHIVE_CHUNK,
+        )
+        if not rows:
+            return removed
+        if archive:
+            _archive(day, rows)
+        frappe.db.delete("AI Audit Log", {"name": ["in", [r.name for r in rows]]})
+        frappe.db.commit()
+        removed += len(rows)
+
+
+def apply_retention() -> Dict[str, Any]:
+    """Scheduler (daily): archive and delete raw rows past Audit Retention (Days)."""
+    days = retention_days()
+    if not days:
+        return {"removed": 0, "days": []}
+    cutoff = add_days(getdate(nowdate()), -days)
+    archive = _setting("archive_audit_logs") in (None, "", 1, "1")
+    out: Dict[str, Any] = {"removed": 0, "days": []}
+    for _ in range(RETENTION_DAYS_PER_RUN):
+        oldest = _oldest_audit_day()
+        if not oldest or oldest >= cutoff:
+            break
+        out["removed"] += purge_day(oldest, archive)
+        out["days"].append(str(oldest))
+    return out
+
+
+# --- readers ----------------------------------------------------------------
+
+
+def month_to_date_cost() -> float:
+    """Provider cost this month from the rollups (today as of the last hourly run); cached briefly."""
+    cache = frappe.cache()
+    cached = cache.get_value(MONTH_COST_CACHE_KEY)
+    if cached is not None:
+        return float(cached)
+    first = getdate(nowdate()).replace(day=1)
+    rows = frappe.get_all("AI Usage Daily", filters={"usage_date": [">=", first]}, fields=["sum(cost) as cost"])
+    cost = float((rows[0].cost if rows else 0) or 0)
+    cache.set_value(MONTH_COST_CACHE_KEY, cost, expires_in_sec=MONTH_COST_TTL_S)
+    return cost
@@ -0,0 +1,25 @@
+import unittest
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.logs.audit import log_audit
+
+POLICY = {"model": "gpt-4o-mini", "models_by_provider": {"OpenAI": "gpt-4o-mini", "Anthropic": "claude-haiku"}}
+
+
+class TestLogAudit(unittest.TestCase):
+    def logged_model(self, provider_meta):
+        with mock.patch.object(frappe, "get_doc") as get_doc:
+            log_audit("a@example.com", "erp", provider_meta, {"provider": provider_meta, "policy": POLICY})
+        return get_doc.call_args[0][0]["model"]
+
+    def test_failover_records_the_answering_providers_model(self):
+        meta = {"key": "Anthropic", "route": {"provider": "Anthropic", "tried": ["OpenAI", "Anthropic"], "failovers": 1}}
+        self.assertEqual(self.logged_model(meta), "claude-haiku")
+
+    def test_primary_and_reported_models(self):
+        self.assertEqual(self.logged_model({"key": "OpenAI", "route": {"provider": "OpenAI"}}), "gpt-4o-mini")
+        self.assertEqual(self.logged_model({"key": "OpenAI"}), "gpt-4o-mini")
+        reported = {"key": "Anthropic", "route": {"provider": "Anthropic"}, "usage": {"model": "claude-haiku-20250101"}}
+        self.assertEqual(self.logged_model(reported), "claude-haiku-20250101")
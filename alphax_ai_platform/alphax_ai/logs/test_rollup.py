@@ -0,0 +1,82 @@
+import json
+import unittest
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.logs import rollup
+from alphax_ai_platform.alphax_ai.logs.rollup import aggregate, model_prices, usage_cost
+
+MODELS = [
+    {"provider": "OpenAI", "model_name": "gpt-4o-mini", "price_in_per_1k": 0.15, "price_out_per_1k": 0.6},
+    {"provider": "OpenAI", "model_name": "gpt-4o", "price_in_per_1k": 2.5, "price_out_per_1k": 10},
+    {"provider": "Mock", "model_name": "mock-model", "price_in_per_1k": 0, "price_out_per_1k": 0},
+]
+
+
+def _row(provider, model, usage, latency_ms=100, user="a@example.com"):
+    return {"user": user, "agent_key": "erp", "provider": provider, "model": model,
+            "latency_ms": latency_ms, "usage_json": json.dumps(usage)}
+
+
+class TestCost(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(frappe, "get_all", return_value=MODELS):
+            self.prices = model_prices()
+
+    def test_unpriced_models_are_left_out(self):
+        self.assertEqual(self.prices[("OpenAI", "gpt-4o")], (2.5, 10.0))
+        self.assertNotIn(("Mock", "mock-model"), self.prices)
+
+    def test_reported_cost_wins(self):
+        usage = {"prompt_tokens": 1000, "completion_tokens": 1000, "cost": 0.42}
+        self.assertEqual(usage_cost(usage, "OpenAI", "gpt-4o", self.prices), 0.42)
+
+    def test_zero_cost_is_priced_from_ai_model(self):
+        usage = {"prompt_tokens": 2000, "completion_tokens": 500, "cost": 0}
+        self.assertAlmostEqual(usage_cost(usage, "OpenAI", "gpt-4o", self.prices), 2 * 2.5 + 0.5 * 10)
+
+    def test_model_name_matching(self):
+        usage = {"prompt_tokens": 1000, "completion_tokens": 0}
+        # another AI Provider without its own AI Model row, and a dated snapshot name
+        self.assertAlmostEqual(usage_cost(usage, "OpenAI Backup", "gpt-4o-mini", self.prices), 0.15)
+        self.assertAlmostEqual(usage_cost(usage, "OpenAI", "gpt-4o-mini-2024-07-18", self.prices), 0.15)
+        self.assertAlmostEqual(usage_cost(usage, "OpenAI", "gpt-4o-2024-08-06", self.prices), 2.5)
+        self.assertEqual(usage_cost(usage, "OpenAI", "o3", self.prices), 0.0)
+        self.assertEqual(usage_cost(usage, "OpenAI", None, self.prices), 0.0)
+        self.assertEqual(usage_cost(usage, "OpenAI", "gpt-4o", None), 0.0)
+
+    def test_total_tokens_only(self):
+        self.assertAlmostEqual(usage_cost({"total_tokens": 4000}, "OpenAI", "gpt-4o-mini", self.prices), 0.6)
+
+    def test_aggregate_prices_each_row(self):
+        rows = [
+            _row("OpenAI", "gpt-4o-mini", {"prompt_tokens": 1000, "completion_tokens": 1000, "total_tokens": 2000, "cost": 0}, 100),
+            _row("OpenAI", "gpt-4o-mini", {"prompt_tokens": 3000, "completion_tokens": 0, "total_tokens": 3000}, 300),
+            _row("Mock", "mock-model", {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}),
+            _row("OpenAI", "gpt-4o-mini", "not json", 200),
+        ]
+        groups = {g["provider"]: g for g in aggregate(rows, self.prices)}
+        openai = groups["OpenAI"]
+        self.assertEqual((openai["calls"], openai["prompt_tokens"], openai["completion_tokens"]), (3, 4000, 1000))
+        self.assertEqual(openai["cost"], round(0.15 + 0.6 + 3 * 0.15, 6))
+        self.assertEqual(openai["latency_max_ms"], 300.0)
+        self.assertEqual(groups["Mock"]["cost"], 0.0)
+
+    def test_rollup_day_uses_ai_model_prices(self):
+        audit = [_row("OpenAI", "gpt-4o", {"prompt_tokens": 1000, "completion_tokens": 100})]
+        inserted = []
+
+        def get_all(doctype, **kwargs):
+            return MODELS if doctype == "AI Model" else audit
+
+        def get_doc(values):
+            inserted.append(values)
+            return mock.Mock()
+
+        with mock.patch.object(frappe, "get_all", side_effect=get_all), mock.patch.object(
+            frappe, "get_doc", side_effect=get_doc
+        ), mock.patch.object(frappe.db, "delete", create=True):
+            self.assertEqual(rollup.rollup_day("2026-10-01"), 1)
+        self.assertEqual(inserted[0]["doctype"], "AI Usage Daily")
+        self.assertEqual(inserted[0]["cost"], 3.5)
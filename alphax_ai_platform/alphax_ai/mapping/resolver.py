@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import frappe
+
+
+# Which master fields are indexed per doctype, and which rows are skipped.
+MASTER_SOURCES: Dict[str, Dict[str, Any]] = {
+    "Supplier": {"fields": ["name", "supplier_name"], "filters": {"disabled": 0}},
+    "Item": {"fields": ["name", "item_name"], "filters": {"disabled": 0}, "extra": ["stock_uom"]},
+    "UOM": {"fields": ["name"], "filters": {"enabled": 1}},
+}
+
+REFRESH_SECONDS = 30
+FULL_REBUILD_SECONDS = 3600
+CACHE_SIZE = 10000
+MAX_PROBE_TRIGRAMS = 12
+# Posting entries scanned per lookup; rarest trigrams are probed first so
+# common ones ("ste", " co") rarely need to be read at all.
+MAX_SCAN = 20000
+MIN_PROBE_TRIGRAMS = 2
+# A word-intersection hit at least this good skips the trigram probe.
+WORD_PATH_SCORE = 0.85
+MAX_CANDIDATES = 50
+DEFAULT_MIN_SCORE = 0.6
+VERSION_KEY = "alphax_ai:masters:version"
+
+_STOPWORDS = {
+    "co", "company", "est", "establishment", "llc", "ltd", "limited", "inc", "corp",
+    "corporation", "the", "and", "wll", "plc", "gmbh", "fze", "fzco",
+}
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_WS_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_INDEXES: Dict[Tuple[str, str], "MasterIndex"] = {}
+
+
+def normalize(value: Any) -> str:
+    s = unicodedata.normalize("NFKC", str(value or "")).lower()
+    s = _PUNCT_RE.sub(" ", s)
+    words = [w for w in _WS_RE.split(s) if w and w not in _STOPWORDS]
+    return " ".join(words)
+
+
+def trigrams(s: str) -> List[str]:
+    padded = f"  {s} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class MasterIndex:
+    """Trigram inverted index over one master doctype.
+
+    Entries are (normalized key, record name); a record contributes one entry
+    per indexed field (e.g. item code and item name). Lookups first try the
+    intersection of the rarest exact words (cheap set ops, typical for clean
+    descriptions), then fall back to probing the rarest trigrams; candidates
+    are scored with the trigram Dice coefficient.
+    """
+
+    def __init__(self, doctype: str):
+        self.doctype = doctype
+        self._reset()
+        self.last_refresh = 0.0
+        self.last_full = 0.0
+        self.version = None
+
+    def _reset(self) -> None:
+        self.keys: List[str] = []
+        self.names: List[Optional[str]] = []
+        self.key_trigrams: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.words: Dict[str, Set[int]] = {}
+        self.exact: Dict[str, str] = {}
+        self.by_name: Dict[str, List[int]] = {}
+        self.extra: Dict[str, Dict[str, Any]] = {}
+        self.hits: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+        self.last_modified = None
+
+    # --- build / refresh ---------------------------------------------------
+
+    def _remove(self, name: str) -> None:
+        for eid in self.by_name.pop(name, []):
+            self.names[eid] = None  # tombstone; postings are compacted on full rebuild
+            if self.exact.get(self.keys[eid]) == name:
+                self.exact.pop(self.keys[eid], None)
+        self.extra.pop(name, None)
+
+    def _add(self, row: Dict[str, Any], source: Dict[str, Any]) -> None:
+        name = row["name"]
+        self._remove(name)
+        for field in source["fields"]:
+            key = normalize(row.get(field))
+            if not key:
+                continue
+            eid = len(self.keys)
+            grams = trigrams(key)
+            self.keys.append(key)
+            self.names.append(name)
+            self.key_trigrams.append(len(grams))
+            self.by_name.setdefault(name, []).append(eid)
+            self.exact.setdefault(key, name)
+            for g in grams:
+                self.postings.setdefault(g, []).append(eid)
+            for w in set(key.split()):
+                self.words.setdefault(w, set()).add(eid)
+        if source.get("extra"):
+            self.extra[name] = {f: row.get(f) for f in source["extra"]}
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        version = _current_version()
+        full = force or version != self.version or now - self.last_full > FULL_REBUILD_SECONDS
+        if not full and now - self.last_refresh < REFRESH_SECONDS:
+            return
+
+        source = MASTER_SOURCES[self.doctype]
+        filters = dict(source.get("filters") or {})
+        if full:
+            self._reset()
+        elif self.last_modified:
+            # incremental: only rows touched since the last sync (disabled rows are dropped below)
+            filters = {"modified": [">", self.last_modified]}
+
+        fields = list(dict.fromkeys(["name", "modified"] + source["fields"] + source.get("extra", []) + list((source.get("filters") or {}).keys())))
+        rows = frappe.get_all(self.doctype, filters=filters, fields=fields, order_by="modified asc")
+        for row in rows:
+            if any(row.get(k) != v for k, v in (source.get("filters") or {}).items()):
+                self._remove(row["name"])
+                continue
+            self._add(row, source)
+            self.last_modified = row.get("modified") or self.last_modified
+
+        if rows or full:
+            self.hits.clear()
+        self.last_refresh = now
+        if full:
+            self.last_full = now
+            self.version = version
+
+    # --- lookup ------------------------------------------------------------
+
+    def lookup(self, query: Any) -> Optional[Dict[str, Any]]:
+        q = normalize(query)
+        if not q:
+            return None
+        if q in self.hits:
+            self.hits.move_to_end(q)
+            return self.hits[q]
+
+        result = self._lookup(q)
+        self.hits[q] = result
+        if len(self.hits) > CACHE_SIZE:
+            self.hits.popitem(last=False)
+        return result
+
+    def _lookup(self, q: str) -> Optional[Dict[str, Any]]:
+        name = self.exact.get(q)
+        if name:
+            return {"name": name, "score": 1.0, "matched": q}
+
+        qset = set(trigrams(q))
+
+        best = self._best(qset, self._word_candidates(q))
+        if best and best["score"] >= WORD_PATH_SCORE:
+            return best
+
+        probe = sorted((g for g in qset if g in self.postings), key=lambda g: len(self.postings[g]))[:MAX_PROBE_TRIGRAMS]
+        if not probe:
+            return best
+
+        counts: Counter = Counter()
+        scanned = 0
+        for i, g in enumerate(probe):
+            posting = self.postings[g]
+            if i >= MIN_PROBE_TRIGRAMS and scanned + len(posting) > MAX_SCAN:
+                break
+            counts.update(posting)
+            scanned += len(posting)
+
+        fuzzy = self._best(qset, (eid for eid, _ in counts.most_common(MAX_CANDIDATES)))
+        if fuzzy and (best is None or fuzzy["score"] > best["score"]):
+            return fuzzy
+        return best
+
+    def _word_candidates(self, q: str) -> Iterable[int]:
+        sets = sorted((self.words[w] for w in set(q.split()) if w in self.words), key=len)
+        if not sets:
+            return ()
+        cands = sets[0]
+        for other in sets[1:]:
+            narrowed = cands & other
+            if not narrowed:
+                break
+            cands = narrowed
+            if len(cands) <= MAX_CANDIDATES:
+                break
+        if len(cands) > MAX_CANDIDATES * 4:
+            return ()
+        return cands
+
+    def _best(self, qset: Set[str], candidates: Iterable[int]) -> Optional[Dict[str, Any]]:
+        best = None
+        for eid in candidates:
+            name = self.names[eid]
+            if name is None:
+                continue
+            key = self.keys[eid]
+            overlap = len(qset.intersection(trigrams(key)))
+            score = 2.0 * overlap / (len(qset) + self.key_trigrams[eid])
+            if best is None or score > best["score"]:
+                best = {"name": name, "score": round(score, 4), "matched": key}
+        return best
+
+
+def _current_version() -> Optional[str]:
+    try:
+        cache = frappe.cache()
+        v = cache.pipeline().get(cache.make_key(VERSION_KEY)).execute()[0]
+        return v.decode() if isinstance(v, bytes) else v
+    except Exception:
+        return None
+
+
+def get_index(doctype: str) -> MasterIndex:
+    if doctype not in MASTER_SOURCES:
+        frappe.throw(f"Master resolution is not configured for {doctype}")
+    key = (getattr(frappe.local, "site", None) or "", doctype)
+    with _lock:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = MasterIndex(doctype)
+        index.refresh()
+    return index
+
+
+def resolve_many(doctype: str, queries: Iterable[Any], min_score: float = DEFAULT_MIN_SCORE) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Batch fuzzy lookup; returns {query: {"name", "score", "matched"} or None}."""
+    index = get_index(doctype)
+    out: Dict[str, Optional[Dict[str, Any]]] = {}
+    for q in queries:
+        q = str(q or "").strip()
+        if not q or q in out:
+            continue
+        hit = index.lookup(q)
+        out[q] = hit if hit and hit["score"] >= min_score else None
+    return out
+
+
+def invalidate(doc=None, method=None) -> None:
+    """doc_events hook: a master was renamed/deleted; force full rebuilds in all workers."""
+    try:
+        cache = frappe.cache()
+        cache.pipeline().incr(cache.make_key(VERSION_KEY)).execute()
+    except Exception:
+        pass
+
+
+def _threshold(schema_fields: Optional[List[Dict[str, Any]]], field_key: str) -> float:
+    for row in schema_fields or []:
+        if row.get("field_key") == field_key and row.get("confidence_threshold"):
+            return float(row.get("confidence_threshold"))
+    return DEFAULT_MIN_SCORE
+
+
+def resolve_purchase_order(parsed: Dict[str, Any], schema_fields: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Map raw supplier text / item descriptions / UOMs of a parsed PO onto masters.
+
+    Matches below the schema field's confidence_threshold are left unresolved
+    (raw text kept) so validation still routes them to review. Resolution
+    details are recorded under parsed["_resolution"].
+    """
+    resolution: Dict[str, Any] = {}
+
+    supplier_raw = parsed.get("supplier")
+    if supplier_raw:
+        hit = resolve_many("Supplier", [supplier_raw], _threshold(schema_fields, "supplier")).get(str(supplier_raw).strip())
+        resolution["supplier"] = {"raw": supplier_raw, "match": hit}
+        if hit:
+            parsed["supplier"] = hit["name"]
+
+    items = [it for it in (parsed.get("items") or []) if isinstance(it, dict)]
+    if items:
+        item_hits = resolve_many(
+            "Item",
+            [it.get("item_code") or it.get("description") for it in items],
+            _threshold(schema_fields, "item_code"),
+        )
+        uom_hits = resolve_many("UOM", [it.get("uom") for it in items if it.get("uom")], DEFAULT_MIN_SCORE)
+        item_index = get_index("Item")
+        unresolved = 0
+        for it in items:
+            raw = str(it.get("item_code") or it.get("description") or "").strip()
+            hit = item_hits.get(raw)
+            if hit:
+                it["item_code"] = hit["name"]
+                it["item_match_score"] = hit["score"]
+                if not it.get("uom"):
+                    it["uom"] = (item_index.extra.get(hit["name"]) or {}).get("stock_uom")
+            else:
+                unresolved += 1
+            uom_hit = uom_hits.get(str(it.get("uom") or "").strip())
+            if uom_hit:
+                it["uom"] = uom_hit["name"]
+        resolution["items"] = {"total": len(items), "unresolved": unresolved}
+
+    parsed["_resolution"] = resolution
+    return parsed
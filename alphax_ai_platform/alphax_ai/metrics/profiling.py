@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import frappe
+
+
+PROFILE_HEADER = "X-AlphaX-Profile"
+TOP_N = 40
+
+
+def profiling_requested() -> bool:
+    """Per-request opt-in: the setting must allow it, the caller must send the
+    header and be a System Manager (profiles expose code paths and timings)."""
+    try:
+        if not frappe.db.get_single_value("AI Platform Settings", "enable_profiling", cache=True):
+            return False
+    except Exception:
+        return False
+    header = frappe.get_request_header(PROFILE_HEADER) if getattr(frappe.local, "request", None) else None
+    if str(header or "").strip().lower() not in ("1", "true", "yes"):
+        return False
+    return "System Manager" in frappe.get_roles()
+
+
+@contextmanager
+def maybe_profile(enabled: bool, out: Dict[str, Any], sort_by: str = "cumulative") -> Iterator[None]:
+    """Run the block under cProfile when `enabled`, writing the top functions to out["profile"]."""
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out["profile"] = format_stats(profiler, sort_by=sort_by)
+
+
+def format_stats(profiler: cProfile.Profile, sort_by: str = "cumulative", limit: Optional[int] = None) -> str:
+    buf = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buf)
+    stats.strip_dirs().sort_stats(sort_by).print_stats(limit or TOP_N)
+    return buf.getvalue()
@@ -0,0 +1,67 @@
+"""Per-request database query counts for load tests.
+
+With **Report Query Counts** enabled in AI Platform Settings, a request that
+sends `X-AlphaX-Query-Count: 1` has its `frappe.db.sql` calls counted (the
+wrapper is set on that request's connection only) and gets the totals back as
+response headers:
+
+    X-AlphaX-Queries: <number of queries>
+    X-AlphaX-Query-Ms: <time spent in them>
+
+Token-authenticated requests resolve their user after before_request, so the
+System Manager check is made in after_request; other callers get no headers.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional
+
+import frappe
+
+REQUEST_HEADER = "X-AlphaX-Query-Count"
+COUNT_HEADER = "X-AlphaX-Queries"
+MS_HEADER = "X-AlphaX-Query-Ms"
+
+
+def counting_requested() -> bool:
+    try:
+        if not frappe.db.get_single_value("AI Platform Settings", "report_query_counts", cache=True):
+            return False
+    except Exception:
+        return False
+    header = frappe.get_request_header(REQUEST_HEADER) if getattr(frappe.local, "request", None) else None
+    return str(header or "").strip().lower() in ("1", "true", "yes")
+
+
+def before_request() -> None:
+    """hooks.py before_request: start counting when asked to."""
+    if not counting_requested():
+        return
+    db = frappe.db
+    sql = db.sql
+    state: Dict[str, Any] = {"queries": 0, "seconds": 0.0}
+
+    def counted_sql(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return sql(*args, **kwargs)
+        finally:
+            state["queries"] += 1
+            state["seconds"] += time.perf_counter() - start
+
+    db.sql = counted_sql
+    frappe.local.alphax_ai_query_count = state
+
+
+def after_request(response=None, request=None) -> Optional[Dict[str, Any]]:
+    """hooks.py after_request: report the counts on the response."""
+    state = getattr(frappe.local, "alphax_ai_query_count", None)
+    if not state:
+        return None
+    frappe.local.alphax_ai_query_count = None
+    if response is None or "System Manager" not in frappe.get_roles():
+        return None
+    response.headers[COUNT_HEADER] = str(state["queries"])
+    response.headers[MS_HEADER] = f"{state['seconds'] * 1000.0:.1f}"
+    return state
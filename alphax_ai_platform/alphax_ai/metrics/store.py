@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+import frappe
+
+
+KEY_PREFIX = "alphax_ai:metrics"
+# Rolling window size per (series, stage, label) sample list.
+MAX_SAMPLES = 512
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _key(*parts: str) -> str:
+    return ":".join([KEY_PREFIX] + [str(p) for p in parts])
+
+
+def _label_keys(labels: Optional[Dict[str, Any]]) -> List[str]:
+    out = ["all"]
+    for k, v in (labels or {}).items():
+        out.append(f"{k}={v if v not in (None, '') else 'none'}")
+    return out
+
+
+def record(
+    series: str,
+    timings_ms: Dict[str, float],
+    labels: Optional[Dict[str, Any]] = None,
+    counters: Optional[Dict[str, float]] = None,
+) -> None:
+    """Push one observation per stage into rolling windows (best-effort).
+
+    Every stage is recorded once under the `all` label and once per label
+    (e.g. blueprint, ocr_engine). Everything goes through a single Redis
+    pipeline so the hot path pays one round trip.
+    """
+    if not timings_ms and not counters:
+        return
+    try:
+        cache = frappe.cache()
+        pipe = cache.pipeline()
+        index_key = cache.make_key(_key(series, "index"))
+        for stage, value in (timings_ms or {}).items():
+            for label in _label_keys(labels):
+                member = f"{stage}|{label}"
+                list_key = cache.make_key(_key(series, "samples", member))
+                pipe.lpush(list_key, round(float(value), 3))
+                pipe.ltrim(list_key, 0, MAX_SAMPLES - 1)
+                pipe.sadd(index_key, member)
+        counters_key = cache.make_key(_key(series, "counters"))
+        pipe.hincrbyfloat(counters_key, "observations", 1)
+        for name, value in (counters or {}).items():
+            pipe.hincrbyfloat(counters_key, name, float(value or 0))
+        pipe.execute()
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Metrics Record Failed")
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return None
+    idx = max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def summarize_values(values: Iterable[float]) -> Dict[str, Any]:
+    vals = sorted(float(v) for v in values)
+    out: Dict[str, Any] = {"count": len(vals), "sum": round(sum(vals), 3)}
+    for q in QUANTILES:
+        p = percentile(vals, q)
+        out[f"p{int(q * 100)}"] = round(p, 3) if p is not None else None
+    return out
+
+
+def _members(cache, series: str) -> List[str]:
+    # Raw redis calls go through a pipeline: RedisWrapper's own set/hash
+    # helpers re-prefix keys (and pickle hash values).
+    raw = cache.pipeline().smembers(cache.make_key(_key(series, "index"))).execute()[0]
+    return sorted((m.decode() if isinstance(m, bytes) else m) for m in (raw or []))
+
+
+def summarize(series: str) -> Dict[str, Any]:
+    """Return {"stages": {stage: {label: {count, sum, p50, p95, p99}}}, "counters": {...}}."""
+    cache = frappe.cache()
+    members = _members(cache, series)
+
+    pipe = cache.pipeline()
+    for member in members:
+        pipe.lrange(cache.make_key(_key(series, "samples", member)), 0, -1)
+    pipe.hgetall(cache.make_key(_key(series, "counters")))
+    results = pipe.execute()
+    windows, raw_counters = results[:-1], results[-1]
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    for member, raw in zip(members, windows):
+        stage, _, label = member.partition("|")
+        stages.setdefault(stage, {})[label] = summarize_values(raw or [])
+
+    counters = {}
+    for k, v in (raw_counters or {}).items():
+        counters[k.decode() if isinstance(k, bytes) else k] = float(v)
+
+    return {"series": series, "window": MAX_SAMPLES, "stages": stages, "counters": counters}
+
+
+def reset(series: str) -> None:
+    cache = frappe.cache()
+    keys = [cache.make_key(_key(series, "samples", m)) for m in _members(cache, series)]
+    keys += [cache.make_key(_key(series, "index")), cache.make_key(_key(series, "counters"))]
+    cache.pipeline().delete(*keys).execute()
+
+
+def _escape_label(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def to_prometheus(series_list: Iterable[str]) -> str:
+    """Render rolling-window summaries in Prometheus text exposition format.
+
+    Quantiles, `_sum` and `_count` describe the current rolling window, not
+    process lifetime; the `_total` counters are cumulative.
+    """
+    lines: List[str] = []
+    for series in series_list:
+        data = summarize(series)
+        metric = f"alphax_ai_{series}_stage_ms"
+        lines.append(f"# HELP {metric} Stage latency in milliseconds over the last {MAX_SAMPLES} observations.")
+        lines.append(f"# TYPE {metric} summary")
+        for stage, by_label in sorted(data["stages"].items()):
+            for label, s in sorted(by_label.items()):
+                base = [f'stage="{_escape_label(stage)}"']
+                if label != "all":
+                    lk, _, lv = label.partition("=")
+                    base.append(f'{lk}="{_escape_label(lv)}"')
+                else:
+                    base.append('scope="all"')
+                for q in QUANTILES:
+                    val = s.get(f"p{int(q * 100)}")
+                    if val is None:
+                        continue
+                    qlabel = f'quantile="{q}"'
+                    lines.append(f'{metric}{{{",".join(base + [qlabel])}}} {val}')
+                lines.append(f'{metric}_sum{{{",".join(base)}}} {s["sum"]}')
+                lines.append(f'{metric}_count{{{",".join(base)}}} {s["count"]}')
+
+        for name, value in sorted(data["counters"].items()):
+            cmetric = f"alphax_ai_{series}_{name}_total"
+            lines.append(f"# TYPE {cmetric} counter")
+            lines.append(f"{cmetric} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+
+class StageTimer:
+    """Lightweight hot-path timer.
+
+    Records monotonic (perf_counter) spans for named stages plus free-form
+    counters (bytes, pages, rows...). Stages with the same name accumulate.
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            duration = (end - start) * 1000.0
+            self.stages[name] = self.stages.get(name, 0.0) + duration
+            self.spans.append({
+                "name": name,
+                "start_ms": round((start - self._origin) * 1000.0, 3),
+                "duration_ms": round(duration, 3),
+            })
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + (value or 0)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._origin) * 1000.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round(self.elapsed_ms(), 3),
+            "stages_ms": {k: round(v, 3) for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+            "spans": list(self.spans),
+        }
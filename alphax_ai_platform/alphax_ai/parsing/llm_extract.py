@@ -0,0 +1,378 @@
+"""Schema-first extraction with an LLM, several documents per provider call.
+
+Target doctypes without a heuristic parser (see parsers.py) are extracted
+from the blueprint's schema fields instead of falling back to a source
+summary:
+
+  - the schema becomes one compact JSON template line (header keys, child
+    rows under their table_child keyed by table_row_field, "!" = required);
+  - documents are packed into one prompt while prompt plus expected reply
+    fit the context window of the model short prompts are routed to (AI
+    Model metadata, policies.model_router), up to Max Documents per Call;
+  - the reply, one JSON object keyed by document id, is split back into one
+    parser-style result per document, which the usual normalize / map /
+    validate steps then handle like a heuristic parser's output.
+
+Off unless Enable LLM Extraction is set. Web requests (a synchronous
+ingest_file) call the provider at interactive priority, so they wait at most
+the interactive limits; jobs (segment batches, intake) use background
+priority.
+
+Documents missing from a batch reply (or malformed) are retried one at a
+time. A ContextLengthError escalates to a larger model and, when there is
+none, halves the batch. Provider failures leave the affected documents
+unparsed (the caller falls back to the source summary and review).
+
+`mock_responder` answers these prompts from "Label: value" lines, so
+`MockProvider(responder=mock_responder)` runs the whole path offline.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.policies.model_router import (
+    ESTIMATE_MARGIN,
+    REPLY_HEADROOM,
+    escalate,
+    route_models,
+    short_prompt_window,
+)
+from alphax_ai_platform.alphax_ai.prompts.renderer import EXTRACTION_SYSTEM_PROMPT, render_extraction_prompt
+from alphax_ai_platform.alphax_ai.providers.base import ContextLengthError, ProviderError
+
+# target doctypes handled by parsers.py
+HEURISTIC_DOCTYPES = ("Purchase Order", "Employee")
+DEFAULT_WINDOW = 8192  # no AI Model rows with a Context Window
+DEFAULT_MAX_DOCS = 8
+MAX_DOC_CHARS = 24000
+MAX_TABLE_ROWS = 200
+DOC_OVERHEAD_TOKENS = 8  # "<<<d3" / ">>>" and the id in the reply
+FIELD_REPLY_TOKENS = 12  # one "key":"value", in the reply
+MAX_ROWS_GUESS = 100
+
+_TYPES = {"Date": "date", "Float": "number", "Int": "integer"}
+_ROW_LINE_RE = re.compile(r"\d[^\n]*\s[^\n]*\d")
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.I)
+_DOC_RE = re.compile(r"<<<(\S+)\n(.*?)\n>>>", re.S)
+
+
+def _tokens(text: str) -> int:
+    return int(math.ceil(len(text or "") / 4.0))
+
+
+def _blank(v: Any) -> bool:
+    return v is None or (isinstance(v, str) and v.strip().lower() in ("", "null", "none", "n/a"))
+
+
+def _setting(fieldname: str) -> Any:
+    try:
+        return frappe.db.get_single_value("AI Platform Settings", fieldname, cache=True)
+    except Exception:
+        return None
+
+
+def enabled() -> bool:
+    v = _setting("enable_llm_extraction")
+    return v not in (None, "") and bool(int(v))
+
+
+def request_priority() -> str:
+    """Limiter priority for the current context: interactive while serving a
+    web request (the caller is waiting), background in jobs."""
+    from alphax_ai_platform.alphax_ai.providers.limiter import BACKGROUND, INTERACTIVE
+
+    return INTERACTIVE if getattr(frappe.local, "request", None) else BACKGROUND
+
+
+def max_docs_per_call() -> int:
+    return int(_setting("llm_extraction_max_docs") or DEFAULT_MAX_DOCS)
+
+
+def applies(bp: Dict[str, Any], target_doctype: str) -> bool:
+    """Schema-first blueprint for a doctype no heuristic parser covers."""
+    return (
+        (bp.get("extraction_mode") or "Schema-first") == "Schema-first"
+        and bool(bp.get("schema_fields"))
+        and target_doctype not in HEURISTIC_DOCTYPES
+        and enabled()
+    )
+
+
+# --- schema -> prompt -------------------------------------------------------
+
+
+def schema_spec(schema_fields: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """{"template": compact JSON line, "header": [keys], "tables": {child: [row keys]}}."""
+    template: Dict[str, Any] = {}
+    header: List[str] = []
+    tables: Dict[str, List[str]] = {}
+    rows: Dict[str, Dict[str, str]] = {}
+    for f in schema_fields or []:
+        key = f.get("field_key")
+        if not key or f.get("data_type") == "Table":
+            continue
+        kind = _TYPES.get(f.get("data_type"), "string") + ("!" if f.get("required") else "")
+        if f.get("example_value"):
+            kind += f" e.g. {f.get('example_value')}"
+        child = f.get("table_child")
+        if child:
+            col = f.get("table_row_field") or key
+            tables.setdefault(child, []).append(col)
+            rows.setdefault(child, {})[col] = kind
+        else:
+            header.append(key)
+            template[key] = kind
+    for child, cols in rows.items():
+        template[child] = [cols]
+    return {
+        "template": json.dumps(template, ensure_ascii=False, separators=(",", ":")),
+        "header": header,
+        "tables": tables,
+    }
+
+
+def render_document(doc: Dict[str, Any]) -> str:
+    """Document text plus its extracted tables as pipe-separated rows, capped at MAX_DOC_CHARS."""
+    parts = [(doc.get("text") or "").strip()]
+    for t in doc.get("tables") or []:
+        rows = [r for r in (t.get("rows") if isinstance(t, dict) else None) or [] if isinstance(r, dict)]
+        if not rows:
+            continue
+        cols = list(rows[0])
+        parts.append(" | ".join(str(c) for c in cols))
+        parts.extend(" | ".join("" if r.get(c) is None else str(r.get(c)) for c in cols) for r in rows[:MAX_TABLE_ROWS])
+    return "\n".join(p for p in parts if p)[:MAX_DOC_CHARS]
+
+
+def _reply_tokens(text: str, spec: Dict[str, Any]) -> int:
+    """Expected reply size for one document: header values plus a guess at its row count."""
+    out = len(spec["header"]) * FIELD_REPLY_TOKENS
+    if spec["tables"]:
+        rows = min(MAX_ROWS_GUESS, len(_ROW_LINE_RE.findall(text)))
+        out += rows * sum(len(cols) for cols in spec["tables"].values()) * FIELD_REPLY_TOKENS
+    return out + DOC_OVERHEAD_TOKENS
+
+
+def pack(
+    docs: List[Dict[str, Any]],
+    spec: Dict[str, Any],
+    window: Optional[int] = None,
+    max_docs: Optional[int] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Greedy, order-preserving batches whose prompt plus expected reply fit `window`.
+
+    `docs` are [{"id", "text"}] with rendered text; a document too large for a
+    batch of its own still gets one (the model router picks a larger model).
+    """
+    budget = (window or DEFAULT_WINDOW) / ESTIMATE_MARGIN - REPLY_HEADROOM
+    overhead = _tokens(EXTRACTION_SYSTEM_PROMPT) + _tokens(spec["template"]) + 32
+    limit = max(1, max_docs or DEFAULT_MAX_DOCS)
+    batches: List[List[Dict[str, Any]]] = []
+    batch: List[Dict[str, Any]] = []
+    used = overhead
+    for d in docs:
+        cost = _tokens(d["text"]) + DOC_OVERHEAD_TOKENS + _reply_tokens(d["text"], spec)
+        if batch and (used + cost > budget or len(batch) >= limit):
+            batches.append(batch)
+            batch, used = [], overhead
+        batch.append(d)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+# --- reply -> parsed --------------------------------------------------------
+
+
+def parse_reply(content: str) -> Dict[str, Any]:
+    """The JSON object in a reply (code fences and stray prose tolerated); {} if none."""
+    text = _FENCE_RE.sub("", content or "").strip()
+    for candidate in (text, text[text.find("{"): text.rfind("}") + 1]):
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        return data if isinstance(data, dict) else {}
+    return {}
+
+
+def to_parsed(fields: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the schema's keys only, in the shape parsers.py returns."""
+    out: Dict[str, Any] = {}
+    for key in spec["header"]:
+        v = fields.get(key)
+        if not _blank(v) and not isinstance(v, (dict, list)):
+            out[key] = v
+    for child, cols in spec["tables"].items():
+        rows = []
+        for r in fields.get(child) or []:
+            if isinstance(r, dict):
+                row = {c: r[c] for c in cols if not _blank(r.get(c)) and not isinstance(r.get(c), (dict, list))}
+                if row:
+                    rows.append(row)
+        if rows:
+            out[child] = rows
+    return out
+
+
+def table_values(parsed: Dict[str, Any], schema_fields: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Child rows of an LLM result, keyed by child table fieldname (apply_schema_field_mapping
+    only maps header fields and the `items` key of the heuristic parsers)."""
+    children = {f.get("table_child") for f in schema_fields or [] if f.get("table_child")}
+    return {c: parsed[c] for c in children if parsed.get(c)}
+
+
+# --- provider calls ---------------------------------------------------------
+
+
+def _provider_keys(provider) -> List[str]:
+    return list(getattr(provider, "order", None) or [getattr(provider, "key", None)])
+
+
+def _call(provider, messages: List[Dict[str, str]]) -> str:
+    policy = {"model": _setting("default_model") or None, "temperature": 0}
+    route = route_models(None, messages, policy, provider_keys=_provider_keys(provider))
+    while True:
+        try:
+            return provider.chat(
+                messages,
+                model=policy.get("model"),
+                temperature=0,
+                models_by_provider=policy.get("models_by_provider"),
+            ).content
+        except ContextLengthError:
+            if not route or not escalate(route, policy):
+                raise
+
+
+def _run_batch(provider, batch, spec, target_doctype, results, stats) -> None:
+    ids = {f"d{i}": d for i, d in enumerate(batch, start=1)}
+    prompt = render_extraction_prompt(
+        target_doctype, spec["template"], [{"id": i, "text": d["text"]} for i, d in ids.items()]
+    )
+    messages = [{"role": "system", "content": EXTRACTION_SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+    try:
+        stats["calls"] += 1
+        reply = parse_reply(_call(provider, messages))
+    except ContextLengthError:
+        if len(batch) == 1:
+            stats["errors"].append(f"{batch[0]['id']}: prompt too long for every model")
+            return
+        half = len(batch) // 2
+        _run_batch(provider, batch[:half], spec, target_doctype, results, stats)
+        _run_batch(provider, batch[half:], spec, target_doctype, results, stats)
+        return
+    except ProviderError as e:
+        stats["errors"].append(str(e))
+        return
+
+    if len(ids) == 1 and "d1" not in reply and set(reply) & set(spec["header"] + list(spec["tables"])):
+        reply = {"d1": reply}  # single document answered without the id wrapper
+    stats["batches"].append(len(batch))
+    missing = []
+    for i, d in ids.items():
+        fields = reply.get(i)
+        if isinstance(fields, dict):
+            results[d["id"]] = to_parsed(fields, spec)
+        else:
+            missing.append(d)
+    if len(batch) > 1:
+        for d in missing:
+            _run_batch(provider, [d], spec, target_doctype, results, stats)
+
+
+def _default_provider(priority: Optional[str] = None):
+    from alphax_ai_platform.alphax_ai.providers.limiter import BACKGROUND
+    from alphax_ai_platform.alphax_ai.providers.registry import ProviderRegistry
+
+    return ProviderRegistry.get_default_provider(priority=priority or BACKGROUND)
+
+
+def plan_batches(docs: List[Dict[str, Any]], schema_fields: List[Dict[str, Any]]) -> List[List[str]]:
+    """Ids of `docs` grouped as extract_documents would send them (one job per group)."""
+    from alphax_ai_platform.alphax_ai.providers.registry import ProviderRegistry
+
+    spec = schema_spec(schema_fields)
+    window = short_prompt_window([p.key for p in ProviderRegistry.get_providers()])
+    rendered = [{"id": d["id"], "text": render_document(d)} for d in docs]
+    return [[d["id"] for d in batch] for batch in pack(rendered, spec, window, max_docs_per_call())]
+
+
+def extract_documents(
+    docs: List[Dict[str, Any]],
+    schema_fields: List[Dict[str, Any]],
+    target_doctype: str,
+    provider=None,
+    max_docs: Optional[int] = None,
+    window: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Extract `docs` ([{"id", "text", "tables"}]) with as few provider calls as fit.
+
+    Returns {"results": {id: parsed dict | None}, "calls", "batches": [docs per
+    answered call], "errors"}. `provider` defaults to the background-priority
+    default provider; `window` to the short-prompt model's context window.
+    """
+    provider = provider or _default_provider()
+    spec = schema_spec(schema_fields)
+    rendered = [{"id": d["id"], "text": render_document(d)} for d in docs]
+    if window is None:
+        window = short_prompt_window(_provider_keys(provider))
+    results: Dict[str, Any] = {d["id"]: None for d in docs}
+    stats: Dict[str, Any] = {"calls": 0, "batches": [], "errors": []}
+    for batch in pack(rendered, spec, window, max_docs or max_docs_per_call()):
+        _run_batch(provider, batch, spec, target_doctype, results, stats)
+    return dict(stats, results=results)
+
+
+def extract_one(extracted: Dict[str, Any], bp: Dict[str, Any], target_doctype: str, provider=None) -> Optional[Dict[str, Any]]:
+    """Parsed result for one extraction; uses `extracted["llm_fields"]` when a batch
+    job already extracted it. Notes the outcome in extracted["meta"]["llm_extraction"].
+
+    Without a `provider` the default one is used at `request_priority()`."""
+    if "llm_fields" in extracted:
+        return extracted.pop("llm_fields")
+    out = extract_documents(
+        [{"id": "doc", "text": extracted.get("text"), "tables": extracted.get("tables")}],
+        bp.get("schema_fields"),
+        target_doctype,
+        provider=provider or _default_provider(request_priority()),
+    )
+    note_outcome(extracted, out, 1)
+    return out["results"]["doc"]
+
+
+def note_outcome(extracted: Dict[str, Any], out: Dict[str, Any], batch_size: int, ok: Optional[bool] = None) -> None:
+    """Record an extract_documents outcome in the OCR result's meta (calls are per batch)."""
+    extracted.setdefault("meta", {})["llm_extraction"] = {
+        "batch_size": batch_size,
+        "calls": out["calls"],
+        "ok": all(v is not None for v in out["results"].values()) if ok is None else ok,
+        "errors": out["errors"][:5],
+    }
+
+
+def mock_responder(messages: List[Dict[str, str]]) -> str:
+    """MockProvider responder for extraction prompts: header values from
+    "Label: value" lines (field_key with spaces for underscores), no rows."""
+    prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    m = re.search(r"^Schema[^:]*:\s*(\{.*\})\s*$", prompt, re.M)
+    template = json.loads(m.group(1)) if m else {}
+    reply = {}
+    for doc_id, text in _DOC_RE.findall(prompt):
+        fields: Dict[str, Any] = {}
+        for key, kind in template.items():
+            if isinstance(kind, list):
+                fields[key] = []
+                continue
+            label = re.escape(key).replace("_", "[ _]")
+            hit = re.search(rf"^\s*{label}\s*[:\-]\s*(.+?)\s*$", text, re.I | re.M)
+            fields[key] = hit.group(1) if hit else None
+        reply[doc_id] = fields
+    return json.dumps(reply, ensure_ascii=False)
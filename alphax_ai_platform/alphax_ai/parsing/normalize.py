@@ -0,0 +1,381 @@
+"""Field normalization compiled from blueprint schema rules.
+
+Each AI Extraction Schema Field (data_type, normalize_rule, normalize_options)
+is compiled once into a plain callable `value -> normalized value | None`
+(None means "present but not parseable"). Compiled callables are cached per
+rule set, so a blueprint pays the compile cost once per worker.
+
+The callables are regex-driven: candidate strings are validated by a
+pattern before any conversion, so the per-value path never relies on
+catching exceptions. Every numeric rule also accepts Arabic-Indic and
+Eastern Arabic-Indic digits and separators.
+
+Rules and their options:
+  - Date (ISO):       "DMY" | "MDY" | "YMD" day-order hint, or a format such
+                      as "%d %b %Y"; default tries Y-M-D, then D-M-Y, then M-D-Y
+  - Number:           "," (decimal comma) | "." (decimal point); default
+                      decides from the separators present
+  - Currency Amount:  as Number, rounded to 2 decimals; currency codes and
+                      symbols are ignored and "(1,200.00)" is negative
+  - Phone:            default country code (e.g. "966") for national numbers
+  - Latin Digits:     Arabic-Indic digits to 0-9, trimmed
+  - Trim / Uppercase / Lowercase
+"""
+
+from __future__ import annotations
+
+import calendar
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Normalizer = Callable[[Any], Any]
+
+_DIGITS = str.maketrans({
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Eastern Arabic-Indic (Persian/Urdu)
+    "٫": ".",  # Arabic decimal separator
+    "٬": ",",  # Arabic thousands separator
+    "،": ",",  # Arabic comma
+    "\u00a0": " ",  # no-break spaces
+    "\u202f": " ",
+})
+
+MONTHS = {
+    m.lower(): i
+    for i in range(1, 13)
+    for m in (calendar.month_name[i], calendar.month_abbr[i])
+}
+MONTHS["sept"] = 9
+
+_NUMERIC_DATE_RE = re.compile(r"(?<!\d)(\d{1,4})([\-/.])(\d{1,2})\2(\d{1,4})(?!\d)")
+_DMY_NAME_RE = re.compile(r"(?<!\d)(\d{1,2})(?:st|nd|rd|th)?[\s\-/.]*([A-Za-z]{3,9})\.?[\s\-/.,]*(\d{4}|\d{2})(?!\d)")
+_MDY_NAME_RE = re.compile(r"\b([A-Za-z]{3,9})\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})(?!\d)")
+_CURRENCY_TEXT_RE = re.compile(r"^(?:[^\W\d_]+\.?\s*)+|(?:\s*[^\W\d_]+\.?)+$")  # "SAR", "ر.س", "Rs."
+_NUMBER_JUNK_RE = re.compile(r"[\s'_]")
+_NUMBER_RE = re.compile(r"[\d.,]*\d[\d.,]*")
+_PLAIN_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_CLEAN_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_ISO_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_GROUPED_RE = re.compile(r"\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*")
+_PHONE_JUNK_RE = re.compile("[\\s\\-().\u200e\u200f]")  # incl. LTR/RTL marks
+_PHONE_RE = re.compile(r"\+?\d{6,15}")
+
+_FORMAT_TOKENS = {
+    "%d": r"(?P<d>\d{1,2})",
+    "%m": r"(?P<m>\d{1,2})",
+    "%Y": r"(?P<Y>\d{4})",
+    "%y": r"(?P<y>\d{2})",
+    "%b": r"(?P<b>[A-Za-z]{3,9})\.?",
+    "%B": r"(?P<b>[A-Za-z]{3,9})",
+}
+
+
+def latin_digits(s: str) -> str:
+    return s.translate(_DIGITS)
+
+
+def _blank(v: Any) -> bool:
+    return v is None or (isinstance(v, str) and not v.strip()) or v != v  # v != v: NaN
+
+
+# --- dates -----------------------------------------------------------------
+
+def _iso(y: int, m: int, d: int) -> Optional[str]:
+    if y < 100:
+        y += 2000 if y < 70 else 1900
+    if not (1 <= m <= 12 and 1 <= y <= 9999) or not 1 <= d <= calendar.monthrange(y, m)[1]:
+        return None
+    return f"{y:04d}-{m:02d}-{d:02d}"
+
+
+def _format_regex(fmt: str) -> Optional["re.Pattern[str]"]:
+    """Translate a strptime-style format into a regex; None for unsupported directives."""
+    out = []
+    i = 0
+    while i < len(fmt):
+        tok = fmt[i:i + 2]
+        if tok in _FORMAT_TOKENS:
+            out.append(_FORMAT_TOKENS[tok])
+            i += 2
+        elif fmt[i] == "%":
+            return None
+        else:
+            out.append(r"\s+" if fmt[i].isspace() else re.escape(fmt[i]))
+            i += 1
+    return re.compile("".join(out), re.I)
+
+
+def compile_date(options: Optional[str] = None) -> Normalizer:
+    """Date parser for a day-order hint ("DMY", "MDY", "YMD") or an explicit format."""
+    hint = (options or "").strip()
+    pattern = _format_regex(hint) if "%" in hint else None
+    order = hint.upper() if hint.upper() in ("DMY", "MDY", "YMD") else None
+
+    def from_format(s: str) -> Optional[str]:
+        m = pattern.search(s)
+        if not m:
+            return None
+        g = m.groupdict()
+        year = g.get("Y") or g.get("y")
+        if not year:
+            return None
+        month = int(g["m"]) if g.get("m") else MONTHS.get((g.get("b") or "").lower(), 0)
+        return _iso(int(year), month, int(g.get("d") or 1))
+
+    def from_numbers(a: str, b: str, c: str) -> Optional[str]:
+        x, y, z = int(a), int(b), int(c)
+        if len(a) == 4 or order == "YMD":
+            return _iso(x, y, z)
+        if len(c) not in (2, 4):
+            return None
+        if order == "MDY":
+            return _iso(z, x, y)
+        return _iso(z, y, x) or (None if order == "DMY" else _iso(z, x, y))
+
+    def convert(v: Any) -> Optional[str]:
+        if isinstance(v, datetime):
+            return v.date().isoformat()
+        if isinstance(v, date):
+            return v.isoformat()
+        if _blank(v):
+            return None
+        s = str(v)
+        m = _ISO_DATE_RE.fullmatch(s)
+        if m:  # fast path: already ISO
+            return _iso(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        s = latin_digits(s)
+        if pattern is not None:
+            return from_format(s)
+        m = _NUMERIC_DATE_RE.search(s)
+        if m:
+            return from_numbers(m.group(1), m.group(3), m.group(4))
+        m = _DMY_NAME_RE.search(s)
+        if m and m.group(2).lower() in MONTHS:
+            return _iso(int(m.group(3)), MONTHS[m.group(2).lower()], int(m.group(1)))
+        m = _MDY_NAME_RE.search(s)
+        if m and m.group(1).lower() in MONTHS:
+            return _iso(int(m.group(3)), MONTHS[m.group(1).lower()], int(m.group(2)))
+        return None
+
+    return convert
+
+
+# --- numbers ---------------------------------------------------------------
+
+def compile_number(options: Optional[str] = None, precision: Optional[int] = None) -> Normalizer:
+    """Amount parser; `options` "," / "." fixes the decimal separator, otherwise it is inferred."""
+    decimal_hint = (options or "").strip()[:1]
+    decimal_hint = decimal_hint if decimal_hint in (",", ".") else None
+
+    def decimal_sep(s: str) -> Optional[str]:
+        if decimal_hint:
+            return decimal_hint
+        comma, dot = s.rfind(","), s.rfind(".")
+        if comma >= 0 and dot >= 0:
+            return "," if comma > dot else "."
+        if comma >= 0:
+            # "1,234" / "1,234,567" group thousands; "12,5" is a decimal comma
+            return "," if s.count(",") == 1 and len(s) - comma - 1 != 3 else None
+        return "." if s.count(".") == 1 else None  # None: every separator groups thousands
+
+    def convert(v: Any) -> Optional[float]:
+        if type(v) is str:
+            if _CLEAN_NUMBER_RE.fullmatch(v):  # fast path: already a plain number
+                f = float(v)
+                return round(f, precision) if precision is not None else f
+            s = v
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            f = float(v)
+            if f != f:
+                return None
+            return round(f, precision) if precision is not None else f
+        elif v is None or isinstance(v, bool):
+            return None
+        else:
+            s = str(v)
+        s = _NUMBER_JUNK_RE.sub("", _CURRENCY_TEXT_RE.sub("", latin_digits(s).strip()))
+        s = s.replace("$", "").replace("€", "").replace("£", "").replace("¥", "").replace("﷼", "")
+        negative = False
+        if s[:1] == "(" and s[-1:] == ")":
+            negative, s = True, s[1:-1]
+        if s and s[0] in "+-":
+            negative, s = negative or s[0] == "-", s[1:]
+        elif s[-1:] == "-":
+            negative, s = True, s[:-1]
+        if not _NUMBER_RE.fullmatch(s):
+            return None
+        dec = decimal_sep(s)
+        if dec is None:
+            if not _GROUPED_RE.fullmatch(s) and not s.isdigit():
+                return None
+            s = s.replace(",", "").replace(".", "")
+        else:
+            s = s.replace("." if dec == "," else ",", "").replace(dec, ".")
+        if not _PLAIN_NUMBER_RE.fullmatch(s):
+            return None
+        f = -float(s) if negative else float(s)
+        return round(f, precision) if precision is not None else f
+
+    return convert
+
+
+def compile_int(options: Optional[str] = None) -> Normalizer:
+    number = compile_number(options)
+
+    def convert(v: Any) -> Optional[int]:
+        f = number(v)
+        return int(f) if f is not None and f.is_integer() else None
+
+    return convert
+
+
+# --- strings ---------------------------------------------------------------
+
+def compile_phone(options: Optional[str] = None) -> Normalizer:
+    """E.164-style "+<country><number>"; national numbers ("05...") need a default country code."""
+    country = re.sub(r"\D", "", latin_digits(options or ""))
+
+    def convert(v: Any) -> Optional[str]:
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        if _blank(v):
+            return None
+        s = _PHONE_JUNK_RE.sub("", latin_digits(str(v)))
+        if s.startswith("00"):
+            s = "+" + s[2:]
+        elif not s.startswith("+") and country:
+            s = "+" + (country + s[1:] if s.startswith("0") else s if s.startswith(country) else country + s)
+        return s if _PHONE_RE.fullmatch(s) else None
+
+    return convert
+
+
+def compile_string(rule: str) -> Normalizer:
+    case = {"Uppercase": str.upper, "Lowercase": str.lower}.get(rule)
+    digits = rule == "Latin Digits"
+
+    def convert(v: Any) -> Optional[str]:
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)  # spreadsheet numbers used as codes/phones ("966551234567.0")
+        if _blank(v):
+            return None
+        s = str(v).strip()
+        if digits:
+            s = latin_digits(s)
+        return case(s) if case else s
+
+    return convert
+
+
+# --- compilation -----------------------------------------------------------
+
+_COMPILED: Dict[Tuple[str, str, str], Normalizer] = {}
+_MISS = object()
+_BLANK = object()
+
+
+def compile_field(field: Dict[str, Any]) -> Normalizer:
+    """Callable for one schema field row (data_type + normalize_rule + normalize_options)."""
+    data_type = field.get("data_type") or "String"
+    rule = field.get("normalize_rule") or "None"
+    options = (field.get("normalize_options") or "").strip()
+    key = (data_type, rule, options)
+    fn = _COMPILED.get(key)
+    if fn is None:
+        if data_type == "Date" or rule == "Date (ISO)":
+            fn = compile_date(options)
+        elif rule == "Currency Amount":
+            fn = compile_number(options, precision=2)
+        elif data_type == "Int":
+            fn = compile_int(options)
+        elif data_type == "Float" or rule == "Number":
+            fn = compile_number(options)
+        elif rule == "Phone":
+            fn = compile_phone(options)
+        else:
+            fn = compile_string(rule)
+        _COMPILED[key] = fn
+    return fn
+
+
+def compile_schema(schema_fields: List[Dict[str, Any]]) -> Dict[str, Normalizer]:
+    """{field_key: callable} for the header (non child-table) fields of a blueprint."""
+    return {
+        f.get("field_key"): compile_field(f)
+        for f in schema_fields or []
+        if f.get("field_key") and not f.get("table_child") and f.get("data_type") != "Table"
+    }
+
+
+def normalize_column(values: List[Any], fn: Normalizer) -> Tuple[List[Any], List[bool]]:
+    """Normalize a column; returns (values, invalid mask). Blank cells become None and are not invalid.
+
+    Results are memoised per distinct value, so repeated cells cost one lookup.
+    """
+    memo: Dict[Any, Any] = {}
+    out: List[Any] = []
+    invalid: List[bool] = []
+    for v in values:
+        if type(v) is str:  # the common case: raw cells / OCR text, memoised by value
+            c = memo.get(v, _MISS)
+            if c is _MISS:
+                c = memo[v] = fn(v) if v.strip() else _BLANK
+        elif v is None or v != v:  # v != v: NaN
+            c = _BLANK
+        elif isinstance(v, (list, dict)):
+            c = None
+        else:
+            key = (type(v), v)  # keeps 1, 1.0 and True apart
+            c = memo.get(key, _MISS)
+            if c is _MISS:
+                c = memo[key] = fn(v)
+        if c is _BLANK:
+            out.append(None)
+            invalid.append(False)
+        else:
+            out.append(c)
+            invalid.append(c is None)
+    return out, invalid
+
+
+def normalize_parsed(parsed: Dict[str, Any], schema_fields: List[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """Apply the schema rules to a parser result in place.
+
+    Header fields are normalized by field_key; child-table fields are
+    normalized column-wise over the matching list of row dicts. Values that
+    do not parse are removed and returned as [(label, raw value)] so the
+    caller can route the document to review instead of inserting bad data.
+    """
+    problems: List[Tuple[str, Any]] = []
+    if not parsed:
+        return problems
+    for f in schema_fields or []:
+        key = f.get("field_key")
+        if not key or f.get("data_type") == "Table":
+            continue
+        fn = compile_field(f)
+        label = f.get("label") or key
+        child = f.get("table_child")
+        if child:
+            rows = [r for r in (parsed.get(child) or []) if isinstance(r, dict)]
+            col = f.get("table_row_field") if rows and f.get("table_row_field") in rows[0] else key
+            values, invalid = normalize_column([r.get(col) for r in rows], fn)
+            for r, v, bad in zip(rows, values, invalid):
+                if bad:
+                    problems.append((label, r.pop(col, None)))
+                elif v is not None:
+                    r[col] = v
+            continue
+        if key not in parsed or _blank(parsed[key]):
+            continue
+        v = fn(parsed[key])
+        if v is None:
+            problems.append((label, parsed.pop(key)))
+        else:
+            parsed[key] = v
+    return problems
+
+
+parse_date = compile_date()
+parse_number = compile_number()
@@ -1,34 +1,11 @@
 from __future__ import annotations
 
 import re
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import frappe
 
-
-_DATE_PATTERNS = [
-    "%Y-%m-%d",
-    "%d-%m-%Y",
-    "%d/%m/%Y",
-    "%m/%d/%Y",
-    "%d.%m.%Y",
-]
-
-
-def _parse_date(s: str) -> Optional[str]:
-    s = (s or "").strip()
-    if not s:
-        return None
-    # common cleanup
-    s2 = re.sub(r"[^0-9/\-.]", "", s)
-    for fmt in _DATE_PATTERNS:
-        try:
-            dt = datetime.strptime(s2, fmt).date()
-            return dt.isoformat()
-        except Exception:
-            continue
-    return None
+from .normalize import normalize_column, parse_date, parse_number
 
 
 def _find_first(patterns: List[str], text: str) -> Optional[str]:
@@ -53,11 +30,20 @@ def _extract_tables_as_rows(tables: List[Any]) -> List[Dict[str, Any]]:
     return rows
 
 
-def parse_purchase_order(extracted_text: str, tables: List[Any], language: str = "auto") -> Dict[str, Any]:
+def parse_purchase_order(
+    extracted_text: str,
+    tables: List[Any],
+    language: str = "auto",
+    normalizers: Optional[Dict[str, Callable[[Any], Any]]] = None,
+) -> Dict[str, Any]:
     """Heuristic parser for Purchase Order-like documents (vendor quote / PO draft / proforma).
     Returns a canonical intermediate structure (not ERP fieldnames yet).
+
+    `normalizers` (field_key -> callable, see normalize.compile_schema) override
+    the default date parsing, e.g. for a blueprint whose dates are month-first.
     """
     text = extracted_text or ""
+    norm = normalizers or {}
     # Supplier
     supplier = _find_first([
         r"Supplier\s*[:\-]\s*(.+)",
@@ -66,8 +52,8 @@ def parse_purchase_order(extracted_text: str, tables: List[Any], language: str =
     ], text)
 
     # Dates
-    trx_date = _parse_date(_find_first([r"Date\s*[:\-]\s*([0-9/\-.]+)", r"PO\s*Date\s*[:\-]\s*([0-9/\-.]+)"], text) or "")
-    delivery_date = _parse_date(_find_first([r"Delivery\s*Date\s*[:\-]\s*([0-9/\-.]+)", r"Expected\s*Date\s*[:\-]\s*([0-9/\-.]+)"], text) or "")
+    trx_date = norm.get("transaction_date", parse_date)(_find_first([r"(?<!Delivery )(?<!Expected )\bDate\s*[:\-]\s*(.+)", r"PO\s*Date\s*[:\-]\s*(.+)"], text))
+    delivery_date = norm.get("schedule_date", parse_date)(_find_first([r"Delivery\s*Date\s*[:\-]\s*(.+)", r"Expected\s*Date\s*[:\-]\s*(.+)"], text))
 
     currency = _find_first([r"Currency\s*[:\-]\s*([A-Z]{3})"], text)
 
@@ -82,16 +68,20 @@ def parse_purchase_order(extracted_text: str, tables: List[Any], language: str =
         col_rate = _pick_key(rows[0].keys(), ["rate", "price", "unit_price", "unit price", "unitprice"])
         col_uom = _pick_key(rows[0].keys(), ["uom", "unit", "unit_of_measure"])
         col_amount = _pick_key(rows[0].keys(), ["amount", "total", "line_total", "line total"])
-        for r in rows:
-            desc = (r.get(col_item) if col_item else None) or ""
-            if not str(desc).strip():
-                continue
+        rows = [r for r in rows if col_item and str(r.get(col_item) or "").strip()]
+
+        def column(col, key):
+            # whole column at once: memoised per distinct cell (see normalize_column)
+            return normalize_column([r.get(col) for r in rows], norm.get(key, parse_number))[0] if col else [None] * len(rows)
+
+        qtys, rates, amounts = column(col_qty, "qty"), column(col_rate, "rate"), column(col_amount, "amount")
+        for i, r in enumerate(rows):
             it = {
-                "description": str(desc).strip(),
-                "qty": _to_float(r.get(col_qty)) if col_qty else None,
-                "rate": _to_float(r.get(col_rate)) if col_rate else None,
+                "description": str(r.get(col_item)).strip(),
+                "qty": qtys[i],
+                "rate": rates[i],
                 "uom": str(r.get(col_uom)).strip() if col_uom and r.get(col_uom) is not None else None,
-                "amount": _to_float(r.get(col_amount)) if col_amount else None,
+                "amount": amounts[i],
             }
             items.append({k: v for k, v in it.items() if v not in (None, "")})
     else:
@@ -105,9 +95,10 @@ def parse_purchase_order(extracted_text: str, tables: List[Any], language: str =
             if m:
                 items.append({
                     "description": m.group(2).strip(),
-                    "qty": _to_float(m.group(3)),
-                    "rate": _to_float(m.group(4)),
-                    "amount": _to_float(m.group(5)),
+                    # the pattern only admits plain decimals, so float() cannot fail here
+                    "qty": float(m.group(3)),
+                    "rate": float(m.group(4)),
+                    "amount": float(m.group(5)),
                 })
 
     return {
@@ -121,9 +112,15 @@ def parse_purchase_order(extracted_text: str, tables: List[Any], language: str =
     }
 
 
-def parse_employee(extracted_text: str, tables: List[Any], language: str = "auto") -> Dict[str, Any]:
+def parse_employee(
+    extracted_text: str,
+    tables: List[Any],
+    language: str = "auto",
+    normalizers: Optional[Dict[str, Callable[[Any], Any]]] = None,
+) -> Dict[str, Any]:
     """Heuristic parser for Employee profile documents (passport/iqama/cv summary forms)."""
     text = extracted_text or ""
+    norm = normalizers or {}
 
     full_name = _find_first([
         r"Name\s*[:\-]\s*(.+)",
@@ -133,8 +130,8 @@ def parse_employee(extracted_text: str, tables: List[Any], language: str = "auto
 
     nationality = _find_first([r"Nationality\s*[:\-]\s*(.+)"], text)
     gender = _find_first([r"Gender\s*[:\-]\s*(Male|Female)"], text)
-    dob = _parse_date(_find_first([r"Date\s*of\s*Birth\s*[:\-]\s*([0-9/\-.]+)", r"DOB\s*[:\-]\s*([0-9/\-.]+)"], text) or "")
-    joining = _parse_date(_find_first([r"Joining\s*Date\s*[:\-]\s*([0-9/\-.]+)"], text) or "")
+    dob = norm.get("date_of_birth", parse_date)(_find_first([r"Date\s*of\s*Birth\s*[:\-]\s*(.+)", r"DOB\s*[:\-]\s*(.+)"], text))
+    joining = norm.get("date_of_joining", parse_date)(_find_first([r"Joining\s*Date\s*[:\-]\s*(.+)"], text))
     mobile = _find_first([r"Mobile\s*[:\-]\s*([+0-9\s\-]{8,})", r"Phone\s*[:\-]\s*([+0-9\s\-]{8,})"], text)
     email = _find_first([r"Email\s*[:\-]\s*([A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,})"], text)
 
@@ -161,19 +158,6 @@ def parse_employee(extracted_text: str, tables: List[Any], language: str = "auto
     }
 
 
-def _to_float(v: Any) -> Optional[float]:
-    if v is None:
-        return None
-    try:
-        s = str(v).strip()
-        if not s:
-            return None
-        s = s.replace(",", "")
-        return float(s)
-    except Exception:
-        return None
-
-
 def _pick_key(keys, aliases: List[str]) -> Optional[str]:
     lower = {str(k).strip().lower(): k for k in keys}
     for a in aliases:
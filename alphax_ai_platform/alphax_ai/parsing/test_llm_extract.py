@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.parsing import llm_extract
+from alphax_ai_platform.alphax_ai.parsing.llm_extract import pack, parse_reply, schema_spec
+from alphax_ai_platform.alphax_ai.providers.limiter import BACKGROUND, INTERACTIVE
+
+SCHEMA = [
+    {"field_key": "invoice_no", "data_type": "Data", "required": 1},
+    {"field_key": "posting_date", "data_type": "Date"},
+    {"field_key": "qty", "data_type": "Float", "table_child": "items", "table_row_field": "qty"},
+]
+
+
+def _doc(i, chars=400):
+    return {"id": f"seg{i}", "text": ("Invoice No: INV-%d\n" % i).ljust(chars, "x")}
+
+
+class TestParseReply(unittest.TestCase):
+    def test_plain_and_fenced_json(self):
+        self.assertEqual(parse_reply('{"d1": {"invoice_no": "A"}}'), {"d1": {"invoice_no": "A"}})
+        self.assertEqual(parse_reply('```json\n{"d1": {}}\n```'), {"d1": {}})
+
+    def test_prose_around_the_object(self):
+        self.assertEqual(parse_reply('Here you go:\n{"d1": {"qty": 2}}\nThanks'), {"d1": {"qty": 2}})
+
+    def test_malformed_or_non_object_reply_is_empty(self):
+        for content in ("", None, "no json here", '{"d1": ', "[1, 2]", '"just a string"'):
+            self.assertEqual(parse_reply(content), {}, content)
+
+
+class TestPack(unittest.TestCase):
+    def setUp(self):
+        self.spec = schema_spec(SCHEMA)
+
+    def test_max_docs_caps_each_batch_in_order(self):
+        docs = [_doc(i) for i in range(7)]
+        batches = pack(docs, self.spec, window=1_000_000, max_docs=3)
+        self.assertEqual([len(b) for b in batches], [3, 3, 1])
+        self.assertEqual([d["id"] for b in batches for d in b], [d["id"] for d in docs])
+
+    def test_window_limits_batch_size(self):
+        docs = [_doc(i, chars=4000) for i in range(6)]
+        small = pack(docs, self.spec, window=4096, max_docs=8)
+        large = pack(docs, self.spec, window=32768, max_docs=8)
+        self.assertGreater(len(small), len(large))
+        self.assertEqual(len(large), 1)
+
+    def test_oversized_document_gets_its_own_batch(self):
+        docs = [_doc(0), _doc(1, chars=100_000), _doc(2)]
+        batches = pack(docs, self.spec, window=8192, max_docs=8)
+        self.assertEqual([[d["id"] for d in b] for b in batches], [["seg0"], ["seg1"], ["seg2"]])
+
+    def test_empty(self):
+        self.assertEqual(pack([], self.spec), [])
+
+
+class TestSettingsAndPriority(unittest.TestCase):
+    def test_disabled_unless_set(self):
+        with mock.patch.object(frappe.db, "get_single_value", return_value=None, create=True):
+            self.assertFalse(llm_extract.enabled())
+        with mock.patch.object(frappe.db, "get_single_value", return_value=1, create=True):
+            self.assertTrue(llm_extract.enabled())
+
+    def test_web_request_uses_interactive_priority(self):
+        with mock.patch.object(frappe.local, "request", object(), create=True):
+            self.assertEqual(llm_extract.request_priority(), INTERACTIVE)
+        with mock.patch.object(frappe.local, "request", None, create=True):
+            self.assertEqual(llm_extract.request_priority(), BACKGROUND)
+
+    def test_extract_one_passes_the_request_priority(self):
+        out = {"results": {"doc": {"invoice_no": "A"}}, "calls": 1, "batches": [1], "errors": []}
+        with mock.patch.object(frappe.local, "request", object(), create=True), mock.patch.object(
+            llm_extract, "_default_provider"
+        ) as default_provider, mock.patch.object(llm_extract, "extract_documents", return_value=out):
+            parsed = llm_extract.extract_one({"text": "Invoice No: A"}, {"schema_fields": SCHEMA}, "Sales Invoice")
+        default_provider.assert_called_once_with(INTERACTIVE)
+        self.assertEqual(parsed, {"invoice_no": "A"})
+
+    def test_batch_result_is_used_without_a_call(self):
+        with mock.patch.object(llm_extract, "extract_documents") as extract_documents:
+            parsed = llm_extract.extract_one({"llm_fields": None}, {"schema_fields": SCHEMA}, "Sales Invoice")
+        self.assertIsNone(parsed)
+        extract_documents.assert_not_called()
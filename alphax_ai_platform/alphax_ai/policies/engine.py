@@ -1,3 +1,5 @@
+import frappe
+
 from .redaction import apply_redaction
 
 
@@ -9,13 +11,38 @@ class PolicyEngine:
     def evaluate(self, context: dict):
         # MVP policy: read-only; budget placeholders; redaction enabled.
         policy = {
-            "model": None,
+            # Default Model from settings; AgentEngine routes per provider from AI Model metadata
+            "model": _default_model(),
             "temperature": 0.2,
             "allow_write_tools": False,
             "redaction": True,
-            "budget": {"hard_stop": False, "remaining": None},
+            "budget": _budget(),
         }
         if policy.get("redaction"):
             context = apply_redaction(context)
         policy["context"] = context
         return policy
+
+
+def _default_model():
+    try:
+        return frappe.db.get_single_value("AI Platform Settings", "default_model", cache=True) or None
+    except Exception:
+        return None
+
+
+def _budget():
+    """Monthly Budget (USD) left, from the daily usage rollups (not the raw audit log)."""
+    try:
+        limit = float(frappe.db.get_single_value("AI Platform Settings", "monthly_budget_usd", cache=True) or 0)
+    except Exception:
+        limit = 0
+    if not limit:
+        return {"hard_stop": False, "remaining": None}
+    from alphax_ai_platform.alphax_ai.logs.rollup import month_to_date_cost
+
+    try:
+        spent = month_to_date_cost()
+    except Exception:
+        return {"hard_stop": False, "remaining": None}
+    return {"hard_stop": False, "remaining": round(limit - spent, 2), "spent": round(spent, 2)}
@@ -0,0 +1,216 @@
+"""Cost- and context-aware model choice from AI Model metadata.
+
+For each provider the router picks the cheapest AI Model whose Context
+Window fits the prompt (estimated at ~4 characters per token, with
+ESTIMATE_MARGIN slack and REPLY_HEADROOM tokens left for the answer); cost
+is Input $/1K x prompt tokens + Output $/1K x REPLY_HEADROOM. Larger models
+stay on an escalation ladder and are only used when the prompt does not fit
+or the provider rejects it for context length (ContextLengthError).
+
+An agent's Model Override is honoured while it fits; beyond that the router
+escalates to larger models of the same provider.
+
+Decisions depend only on the agent and the prompt's size bucket: the token
+estimate rounded up in quarter-octave steps (at most ~19% pessimistic) and
+checked at the bucket's upper bound. They are cached per worker under
+(models version, agent, bucket); saving an AI Model or AI Agent bumps the
+version in Redis for every worker.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+import frappe
+
+REPLY_HEADROOM = 1024
+ESTIMATE_MARGIN = 1.15
+MIN_BUCKET = 512
+MAX_CACHED_PLANS = 1024
+VERSION_KEY = "alphax_ai:model_route:version"
+
+_PLANS: Dict[Any, Dict[str, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return int(math.ceil(sum(len(m.get("content") or "") for m in messages or []) / 4.0))
+
+
+def size_bucket(tokens: int) -> int:
+    """Upper bound of the prompt's size class: quarter-octave steps above MIN_BUCKET."""
+    if tokens <= MIN_BUCKET:
+        return MIN_BUCKET
+    steps = math.ceil(4 * math.log2(tokens / MIN_BUCKET))
+    return int(math.ceil(MIN_BUCKET * 2 ** (steps / 4.0)))
+
+
+def invalidate(doc=None, method=None) -> None:
+    """doc_events hook: AI Model / AI Agent changed; drop cached plans in all workers."""
+    try:
+        cache = frappe.cache()
+        cache.pipeline().incr(cache.make_key(VERSION_KEY)).execute()
+    except Exception:
+        pass
+
+
+def _version() -> Any:
+    try:
+        cache = frappe.cache()
+        return cache.pipeline().get(cache.make_key(VERSION_KEY)).execute()[0] or 0
+    except Exception:
+        return None
+
+
+def _fits(model: Dict[str, Any], tokens: int) -> bool:
+    window = model.get("context_window") or 0
+    return not window or tokens * ESTIMATE_MARGIN + REPLY_HEADROOM <= window
+
+
+def _cost(model: Dict[str, Any], tokens: int) -> float:
+    return (float(model.get("price_in_per_1k") or 0) * tokens + float(model.get("price_out_per_1k") or 0) * REPLY_HEADROOM) / 1000.0
+
+
+def _window(model: Dict[str, Any]) -> float:
+    return model.get("context_window") or math.inf
+
+
+def _ladder(models: List[Dict[str, Any]], tokens: int, pinned: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Chosen model first, then larger-window models by cost (the escalation path)."""
+    if not models:
+        return []
+    fitting = [m for m in models if _fits(m, tokens)]
+    if pinned and _fits(pinned, tokens):
+        choice = pinned
+    elif fitting:
+        pool = [m for m in fitting if _window(m) > _window(pinned)] if pinned else fitting
+        choice = min(pool or fitting, key=lambda m: (_cost(m, tokens), _window(m), m["name"]))
+    else:
+        return [max(models, key=_window)]  # nothing fits: best effort with the largest
+    larger = [m for m in models if m is not choice and _window(m) > _window(choice)]
+    return [choice] + sorted(larger, key=lambda m: (_cost(m, tokens), _window(m), m["name"]))
+
+
+def _plan(agent_key: Optional[str], bucket: int) -> Dict[str, Any]:
+    models = frappe.get_all(
+        "AI Model",
+        fields=["name", "provider", "model_name", "context_window", "price_in_per_1k", "price_out_per_1k"],
+    )
+    override = None
+    if agent_key:
+        override = frappe.db.get_value("AI Agent", agent_key, "model_override")
+    by_provider: Dict[str, List[Dict[str, Any]]] = {}
+    for m in models:
+        by_provider.setdefault(m["provider"], []).append(dict(m))
+
+    ladders = {}
+    for provider, group in by_provider.items():
+        pinned = next((m for m in group if m["name"] == override), None)
+        ladders[provider] = [
+            {"model": m["model_name"], "key": m["name"], "context_window": m.get("context_window") or None, "est_cost": round(_cost(m, bucket), 6)}
+            for m in _ladder(group, bucket, pinned)
+        ]
+    return {"bucket": bucket, "override": override, "ladders": ladders}
+
+
+def _cached_plan(agent_key: Optional[str], bucket: int) -> Dict[str, Any]:
+    version = _version()
+    key = (version, agent_key, bucket)
+    if version is not None:
+        with _LOCK:
+            plan = _PLANS.get(key)
+        if plan is not None:
+            return dict(plan, cached=True)
+    plan = _plan(agent_key, bucket)
+    if version is not None:
+        with _LOCK:
+            if len(_PLANS) >= MAX_CACHED_PLANS:
+                _PLANS.clear()
+            _PLANS[key] = plan
+    return dict(plan, cached=False)
+
+
+def short_prompt_window(provider_keys: Optional[List[str]] = None, agent_key: Optional[str] = None) -> Optional[int]:
+    """Context window of the model short prompts are routed to (smallest across
+    `provider_keys`); None when no AI Model with a window is configured.
+
+    Callers that pack several inputs into one prompt size the pack to this
+    window so it still goes to the cheap model instead of escalating.
+    """
+    try:
+        plan = _cached_plan(agent_key, MIN_BUCKET)
+    except Exception:
+        return None
+    windows = [
+        ladder[0]["context_window"]
+        for provider, ladder in plan["ladders"].items()
+        if ladder and ladder[0].get("context_window") and (not provider_keys or provider in provider_keys)
+    ]
+    return min(windows) if windows else None
+
+
+def route_models(
+    agent_key: Optional[str],
+    messages: List[Dict[str, str]],
+    policy: Dict[str, Any],
+    provider_keys: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Fill policy["model"] / policy["models_by_provider"]; returns the route (also policy["model_route"]).
+
+    `provider_keys` are the providers the call may go to, primary first;
+    policy["model"] is the choice for the primary.
+    """
+    tokens = prompt_tokens(messages)
+    try:
+        plan = _cached_plan(agent_key, size_bucket(tokens))
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Model Routing Failed")
+        return {}
+    ladders = {p: list(l) for p, l in plan["ladders"].items() if l}
+    route = {
+        "estimated_tokens": tokens,
+        "bucket": plan["bucket"],
+        "cached": plan["cached"],
+        "override": plan["override"],
+        "providers": list(provider_keys or ladders),
+        "ladders": ladders,
+        "escalations": 0,
+        # providers without AI Model rows keep the policy's model (Default Model setting)
+        "default_model": policy.get("model"),
+    }
+    _apply(route, policy)
+    return route
+
+
+def _apply(route: Dict[str, Any], policy: Dict[str, Any]) -> None:
+    chosen = {p: l[0] for p, l in route["ladders"].items()}
+    models = {p: route["default_model"] for p in route["providers"]}
+    models.update({p: c["model"] for p, c in chosen.items()})
+    primary = chosen.get(route["providers"][0]) if route["providers"] else None
+    policy["models_by_provider"] = models
+    policy["model"] = primary["model"] if primary else route["default_model"]
+    route["model"] = primary["key"] if primary else None
+    route["est_cost"] = primary["est_cost"] if primary else None
+    policy["model_route"] = {k: v for k, v in route.items() if k != "ladders"}
+
+
+def escalate(route: Dict[str, Any], policy: Dict[str, Any]) -> bool:
+    """Move every provider to its next larger model; False when there is none."""
+    moved = False
+    for ladder in route.get("ladders", {}).values():
+        if len(ladder) > 1:
+            ladder.pop(0)
+            moved = True
+    if moved:
+        route["escalations"] += 1
+        _apply(route, policy)
+    return moved
+
+
+def model_for(provider_key: str, model: Optional[str], models_by_provider: Optional[Dict[str, str]]) -> Optional[str]:
+    """Model to send to one provider: its own routed model, never another provider's."""
+    if not models_by_provider:
+        return model
+    return models_by_provider.get(provider_key, model)
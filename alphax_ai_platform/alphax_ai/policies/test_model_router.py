@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from alphax_ai_platform.alphax_ai.policies import model_router
+from alphax_ai_platform.alphax_ai.policies.model_router import _ladder, escalate, model_for, size_bucket
+
+
+def _model(name, window, price_in, price_out=None):
+    return {"name": name, "model_name": name, "context_window": window,
+            "price_in_per_1k": price_in, "price_out_per_1k": price_in * 4 if price_out is None else price_out}
+
+
+MINI = _model("mini", 16000, 0.15)
+MID = _model("mid", 128000, 2.5)
+BIG = _model("big", 1000000, 1.0)  # cheaper per token than mid, but larger
+OPEN = _model("open", None, 5.0)  # no context window: always fits
+
+
+def _names(ladder):
+    return [m["name"] for m in ladder]
+
+
+class TestLadder(unittest.TestCase):
+    def test_cheapest_fitting_model_first_then_larger_by_cost(self):
+        self.assertEqual(_names(_ladder([MID, BIG, MINI], 1000)), ["mini", "big", "mid"])
+
+    def test_prompt_too_large_for_the_cheap_model(self):
+        # big is cheaper than mid and fits; mid is smaller, so it is no escalation step
+        self.assertEqual(_names(_ladder([MINI, MID, BIG], 20000)), ["big"])
+        self.assertEqual(_names(_ladder([MINI, MID], 20000)), ["mid"])
+
+    def test_nothing_fits_uses_the_largest(self):
+        self.assertEqual(_names(_ladder([MINI, MID], 500000)), ["mid"])
+
+    def test_unknown_window_always_fits_and_ranks_largest(self):
+        self.assertEqual(_names(_ladder([MINI, OPEN], 1000)), ["mini", "open"])
+        self.assertEqual(_names(_ladder([MINI, OPEN], 900000)), ["open"])
+
+    def test_pinned_override_while_it_fits(self):
+        self.assertEqual(_names(_ladder([MINI, MID, BIG], 1000, pinned=MID)), ["mid", "big"])
+
+    def test_pinned_override_too_small_escalates_past_it(self):
+        self.assertEqual(_names(_ladder([MINI, MID, BIG], 20000, pinned=MINI)), ["big"])
+        self.assertEqual(_names(_ladder([MINI, MID, OPEN], 20000, pinned=MINI)), ["mid", "open"])
+
+    def test_empty(self):
+        self.assertEqual(_ladder([], 1000), [])
+
+    def test_reply_headroom_and_margin_count(self):
+        # 12000 tokens * 1.15 + 1024 reply tokens > 14000 window
+        small = _model("small", 14000, 0.1)
+        self.assertEqual(_names(_ladder([small, MID], 12000)), ["mid"])
+
+
+class TestRouting(unittest.TestCase):
+    def test_size_bucket_is_monotonic_and_bounded(self):
+        self.assertEqual(size_bucket(10), model_router.MIN_BUCKET)
+        buckets = [size_bucket(t) for t in range(513, 50000, 97)]
+        self.assertEqual(buckets, sorted(buckets))
+        for t in (600, 5000, 40000):
+            self.assertGreaterEqual(size_bucket(t), t)
+            self.assertLessEqual(size_bucket(t), t * 1.2)
+
+    def test_escalate_moves_every_provider_once(self):
+        plan = {
+            "bucket": 512, "cached": False, "override": None,
+            "ladders": {
+                "OpenAI": [{"model": "mini", "key": "mini", "est_cost": 0.1}, {"model": "big", "key": "big", "est_cost": 1}],
+                "Azure": [{"model": "azure-big", "key": "azure-big", "est_cost": 1}],
+            },
+        }
+        policy = {"model": "fallback"}
+        with mock.patch.object(model_router, "_cached_plan", return_value=plan):
+            route = model_router.route_models(None, [{"role": "user", "content": "hi"}], policy, ["OpenAI", "Azure", "Other"])
+        self.assertEqual(policy["models_by_provider"], {"OpenAI": "mini", "Azure": "azure-big", "Other": "fallback"})
+        self.assertTrue(escalate(route, policy))
+        self.assertEqual((policy["model"], route["escalations"]), ("big", 1))
+        self.assertFalse(escalate(route, policy))
+        self.assertEqual(model_for("Azure", policy["model"], policy["models_by_provider"]), "azure-big")
+        self.assertEqual(model_for("Azure", "x", None), "x")
@@ -12,4 +12,32 @@ def render_agent_system_prompt(agent_key: str, context: dict, policy: dict):
             f"Context: user={context.get('user')}, company={context.get('company')}, "
             f"doctype={context.get('doctype')}, docname={context.get('docname')}"
         )
+    passages = (context or {}).get("passages") or []
+    if passages:
+        parts.append(
+            "Relevant excerpts from ingested documents (quote them, cite the [number], "
+            "and say so when they do not answer the question):"
+        )
+        for i, p in enumerate(passages, start=1):
+            parts.append(f"[{i}] {p.get('file_name') or p.get('ingested_document')}: {p.get('text')}")
     return "\n".join(parts)
+
+
+EXTRACTION_SYSTEM_PROMPT = (
+    "You extract structured data from business documents for ERPNext. "
+    "Reply with one JSON object and nothing else: keys are the document ids, each value is an object "
+    "with the schema's keys. Use null for values the document does not contain; never guess. "
+    "Dates as YYYY-MM-DD; numbers without thousands separators or currency symbols."
+)
+
+
+def render_extraction_prompt(target_doctype: str, schema: str, documents: list):
+    """User prompt for a batch of documents: [{"id", "text"}] sharing one schema line."""
+    parts = [
+        f"Target: {target_doctype}",
+        f"Schema (! = required; [..] = list of rows): {schema}",
+        "Documents: " + ", ".join(d["id"] for d in documents),
+    ]
+    for d in documents:
+        parts.append(f"<<<{d['id']}\n{d['text']}\n>>>")
+    return "\n\n".join(parts)
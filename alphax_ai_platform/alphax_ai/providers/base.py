@@ -9,6 +9,24 @@ class ProviderResponse:
     content: str
     usage: Dict[str, Any] | None = None
     raw: Any | None = None
+    # routing details (provider that answered, hedges, failovers) when served by ProviderRouter
+    route: Dict[str, Any] | None = None
+
+
+class ProviderError(Exception):
+    """A provider call failed (HTTP 5xx, timeout, malformed reply); callers may fail over."""
+
+
+class RateLimitError(ProviderError):
+    """HTTP 429 from a provider, or no room in the shared limiter before the caller's deadline."""
+
+    def __init__(self, message: str = "Rate limit exceeded", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ContextLengthError(ProviderError):
+    """The prompt does not fit the model's context window; retry on a larger model."""
 
 
 class BaseProvider:
@@ -0,0 +1,334 @@
+"""Shared per-provider rate limits with priority classes.
+
+Every provider call first reserves one request and an estimated token count
+from the provider's per-minute budget (AI Provider: Requests / Tokens per
+Minute). Budgets are shared by all workers through Redis: usage is kept in
+one-second buckets and the last WINDOW_S buckets are summed, so capacity
+returns second by second like a token bucket holding one minute's budget.
+A reservation is an INCRBY plus a read of the window in the same pipeline;
+when it does not fit it is handed back and the caller waits. Two racing
+workers can both back off but never both overrun.
+
+Priority classes:
+
+  - interactive (chat) may use the whole budget;
+  - background (ingestion jobs, backfills) may use the budget minus
+    Interactive Reserve (%), and yields while any interactive caller waits.
+
+A 429 from the provider starts a shared cool-down (its Retry-After, else an
+exponential backoff), so every worker pauses instead of piling on. Wait
+times and admit/reject counts go to the `provider_limiter` metrics series;
+`queue_depths()` reports how many callers wait per provider and class.
+Redis trouble degrades to unlimited calls.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+from frappe import _
+
+from alphax_ai_platform.alphax_ai.policies.model_router import model_for
+
+from .base import BaseProvider, ProviderResponse, RateLimitError
+
+KEY_PREFIX = "alphax_ai:ratelimit"
+WINDOW_S = 60
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+DEFAULT_RESERVE_PERCENT = 20.0
+MAX_WAIT_S = {INTERACTIVE: 20.0, BACKGROUND: 300.0}
+POLL_S = {INTERACTIVE: 0.05, BACKGROUND: 0.5}
+MAX_ATTEMPTS = {INTERACTIVE: 3, BACKGROUND: 6}
+MAX_BACKOFF_S = 30.0
+# tokens held for the reply until the provider reports actual usage
+COMPLETION_ALLOWANCE = 256
+METRICS_SERIES = "provider_limiter"
+
+
+def _key(*parts: Any) -> str:
+    return ":".join([KEY_PREFIX] + [str(p) for p in parts])
+
+
+def _int(v: Any) -> int:
+    if v in (None, b"", ""):
+        return 0
+    return int(float(v.decode() if isinstance(v, bytes) else v))
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Prompt tokens (~4 characters each) plus COMPLETION_ALLOWANCE."""
+    chars = sum(len(m.get("content") or "") for m in messages or [])
+    return chars // 4 + COMPLETION_ALLOWANCE
+
+
+def provider_limits(provider_key: str) -> Dict[str, float]:
+    """{"rpm", "tpm", "reserve"} from the AI Provider record (0 = unlimited)."""
+    try:
+        row = frappe.db.get_value(
+            "AI Provider",
+            provider_key,
+            ["requests_per_minute", "tokens_per_minute", "interactive_reserve_percent"],
+            as_dict=True,
+            cache=True,
+        )
+    except Exception:
+        row = None
+    row = row or {}
+    reserve = row.get("interactive_reserve_percent")
+    return {
+        "rpm": max(0, _int(row.get("requests_per_minute"))),
+        "tpm": max(0, _int(row.get("tokens_per_minute"))),
+        "reserve": DEFAULT_RESERVE_PERCENT if reserve in (None, "") else max(0.0, min(100.0, float(reserve))),
+    }
+
+
+class ProviderLimiter:
+    """Cross-worker request/token budget for one provider."""
+
+    def __init__(self, provider_key: str, limits: Optional[Dict[str, float]] = None):
+        self.provider_key = provider_key
+        self.limits = limits if limits is not None else provider_limits(provider_key)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.limits.get("rpm") or self.limits.get("tpm"))
+
+    def _capacity(self, priority: str) -> Tuple[float, float]:
+        share = 1.0 if priority == INTERACTIVE else 1.0 - self.limits.get("reserve", 0) / 100.0
+        return self.limits.get("rpm", 0) * share, self.limits.get("tpm", 0) * share
+
+    def _bucket_keys(self, cache, kind: str, sec: int) -> List[str]:
+        return [cache.make_key(_key(self.provider_key, kind, s)) for s in range(sec - WINDOW_S + 1, sec + 1)]
+
+    @staticmethod
+    def _free_in(values: List[int], excess: float, sec: int, now: float) -> float:
+        """Seconds until enough of the oldest buckets leave the window to free `excess`."""
+        freed = 0
+        for i, v in enumerate(values):
+            freed += v
+            if freed >= excess:
+                return max(0.0, sec - WINDOW_S + 1 + i + WINDOW_S - now)
+        return float(WINDOW_S)
+
+    def _try_reserve(self, cache, priority: str, tokens: int, now: float) -> Tuple[bool, float, int]:
+        """One round trip: (admitted, seconds to wait otherwise, bucket second)."""
+        sec = int(now)
+        rpm, tpm = self._capacity(priority)
+        req_keys = self._bucket_keys(cache, "req", sec)
+        tok_keys = self._bucket_keys(cache, "tok", sec)
+        pipe = cache.pipeline()
+        pipe.incr(req_keys[-1], 1)
+        pipe.expire(req_keys[-1], WINDOW_S + 5)
+        pipe.incr(tok_keys[-1], tokens)
+        pipe.expire(tok_keys[-1], WINDOW_S + 5)
+        pipe.mget(req_keys)
+        pipe.mget(tok_keys)
+        pipe.get(cache.make_key(_key(self.provider_key, "cooldown")))
+        pipe.hgetall(cache.make_key(_key(self.provider_key, "waiting")))
+        res = pipe.execute()
+        reqs = [_int(v) for v in res[4]]
+        toks = [_int(v) for v in res[5]]
+
+        wait = 0.0
+        cooldown = float(_int(res[6]) if res[6] else 0)
+        if cooldown > now:
+            wait = cooldown - now
+        if rpm and sum(reqs) > rpm:
+            wait = max(wait, self._free_in(reqs, sum(reqs) - rpm, sec, now))
+        if tpm and sum(toks) > tpm:
+            wait = max(wait, self._free_in(toks, sum(toks) - tpm, sec, now))
+        if not wait and priority != INTERACTIVE and _live_waiters(res[7], now).get(INTERACTIVE):
+            wait = POLL_S[priority]  # interactive callers go first
+        if not wait:
+            return True, 0.0, sec
+
+        pipe = cache.pipeline()
+        pipe.incr(req_keys[-1], -1)
+        pipe.incr(tok_keys[-1], -tokens)
+        pipe.execute()
+        return False, wait, sec
+
+    def acquire(self, priority: str, tokens: int, block: bool = True) -> Optional[Dict[str, Any]]:
+        """Block until the budget has room (or raise RateLimitError at the class's deadline).
+
+        With block=False a full budget returns None at once (used for optional
+        calls such as hedged requests).
+        """
+        if not self.enabled:
+            return {"sec": None, "tokens": 0}
+        tpm = self._capacity(priority)[1]
+        if tpm:
+            tokens = min(tokens, int(tpm))  # a prompt larger than the budget still gets through alone
+        start = time.monotonic()
+        deadline = start + MAX_WAIT_S[priority]
+        cache = frappe.cache()
+        waiter = None
+        outcome = "admitted"
+        try:
+            while True:
+                try:
+                    admitted, wait, sec = self._try_reserve(cache, priority, tokens, time.time())
+                except Exception:
+                    return {"sec": None, "tokens": 0}  # Redis unavailable: do not block calls
+                if admitted:
+                    return {"sec": sec, "tokens": tokens}
+                if not block:
+                    outcome = "deferred"
+                    return None
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    outcome = "rejected"
+                    raise RateLimitError(
+                        _("The AI provider {0} is at its rate limit; please retry in {1} seconds.").format(
+                            self.provider_key, int(wait) + 1
+                        ),
+                        retry_after=wait,
+                    )
+                if waiter is None:
+                    waiter = self._enter_queue(cache, priority, deadline - start)
+                time.sleep(max(wait, POLL_S[priority]) * random.uniform(1.0, 1.2))
+        finally:
+            if waiter:
+                self._leave_queue(cache, waiter)
+            self._record(priority, outcome, (time.monotonic() - start) * 1000.0, waited=bool(waiter))
+
+    def settle(self, reservation: Dict[str, Any], actual_tokens: Optional[int]) -> None:
+        """Replace the token estimate with the provider's reported usage."""
+        if not reservation.get("sec") or not actual_tokens:
+            return
+        delta = int(actual_tokens) - int(reservation["tokens"])
+        if not delta:
+            return
+        try:
+            cache = frappe.cache()
+            key = cache.make_key(_key(self.provider_key, "tok", reservation["sec"]))
+            cache.pipeline().incr(key, delta).expire(key, WINDOW_S + 5).execute()
+        except Exception:
+            pass
+
+    def cool_down(self, retry_after: Optional[float], attempt: int) -> float:
+        """Pause every worker after a 429; returns the pause in seconds."""
+        pause = float(retry_after) if retry_after else min(MAX_BACKOFF_S, 2.0 ** attempt) * random.uniform(0.5, 1.0)
+        if self.enabled:
+            try:
+                cache = frappe.cache()
+                key = cache.make_key(_key(self.provider_key, "cooldown"))
+                cache.pipeline().set(key, int(time.time() + pause) + 1, ex=int(pause) + 2).execute()
+            except Exception:
+                pass
+        return pause
+
+    def _enter_queue(self, cache, priority: str, max_wait: float) -> Optional[Tuple[str, str]]:
+        member = f"{priority}:{uuid.uuid4().hex}"
+        key = cache.make_key(_key(self.provider_key, "waiting"))
+        try:
+            cache.pipeline().hset(key, member, int(time.time() + max_wait) + 1).execute()
+        except Exception:
+            return None
+        return key, member
+
+    @staticmethod
+    def _leave_queue(cache, waiter: Tuple[str, str]) -> None:
+        try:
+            cache.pipeline().hdel(*waiter).execute()
+        except Exception:
+            pass
+
+    def _record(self, priority: str, outcome: str, wait_ms: float, waited: bool) -> None:
+        from alphax_ai_platform.alphax_ai.metrics.store import record
+
+        counters = {f"{priority}_{outcome}": 1}
+        if waited:
+            counters[f"{priority}_queued"] = 1
+        record(
+            METRICS_SERIES,
+            {"wait_ms": wait_ms},
+            labels={"provider": self.provider_key, "priority": priority},
+            counters=counters,
+        )
+
+
+def _live_waiters(raw: Optional[Dict[Any, Any]], now: float) -> Dict[str, int]:
+    """Waiters per class; entries of crashed workers expire at their deadline."""
+    out: Dict[str, int] = {}
+    for member, until in (raw or {}).items():
+        if _int(until) < now:
+            continue
+        member = member.decode() if isinstance(member, bytes) else member
+        priority = member.partition(":")[0]
+        out[priority] = out.get(priority, 0) + 1
+    return out
+
+
+def queue_depths() -> Dict[str, Dict[str, int]]:
+    """{provider: {priority: callers waiting}} for every AI Provider."""
+    try:
+        providers = frappe.get_all("AI Provider", pluck="name")
+    except Exception:
+        providers = []
+    if not providers:
+        return {}
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for p in providers:
+        pipe.hgetall(cache.make_key(_key(p, "waiting")))
+    now = time.time()
+    out = {}
+    for p, raw in zip(providers, pipe.execute()):
+        live = _live_waiters(raw, now)
+        out[p] = {priority: live.get(priority, 0) for priority in PRIORITIES}
+    return out
+
+
+def queue_depth_prometheus() -> str:
+    lines = [
+        "# HELP alphax_ai_provider_queue_depth Callers waiting for provider rate-limit capacity.",
+        "# TYPE alphax_ai_provider_queue_depth gauge",
+    ]
+    for provider, by_priority in sorted(queue_depths().items()):
+        for priority, n in by_priority.items():
+            lines.append(f'alphax_ai_provider_queue_depth{{provider="{provider}",priority="{priority}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+class RateLimitedProvider(BaseProvider):
+    """Wraps a provider: waits for shared budget before each call, retries 429s."""
+
+    def __init__(self, provider: BaseProvider, priority: str = INTERACTIVE, limiter: Optional[ProviderLimiter] = None):
+        self.provider = provider
+        self.key = provider.key
+        self.label = provider.label
+        self.priority = priority if priority in PRIORITIES else BACKGROUND
+        self.limiter = limiter or ProviderLimiter(provider.key)
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: Optional[str] = None,
+        temperature: float = 0.2,
+        **kwargs,
+    ) -> ProviderResponse:
+        tokens = estimate_tokens(messages)
+        model = model_for(self.key, model, kwargs.pop("models_by_provider", None))
+        attempt = 0
+        while True:
+            attempt += 1
+            reservation = self.limiter.acquire(self.priority, tokens)
+            try:
+                response = self.provider.chat(messages, model=model, temperature=temperature, **kwargs)
+            except RateLimitError as e:
+                pause = self.limiter.cool_down(e.retry_after, attempt)
+                if attempt >= MAX_ATTEMPTS[self.priority] or pause > MAX_WAIT_S[self.priority]:
+                    raise
+                if not self.limiter.enabled:
+                    time.sleep(pause)  # otherwise the shared cool-down makes acquire() wait
+                continue
+            self.limiter.settle(reservation, (response.usage or {}).get("total_tokens"))
+            return response
@@ -1,13 +1,97 @@
-from typing import Dict, List, Optional
-from .base import BaseProvider, ProviderResponse
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from .base import BaseProvider, ContextLengthError, ProviderError, ProviderResponse, RateLimitError
 
 
 class MockProvider(BaseProvider):
+    """Offline provider for development, tests and benchmarks.
+
+    Optional knobs:
+      - latency_ms / jitter_ms: simulated round-trip time (uniform jitter, seeded)
+      - latency_sigma: log-normal latency instead (median latency_ms, long tail)
+      - error_rate: share of calls failing with ProviderError (like an HTTP 5xx)
+      - context_windows: {model: tokens}; longer prompts (~4 chars/token) raise
+        ContextLengthError like a real provider's context_length_exceeded
+      - responder: callable(messages) -> str to script replies
+      - rate_limit_rpm: answer HTTP-429 style (RateLimitError with retry_after)
+        once more than this many calls arrive within rate_limit_window_s
+    """
+
     key = "mock"
     label = "Mock Provider"
 
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        seed: Optional[int] = None,
+        responder: Optional[Callable[[List[Dict[str, str]]], str]] = None,
+        rate_limit_rpm: Optional[int] = None,
+        rate_limit_window_s: float = 60.0,
+        latency_sigma: float = 0,
+        error_rate: float = 0,
+        key: Optional[str] = None,
+        context_windows: Optional[Dict[str, int]] = None,
+    ):
+        self.latency_ms = float(latency_ms or 0)
+        self.jitter_ms = float(jitter_ms or 0)
+        self.responder = responder
+        self._rng = random.Random(seed)
+        self.latency_sigma = float(latency_sigma or 0)
+        self.error_rate = float(error_rate or 0)
+        if key:
+            self.key = key
+        self.context_windows = dict(context_windows or {})
+        self.models_used: List[Optional[str]] = []
+        self.rate_limit_rpm = int(rate_limit_rpm or 0)
+        self.rate_limit_window_s = float(rate_limit_window_s)
+        self.calls = 0
+        self.rejected = 0
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+
+    def _check_rate_limit(self) -> None:
+        with self._lock:
+            self.calls += 1
+            if not self.rate_limit_rpm:
+                return
+            now = time.monotonic()
+            while self._recent and self._recent[0] <= now - self.rate_limit_window_s:
+                self._recent.popleft()
+            if len(self._recent) >= self.rate_limit_rpm:
+                self.rejected += 1
+                retry_after = self._recent[0] + self.rate_limit_window_s - now
+                raise RateLimitError("429 Too Many Requests (mock)", retry_after=round(retry_after, 3))
+            self._recent.append(now)
+
+    def _simulate_latency(self) -> None:
+        with self._lock:
+            if self.latency_sigma:
+                delay = self.latency_ms * self._rng.lognormvariate(0, self.latency_sigma)
+            else:
+                delay = self.latency_ms
+                if self.jitter_ms:
+                    delay += self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self.error_rate and self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if failed:
+            raise ProviderError("500 Internal Server Error (mock)")
+
     def chat(self, messages: List[Dict[str, str]], *, model: Optional[str] = None, temperature: float = 0.2, **kwargs) -> ProviderResponse:
-        last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
-        content = f"[Mock AI] I received: {last_user}"
+        self._check_rate_limit()
+        self.models_used.append(model)
+        window = self.context_windows.get(model)
+        if window and sum(len(m.get("content") or "") for m in messages) / 4.0 > window:
+            raise ContextLengthError(f"context_length_exceeded: {model} allows {window} tokens (mock)")
+        self._simulate_latency()
+        if self.responder:
+            content = self.responder(messages)
+        else:
+            last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+            content = f"[Mock AI] I received: {last_user}"
         usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost": 0}
         return ProviderResponse(content=content, usage=usage, raw=None)
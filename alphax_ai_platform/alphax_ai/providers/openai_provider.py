@@ -7,8 +7,12 @@ class OpenAIProvider(BaseProvider):
     key = "openai"
     label = "OpenAI"
 
-    def __init__(self):
-        self.api_key = os.environ.get("OPENAI_API_KEY")
+    def __init__(self, key: Optional[str] = None, api_key_env: Optional[str] = None, base_url: Optional[str] = None):
+        # `key` is the AI Provider name, so limits and health are tracked per configured endpoint
+        if key:
+            self.key = key
+        self.api_key = os.environ.get(api_key_env or "OPENAI_API_KEY")
+        self.base_url = base_url
 
     def chat(self, messages: List[Dict[str, str]], *, model: Optional[str] = None, temperature: float = 0.2, **kwargs) -> ProviderResponse:
         # Skeleton stub:
@@ -1,18 +1,118 @@
+import threading
+
 import frappe
+from .limiter import INTERACTIVE, RateLimitedProvider
 from .mock_provider import MockProvider
 from .openai_provider import OpenAIProvider
+from .router import ProviderRouter
+
+VERSION_KEY = "alphax_ai:providers:version"
+
+# per worker: (providers version, [AI Provider rows], Default Provider type)
+_CONFIG = {}
+_LOCK = threading.Lock()
+
+# AI Provider types with a client in this app
+_FACTORIES = {
+    "openai": lambda row: OpenAIProvider(key=row.name, api_key_env=row.secret_env_var, base_url=row.base_url),
+    "mock": lambda row: _mock_provider(key=row.name),
+}
+
+
+def _mock_provider(key=None):
+    """MockProvider with the simulated latency from AI Platform Settings (load tests)."""
+    try:
+        latency_ms = frappe.db.get_single_value("AI Platform Settings", "mock_latency_ms", cache=True)
+        jitter_ms = frappe.db.get_single_value("AI Platform Settings", "mock_jitter_ms", cache=True)
+    except Exception:
+        latency_ms = jitter_ms = 0
+    return MockProvider(latency_ms=latency_ms or 0, jitter_ms=jitter_ms or 0, key=key)
+
+
+def invalidate(doc=None, method=None) -> None:
+    """doc_events hook: AI Provider / AI Platform Settings changed; reload them in all workers."""
+    try:
+        cache = frappe.cache()
+        cache.pipeline().incr(cache.make_key(VERSION_KEY)).execute()
+    except Exception:
+        pass
+
+
+def _version():
+    try:
+        cache = frappe.cache()
+        return cache.pipeline().get(cache.make_key(VERSION_KEY)).execute()[0] or 0
+    except Exception:
+        return None
+
+
+def _load_config():
+    try:
+        default_type = frappe.db.get_single_value("AI Platform Settings", "default_provider")
+    except Exception:
+        default_type = None
+    try:
+        rows = frappe.get_all(
+            "AI Provider",
+            fields=["name", "provider_type", "is_default", "base_url", "secret_env_var"],
+        )
+    except Exception:
+        rows = []
+    return [r for r in rows if r.provider_type in _FACTORIES], default_type
+
+
+def _config():
+    """AI Provider rows and the Default Provider type, cached per worker until invalidate()."""
+    version = _version()
+    site = getattr(frappe.local, "site", None)
+    if version is not None:
+        with _LOCK:
+            hit = _CONFIG.get(site)
+        if hit and hit[0] == version:
+            return hit[1], hit[2]
+    rows, default_type = _load_config()
+    if version is not None:
+        with _LOCK:
+            _CONFIG[site] = (version, rows, default_type)
+    return rows, default_type
 
 
 class ProviderRegistry:
     @staticmethod
-    def get_default_provider():
-        # Read from AI Platform Settings if available; fallback to mock
-        try:
-            provider_key = frappe.db.get_single_value("AI Platform Settings", "default_provider")
-        except Exception:
-            provider_key = None
+    def get_providers():
+        """Configured providers, default first: the AI Provider marked Is Default,
+        then those of the Default Provider type from AI Platform Settings."""
+        rows, default_type = _config()
+        rows.sort(key=lambda r: (not r.is_default, r.provider_type != default_type, r.name))
+        providers = [_FACTORIES[r.provider_type](r) for r in rows]
+        if providers:
+            return providers
 
-        if provider_key == "openai":
-            return OpenAIProvider()
+        # No AI Provider records: the settings' default, as before
+        if default_type == "openai":
+            return [OpenAIProvider()]
+        return [_mock_provider()]
 
-        return MockProvider()
+    @staticmethod
+    def get_default_provider(priority: str = INTERACTIVE):
+        """Default provider behind the shared rate limiter.
+
+        `priority`: "interactive" for user-facing calls (chat), "background"
+        for jobs; background calls leave the AI Provider's interactive
+        reserve free and yield to waiting interactive calls.
+
+        With several AI Providers and Provider Failover enabled the result is
+        a ProviderRouter: failover to the next healthy provider and, for
+        interactive calls, optional hedged requests. Mock providers are only
+        failover targets when the default provider is a mock as well.
+        """
+        providers = ProviderRegistry.get_providers()
+        if not isinstance(providers[0], MockProvider):
+            providers = [providers[0]] + [p for p in providers[1:] if not isinstance(p, MockProvider)]
+        try:
+            failover = frappe.db.get_single_value("AI Platform Settings", "enable_provider_failover", cache=True)
+        except Exception:
+            failover = None
+        if len(providers) > 1 and failover not in (0, "0"):
+            return ProviderRouter(providers, priority)
+        return RateLimitedProvider(providers[0], priority)
@@ -0,0 +1,295 @@
+"""Failover and hedged requests across the configured AI Providers.
+
+ProviderRouter puts the candidates in health order (rolling per-provider
+latency and error rate, kept per worker process) and:
+
+  - fails over to the next provider when a call raises, hits its timeout
+    (Provider Timeout (s)) or cannot get rate-limit capacity in time;
+  - for interactive calls with Hedged Requests enabled, sends the same
+    request to the next provider once the first one has been running longer
+    than its rolling p95 (or Hedge Delay (ms)) and returns whichever answers
+    first. The hedge only goes out if that provider's limiter has room
+    right now, so hedging never queues behind background work.
+
+A provider with BREAKER_FAILURES consecutive failures is skipped for
+BREAKER_OPEN_S seconds (unless every provider is in that state).
+
+Calls run on a small thread pool so a slow call can be raced; the provider
+classes used here only do HTTP and never touch frappe.local. Limiter
+reservations, cool-downs and metrics stay on the request thread.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.metrics.store import percentile
+from alphax_ai_platform.alphax_ai.policies.model_router import model_for
+
+from .base import BaseProvider, ContextLengthError, ProviderError, ProviderResponse, RateLimitError
+from .limiter import BACKGROUND, INTERACTIVE, PRIORITIES, ProviderLimiter, estimate_tokens
+
+STATS_WINDOW = 200
+MIN_SAMPLES = 5
+BREAKER_FAILURES = 3
+BREAKER_OPEN_S = 30.0
+DEFAULT_TIMEOUT_S = 60.0
+# hedge delay until the primary has MIN_SAMPLES latencies
+DEFAULT_HEDGE_MS = 1500.0
+MIN_HEDGE_MS = 50.0
+METRICS_SERIES = "provider_router"
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="alphax_ai_provider")
+
+
+class HealthTracker:
+    """Rolling latency / outcome window per provider key (thread-safe, per process)."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+
+    def observe(self, key: str, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append((latency_ms, ok))
+            if ok:
+                self._failures[key] = 0
+                self._open_until.pop(key, None)
+            else:
+                self._failures[key] = self._failures.get(key, 0) + 1
+                if self._failures[key] >= BREAKER_FAILURES:
+                    self._open_until[key] = time.monotonic() + BREAKER_OPEN_S
+
+    def snapshot(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples.get(key) or ())
+            open_until = self._open_until.get(key, 0.0)
+        latencies = sorted(ms for ms, ok in samples if ok)
+        errors = sum(1 for _ms, ok in samples if not ok)
+        return {
+            "count": len(samples),
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "circuit_open": open_until > time.monotonic(),
+        }
+
+    def rank(self, keys: List[str]) -> List[str]:
+        """Healthiest first: open circuits last, then measured providers by
+        p95 x (1 + 4 x error rate), then unmeasured ones in configured order."""
+
+        def sort_key(item: Tuple[int, str]):
+            index, key = item
+            s = self.snapshot(key)
+            measured = s["count"] >= MIN_SAMPLES and s["p95"] is not None
+            score = s["p95"] * (1 + 4 * s["error_rate"]) if measured else 0.0
+            return (s["circuit_open"], not measured, score, index)
+
+        return [k for _i, k in sorted(enumerate(keys), key=sort_key)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._failures.clear()
+            self._open_until.clear()
+
+
+HEALTH = HealthTracker()
+
+
+def _settings() -> Dict[str, Any]:
+    out = {"hedge": False, "hedge_delay_ms": 0.0, "timeout_s": DEFAULT_TIMEOUT_S}
+    try:
+        get = lambda f: frappe.db.get_single_value("AI Platform Settings", f, cache=True)  # noqa: E731
+        out["hedge"] = bool(int(get("enable_hedged_requests") or 0))
+        out["hedge_delay_ms"] = float(get("hedge_delay_ms") or 0)
+        out["timeout_s"] = float(get("provider_timeout_seconds") or DEFAULT_TIMEOUT_S)
+    except Exception:
+        pass
+    return out
+
+
+def _timed_call(provider: BaseProvider, timeout_s: float, messages, model, temperature, kwargs) -> ProviderResponse:
+    """Runs on the pool; the only place outcomes are recorded, so late answers still count."""
+    start = time.monotonic()
+    try:
+        response = provider.chat(messages, model=model, temperature=temperature, **kwargs)
+    except ContextLengthError:
+        raise  # the prompt's fault, not the provider's
+    except Exception:
+        HEALTH.observe(provider.key, (time.monotonic() - start) * 1000.0, False)
+        raise
+    elapsed = time.monotonic() - start
+    HEALTH.observe(provider.key, elapsed * 1000.0, elapsed <= timeout_s)
+    return response
+
+
+class ProviderRouter(BaseProvider):
+    """Routes one logical call over several providers (failover, optional hedging)."""
+
+    key = "router"
+    label = "Provider Router"
+
+    def __init__(
+        self,
+        providers: List[BaseProvider],
+        priority: str = INTERACTIVE,
+        hedge: Optional[bool] = None,
+        hedge_delay_ms: Optional[float] = None,
+        timeout_s: Optional[float] = None,
+        limiters: Optional[Dict[str, ProviderLimiter]] = None,
+    ):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        settings = _settings()
+        self.providers = {p.key: p for p in providers}
+        self.order = list(self.providers)
+        self.priority = priority if priority in PRIORITIES else BACKGROUND
+        # hedging doubles provider spend; only worth it where a user is waiting
+        self.hedge = (settings["hedge"] if hedge is None else hedge) and self.priority == INTERACTIVE
+        self.hedge_delay_ms = settings["hedge_delay_ms"] if hedge_delay_ms is None else hedge_delay_ms
+        self.timeout_s = settings["timeout_s"] if timeout_s is None else timeout_s
+        self.limiters = limiters or {}
+        for k in self.order:
+            self.limiters.setdefault(k, ProviderLimiter(k))
+
+    def _hedge_after_s(self, key: str) -> float:
+        delay = self.hedge_delay_ms
+        if not delay:
+            stats = HEALTH.snapshot(key)
+            delay = stats["p95"] if stats["p95"] is not None and stats["count"] >= MIN_SAMPLES else DEFAULT_HEDGE_MS
+        return max(MIN_HEDGE_MS, delay) / 1000.0
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: Optional[str] = None,
+        temperature: float = 0.2,
+        **kwargs,
+    ) -> ProviderResponse:
+        tokens = estimate_tokens(messages)
+        models_by_provider = kwargs.pop("models_by_provider", None)
+        queue = HEALTH.rank(self.order)
+        started = time.monotonic()
+        pending: Dict[Future, Tuple[str, Dict[str, Any], float]] = {}
+        route: Dict[str, Any] = {"tried": [], "errors": [], "hedged": False, "failovers": 0}
+        last_error: Optional[BaseException] = None
+        hedge_checked = False
+
+        def launch(key: str, block: bool) -> bool:
+            nonlocal last_error
+            try:
+                reservation = self.limiters[key].acquire(self.priority, tokens, block=block)
+            except RateLimitError as e:
+                last_error = e
+                route["errors"].append(f"{key}: {e}")
+                return False
+            if reservation is None:
+                return False
+            future = _EXECUTOR.submit(
+                _timed_call,
+                self.providers[key],
+                self.timeout_s,
+                messages,
+                model_for(key, model, models_by_provider),
+                temperature,
+                kwargs,
+            )
+            pending[future] = (key, reservation, time.monotonic())
+            route["tried"].append(key)
+            return True
+
+        def fail_over() -> None:
+            while queue and not pending:
+                if launch(queue.pop(0), block=True) and len(route["tried"]) > 1:
+                    route["failovers"] += 1
+
+        fail_over()
+        while pending:
+            now = time.monotonic()
+            wake = min(t0 + self.timeout_s for _k, _r, t0 in pending.values())
+            hedge_due = None
+            if self.hedge and queue and not hedge_checked and len(pending) == 1:
+                key, _r, t0 = next(iter(pending.values()))
+                hedge_due = t0 + self._hedge_after_s(key)
+                wake = min(wake, hedge_due)
+            done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+
+            if not done:
+                now = time.monotonic()
+                for future, (key, _r, t0) in list(pending.items()):
+                    if now >= t0 + self.timeout_s:
+                        pending.pop(future)  # left running; its late answer only feeds HEALTH
+                        last_error = ProviderError(f"{key} timed out after {self.timeout_s:g}s")
+                        route["errors"].append(str(last_error))
+                if hedge_due is not None and now >= hedge_due and pending:
+                    hedge_checked = True
+                    while queue and not route["hedged"]:
+                        route["hedged"] = launch(queue.pop(0), block=False)
+                fail_over()
+                continue
+
+            for future in done:
+                key, reservation, t0 = pending.pop(future)
+                try:
+                    response = future.result()
+                except ContextLengthError:
+                    raise  # same prompt, same model on the others: the caller escalates instead
+                except RateLimitError as e:
+                    self.limiters[key].cool_down(e.retry_after, 1)
+                    last_error = e
+                    route["errors"].append(f"{key}: {e}")
+                    continue
+                except Exception as e:
+                    last_error = e
+                    route["errors"].append(f"{key}: {e}")
+                    continue
+                self.limiters[key].settle(reservation, (response.usage or {}).get("total_tokens"))
+                route.update(provider=key, hedge_won=route["hedged"] and key != route["tried"][0])
+                self._record(route, (time.monotonic() - started) * 1000.0)
+                response.route = route
+                return response
+            fail_over()
+
+        route["provider"] = None
+        self._record(route, (time.monotonic() - started) * 1000.0)
+        if isinstance(last_error, ProviderError):
+            raise last_error
+        raise ProviderError("All AI providers failed: " + "; ".join(route["errors"])) from last_error
+
+    def _record(self, route: Dict[str, Any], total_ms: float) -> None:
+        from alphax_ai_platform.alphax_ai.metrics.store import record
+
+        record(
+            METRICS_SERIES,
+            {"call_ms": total_ms},
+            labels={"provider": route.get("provider") or "failed", "priority": self.priority},
+            counters={
+                "calls": 1,
+                "failed": 0 if route.get("provider") else 1,
+                "failovers": route["failovers"],
+                "hedged": 1 if route["hedged"] else 0,
+                "hedge_won": 1 if route.get("hedge_won") else 0,
+                "provider_errors": len(route["errors"]),
+            },
+        )
+
+
+def health_snapshot(keys: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Rolling stats of this worker process, per provider key."""
+    if keys is None:
+        try:
+            keys = frappe.get_all("AI Provider", pluck="name")
+        except Exception:
+            keys = []
+    return {k: HEALTH.snapshot(k) for k in keys}
@@ -0,0 +1,63 @@
+import frappe
+
+from alphax_ai_platform.alphax_ai.providers import registry
+from alphax_ai_platform.alphax_ai.providers.limiter import RateLimitedProvider
+from alphax_ai_platform.alphax_ai.providers.mock_provider import MockProvider
+from alphax_ai_platform.alphax_ai.providers.registry import ProviderRegistry
+from alphax_ai_platform.alphax_ai.providers.router import ProviderRouter
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+
+def _provider(name, provider_type, is_default=0):
+    return frappe._dict(name=name, provider_type=provider_type, is_default=is_default, base_url=None, secret_env_var=None)
+
+
+class TestProviderRegistry(PatchedTestCase):
+    def setUp(self):
+        self.rows = []
+        self.settings = {"default_provider": "openai", "enable_provider_failover": 1}
+        registry._CONFIG.clear()
+        self.addCleanup(registry._CONFIG.clear)
+        registry.invalidate()
+        self.get_all = self.patch(frappe, "get_all", side_effect=lambda doctype, **kw: list(self.rows))
+        self.get_single_value = self.patch(
+            frappe.db, "get_single_value", create=True, side_effect=lambda dt, f, **kw: self.settings.get(f)
+        )
+        self.get_value = self.patch(frappe.db, "get_value", create=True, return_value=None)
+
+    def test_provider_rows_are_cached_until_invalidated(self):
+        self.rows = [_provider("OpenAI", "openai", 1)]
+        self.assertEqual([p.key for p in ProviderRegistry.get_providers()], ["OpenAI"])
+        self.rows = [_provider("OpenAI", "openai", 1), _provider("Azure", "openai")]
+        self.assertEqual([p.key for p in ProviderRegistry.get_providers()], ["OpenAI"])
+        self.assertEqual(self.get_all.call_count, 1)
+        registry.invalidate()
+        self.assertEqual([p.key for p in ProviderRegistry.get_providers()], ["OpenAI", "Azure"])
+        self.assertEqual(self.get_all.call_count, 2)
+
+    def test_default_first(self):
+        self.rows = [_provider("A Mock", "mock"), _provider("B", "openai"), _provider("C", "openai", 1), _provider("D", "other")]
+        self.assertEqual([p.key for p in ProviderRegistry.get_providers()], ["C", "B", "A Mock"])
+
+    def test_mock_is_not_a_failover_target_for_a_real_default(self):
+        self.rows = [_provider("OpenAI", "openai", 1), _provider("Mock", "mock")]
+        provider = ProviderRegistry.get_default_provider()
+        self.assertIsInstance(provider, RateLimitedProvider)
+        self.assertEqual(provider.key, "OpenAI")
+
+        self.rows.append(_provider("Azure", "openai"))
+        registry.invalidate()
+        router = ProviderRegistry.get_default_provider()
+        self.assertIsInstance(router, ProviderRouter)
+        self.assertEqual(router.order, ["OpenAI", "Azure"])
+
+    def test_mock_default_keeps_mock_failover(self):
+        self.settings["default_provider"] = "mock"
+        self.rows = [_provider("Mock 1", "mock", 1), _provider("Mock 2", "mock")]
+        router = ProviderRegistry.get_default_provider()
+        self.assertIsInstance(router, ProviderRouter)
+        self.assertEqual(router.order, ["Mock 1", "Mock 2"])
+
+    def test_no_rows_falls_back_to_the_settings_type(self):
+        self.settings["default_provider"] = None
+        self.assertIsInstance(ProviderRegistry.get_providers()[0], MockProvider)
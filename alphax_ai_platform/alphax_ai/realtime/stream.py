@@ -1,9 +1,103 @@
+"""Coalesced realtime fan-out to the desk.
+
+Each `frappe.publish_realtime` is one Redis PUBLISH plus one socket.io emit
+per client in the room, so progress producers (ingestion stages, action
+batches, chat streaming) do not call it directly. They `emit` into the
+CoalescingPublisher of the current request or job, which:
+
+  - keeps only the latest payload per `key` (a pending "page 6/40" is
+    replaced by "page 7/40"; updates without a key are all kept, in order);
+  - sends everything pending for one (event, user) room as a single message
+    `{"updates": [...]}`, at most once per FLUSH_INTERVAL_S, or at once when
+    MAX_BATCH updates are pending or an update is `final`;
+  - is flushed by the after_request / after_job hooks (hooks.py), so the
+    last updates of a request or job are never left behind.
+
+Clients listen with `frappe.realtime.on(event, msg => msg.updates.forEach(...))`.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional, Tuple
+
 import frappe
 
+STREAM_EVENT = "alphax_ai_stream"
+FLUSH_INTERVAL_S = 0.25
+MAX_BATCH = 50
+
+
+class CoalescingPublisher:
+    def __init__(self, interval: float = FLUSH_INTERVAL_S, max_batch: int = MAX_BATCH):
+        self.interval = interval
+        self.max_batch = max_batch
+        # (event, user) -> {key: payload}; insertion order is send order
+        self._pending: Dict[Tuple[str, Optional[str]], Dict[Any, Dict[str, Any]]] = {}
+        self._last_sent: Dict[Tuple[str, Optional[str]], float] = {}
+        self._seq = 0
+        self.emitted = 0
+        self.sent = 0
+
+    def emit(
+        self,
+        event: str,
+        payload: Dict[str, Any],
+        key: Any = None,
+        user: Optional[str] = None,
+        final: bool = False,
+    ) -> None:
+        room = (event, user or frappe.session.user)
+        bucket = self._pending.setdefault(room, {})
+        if key is None:
+            self._seq += 1
+            key = ("seq", self._seq)
+        else:
+            bucket.pop(key, None)  # re-insert: the latest update keeps its place at the end
+        bucket[key] = payload
+        self.emitted += 1
+        if final or len(bucket) >= self.max_batch or time.monotonic() - self._last_sent.get(room, 0.0) >= self.interval:
+            self._send(room)
+
+    def flush(self) -> None:
+        """Send everything pending now (end of request/job, or before a slow step)."""
+        for room in list(self._pending):
+            self._send(room)
+
+    def _send(self, room: Tuple[str, Optional[str]]) -> None:
+        bucket = self._pending.pop(room, None)
+        if not bucket:
+            return
+        self._last_sent[room] = time.monotonic()
+        self.sent += 1
+        event, user = room
+        try:
+            frappe.publish_realtime(event, {"updates": list(bucket.values())}, user=user)
+        except Exception:
+            # progress is best-effort; never fail the work being reported on
+            frappe.log_error(frappe.get_traceback(), "AlphaX AI Realtime Publish Failed")
+
+
+def publisher() -> CoalescingPublisher:
+    """The publisher of the current request or job (frappe.local is reset between them)."""
+    pub = getattr(frappe.local, "alphax_ai_publisher", None)
+    if pub is None:
+        pub = frappe.local.alphax_ai_publisher = CoalescingPublisher()
+    return pub
+
+
+def emit(event: str, payload: Dict[str, Any], key: Any = None, user: Optional[str] = None, final: bool = False) -> None:
+    publisher().emit(event, payload, key=key, user=user, final=final)
+
+
+def flush_all(*args, **kwargs) -> None:
+    """hooks.py after_request / after_job."""
+    pub = getattr(frappe.local, "alphax_ai_publisher", None)
+    if pub is not None:
+        pub.flush()
+
+
+def publish(session_id: str, payload: dict, final: bool = False) -> None:
+    """Chat stream update for one session; every chunk is kept (no key), only batched."""
+    emit(STREAM_EVENT, dict(payload, session_id=session_id), final=final)
 
-def publish(session_id: str, payload: dict):
-    frappe.publish_realtime(
-        event=f"alphax_ai_stream::{session_id}",
-        message=payload,
-        user=frappe.session.user,
-    )
@@ -0,0 +1,29 @@
+frappe.query_reports["AI Usage Summary"] = {
+  filters: [
+    {
+      fieldname: "from_date",
+      label: __("From Date"),
+      fieldtype: "Date",
+      default: frappe.datetime.add_days(frappe.datetime.get_today(), -30),
+      reqd: 1,
+    },
+    {
+      fieldname: "to_date",
+      label: __("To Date"),
+      fieldtype: "Date",
+      default: frappe.datetime.get_today(),
+      reqd: 1,
+    },
+    {
+      fieldname: "group_by",
+      label: __("Group By"),
+      fieldtype: "Select",
+      options: "User\nAgent\nProvider\nModel\nDay",
+      default: "User",
+    },
+    { fieldname: "user", label: __("User"), fieldtype: "Link", options: "User" },
+    { fieldname: "agent_key", label: __("Agent Key"), fieldtype: "Data" },
+    { fieldname: "provider", label: __("Provider"), fieldtype: "Data" },
+    { fieldname: "model", label: __("Model"), fieldtype: "Data" },
+  ],
+};
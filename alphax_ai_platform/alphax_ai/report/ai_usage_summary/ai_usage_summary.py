@@ -0,0 +1,75 @@
+"""Chat usage per user / agent / provider / model / day, read from the AI Usage
+Daily rollups (never the raw AI Audit Log, which retention may have archived)."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, getdate, nowdate
+
+GROUP_BY = {
+    "User": "user",
+    "Agent": "agent_key",
+    "Provider": "provider",
+    "Model": "model",
+    "Day": "usage_date",
+}
+
+
+def execute(filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    filters = frappe._dict(filters or {})
+    group = GROUP_BY.get(filters.get("group_by") or "User")
+    if not group:
+        frappe.throw(_("Unknown Group By {0}").format(filters.get("group_by")))
+    to_date = getdate(filters.get("to_date") or nowdate())
+    from_date = getdate(filters.get("from_date") or add_days(to_date, -30))
+
+    conditions = {"usage_date": ["between", [from_date, to_date]]}
+    for key in ("user", "agent_key", "provider", "model"):
+        if filters.get(key):
+            conditions[key] = filters.get(key)
+
+    rows = frappe.get_all(
+        "AI Usage Daily",
+        filters=conditions,
+        fields=[
+            f"{group} as group_value",
+            "sum(calls) as calls",
+            "sum(prompt_tokens) as prompt_tokens",
+            "sum(completion_tokens) as completion_tokens",
+            "sum(total_tokens) as total_tokens",
+            "sum(cost) as cost",
+            "sum(latency_avg_ms * calls) as latency_weighted",
+            "max(latency_p95_ms) as latency_p95_ms",
+            "max(latency_max_ms) as latency_max_ms",
+        ],
+        group_by=group,
+        order_by="cost desc" if group != "usage_date" else "usage_date asc",
+        limit_page_length=0,
+    )
+    for r in rows:
+        r["latency_avg_ms"] = round((r.pop("latency_weighted") or 0) / r["calls"], 1) if r.get("calls") else None
+
+    label = filters.get("group_by") or "User"
+    group_column = {"fieldname": "group_value", "label": _(label), "width": 200}
+    if group == "user":
+        group_column.update(fieldtype="Link", options="User")
+    elif group == "usage_date":
+        group_column.update(fieldtype="Date", width=110)
+    else:
+        group_column["fieldtype"] = "Data"
+    columns = [
+        group_column,
+        {"fieldname": "calls", "label": _("Calls"), "fieldtype": "Int", "width": 90},
+        {"fieldname": "prompt_tokens", "label": _("Prompt Tokens"), "fieldtype": "Int", "width": 120},
+        {"fieldname": "completion_tokens", "label": _("Completion Tokens"), "fieldtype": "Int", "width": 140},
+        {"fieldname": "total_tokens", "label": _("Total Tokens"), "fieldtype": "Int", "width": 120},
+        {"fieldname": "cost", "label": _("Cost"), "fieldtype": "Float", "precision": 4, "width": 100},
+        {"fieldname": "latency_avg_ms", "label": _("Avg Latency (ms)"), "fieldtype": "Float", "width": 130},
+        # percentiles cannot be merged across days; the worst day's is the honest bound
+        {"fieldname": "latency_p95_ms", "label": _("Worst Daily p95 (ms)"), "fieldtype": "Float", "width": 150},
+        {"fieldname": "latency_max_ms", "label": _("Max Latency (ms)"), "fieldtype": "Float", "width": 130},
+    ]
+    return columns, rows
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .chunking import tokenize
+
+K1 = 1.2
+B = 0.75
+MAX_QUERY_TERMS = 32
+
+
+class BM25Index:
+    """Incrementally updatable in-memory BM25 (Okapi) index.
+
+    Entries are identified by an integer id chosen by the caller. Postings
+    keep the per-entry term frequency; collection statistics (N, average
+    length) are maintained on add/remove so scoring never needs a rebuild.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, entry_id: int, text: str) -> None:
+        if entry_id in self.lengths:
+            self.remove(entry_id)
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[entry_id] = tf
+        self.lengths[entry_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, entry_id: int) -> None:
+        # Full postings scan: removals are rare (deletes trigger a rebuild anyway).
+        length = self.lengths.pop(entry_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in list(self.postings):
+            posting = self.postings.get(term)
+            if posting and posting.pop(entry_id, None) is not None and not posting:
+                del self.postings[term]
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        deadline: Optional[float] = None,
+        allowed: Optional[Set[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """Top-k (entry_id, score).
+
+        Terms are scored rarest first (highest idf). Once the upper bound of
+        all remaining terms cannot lift an unseen entry into the top-k, the
+        remaining (long, common) postings are no longer scanned; only the
+        current candidates that can still make it are looked up (MaxScore).
+        When `deadline` (time.monotonic()) passes, the remaining, least
+        informative terms are skipped and the partial scores are returned.
+        """
+        n = len(self.lengths)
+        if not n:
+            return []
+        avg = (self.total_length / n) or 1.0
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self.postings]
+        terms.sort(key=lambda t: len(self.postings[t]))
+
+        scores: Dict[int, float] = {}
+        lengths = self.lengths
+        norm = K1 * (1.0 - B)
+        scale = K1 * B / avg
+        terms = terms[:MAX_QUERY_TERMS]
+        idfs = [math.log(1.0 + (n - len(self.postings[t]) + 0.5) / (len(self.postings[t]) + 0.5)) for t in terms]
+        # max contribution of a term is idf * (K1 + 1) (tf -> infinity)
+        remaining = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + idfs[i] * (K1 + 1.0)
+
+        live: Optional[List[int]] = None
+        for i, term in enumerate(terms):
+            posting = self.postings[term]
+            idf = idfs[i]
+            if live is None and len(scores) >= k:
+                threshold = heapq.nlargest(k, scores.values())[-1]
+                if remaining[i] < threshold:
+                    live = [eid for eid, sc in scores.items() if sc + remaining[i] >= threshold]
+            if live is None:
+                for eid, tf in posting.items():
+                    if allowed is not None and eid not in allowed:
+                        continue
+                    s = idf * tf * (K1 + 1.0) / (tf + norm + scale * lengths[eid])
+                    scores[eid] = scores.get(eid, 0.0) + s
+            else:
+                for eid in live:
+                    tf = posting.get(eid)
+                    if tf:
+                        scores[eid] += idf * tf * (K1 + 1.0) / (tf + norm + scale * lengths[eid])
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List
+
+MAX_WORDS = 120
+OVERLAP_WORDS = 20
+
+_PARA_RE = re.compile(r"\n\s*\n")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Kept short on purpose: BM25's idf already discounts frequent terms, this only
+# drops words that would otherwise dominate posting-list scans.
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "the", "this", "to", "was", "with", "what", "which", "who",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def chunk_text(text: str, max_words: int = MAX_WORDS, overlap: int = OVERLAP_WORDS) -> List[str]:
+    """Split text into passages of at most `max_words` words.
+
+    Paragraphs are packed together while they fit; a paragraph longer than
+    `max_words` is cut into overlapping windows so a sentence spanning the
+    cut is still retrievable from one side.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+
+    def flush():
+        if current:
+            chunks.append(" ".join(current))
+            current.clear()
+
+    for para in _PARA_RE.split(text or ""):
+        words = para.split()
+        if not words:
+            continue
+        if len(words) > max_words:
+            flush()
+            step = max(1, max_words - overlap)
+            for i in range(0, len(words), step):
+                chunks.append(" ".join(words[i:i + max_words]))
+                if i + max_words >= len(words):
+                    break
+            continue
+        if len(current) + len(words) > max_words:
+            flush()
+        current.extend(words)
+    flush()
+    return chunks
+
+
+def tables_to_text(tables: List[Any]) -> str:
+    """Spreadsheet rows as "column: value" lines (one paragraph per row)."""
+    rows = []
+    for t in tables or []:
+        if not isinstance(t, dict):
+            continue
+        for r in t.get("rows") or []:
+            if isinstance(r, dict):
+                rows.append("; ".join(f"{k}: {v}" for k, v in r.items() if v not in (None, "")))
+    return "\n\n".join(rows)
+
+
+def document_chunks(extracted: Dict[str, Any]) -> List[str]:
+    text = extracted.get("text") or ""
+    if not text.strip():
+        text = tables_to_text(extracted.get("tables") or [])
+    return chunk_text(text)
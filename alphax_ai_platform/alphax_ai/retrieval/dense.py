@@ -0,0 +1,173 @@
+"""Optional dense retrieval: hashed bag-of-words embeddings in a memory-mapped matrix.
+
+Embeddings come from the hashing trick (words plus 5-character prefixes,
+signed, log-tf, L2-normalised), so they are deterministic, need no model
+download and work offline. The prefixes make them tolerant of inflections
+("warranties" / "warranty") that BM25's exact terms miss; that is what they
+add on top of BM25, so the fusion weights them below it.
+
+Vectors are appended to a flat float32 file; readers memory-map it and grow
+the mapping when the file grows, so every worker shares one copy through the
+page cache.
+
+NumPy is optional: without it `available()` is False and retrieval falls
+back to BM25 only.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .chunking import tokenize
+
+# NumPy is imported on first use (_numpy), not at import time: web workers
+# that load this module but never search or index do not pay for it.
+np = None
+_np_checked = False
+
+DIM = 512
+PREFIX_CHARS = 5
+DTYPE_BYTES = 4
+BLOCK_ROWS = 8192
+
+
+def _numpy():
+    global np, _np_checked
+    if not _np_checked:
+        try:
+            import numpy  # type: ignore
+        except Exception:  # pragma: no cover - optional dependency
+            numpy = None
+        np = numpy
+        _np_checked = True
+    return np
+
+
+def available() -> bool:
+    return _numpy() is not None
+
+
+def _features(text: str) -> Counter:
+    tokens = tokenize(text)
+    feats = Counter(tokens)
+    feats.update("~" + t[:PREFIX_CHARS] for t in tokens if len(t) > PREFIX_CHARS)
+    return feats
+
+
+def embed(texts: Sequence[str], dim: int = DIM):
+    """(len(texts), dim) float32 matrix of unit-length hashed embeddings."""
+    _numpy()
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feat, tf in _features(text).items():
+            h = zlib.crc32(feat.encode("utf-8"))
+            out[row, h % dim] += (1.0 if (h >> 31) & 1 else -1.0) * (1.0 + np.log(tf))
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+class VectorStore:
+    """Append-only float32 matrix on disk, memory-mapped for search."""
+
+    def __init__(self, path: str, dim: int = DIM):
+        self.path = path
+        self.dim = dim
+        self._map = None
+        self._rows = 0
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * DTYPE_BYTES
+
+    def append(self, vectors) -> int:
+        """Append rows; returns the row number of the first one.
+
+        The append happens under an exclusive lock so concurrent indexing jobs
+        get disjoint row ranges.
+        """
+        import fcntl
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        _numpy()
+        data = np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+        with open(self.path, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if size % self.row_bytes:
+                    # a torn write from a crashed job: pad to the next row boundary
+                    pad = self.row_bytes - size % self.row_bytes
+                    f.write(b"\0" * pad)
+                    size += pad
+                f.write(data)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return size // self.row_bytes
+
+    def matrix(self):
+        try:
+            rows = os.path.getsize(self.path) // self.row_bytes
+        except OSError:
+            return None
+        if not rows:
+            return None
+        _numpy()
+        if self._map is None or rows != self._rows:
+            self._map = np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._rows = rows
+        return self._map
+
+    def search(
+        self,
+        queries,
+        k: int,
+        row_ids: Dict[int, int],
+        deadline: Optional[float] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Batched top-k by cosine similarity for each query row.
+
+        Only rows present in `row_ids` (vector row -> entry id) are eligible;
+        results are returned as (entry_id, score). The matrix is scanned in
+        blocks and the scan stops early once `deadline` has passed.
+        """
+        mat = self.matrix()
+        _numpy()
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if mat is None or not row_ids:
+            return [[] for _ in range(len(q))]
+
+        eligible = np.zeros(mat.shape[0], dtype=bool)
+        rows = np.fromiter((r for r in row_ids if 0 <= r < mat.shape[0]), dtype=np.int64)
+        eligible[rows] = True
+
+        best_rows: List[np.ndarray] = []
+        best_scores: List[np.ndarray] = []
+        for start in range(0, mat.shape[0], BLOCK_ROWS):
+            block = np.asarray(mat[start:start + BLOCK_ROWS])
+            scores = q @ block.T
+            scores[:, ~eligible[start:start + BLOCK_ROWS]] = -np.inf
+            take = min(k, scores.shape[1])
+            idx = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_rows.append(idx + start)
+            best_scores.append(np.take_along_axis(scores, idx, axis=1))
+            if deadline is not None and time.monotonic() > deadline:
+                break
+
+        cand_rows = np.concatenate(best_rows, axis=1)
+        cand_scores = np.concatenate(best_scores, axis=1)
+        out = []
+        for i in range(len(q)):
+            order = np.argsort(-cand_scores[i])[:k]
+            out.append([
+                (row_ids[int(cand_rows[i, j])], float(cand_scores[i, j]))
+                for j in order
+                if np.isfinite(cand_scores[i, j])
+            ])
+        return out
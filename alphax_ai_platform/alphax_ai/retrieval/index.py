@@ -0,0 +1,358 @@
+"""Local retrieval over ingested documents (grounded chat).
+
+Extracted text is chunked into `AI Document Chunk` rows by a background job
+after ingest. Each worker keeps an in-memory BM25 index over those rows and,
+when NumPy is installed, a dense index backed by a shared memory-mapped
+vector file. Both are refreshed incrementally (chunk names are
+autoincrement, so "name > last seen" is the cursor) and rebuilt when a
+deletion bumps the shared Redis version key.
+
+Queries run under a deadline: loading, BM25 term scoring and the dense block
+scan all stop when the budget is spent and return what they have, so a cold
+or very large index degrades recall instead of chat latency.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import frappe
+from frappe.utils import now as now_str
+
+from alphax_ai_platform.alphax_ai.storage.compression import unpack
+
+from . import dense
+from .bm25 import BM25Index
+from .chunking import document_chunks
+
+CHUNK_DOCTYPE = "AI Document Chunk"
+VERSION_KEY = "alphax_ai:retrieval:version"
+LOAD_PAGE = 2000
+REFRESH_SECONDS = 10
+FULL_REBUILD_SECONDS = 3600
+RRF_K = 60
+# Hashed embeddings are a fuzzy lexical signal: they refine BM25, not outvote it.
+DENSE_WEIGHT = 0.5
+# Below this cosine a dense-only hit is hash-collision noise, not a match.
+DENSE_MIN_SIMILARITY = 0.2
+PASSAGE_CHARS = 700
+DEFAULT_TOP_K = 4
+DEFAULT_BUDGET_MS = 150
+
+_lock = threading.Lock()
+_INDEXES: Dict[str, "RetrievalIndex"] = {}
+
+
+def _settings() -> Dict[str, Any]:
+    def get(field, default):
+        try:
+            v = frappe.db.get_single_value("AI Platform Settings", field, cache=True)
+        except Exception:
+            return default
+        return default if v in (None, "") else v
+
+    return {
+        "enabled": int(get("enable_retrieval", 1)),
+        "dense": int(get("enable_dense_retrieval", 1)) and dense.available(),
+        "top_k": int(get("retrieval_top_k", DEFAULT_TOP_K)) or DEFAULT_TOP_K,
+        "budget_ms": float(get("retrieval_budget_ms", DEFAULT_BUDGET_MS)) or DEFAULT_BUDGET_MS,
+    }
+
+
+def _vector_store() -> "dense.VectorStore":
+    return dense.VectorStore(frappe.get_site_path("private", "alphax_ai", "retrieval_vectors.f32"))
+
+
+def _current_version() -> Optional[str]:
+    try:
+        cache = frappe.cache()
+        v = cache.pipeline().get(cache.make_key(VERSION_KEY)).execute()[0]
+        return v.decode() if isinstance(v, bytes) else v
+    except Exception:
+        return None
+
+
+def _bump_version() -> None:
+    try:
+        cache = frappe.cache()
+        cache.pipeline().incr(cache.make_key(VERSION_KEY)).execute()
+    except Exception:
+        pass
+
+
+class RetrievalIndex:
+    """Per-site, per-worker view over AI Document Chunk rows."""
+
+    def __init__(self):
+        self._reset()
+        self.version = None
+        self.last_refresh = 0.0
+        self.last_full = 0.0
+
+    def _reset(self) -> None:
+        self.bm25 = BM25Index()
+        self.documents: Dict[int, str] = {}
+        self.by_document: Dict[str, Set[int]] = {}
+        self.vector_rows: Dict[int, int] = {}
+        self.last_id = 0
+        self.caught_up = False
+        self.store = _vector_store() if dense.available() else None
+
+    def refresh(self, deadline: Optional[float] = None) -> None:
+        now = time.monotonic()
+        version = _current_version()
+        if version != self.version or now - self.last_full > FULL_REBUILD_SECONDS:
+            self._reset()
+            self.version = version
+            self.last_full = now
+        elif self.caught_up and now - self.last_refresh < REFRESH_SECONDS:
+            return
+
+        # Resumable: a cold index loads page by page across requests.
+        while True:
+            rows = frappe.get_all(
+                CHUNK_DOCTYPE,
+                filters={"name": [">", self.last_id]},
+                fields=["name", "ingested_document", "content", "vector_row"],
+                order_by="name asc",
+                limit_page_length=LOAD_PAGE,
+            )
+            for r in rows:
+                self._add(int(r.name), r.ingested_document, r.content, r.vector_row)
+            self.caught_up = len(rows) < LOAD_PAGE
+            if self.caught_up or (deadline is not None and time.monotonic() > deadline):
+                break
+        self.last_refresh = now
+
+    def _add(self, entry_id: int, document: str, content: str, vector_row: Optional[int]) -> None:
+        self.bm25.add(entry_id, content or "")
+        self.documents[entry_id] = document
+        self.by_document.setdefault(document, set()).add(entry_id)
+        if vector_row is not None and int(vector_row) >= 0:
+            self.vector_rows[int(vector_row)] = entry_id
+        self.last_id = max(self.last_id, entry_id)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        deadline: Optional[float] = None,
+        documents: Optional[List[str]] = None,
+        use_dense: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Top-k entries by reciprocal-rank fusion of BM25 and dense ranks."""
+        allowed = None
+        row_ids = self.vector_rows
+        if documents:
+            allowed = set()
+            for d in documents:
+                allowed |= self.by_document.get(d, set())
+            if not allowed:
+                return []
+            row_ids = {r: e for r, e in self.vector_rows.items() if e in allowed}
+
+        depth = max(k * 4, 20)
+        rankings = [(1.0, self.bm25.search(query, depth, deadline=deadline, allowed=allowed))]
+        if use_dense and self.store is not None and row_ids and (deadline is None or time.monotonic() < deadline):
+            ranked = self.store.search(dense.embed([query]), depth, row_ids, deadline=deadline)[0]
+            rankings.append((DENSE_WEIGHT, [(eid, s) for eid, s in ranked if s >= DENSE_MIN_SIMILARITY]))
+
+        fused: Dict[int, float] = {}
+        for weight, ranking in rankings:
+            for rank, (eid, _score) in enumerate(ranking):
+                fused[eid] = fused.get(eid, 0.0) + weight / (RRF_K + rank + 1)
+        top = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [{"chunk": eid, "document": self.documents.get(eid), "score": round(s, 6)} for eid, s in top]
+
+
+def get_index() -> RetrievalIndex:
+    site = getattr(frappe.local, "site", None) or ""
+    with _lock:
+        index = _INDEXES.get(site)
+        if index is None:
+            index = _INDEXES[site] = RetrievalIndex()
+    return index
+
+
+def search(
+    query: str,
+    k: Optional[int] = None,
+    budget_ms: Optional[float] = None,
+    documents: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Permission-filtered passages for `query`.
+
+    Returns [{"ingested_document", "file_name", "chunk_index", "text", "score"}].
+    Only documents the session user can read are returned.
+    """
+    settings = _settings()
+    k = int(k or settings["top_k"])
+    budget = float(budget_ms or settings["budget_ms"])
+    deadline = time.monotonic() + budget / 1000.0
+
+    index = get_index()
+    with _lock:
+        index.refresh(deadline)
+        hits = index.search(query, k * 3, deadline=deadline, documents=documents, use_dense=bool(settings["dense"]))
+    if not hits:
+        return []
+
+    names = list(dict.fromkeys(h["document"] for h in hits if h["document"]))
+    readable = {
+        r.name: r.file_name
+        for r in frappe.get_list(
+            "AI Ingested Document",
+            filters={"name": ["in", names]},
+            fields=["name", "file_name"],
+            limit_page_length=0,
+        )
+    }
+    hits = [h for h in hits if h["document"] in readable][:k]
+    if not hits:
+        return []
+
+    rows = {
+        int(r.name): r
+        for r in frappe.get_all(
+            CHUNK_DOCTYPE,
+            filters={"name": ["in", [h["chunk"] for h in hits]]},
+            fields=["name", "chunk_index", "content"],
+        )
+    }
+    passages = []
+    for h in hits:
+        row = rows.get(h["chunk"])
+        if not row:
+            continue
+        passages.append({
+            "ingested_document": h["document"],
+            "file_name": readable.get(h["document"]),
+            "chunk_index": row.chunk_index,
+            "text": (row.content or "")[:PASSAGE_CHARS],
+            "score": h["score"],
+        })
+    return passages
+
+
+def retrieval_scope(doctype: Optional[str], docname: Optional[str]) -> Optional[List[str]]:
+    """Ingested documents behind the open record (None = search everything)."""
+    if doctype == "AI Ingested Document" and docname:
+        return [docname]
+    if doctype and docname:
+        return frappe.get_all(
+            "AI Ingested Document",
+            filters={"target_doctype": doctype, "created_document": docname},
+            pluck="name",
+        ) or None
+    return None
+
+
+def warm_index() -> bool:
+    """Catch this worker's index up within the retrieval budget (chat prefetch); False when retrieval is off."""
+    settings = _settings()
+    if not settings["enabled"]:
+        return False
+    index = get_index()
+    with _lock:
+        index.refresh(time.monotonic() + settings["budget_ms"] / 1000.0)
+    return True
+
+
+def retrieve_for_chat(
+    message: str,
+    doctype: Optional[str] = None,
+    docname: Optional[str] = None,
+    documents: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Passages for a chat turn, scoped to the open document when it came from an ingest.
+
+    A prefetched `retrieval_scope` can be passed as `documents` instead of
+    doctype/docname.
+    """
+    if not message or not _settings()["enabled"]:
+        return []
+
+    if documents is None:
+        documents = retrieval_scope(doctype, docname)
+
+    try:
+        return search(message, documents=documents)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AlphaX AI Retrieval Failed")
+        return []
+
+
+# --- indexing ---------------------------------------------------------------
+
+def enqueue_indexing(ocr_result: str) -> None:
+    frappe.enqueue(
+        "alphax_ai_platform.alphax_ai.retrieval.index.index_ocr_result",
+        queue="default",
+        job_id=f"alphax_ai_retrieval::{ocr_result}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        ocr_result=ocr_result,
+    )
+
+
+def index_ocr_result(ocr_result: str) -> int:
+    """Chunk one AI OCR Result into AI Document Chunk rows (replacing earlier ones)."""
+    ocr = frappe.db.get_value(
+        "AI OCR Result",
+        ocr_result,
+        ["ingested_document", "extracted_text", "extracted_tables_json"],
+        as_dict=True,
+    )
+    if not ocr:
+        return 0
+
+    if frappe.db.exists(CHUNK_DOCTYPE, {"ocr_result": ocr_result}):
+        frappe.db.delete(CHUNK_DOCTYPE, {"ocr_result": ocr_result})
+        _bump_version()
+
+    try:
+        tables = json.loads(ocr.extracted_tables_json or "[]")
+    except Exception:
+        tables = []
+    chunks = document_chunks({"text": unpack(ocr.extracted_text), "tables": tables})
+    if not chunks:
+        return 0
+
+    first_row = -1
+    if _settings()["dense"]:
+        try:
+            first_row = _vector_store().append(dense.embed(chunks))
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), "AlphaX AI Retrieval Vector Append Failed")
+
+    now = now_str()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        CHUNK_DOCTYPE,
+        ["ingested_document", "ocr_result", "chunk_index", "content", "vector_row", "creation", "modified", "owner", "modified_by"],
+        [
+            (ocr.ingested_document, ocr_result, i, text, first_row + i if first_row >= 0 else -1, now, now, user, user)
+            for i, text in enumerate(chunks)
+        ],
+    )
+    frappe.db.commit()
+    return len(chunks)
+
+
+def reindex_all() -> int:
+    """Background backfill: index every OCR result that has no chunks yet."""
+    done = set(frappe.get_all(CHUNK_DOCTYPE, pluck="ocr_result", distinct=True))
+    count = 0
+    for name in frappe.get_all("AI OCR Result", pluck="name", order_by="creation asc"):
+        if name not in done:
+            count += index_ocr_result(name)
+    return count
+
+
+def remove_document(doc, method=None) -> None:
+    """doc_events hook: drop the chunks of a deleted ingested document."""
+    frappe.db.delete(CHUNK_DOCTYPE, {"ingested_document": doc.name})
+    _bump_version()
@@ -0,0 +1,300 @@
+"""Transparent compression of large text fields.
+
+AI OCR Result.extracted_text, AI Chat Message.content and AI Audit Log
+.trace_json (COMPRESSED_FIELDS) hold most of the app's data. Values longer
+than Compress Text Over (Chars) are stored as
+
+    axz1:<dictionary id or ->:<base64 of the zlib stream>
+
+(plain text that itself starts with the marker is stored as axz1:=:<text>,
+and a value whose dictionary or body does not decode is read back as it is)
+
+compressed with a preset dictionary trained on the site's own rows (zlib's
+zdict: common JSON keys, prompt boilerplate and document headers cost a few
+bits each instead of being spelled out per row). Dictionaries live in AI
+Compression Dictionary, so database backups stay self-contained; they are
+never changed once written, and a value names the one it was packed with.
+
+  - writes: the doctype controllers call `pack_fields` in validate, and
+    `unpack_fields` again once the row is written (after_insert, on_update),
+    so the saved document keeps the original text in memory;
+  - reads: the controllers' load_from_db unpacks, so `frappe.get_doc`, the
+    desk form and /api/resource/<doctype>/<name> return the original text.
+    Column reads (get_all / get_list, report and list views, exports) see
+    the stored form; the app's own such readers call `unpack` (a prefix
+    check for plain values), so only values actually read are decompressed;
+  - existing rows: `compact` rewrites them in keyset batches (the v0_6
+    compaction patch, `bench execute ...storage.compression.compact_all`).
+
+zlib is in the standard library; zstd would need a new dependency and
+unreadable rows if it were ever uninstalled.
+"""
+
+from __future__ import annotations
+
+import base64
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import frappe
+
+MARKER = "axz1:"
+NO_DICTIONARY = "-"
+ESCAPED = "="
+DEFAULT_MIN_CHARS = 4096
+LEVEL = 6
+# packed values must save at least this much to be worth the base64 detour
+MIN_SAVING = 0.1
+DICTIONARY_DOCTYPE = "AI Compression Dictionary"
+DICTIONARY_BYTES = 16 * 1024
+TRAIN_SAMPLES = 200
+MIN_TRAIN_SAMPLES = 20
+COMPACT_BATCH = 200
+ACTIVE_TTL_S = 300
+
+COMPRESSED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "AI OCR Result": ("extracted_text",),
+    "AI Chat Message": ("content",),
+    "AI Audit Log": ("trace_json",),
+}
+
+_lock = threading.Lock()
+# dictionary id -> bytes (immutable, so cached for the life of the process)
+_dictionaries: Dict[str, bytes] = {}
+# (site, doctype, fieldname) -> (dictionary id or None, loaded at)
+_active: Dict[Tuple[str, str, str], Tuple[Optional[str], float]] = {}
+_PIECE_RE = re.compile(r"[^\n,.;]{6,200}[\n,.;]?")
+
+
+def min_chars() -> int:
+    """0 = compression off (values already packed are still read)."""
+    try:
+        v = frappe.db.get_single_value("AI Platform Settings", "compress_text_min_chars", cache=True)
+    except Exception:
+        return DEFAULT_MIN_CHARS
+    return DEFAULT_MIN_CHARS if v in (None, "") else max(0, int(v))
+
+
+def is_packed(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(MARKER)
+
+
+# --- dictionaries -----------------------------------------------------------
+
+
+def _dictionary(dict_id: str) -> bytes:
+    with _lock:
+        cached = _dictionaries.get(dict_id)
+    if cached is not None:
+        return cached
+    raw = frappe.db.get_value(DICTIONARY_DOCTYPE, dict_id, "dictionary")
+    if raw is None:
+        raise ValueError(f"compression dictionary {dict_id} not found")
+    data = base64.b64decode(raw)
+    with _lock:
+        _dictionaries[dict_id] = data
+    return data
+
+
+def active_dictionary(doctype: str, fieldname: str) -> Optional[str]:
+    """Newest dictionary trained for this field (None: pack without one)."""
+    key = (getattr(frappe.local, "site", None) or "", doctype, fieldname)
+    with _lock:
+        hit = _active.get(key)
+    if hit and time.monotonic() - hit[1] < ACTIVE_TTL_S:
+        return hit[0]
+    try:
+        rows = frappe.get_all(
+            DICTIONARY_DOCTYPE,
+            filters={"target_doctype": doctype, "fieldname": fieldname},
+            fields=["name"],
+            order_by="creation desc",
+            limit_page_length=1,
+        )
+    except Exception:
+        rows = []
+    dict_id = rows[0].name if rows else None
+    with _lock:
+        _active[key] = (dict_id, time.monotonic())
+    return dict_id
+
+
+def build_dictionary(samples: List[str], size: int = DICTIONARY_BYTES) -> bytes:
+    """A zlib preset dictionary: the text pieces found in most samples, most common last
+    (zlib reaches the end of the dictionary with the shortest distances)."""
+    counts: Counter = Counter()
+    for s in samples:
+        counts.update(set(_PIECE_RE.findall(s or "")))
+    picked: List[bytes] = []
+    total = 0
+    for piece, n in counts.most_common():
+        if n < 2:
+            break
+        b = piece.encode("utf-8")
+        if total + len(b) > size:
+            continue
+        picked.append(b)
+        total += len(b)
+    return b"".join(reversed(picked))
+
+
+def train(doctype: str, fieldname: str, samples: int = TRAIN_SAMPLES) -> Optional[str]:
+    """Train and store a dictionary from the newest large values of one field; returns its id."""
+    threshold = min_chars() or DEFAULT_MIN_CHARS
+    texts = []
+    for r in frappe.get_all(doctype, fields=[fieldname], order_by="creation desc", limit_page_length=samples * 5):
+        value = unpack(r.get(fieldname))
+        if value and len(value) >= threshold:
+            texts.append(value)
+            if len(texts) >= samples:
+                break
+    if len(texts) < MIN_TRAIN_SAMPLES:
+        return None
+    data = build_dictionary(texts)
+    if not data:
+        return None
+    plain = sum(len(_compress(t.encode("utf-8"), None)) for t in texts)
+    with_dict = sum(len(_compress(t.encode("utf-8"), data)) for t in texts)
+    doc = frappe.get_doc(
+        {
+            "doctype": DICTIONARY_DOCTYPE,
+            "target_doctype": doctype,
+            "fieldname": fieldname,
+            "dictionary": base64.b64encode(data).decode("ascii"),
+            "dictionary_bytes": len(data),
+            "samples": len(texts),
+            "saving_percent": round(100.0 * (1 - with_dict / plain), 2) if plain else 0,
+        }
+    ).insert(ignore_permissions=True)
+    with _lock:
+        _active.pop((getattr(frappe.local, "site", None) or "", doctype, fieldname), None)
+    return doc.name
+
+
+def ensure_dictionaries() -> Dict[str, Optional[str]]:
+    """Scheduler (weekly): train a dictionary for each field that has none yet (once enough rows exist)."""
+    out = {}
+    for doctype, fields in COMPRESSED_FIELDS.items():
+        for fieldname in fields:
+            if not active_dictionary(doctype, fieldname):
+                out[f"{doctype}.{fieldname}"] = train(doctype, fieldname)
+                frappe.db.commit()
+    return out
+
+
+# --- values -----------------------------------------------------------------
+
+
+def _compress(data: bytes, dictionary: Optional[bytes]) -> bytes:
+    c = zlib.compressobj(LEVEL, zdict=dictionary) if dictionary else zlib.compressobj(LEVEL)
+    return c.compress(data) + c.flush()
+
+
+def pack(value: Any, dict_id: Optional[str] = None, threshold: Optional[int] = None) -> Any:
+    """The stored form of `value`: packed when long enough and it pays off, else unchanged."""
+    if not isinstance(value, str):
+        return value
+    if is_packed(value):
+        # already stored form, or plain text that only starts like it
+        return value if _decode(value) is not None else f"{MARKER}{ESCAPED}:{value}"
+    threshold = min_chars() if threshold is None else threshold
+    if not threshold or len(value) < threshold:
+        return value
+    data = value.encode("utf-8")
+    body = base64.b64encode(_compress(data, _dictionary(dict_id) if dict_id else None)).decode("ascii")
+    packed = f"{MARKER}{dict_id or NO_DICTIONARY}:{body}"
+    return packed if len(packed) < len(data) * (1 - MIN_SAVING) else value
+
+
+def _decode(value: str) -> Optional[str]:
+    """The original text of a packed value, or None when it does not decode."""
+    dict_id, _, body = value[len(MARKER):].partition(":")
+    if dict_id == ESCAPED:
+        return body
+    try:
+        d = zlib.decompressobj(zdict=_dictionary(dict_id)) if dict_id != NO_DICTIONARY else zlib.decompressobj()
+        return (d.decompress(base64.b64decode(body, validate=True)) + d.flush()).decode("utf-8")
+    except (ValueError, zlib.error, UnicodeDecodeError):
+        # unknown dictionary, or a body that is not base64 / zlib (binascii.Error is a ValueError)
+        return None
+
+
+def unpack(value: Any) -> Any:
+    """The original text of a stored value (plain values are returned as they are)."""
+    if not is_packed(value):
+        return value
+    text = _decode(value)
+    return value if text is None else text
+
+
+def pack_fields(doc) -> None:
+    """Controller validate: pack this doctype's large fields before they are written."""
+    threshold = min_chars()
+    for fieldname in COMPRESSED_FIELDS.get(doc.doctype, ()):
+        value = doc.get(fieldname)
+        if not isinstance(value, str):
+            continue
+        if is_packed(value):
+            doc.set(fieldname, pack(value))
+        elif threshold and len(value) >= threshold:
+            doc.set(fieldname, pack(value, active_dictionary(doc.doctype, fieldname), threshold))
+
+
+def unpack_fields(doc) -> None:
+    """Controller load_from_db / after write: put the original text back on the document."""
+    for fieldname in COMPRESSED_FIELDS.get(doc.doctype, ()):
+        if is_packed(doc.get(fieldname)):
+            doc.set(fieldname, unpack(doc.get(fieldname)))
+
+
+# --- compaction -------------------------------------------------------------
+
+
+def compact(doctype: str, fieldname: str, batch: int = COMPACT_BATCH) -> Dict[str, int]:
+    """Pack the existing rows of one field, `batch` rows per transaction, in name order."""
+    threshold = min_chars()
+    out = {"rows": 0, "packed": 0, "chars_before": 0, "chars_after": 0}
+    if not threshold:
+        return out
+    dict_id = active_dictionary(doctype, fieldname)
+    last = ""
+    while True:
+        rows = frappe.get_all(
+            doctype,
+            filters={"name": [">", last]},
+            fields=["name", fieldname],
+            order_by="name asc",
+            limit_page_length=batch,
+        )
+        if not rows:
+            return out
+        last = rows[-1].name
+        updates = {}
+        for r in rows:
+            value = r.get(fieldname)
+            out["rows"] += 1
+            if not isinstance(value, str) or is_packed(value) or len(value) < threshold:
+                continue
+            packed = pack(value, dict_id, threshold)
+            if packed is not value:
+                updates[r.name] = {fieldname: packed}
+                out["packed"] += 1
+                out["chars_before"] += len(value)
+                out["chars_after"] += len(packed)
+        if updates:
+            frappe.db.bulk_update(doctype, updates, update_modified=False)
+        frappe.db.commit()
+
+
+def compact_all() -> Dict[str, Dict[str, int]]:
+    """Train missing dictionaries, then compact every compressed field."""
+    ensure_dictionaries()
+    return {
+        f"{doctype}.{fieldname}": compact(doctype, fieldname)
+        for doctype, fields in COMPRESSED_FIELDS.items()
+        for fieldname in fields
+    }
@@ -0,0 +1,105 @@
+import base64
+import os
+import unittest
+from unittest import mock
+
+import frappe
+from frappe.model.document import Document
+
+from alphax_ai_platform.alphax_ai.doctype.ai_chat_message.ai_chat_message import AIChatMessage
+from alphax_ai_platform.alphax_ai.storage import compression
+from alphax_ai_platform.alphax_ai.storage.compression import MARKER, build_dictionary, is_packed, pack, unpack
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+
+TRACE = '{"provider": "openai", "model": "gpt-4o-mini", "tokens_in": %d, "tokens_out": 87, "latency_ms": 912, "tool": null}\n'
+LONG = "".join(TRACE % i for i in range(200))
+
+
+class TestPackUnpack(unittest.TestCase):
+    def test_round_trip_without_dictionary(self):
+        packed = pack(LONG, threshold=100)
+        self.assertTrue(packed.startswith(MARKER + compression.NO_DICTIONARY + ":"))
+        self.assertLess(len(packed), len(LONG))
+        self.assertEqual(unpack(packed), LONG)
+
+    def test_round_trip_with_dictionary(self):
+        zdict = build_dictionary([TRACE % i for i in range(50)])
+        self.assertTrue(zdict)
+        with mock.patch.object(compression, "_dictionary", return_value=zdict):
+            packed = pack(LONG, "DICT-0001", threshold=100)
+            self.assertTrue(packed.startswith(MARKER + "DICT-0001:"))
+            self.assertLess(len(packed), len(pack(LONG, threshold=100)))
+            self.assertEqual(unpack(packed), LONG)
+
+    def test_short_values_and_threshold_off_stay_plain(self):
+        self.assertIs(pack("short", threshold=100), "short")
+        self.assertIs(pack(LONG, threshold=0), LONG)
+        self.assertIs(pack(LONG, threshold=len(LONG) + 1), LONG)
+
+    def test_incompressible_value_stays_plain(self):
+        noise = base64.b64encode(os.urandom(6000)).decode("ascii")
+        self.assertIs(pack(noise, threshold=100), noise)
+
+    def test_non_strings_and_plain_text_pass_through(self):
+        for value in (None, 42, {"a": 1}, "", "plain text"):
+            self.assertEqual(unpack(value), value)
+        self.assertIs(pack(None, threshold=1), None)
+
+    def test_text_that_merely_looks_packed(self):
+        for value in (MARKER + "-:not base64!", MARKER + "-:" + base64.b64encode(b"not zlib").decode()):
+            self.assertTrue(is_packed(value))
+            self.assertEqual(unpack(value), value)
+
+    def test_unknown_dictionary_reads_as_plain_text(self):
+        value = MARKER + "see the docs: this is how packed values look"
+        with mock.patch.object(frappe.db, "get_value", return_value=None, create=True):
+            self.assertEqual(unpack(value), value)
+
+    def test_plain_text_with_the_marker_is_escaped(self):
+        value = MARKER + "see the docs: this is how packed values look"
+        with mock.patch.object(frappe.db, "get_value", return_value=None, create=True):
+            stored = pack(value, threshold=100)
+            self.assertEqual(stored, MARKER + compression.ESCAPED + ":" + value)
+            self.assertIs(pack(stored, threshold=100), stored)
+            self.assertEqual(unpack(stored), value)
+        # even with compression off
+        self.assertEqual(unpack(pack(MARKER + "-:x", threshold=0)), MARKER + "-:x")
+
+    def test_already_packed_is_not_packed_twice(self):
+        packed = pack(LONG, threshold=100)
+        self.assertIs(pack(packed, threshold=100), packed)
+
+
+class TestControllers(PatchedTestCase):
+    def setUp(self):
+        self.patch(compression, "min_chars", return_value=100)
+        self.patch(compression, "active_dictionary", return_value=None)
+
+    def _message(self, content):
+        return AIChatMessage({"doctype": "AI Chat Message", "role": "assistant", "content": content})
+
+    def test_packed_for_the_write_and_plain_after_it(self):
+        doc = self._message(LONG)
+        doc.validate()
+        self.assertTrue(is_packed(doc.content))
+        doc.after_insert()
+        self.assertEqual(doc.content, LONG)
+        doc.validate()
+        doc.on_update()
+        self.assertEqual(doc.content, LONG)
+
+    def test_marker_text_round_trips_through_a_save(self):
+        value = MARKER + "see the docs: short"
+        doc = self._message(value)
+        with mock.patch.object(frappe.db, "get_value", return_value=None, create=True):
+            doc.validate()
+            self.assertEqual(doc.content, MARKER + compression.ESCAPED + ":" + value)
+            doc.after_insert()
+        self.assertEqual(doc.content, value)
+
+    def test_load_from_db_unpacks(self):
+        doc = self._message(pack(LONG, threshold=100))
+        with mock.patch.object(Document, "load_from_db", create=True) as load:
+            self.assertIs(doc.load_from_db(), doc)
+        load.assert_called_once_with()
+        self.assertEqual(doc.content, LONG)
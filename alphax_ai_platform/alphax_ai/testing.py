@@ -0,0 +1,47 @@
+"""Shared fixtures for the app's unit tests (the test_*.py files next to each module).
+
+Rows returned by `frappe.get_all` / documents are plain `frappe._dict`s in the
+tests; `PatchedTestCase.patch` replaces the setUp boilerplate of starting a
+`mock.patch.object` and registering its stop, and `patch_commit_hooks` lets a
+test decide when the transaction "commits".
+"""
+
+from __future__ import annotations
+
+import unittest
+from typing import Any
+from unittest import mock
+
+import frappe
+
+
+class Callbacks(list):
+    """Stand-in for frappe.db.after_commit / after_rollback that the test runs by hand."""
+
+    def add(self, fn) -> None:
+        self.append(fn)
+
+    def run(self) -> None:
+        fns, self[:] = list(self), []
+        for fn in fns:
+            fn()
+
+
+class PatchedTestCase(unittest.TestCase):
+    def patch(self, target: Any, attribute: str, new: Any = mock.DEFAULT, **kwargs) -> Any:
+        """`mock.patch.object(target, attribute, ...)` for the rest of this test; returns the patch.
+
+        Attributes the offline frappe stand-in lacks (frappe.db methods and the
+        like) need `create=True`, as with mock.patch.object.
+        """
+        patcher = mock.patch.object(target, attribute, new, **kwargs)
+        patched = patcher.start()
+        self.addCleanup(patcher.stop)
+        return patched
+
+    def patch_commit_hooks(self):
+        """Replace frappe.db.after_commit / after_rollback; returns both (see `Callbacks`)."""
+        after_commit, after_rollback = Callbacks(), Callbacks()
+        self.patch(frappe.db, "after_commit", after_commit, create=True)
+        self.patch(frappe.db, "after_rollback", after_rollback, create=True)
+        return after_commit, after_rollback
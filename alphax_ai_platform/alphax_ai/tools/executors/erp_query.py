@@ -0,0 +1,361 @@
+"""Read-only ERP query tool (AI Tool `erp_query`).
+
+Lets an agent answer "what are my open POs for supplier X" without pulling
+whole doctypes into the prompt:
+
+    {"doctype": "Purchase Order",
+     "fields": ["name", "transaction_date", "grand_total"],
+     "filters": {"supplier": "ACME Trading Co.", "status": ["in", ["To Receive and Bill", "To Bill"]]},
+     "order_by": "transaction_date desc", "limit": 20}
+
+    {"doctype": "Purchase Order", "filters": {"docstatus": 1},
+     "aggregates": [{"function": "sum", "field": "grand_total"}, {"function": "count"}],
+     "group_by": ["supplier"], "order_by": "sum_grand_total desc"}
+
+  - permissions: runs through `frappe.get_list` as the calling user (role
+    and User Permission rules apply); columns, filters and group-by are
+    limited to fields the user may read at their permlevel, never Password
+    fields, and single/child/virtual doctypes are refused;
+  - limits: at most ERP Query Max Rows rows (the result says `truncated`)
+    and a database statement timeout of ERP Query Timeout (s);
+  - aggregates (count/sum/avg/min/max, group by) run in SQL, so totals over
+    thousands of rows come back as a handful of numbers;
+  - cache: results are kept for ERP Query Cache TTL (s) under (doctype
+    version, permissions hash, query). The hash covers the user, their roles
+    and User Permissions (owner-only rules and shares make results personal);
+    `invalidate` (doc_events "*") bumps the doctype version once the save,
+    submit, cancel, rename or delete is committed (a query running before
+    the commit would otherwise cache the old rows under the new version),
+    with one Redis round trip per transaction, and only for doctypes that
+    have been queried (their version key exists). Writes that bypass
+    controllers (db.set_value, bulk updates) are only picked up when the
+    TTL runs out.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import frappe
+from frappe import _
+
+DEFAULT_ROWS = 20
+DEFAULT_MAX_ROWS = 100
+DEFAULT_TIMEOUT_S = 5
+DEFAULT_CACHE_TTL_S = 300
+MAX_FILTER_VALUES = 100
+VERSION_KEY = "alphax_ai:erp_query:version"
+CACHE_KEY = "alphax_ai:erp_query:result"
+
+OPERATORS = ("=", "!=", ">", ">=", "<", "<=", "like", "not like", "in", "not in", "between", "is")
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+NUMERIC_TYPES = ("Int", "Float", "Currency", "Percent", "Duration")
+STANDARD_FIELDS = {
+    "name": "Data",
+    "owner": "Link",
+    "creation": "Datetime",
+    "modified": "Datetime",
+    "modified_by": "Link",
+    "docstatus": "Int",
+}
+# no column, or not something an agent should read
+SKIPPED_TYPES = ("Password", "Table", "Table MultiSelect", "Section Break", "Column Break", "Tab Break",
+                 "HTML", "Button", "Image", "Fold", "Heading")
+
+
+def _setting(fieldname: str, default: Any) -> Any:
+    try:
+        v = frappe.db.get_single_value("AI Platform Settings", fieldname, cache=True)
+    except Exception:
+        return default
+    return default if v in (None, "") else v
+
+
+def max_rows() -> int:
+    return max(1, int(_setting("erp_query_max_rows", DEFAULT_MAX_ROWS)))
+
+
+def timeout_seconds() -> float:
+    return max(0.0, float(_setting("erp_query_timeout_seconds", DEFAULT_TIMEOUT_S)))
+
+
+def cache_ttl_seconds() -> int:
+    return max(0, int(_setting("erp_query_cache_ttl_seconds", DEFAULT_CACHE_TTL_S)))
+
+
+# --- validation -------------------------------------------------------------
+
+
+def readable_columns(doctype: str, user: str) -> Dict[str, str]:
+    """fieldname -> fieldtype of the columns `user` may read."""
+    meta = frappe.get_meta(doctype)
+    try:
+        from frappe.model import get_permitted_fields
+
+        permitted = set(get_permitted_fields(doctype, user=user))
+    except Exception:
+        permitted = {df.fieldname for df in meta.fields if not (df.get("permlevel") or 0)}
+    columns = dict(STANDARD_FIELDS)
+    for df in meta.fields:
+        if df.fieldtype not in SKIPPED_TYPES and df.fieldname in permitted:
+            columns[df.fieldname] = df.fieldtype
+    return columns
+
+
+def _field(name: Any, columns: Dict[str, str], what: str) -> str:
+    name = str(name or "").strip()
+    if name not in columns:
+        frappe.throw(_("{0}: unknown or not permitted field {1}").format(what, name))
+    return name
+
+
+def _filters(spec: Any, columns: Dict[str, str]) -> List[List[Any]]:
+    """{field: value | [op, value]} or [[field, op, value], ...] -> validated [[field, op, value]]."""
+    if isinstance(spec, dict):
+        items = []
+        for k, v in spec.items():
+            if isinstance(v, (list, tuple)) and len(v) == 2 and str(v[0]).lower() in OPERATORS:
+                items.append([k, v[0], v[1]])
+            else:
+                items.append([k, "in" if isinstance(v, (list, tuple)) else "=", v])
+    else:
+        items = [list(f) for f in spec or []]
+    out = []
+    for f in items:
+        if len(f) != 3:
+            frappe.throw(_("Filters must be [field, operator, value]"))
+        field, op, value = _field(f[0], columns, "filters"), str(f[1]).lower().strip(), f[2]
+        if op not in OPERATORS:
+            frappe.throw(_("Operator {0} is not allowed").format(op))
+        values = value if isinstance(value, (list, tuple)) else [value]
+        if len(values) > MAX_FILTER_VALUES or any(isinstance(v, (dict, list, tuple)) for v in values):
+            frappe.throw(_("Filter values of {0} must be at most {1} plain values").format(field, MAX_FILTER_VALUES))
+        if op == "is" and value not in ("set", "not set"):
+            frappe.throw(_("The is operator takes set or not set"))
+        out.append([field, op, list(value) if isinstance(value, (list, tuple)) else value])
+    # conditions are ANDed: one order, so equivalent queries share a cache entry
+    return sorted(out, key=lambda f: json.dumps(f, sort_keys=True, default=str))
+
+
+def _aggregates(spec: Any, columns: Dict[str, str]) -> List[Tuple[str, str, str]]:
+    """[(function, field, alias)]"""
+    out = []
+    for a in spec or []:
+        if isinstance(a, str):
+            a = {"function": a}
+        fn = str(a.get("function") or "").lower()
+        if fn not in AGGREGATES:
+            frappe.throw(_("Aggregate {0} is not supported ({1})").format(fn, ", ".join(AGGREGATES)))
+        field = _field(a.get("field") or "name", columns, "aggregates")
+        if fn in ("sum", "avg") and columns[field] not in NUMERIC_TYPES:
+            frappe.throw(_("{0} needs a numeric field, {1} is {2}").format(fn, field, columns[field]))
+        out.append((fn, field, "count" if fn == "count" and field == "name" else f"{fn}_{field}"))
+    return out
+
+
+def _order_by(spec: Any, allowed: List[str]) -> Optional[str]:
+    if not spec:
+        return None
+    parts = str(spec).split()
+    direction = parts[1].lower() if len(parts) == 2 else "asc"
+    if len(parts) not in (1, 2) or parts[0] not in allowed or direction not in ("asc", "desc"):
+        frappe.throw(_("order_by must be a selectable field or aggregate, optionally followed by asc or desc"))
+    return f"{parts[0]} {direction}"
+
+
+def normalize(args: Dict[str, Any], user: str) -> Dict[str, Any]:
+    """Validated query: the cache key and the get_list arguments come from this only."""
+    doctype = str(args.get("doctype") or "").strip()
+    if not doctype or not frappe.db.exists("DocType", doctype):
+        frappe.throw(_("Unknown doctype {0}").format(doctype))
+    meta = frappe.get_meta(doctype)
+    if meta.issingle or meta.istable or meta.get("is_virtual"):
+        frappe.throw(_("{0} cannot be queried (single, child or virtual doctype)").format(doctype))
+    if not frappe.has_permission(doctype, "read", user=user):
+        frappe.throw(_("Not permitted to read {0}").format(doctype), frappe.PermissionError)
+
+    columns = readable_columns(doctype, user)
+    group_by = args.get("group_by") or []
+    group_by = [_field(g, columns, "group_by") for g in ([group_by] if isinstance(group_by, str) else group_by)]
+    aggregates = _aggregates(args.get("aggregates"), columns)
+    if group_by and not aggregates:
+        aggregates = [("count", "name", "count")]
+
+    if aggregates:
+        fields = list(group_by)
+        order_by = _order_by(args.get("order_by"), group_by + [a[2] for a in aggregates])
+        if not order_by:
+            order_by = f"{aggregates[0][2]} desc" if group_by else None
+    else:
+        fields = [_field(f, columns, "fields") for f in args.get("fields") or []]
+        if not fields:
+            fields = ["name"] + ([meta.title_field] if meta.title_field in columns and meta.title_field != "name" else [])
+        order_by = _order_by(args.get("order_by"), list(columns)) or "modified desc"
+
+    try:
+        limit = int(args.get("limit") or DEFAULT_ROWS)
+    except (TypeError, ValueError):
+        limit = DEFAULT_ROWS
+    return {
+        "doctype": doctype,
+        "fields": fields,
+        "aggregates": aggregates,
+        "filters": _filters(args.get("filters"), columns),
+        "group_by": group_by,
+        "order_by": order_by,
+        "limit": max(1, min(limit, max_rows())),
+    }
+
+
+# --- execution --------------------------------------------------------------
+
+
+@contextmanager
+def statement_timeout(seconds: float) -> Iterator[None]:
+    """Cap every statement of the block at `seconds` (MariaDB max_statement_time / Postgres statement_timeout)."""
+    db_type = getattr(frappe.db, "db_type", None)
+    if not seconds or db_type not in ("mariadb", "postgres"):
+        yield
+        return
+    if db_type == "mariadb":
+        previous = frappe.db.sql("select @@session.max_statement_time")[0][0]
+        frappe.db.sql("set session max_statement_time = %s", (float(seconds),))
+        restore = ("set session max_statement_time = %s", (previous,))
+    else:
+        previous = frappe.db.sql("show statement_timeout")[0][0]
+        frappe.db.sql("set statement_timeout = %s", (int(seconds * 1000),))
+        restore = ("set statement_timeout = %s", (previous,))
+    try:
+        yield
+    finally:
+        frappe.db.sql(*restore)
+
+
+def _is_timeout(e: Exception) -> bool:
+    check = getattr(frappe.db, "is_statement_timeout", None)
+    try:
+        return bool(check and check(e))
+    except Exception:
+        return False
+
+
+def run_query(q: Dict[str, Any], user: str) -> Dict[str, Any]:
+    select = q["fields"] + [f"{fn}({field}) as {alias}" for fn, field, alias in q["aggregates"]]
+    try:
+        with statement_timeout(timeout_seconds()):
+            rows = frappe.get_list(
+                q["doctype"],
+                fields=select,
+                filters=q["filters"],
+                group_by=", ".join(q["group_by"]) or None,
+                order_by=q["order_by"],
+                limit_page_length=q["limit"] + 1,
+                user=user,
+            )
+    except Exception as e:
+        if _is_timeout(e):
+            frappe.throw(_("The query ran longer than {0}s; add filters to narrow it").format(timeout_seconds()))
+        raise
+    return {
+        "doctype": q["doctype"],
+        "columns": (q["group_by"] + [a[2] for a in q["aggregates"]]) if q["aggregates"] else q["fields"],
+        "rows": [dict(r) for r in rows[: q["limit"]]],
+        "truncated": len(rows) > q["limit"],
+    }
+
+
+# --- cache ------------------------------------------------------------------
+
+
+def permissions_hash(user: str) -> str:
+    """Changes whenever what `user` may see can change: the user, their roles, their User Permissions."""
+    from frappe.permissions import get_user_permissions
+
+    try:
+        user_permissions = get_user_permissions(user)
+    except Exception:
+        user_permissions = None
+    payload = [user, sorted(frappe.get_roles(user)), user_permissions]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _version_key(doctype: str) -> str:
+    return frappe.cache().make_key(f"{VERSION_KEY}:{doctype}")
+
+
+def _version(doctype: str) -> Any:
+    """The doctype's cache version; created (0) on first use, so `invalidate` knows it is queried."""
+    try:
+        key = _version_key(doctype)
+        return frappe.cache().pipeline().set(key, 0, nx=True).get(key).execute()[1] or 0
+    except Exception:
+        return None
+
+
+def invalidate(doc=None, method=None) -> None:
+    """doc_events "*": a document was saved, submitted, cancelled, renamed or deleted;
+    drop its doctype's results once the transaction commits."""
+    doctype = getattr(doc, "doctype", None)
+    if not doctype:
+        return
+    pending = getattr(frappe.local, "alphax_ai_erp_query_pending", None)
+    if pending is None:
+        pending = frappe.local.alphax_ai_erp_query_pending = set()
+        frappe.db.after_commit.add(_bump_pending)
+        frappe.db.after_rollback.add(_drop_pending)
+    pending.add(doctype)
+
+
+def _drop_pending() -> Set[str]:
+    pending = getattr(frappe.local, "alphax_ai_erp_query_pending", None) or set()
+    frappe.local.alphax_ai_erp_query_pending = None
+    return pending
+
+
+def _bump_pending() -> None:
+    """After commit: bump the versions of the changed doctypes that have cached results."""
+    doctypes = sorted(_drop_pending())
+    if not doctypes:
+        return
+    try:
+        cache = frappe.cache()
+        keys = [_version_key(dt) for dt in doctypes]
+        pipe = cache.pipeline()
+        for key in keys:
+            pipe.get(key)
+        queried = [key for key, v in zip(keys, pipe.execute()) if v is not None]
+        if queried:
+            pipe = cache.pipeline()
+            for key in queried:
+                pipe.incr(key)
+            pipe.execute()
+    except Exception:
+        pass
+
+
+def execute(args: Dict[str, Any], user: Optional[str] = None) -> Dict[str, Any]:
+    """AI Tool executor: validated, permission-checked, row- and time-limited query with a result cache."""
+    start = time.perf_counter()
+    user = user or frappe.session.user
+    if isinstance(args, str):
+        args = json.loads(args or "{}")
+    q = normalize(args or {}, user)
+
+    ttl = cache_ttl_seconds()
+    version = _version(q["doctype"]) if ttl else None
+    key = None
+    if version is not None:
+        digest = hashlib.sha1(json.dumps(q, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        key = f"{CACHE_KEY}:{q['doctype']}:{version}:{permissions_hash(user)}:{digest}"
+        hit = frappe.cache().get_value(key)
+        if hit is not None:
+            return dict(hit, cached=True, ms=round((time.perf_counter() - start) * 1000.0, 1))
+
+    result = run_query(q, user)
+    if key:
+        frappe.cache().set_value(key, result, expires_in_sec=ttl)
+    return dict(result, cached=False, ms=round((time.perf_counter() - start) * 1000.0, 1))
@@ -0,0 +1,163 @@
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+import frappe
+
+from alphax_ai_platform.alphax_ai.tools.executors import erp_query
+from alphax_ai_platform.alphax_ai.testing import PatchedTestCase
+from alphax_ai_platform.alphax_ai.tools.executors.erp_query import normalize
+
+COLUMNS = dict(
+    erp_query.STANDARD_FIELDS,
+    supplier="Link",
+    transaction_date="Date",
+    status="Select",
+    grand_total="Currency",
+    title="Data",
+)
+
+
+class _Meta:
+    issingle = istable = 0
+    title_field = "title"
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+        self.fields = [
+            frappe._dict(fieldname="supplier", fieldtype="Link"),
+            frappe._dict(fieldname="grand_total", fieldtype="Currency"),
+            frappe._dict(fieldname="api_secret", fieldtype="Password"),
+            frappe._dict(fieldname="items", fieldtype="Table"),
+            frappe._dict(fieldname="margin", fieldtype="Percent", permlevel=1),
+        ]
+
+    def get(self, key):
+        return self.__dict__.get(key)
+
+
+class ErpQueryTestCase(PatchedTestCase):
+    def setUp(self):
+        self.meta = _Meta()
+        self.patch(frappe.db, "exists", create=True, side_effect=lambda dt, name=None: name != "Nope")
+        self.patch(frappe, "get_meta", side_effect=lambda doctype: self.meta)
+        self.patch(frappe, "has_permission", return_value=True)
+        self.patch(frappe.db, "get_single_value", create=True, return_value=None)
+        self.patch(erp_query, "readable_columns", return_value=dict(COLUMNS))
+
+    def q(self, **args):
+        return normalize(dict({"doctype": "Purchase Order"}, **args), "buyer@example.com")
+
+
+class TestNormalize(ErpQueryTestCase):
+    def test_defaults(self):
+        q = self.q()
+        self.assertEqual((q["fields"], q["order_by"], q["limit"], q["filters"]), (["name", "title"], "modified desc", 20, []))
+
+    def test_limit_is_capped(self):
+        self.assertEqual(self.q(limit=10000)["limit"], erp_query.DEFAULT_MAX_ROWS)
+        self.assertEqual(self.q(limit=0)["limit"], erp_query.DEFAULT_ROWS)
+        self.assertEqual(self.q(limit="many")["limit"], erp_query.DEFAULT_ROWS)
+        with mock.patch.object(frappe.db, "get_single_value", create=True, return_value=5):
+            self.assertEqual(self.q(limit=50)["limit"], 5)
+
+    def test_filter_forms_are_equivalent_and_ordered(self):
+        as_dict = self.q(filters={"supplier": "ACME", "status": ["in", ["To Bill"]], "docstatus": [0, 1]})
+        as_list = self.q(filters=[["docstatus", "in", [0, 1]], ["status", "IN", ["To Bill"]], ["supplier", "=", "ACME"]])
+        self.assertEqual(as_dict["filters"], as_list["filters"])
+        self.assertIn(["supplier", "=", "ACME"], as_dict["filters"])
+
+    def test_aggregates_and_group_by(self):
+        q = self.q(aggregates=[{"function": "sum", "field": "grand_total"}, "count"], group_by="supplier")
+        self.assertEqual(q["aggregates"], [("sum", "grand_total", "sum_grand_total"), ("count", "name", "count")])
+        self.assertEqual((q["fields"], q["order_by"]), (["supplier"], "sum_grand_total desc"))
+        q = self.q(group_by=["supplier"], order_by="count asc")
+        self.assertEqual((q["aggregates"], q["order_by"]), ([("count", "name", "count")], "count asc"))
+
+    def test_rejected_queries(self):
+        bad = (
+            {"doctype": "Nope"},
+            {"fields": ["api_secret"]},
+            {"fields": ["name", "`name`; drop table"]},
+            {"filters": {"margin": 10}},
+            {"filters": [["supplier", "regexp", "A.*"]]},
+            {"filters": [["supplier", "="]]},
+            {"filters": [["supplier", "in", list(range(erp_query.MAX_FILTER_VALUES + 1))]]},
+            {"filters": [["supplier", "in", [{"$ne": 1}]]]},
+            {"filters": [["supplier", "is", "null"]]},
+            {"aggregates": [{"function": "median", "field": "grand_total"}]},
+            {"aggregates": [{"function": "sum", "field": "supplier"}]},
+            {"group_by": "items"},
+            {"order_by": "grand_total; select 1"},
+            {"order_by": "grand_total sideways"},
+            {"aggregates": ["count"], "order_by": "grand_total"},
+        )
+        for args in bad:
+            with self.subTest(args=args), self.assertRaises(frappe.ValidationError):
+                normalize(dict({"doctype": "Purchase Order"}, **args), "buyer@example.com")
+
+    def test_single_child_and_virtual_doctypes_are_refused(self):
+        for flags in ({"issingle": 1}, {"istable": 1}, {"is_virtual": 1}):
+            self.meta = _Meta(**flags)
+            with self.subTest(flags=flags), self.assertRaises(frappe.ValidationError):
+                self.q()
+
+    def test_no_read_permission(self):
+        with mock.patch.object(frappe, "has_permission", return_value=False):
+            with self.assertRaises(frappe.PermissionError):
+                self.q()
+
+
+class TestReadableColumns(unittest.TestCase):
+    def test_permitted_fields_without_password_or_tables(self):
+        import frappe.model
+
+        with mock.patch.object(frappe, "get_meta", return_value=_Meta()), mock.patch.object(
+            frappe.model, "get_permitted_fields", create=True, return_value=["supplier", "api_secret", "items", "grand_total"]
+        ):
+            columns = erp_query.readable_columns("Purchase Order", "buyer@example.com")
+        self.assertEqual(columns["supplier"], "Link")
+        self.assertEqual(columns["grand_total"], "Currency")
+        self.assertIn("name", columns)
+        for hidden in ("api_secret", "items", "margin"):
+            self.assertNotIn(hidden, columns)
+
+
+class TestInvalidate(PatchedTestCase):
+    def setUp(self):
+        self.after_commit, self.after_rollback = self.patch_commit_hooks()
+        self.addCleanup(erp_query._drop_pending)
+        self.doctype = f"Test Query {uuid.uuid4().hex[:8]}"
+        self.addCleanup(lambda: frappe.cache().delete(erp_query._version_key(self.doctype)))
+
+    def save(self):
+        erp_query.invalidate(SimpleNamespace(doctype=self.doctype))
+
+    def commit(self):
+        self.after_rollback[:] = []
+        self.after_commit.run()
+
+    def test_version_is_bumped_once_after_commit(self):
+        before = int(erp_query._version(self.doctype))
+        self.save()
+        self.save()
+        self.assertEqual(int(erp_query._version(self.doctype)), before)
+        self.assertEqual(len(self.after_commit), 1)
+        self.commit()
+        self.assertEqual(int(erp_query._version(self.doctype)), before + 1)
+
+    def test_rollback_keeps_the_version(self):
+        before = int(erp_query._version(self.doctype))
+        self.save()
+        self.after_commit[:] = []
+        self.after_rollback.run()
+        self.assertEqual(int(erp_query._version(self.doctype)), before)
+        self.save()
+        self.commit()
+        self.assertEqual(int(erp_query._version(self.doctype)), before + 1)
+
+    def test_doctypes_never_queried_are_not_written(self):
+        self.save()
+        self.commit()
+        self.assertIsNone(frappe.cache().get(erp_query._version_key(self.doctype)))
@@ -0,0 +1,62 @@
+"""Run AI Tools by key.
+
+An AI Tool names its executor (`executor_path`, a function taking the
+arguments dict and `user`). The runner checks that the tool is enabled and,
+for write tools, that the policy allows them, then calls it as the user.
+Validation and permission errors come back as {"ok": False, "error": ...}
+so an agent can read them and correct its call.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import frappe
+from frappe import _
+
+
+def tool_specs(policy: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Function-calling definitions of the enabled tools the policy allows."""
+    allow_write = bool((policy or {}).get("allow_write_tools"))
+    specs = []
+    for t in frappe.get_all(
+        "AI Tool",
+        filters={"enabled": 1},
+        fields=["tool_key", "label", "description", "parameters_json", "is_write"],
+        order_by="tool_key asc",
+    ):
+        if t.is_write and not allow_write:
+            continue
+        specs.append(
+            {
+                "type": "function",
+                "function": {
+                    "name": t.tool_key,
+                    "description": t.description or t.label,
+                    "parameters": json.loads(t.parameters_json or "{}") or {"type": "object", "properties": {}},
+                },
+            }
+        )
+    return specs
+
+
+def run_tool(tool_key: str, args: Any = None, user: Optional[str] = None, policy: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    tool = frappe.db.get_value("AI Tool", tool_key, ["tool_key", "executor_path", "is_write", "enabled"], as_dict=True)
+    if not tool or not tool.enabled:
+        frappe.throw(_("AI Tool {0} is not available").format(tool_key))
+    if tool.is_write and not (policy or {}).get("allow_write_tools"):
+        frappe.throw(_("AI Tool {0} writes data and the policy does not allow write tools").format(tool_key), frappe.PermissionError)
+    if isinstance(args, str):
+        args = json.loads(args or "{}")
+
+    start = time.perf_counter()
+    executor = frappe.get_attr(tool.executor_path)
+    try:
+        result = executor(args or {}, user=user or frappe.session.user)
+    except (frappe.ValidationError, frappe.PermissionError) as e:
+        # frappe.throw also queued the message for the HTTP response; the agent gets it here instead
+        frappe.clear_messages()
+        return {"ok": False, "tool": tool_key, "error": str(e), "ms": round((time.perf_counter() - start) * 1000.0, 1)}
+    return {"ok": True, "tool": tool_key, "result": result, "ms": round((time.perf_counter() - start) * 1000.0, 1)}
@@ -196,8 +196,25 @@ frappe.pages['alphax-ai-blueprint-wizard'].on_page_load = function(wrapper) {
     if (!file_url) return frappe.msgprint(__('Enter a file URL like /files/xxx.pdf'));
     if (!blueprint_name) return frappe.msgprint(__('Save the blueprint first (or load a template)'));
 
+    const $btn = $root.find('#run_test');
+    if ($btn.prop('disabled')) return;
+    $btn.prop('disabled', true);
     $root.find('#test_out').text(__('Running...'));
-    const msg = await call('alphax_ai_platform.alphax_ai.api.blueprints.test_ingest', { file_url, blueprint_name });
-    $root.find('#test_out').text(JSON.stringify(msg, null, 2));
+    // stage updates arrive batched: { updates: [{ progress_id, stage, done, total, status, final }] }
+    const progress_id = frappe.utils.get_random(12);
+    const on_progress = (data) => {
+      (data.updates || []).filter(u => u.progress_id === progress_id && !u.final).forEach(u => {
+        const count = u.total ? ` ${u.done || 0}/${u.total}` : '';
+        $root.find('#test_out').text(__(u.stage) + count + '...');
+      });
+    };
+    frappe.realtime.on('alphax_ai_ingest_progress', on_progress);
+    try {
+      const msg = await call('alphax_ai_platform.alphax_ai.api.blueprints.test_ingest', { file_url, blueprint_name, progress_id });
+      $root.find('#test_out').text(JSON.stringify(msg, null, 2));
+    } finally {
+      frappe.realtime.off('alphax_ai_ingest_progress', on_progress);
+      $btn.prop('disabled', false);
+    }
   });
 };
@@ -12,8 +12,79 @@ app_include_css = ["/assets/alphax_ai_platform/css/ai_assistant.css", "/assets/a
 fixtures = [
     {"dt": "AI Mapping Template"},
     {"dt": "AI Intake Blueprint"},
+    {"dt": "AI Tool", "filters": [["tool_key", "in", ["erp_query"]]]},
 ]
 
-scheduler_events = {}
+scheduler_events = {
+    "hourly": [
+        "alphax_ai_platform.alphax_ai.actions.executor.resume_stalled_batches",
+        "alphax_ai_platform.alphax_ai.ingestion.splitter.resume_stalled_splits",
+        "alphax_ai_platform.alphax_ai.logs.rollup.rollup_recent",
+    ],
+    "daily_long": [
+        "alphax_ai_platform.alphax_ai.logs.rollup.apply_retention",
+    ],
+    "weekly_long": [
+        "alphax_ai_platform.alphax_ai.storage.compression.ensure_dictionaries",
+    ],
+    "cron": {
+        # watch folders / Maildir inboxes; each AI Intake Source has its own Scan Interval
+        "* * * * *": [
+            "alphax_ai_platform.alphax_ai.ingestion.intake.scan_due_sources",
+        ],
+    },
+}
 
-doc_events = {}
+# Warm-up: preload extractor libraries / prime caches in background workers only
+before_job = ["alphax_ai_platform.alphax_ai.caching.warmup.before_job"]
+after_migrate = ["alphax_ai_platform.alphax_ai.caching.warmup.after_migrate"]
+
+# Per-request query counts for load tests (metrics/queries.py, opt-in per request)
+before_request = ["alphax_ai_platform.alphax_ai.metrics.queries.before_request"]
+
+# Send realtime updates still held by the coalescing publisher (realtime/stream.py)
+after_request = [
+    "alphax_ai_platform.alphax_ai.realtime.stream.flush_all",
+    "alphax_ai_platform.alphax_ai.metrics.queries.after_request",
+]
+after_job = ["alphax_ai_platform.alphax_ai.realtime.stream.flush_all"]
+
+# Master renames/deletions invalidate the in-memory fuzzy match indexes
+_master_index_events = {
+    "on_trash": "alphax_ai_platform.alphax_ai.mapping.resolver.invalidate",
+    "after_rename": "alphax_ai_platform.alphax_ai.mapping.resolver.invalidate",
+}
+
+_model_route_events = {
+    "on_update": "alphax_ai_platform.alphax_ai.policies.model_router.invalidate",
+    "on_trash": "alphax_ai_platform.alphax_ai.policies.model_router.invalidate",
+}
+
+_provider_events = {
+    "on_update": "alphax_ai_platform.alphax_ai.providers.registry.invalidate",
+    "on_trash": "alphax_ai_platform.alphax_ai.providers.registry.invalidate",
+    "after_rename": "alphax_ai_platform.alphax_ai.providers.registry.invalidate",
+}
+
+# Any committed document change drops the ERP query tool's cached results for its doctype
+_erp_query_events = {
+    event: "alphax_ai_platform.alphax_ai.tools.executors.erp_query.invalidate"
+    for event in ("on_update", "on_cancel", "on_update_after_submit", "on_trash", "after_rename")
+}
+
+doc_events = {
+    "*": _erp_query_events,
+    "Supplier": _master_index_events,
+    "Item": _master_index_events,
+    "UOM": _master_index_events,
+    "AI Model": _model_route_events,
+    "AI Agent": _model_route_events,
+    "AI Provider": _provider_events,
+    "AI Platform Settings": {"on_update": "alphax_ai_platform.alphax_ai.providers.registry.invalidate"},
+    "AI Ingested Document": {
+        "on_trash": [
+            "alphax_ai_platform.alphax_ai.retrieval.index.remove_document",
+            "alphax_ai_platform.alphax_ai.ingestion.dedup.remove_document",
+        ],
+    },
+}
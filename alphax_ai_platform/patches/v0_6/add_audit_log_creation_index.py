@@ -0,0 +1,6 @@
+from alphax_ai_platform.alphax_ai.doctype.ai_audit_log import ai_audit_log
+
+
+def execute():
+    """Index AI Audit Log.creation for the daily rollup and retention jobs on existing sites."""
+    ai_audit_log.on_doctype_update()
@@ -0,0 +1,8 @@
+from alphax_ai_platform.alphax_ai.doctype.ai_chat_message import ai_chat_message
+from alphax_ai_platform.alphax_ai.doctype.ai_chat_session import ai_chat_session
+
+
+def execute():
+    """Composite indexes for the keyset-paginated history APIs on existing sites."""
+    ai_chat_session.on_doctype_update()
+    ai_chat_message.on_doctype_update()
@@ -0,0 +1,6 @@
+from alphax_ai_platform.alphax_ai.storage import compression
+
+
+def execute():
+    """Train compression dictionaries and pack existing large OCR text, chat messages and audit traces."""
+    compression.compact_all()
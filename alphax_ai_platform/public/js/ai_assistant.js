@@ -1,5 +1,32 @@
+// Speculative prefetch: opening a form warms the chat context, policy and prompt
+// for that document (api.chat.prefetch), and the assistant uses the last opened
+// document as its context, so the first turn goes straight to the provider.
+// Only users who opened the assistant in this browser session prefetch; everyone
+// else's form loads never reach the server.
+frappe.provide('alphax_ai');
+alphax_ai.agent_key = alphax_ai.agent_key || 'default';
+alphax_ai.context = alphax_ai.context || null;
+alphax_ai.prefetched = alphax_ai.prefetched || {};
+alphax_ai.ASSISTANT_OPENED = 'alphax_ai_assistant_opened';
+
+$(document).on('form-refresh', (e, frm) => {
+  if (!frm || !frm.doc || frm.is_new()) return;
+  alphax_ai.context = { doctype: frm.doctype, docname: frm.doc.name };
+  if (!sessionStorage.getItem(alphax_ai.ASSISTANT_OPENED)) return;
+  // once per document version and agent; the server cache lives about two minutes
+  const key = [alphax_ai.agent_key, frm.doctype, frm.doc.name, frm.doc.modified].join('::');
+  if (Date.now() - (alphax_ai.prefetched[key] || 0) < 60 * 1000) return;
+  alphax_ai.prefetched[key] = Date.now();
+  frappe.xcall('alphax_ai_platform.alphax_ai.api.chat.prefetch', {
+    agent_key: alphax_ai.agent_key,
+    doctype: frm.doctype,
+    docname: frm.doc.name
+  }).catch(() => {});
+});
+
 frappe.pages['alphax-ai-assistant'] = {
   on_page_load: function(wrapper) {
+    sessionStorage.setItem(alphax_ai.ASSISTANT_OPENED, '1');
     frappe.ui.make_app_page({
       parent: wrapper,
       title: 'AlphaX AI Platform',
@@ -28,6 +55,7 @@ frappe.pages['alphax-ai-assistant'] = {
           <div class="alphax-ai-row alphax-ai-row-right">
             <button class="btn btn-secondary" id="alphax-ai-send">Send</button>
           </div>
+          <div class="alphax-ai-subtitle" id="alphax-ai-context"></div>
           <div class="alphax-ai-output" id="alphax-ai-output"></div>
         </div>
       </div>
@@ -35,6 +63,13 @@ frappe.pages['alphax-ai-assistant'] = {
 
     let session_id = null;
 
+    const show_context = () => {
+      const ctx = alphax_ai.context;
+      $('#alphax-ai-context').text(ctx ? __('Context: {0} {1}', [__(ctx.doctype), ctx.docname]) : '');
+    };
+    show_context();
+    $(wrapper).on('show', show_context);
+
     function append(msg, cls) {
       const el = document.getElementById('alphax-ai-output');
       el.insertAdjacentHTML('beforeend', `<div class="alphax-ai-msg ${cls}">${frappe.utils.escape_html(msg)}</div>`);
@@ -47,22 +82,45 @@ frappe.pages['alphax-ai-assistant'] = {
       append('New session started.', 'system');
     });
 
+    // Key of the last unanswered turn: re-sending the same text after a
+    // timeout reuses it, so the server replays the first reply.
+    let pending = null;
+
     $('#alphax-ai-send').on('click', async () => {
       const agent_key = $('#alphax-ai-agent').val() || 'default';
+      alphax_ai.agent_key = agent_key;
+      const ctx = alphax_ai.context || {};
       const message = $('#alphax-ai-message').val();
-      if (!message) return;
+      const $btn = $('#alphax-ai-send');
+      if (!message || $btn.prop('disabled')) return;
+
+      if (!pending || pending.message !== message || pending.session_id !== session_id) {
+        pending = { message, session_id, key: frappe.utils.get_random(20) };
+      }
 
       append(message, 'user');
       $('#alphax-ai-message').val('');
+      $btn.prop('disabled', true);
 
-      const r = await frappe.call('alphax_ai_platform.alphax_ai.api.chat.chat', {
-        agent_key,
-        message,
-        session_id
-      });
+      try {
+        const r = await frappe.call('alphax_ai_platform.alphax_ai.api.chat.chat', {
+          agent_key,
+          message,
+          session_id,
+          doctype: ctx.doctype,
+          docname: ctx.docname,
+          idempotency_key: pending.key
+        });
 
-      session_id = r.message.session_id;
-      append(r.message.reply, 'assistant');
+        pending = null;
+        session_id = r.message.session_id;
+        append(r.message.reply, 'assistant');
+      } catch (e) {
+        $('#alphax-ai-message').val(message);
+        append('Request failed; press Send to retry.', 'system');
+      } finally {
+        $btn.prop('disabled', false);
+      }
     });
   }
 };
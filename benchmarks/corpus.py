@@ -0,0 +1,280 @@
+"""Deterministic synthetic corpora for the offline benchmarks.
+
+Every generator takes an explicit `seed` so two runs (or two commits) time
+exactly the same inputs. Generators that need optional libraries (openpyxl,
+Pillow) return None when the library is missing; the runner then records the
+case as skipped.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import random
+from typing import List, Optional, Tuple
+
+SUPPLIERS = [
+    "ACME Trading Co.",
+    "Gulf Industrial Supplies LLC",
+    "Al Noor Electrical Est.",
+    "Northwind Traders",
+    "Riyadh Office Solutions",
+]
+PRODUCTS = [
+    "Steel Pipe 2in", "Copper Cable 4mm", "Office Chair Ergonomic", "A4 Paper Ream",
+    "LED Panel 60x60", "Safety Helmet White", "Hydraulic Oil 20L", "Laptop 14in",
+]
+UOMS = ["Nos", "Box", "Kg", "Meter", "Unit"]
+
+
+def _items(n: int, rng: random.Random) -> List[dict]:
+    rows = []
+    for i in range(n):
+        qty = rng.randint(1, 500)
+        rate = round(rng.uniform(1, 2500), 2)
+        rows.append({
+            "item_code": f"ITM-{i:05d}",
+            "description": f"{rng.choice(PRODUCTS)} #{i}",
+            "qty": qty,
+            "rate": rate,
+            "uom": rng.choice(UOMS),
+            "amount": round(qty * rate, 2),
+        })
+    return rows
+
+
+def po_text(lines: int, seed: int = 7) -> str:
+    """Purchase-order-like plain text with `lines` parseable item lines."""
+    rng = random.Random(seed)
+    head = [
+        f"Supplier: {rng.choice(SUPPLIERS)}",
+        f"Date: 2026-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "Delivery Date: 2026-11-30",
+        "Currency: SAR",
+        "Contact: purchasing@example.com",
+        "",
+    ]
+    body = []
+    for i, it in enumerate(_items(lines, rng), start=1):
+        body.append(f"{i}  {it['description']}  {it['qty']}  {it['rate']:.2f}  {it['amount']:.2f}")
+    return "\n".join(head + body)
+
+
+def scan_pages(documents: int, seed: int = 7) -> Tuple[List[str], List[int]]:
+    """Page texts of a batch scan holding `documents` invoices back to back.
+
+    Invoices run 1-3 pages; about half print "Page x of y", the rest rely on
+    letterhead / invoice number only. Returns (pages, first page index of each
+    invoice) so boundary detection can be checked against the truth.
+    """
+    rng = random.Random(seed)
+    pages: List[str] = []
+    starts: List[int] = []
+    for d in range(documents):
+        supplier = SUPPLIERS[d % len(SUPPLIERS)] if d % 7 else rng.choice(SUPPLIERS)
+        n_pages = rng.randint(1, 3)
+        numbered = rng.random() < 0.5
+        starts.append(len(pages))
+        items = _items(rng.randint(n_pages * 5, n_pages * 15), rng)
+        per_page = -(-len(items) // n_pages)
+        for p in range(n_pages):
+            head = [supplier, "P.O. Box 1234, Riyadh", "TAX INVOICE" if p == 0 else "Invoice (continued)"]
+            if p == 0:
+                head += [f"Invoice No: INV-{seed}{d:04d}", f"Supplier: {supplier}", f"Date: 2026-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"]
+            else:
+                head += [f"Invoice No: INV-{seed}{d:04d}"]
+            body = [
+                f"{it['description']}  {it['qty']}  {it['rate']:.2f}  {it['amount']:.2f}"
+                for it in items[p * per_page:(p + 1) * per_page]
+            ]
+            foot = [f"Page {p + 1} of {n_pages}"] if numbered else []
+            pages.append("\n".join(head + body + foot))
+    return pages, starts
+
+
+def raw_cells(count: int, seed: int = 7) -> dict:
+    """Spreadsheet-style raw cells as users send them: mixed date styles,
+    amounts with currency and separators, Arabic-Indic digits, phones."""
+    rng = random.Random(seed)
+    arabic = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+    dates, amounts, phones = [], [], []
+    for _ in range(count):
+        d, m = rng.randint(1, 28), rng.randint(1, 12)
+        dates.append(rng.choice([f"2026-{m:02d}-{d:02d}", f"{d:02d}/{m:02d}/2026", f"{d} Mar 2026", f"{d:02d}.{m:02d}.26"]))
+        v = rng.uniform(1, 250000)
+        amounts.append(rng.choice([f"{v:,.2f}", f"SAR {v:,.2f}", f"{v:.2f}".replace(".", ","), f"{v:,.2f}".translate(arabic)]))
+        phones.append(rng.choice(["05", "+9665", "009665"]) + "".join(str(rng.randint(0, 9)) for _ in range(8)))
+    return {"dates": dates, "amounts": amounts, "phones": phones}
+
+
+def employee_text(seed: int = 7) -> str:
+    rng = random.Random(seed)
+    return "\n".join([
+        f"Full Name: Employee {rng.randint(1000, 9999)}",
+        "Nationality: Saudi",
+        "Gender: Male",
+        "Date of Birth: 12/04/1990",
+        "Joining Date: 01-02-2026",
+        "Mobile: +966 55 123 4567",
+        "Email: employee@example.com",
+        "National ID: 1098765432",
+        "Designation: Procurement Officer",
+    ])
+
+
+FIRST_NAMES = ["Ahmed", "Sara", "Omar", "Lina", "Khalid", "Noura", "Faisal", "Huda"]
+LAST_NAMES = ["Al Harbi", "Qahtani", "Hassan", "Saleh", "Mansour", "Yousef"]
+
+
+def employee_rows(count: int, seed: int = 7, invalid_every: int = 50) -> List[dict]:
+    """Spreadsheet rows of an HR onboarding sheet; every `invalid_every`-th row has a bad date."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        rows.append({
+            "Employee Name": f"{first} {last}",
+            "First Name": first,
+            "Last Name": last,
+            "Gender": rng.choice(["Male", "Female"]),
+            "Date of Birth": "31/02/1990" if invalid_every and i % invalid_every == 7 else f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1965, 2003)}",
+            "Date of Joining": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 00:00:00",
+            "Mobile": 966500000000.0 + i,
+            "Designation": rng.choice(["Accountant", "Engineer", "Driver", "Technician"]),
+        })
+    return rows
+
+
+def po_csv(rows: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=["item_code", "description", "qty", "rate", "uom", "amount"])
+    writer.writeheader()
+    writer.writerows(_items(rows, rng))
+    return buf.getvalue().encode("utf-8")
+
+
+def po_xlsx(rows: int, seed: int = 7) -> Optional[bytes]:
+    try:
+        from openpyxl import Workbook  # type: ignore
+    except Exception:
+        return None
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    cols = ["item_code", "description", "qty", "rate", "uom", "amount"]
+    ws.append(cols)
+    for it in _items(rows, rng):
+        ws.append([it[c] for c in cols])
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def _pdf_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_text(pages: int, lines_per_page: int = 40, seed: int = 7) -> bytes:
+    """Minimal multi-page PDF with a real text layer (Helvetica), no dependencies."""
+    text_lines = po_text(pages * lines_per_page, seed=seed).splitlines()
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog_id = add(b"")  # placeholder, filled below
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for p in range(pages):
+        chunk = text_lines[p * lines_per_page:(p + 1) * lines_per_page] or [" "]
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in chunk:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append(f"(Page {p + 1} of {pages}) Tj")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref))
+    return out.getvalue()
+
+
+def png_image(width: int, height: int, seed: int = 7) -> Optional[bytes]:
+    try:
+        from PIL import Image, ImageDraw  # type: ignore
+    except Exception:
+        return None
+    img = Image.new("L", (width, height), color=255)
+    draw = ImageDraw.Draw(img)
+    y = 10
+    for line in po_text(max(1, height // 20), seed=seed).splitlines():
+        draw.text((10, y), line, fill=0)
+        y += 16
+        if y > height - 16:
+            break
+    bio = io.BytesIO()
+    img.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+CLAUSES = [
+    "Payment terms are net {n} days from the invoice date",
+    "Delivery to the {city} warehouse within {n} working days",
+    "A penalty of {n} percent applies per week of late delivery",
+    "Warranty covers manufacturing defects for {n} months",
+    "Prices are valid for {n} days and exclude VAT",
+    "The supplier shall provide {n} copies of the test certificates",
+    "Goods are inspected on arrival and rejected items are returned within {n} days",
+    "Either party may terminate with {n} days written notice",
+]
+CITIES = ["Riyadh", "Jeddah", "Dammam", "Dubai", "Doha"]
+
+
+def passages(count: int, seed: int = 7) -> List[str]:
+    """Contract/quote-like passages (a few clauses each) for retrieval benchmarks."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(count):
+        clauses = [rng.choice(CLAUSES).format(n=rng.randint(1, 120), city=rng.choice(CITIES)) for _ in range(rng.randint(3, 6))]
+        out.append(f"{rng.choice(SUPPLIERS)} quotation Q-{i:06d}. " + ". ".join(clauses) + ".")
+    return out
+
+
+def redaction_context(docs: int, seed: int = 7) -> dict:
+    """Nested context shaped like build_context output, sprinkled with emails."""
+    rng = random.Random(seed)
+    return {
+        "user": "buyer@example.com",
+        "roles": ["Purchase User", "Employee"],
+        "company": "Bench Co",
+        "docs": [
+            {
+                "name": f"PO-{i:05d}",
+                "notes": f"Contact supplier{rng.randint(1, 99)}@vendor{i % 7}.com about item {i}",
+                "lines": [f"line {j} owner{j}@example.org" for j in range(5)],
+            }
+            for i in range(docs)
+        ],
+    }
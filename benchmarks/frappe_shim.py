@@ -0,0 +1,464 @@
+"""Frappe-less stand-in used only by the offline benchmarks.
+
+It implements just enough of the `frappe` surface used by the ingestion and
+chat hot paths (get_doc/insert, get_meta, db.set_value, cache, permissions,
+site paths) on top of in-memory dicts, so the real application code can be
+timed without MariaDB, Redis or a running bench.
+
+Call `install()` before importing any `alphax_ai_platform` module.
+"""
+
+from __future__ import annotations
+
+import enum
+import json
+import re
+import sys
+import tempfile
+import threading
+import types
+import uuid
+from typing import Any, Dict, List, Optional
+
+
+class ShimError(Exception):
+    pass
+
+
+class _dict(dict):
+    """frappe._dict: dict with attribute access."""
+
+    def __getattr__(self, key):
+        return self.get(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+class Doc(dict):
+    """dict with attribute access and the Document methods the app calls."""
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            return None
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def insert(self, ignore_permissions=False, **kwargs):
+        DB.insert(self)
+        return self
+
+    def save(self, ignore_permissions=False, **kwargs):
+        DB.insert(self)
+        return self
+
+    def append(self, fieldname, row):
+        self.setdefault(fieldname, []).append(Doc(row))
+
+    def set(self, fieldname, value):
+        self[fieldname] = value
+
+    def as_dict(self):
+        return dict(self)
+
+    def db_set(self, fieldname, value, **kwargs):
+        self[fieldname] = value
+
+
+class _Field(Doc):
+    pass
+
+
+class _Meta:
+    def __init__(self, doctype: str, fields: List[Dict[str, Any]]):
+        self.name = doctype
+        self.fields = [_Field(f) for f in fields]
+
+    def get_field(self, fieldname):
+        return next((f for f in self.fields if f.fieldname == fieldname), None)
+
+    def has_field(self, fieldname):
+        return self.get_field(fieldname) is not None
+
+
+# Minimal target doctype metas: required fields drive validate_for_doctype.
+META: Dict[str, List[Dict[str, Any]]] = {
+    "Purchase Order": [
+        {"fieldname": "supplier", "label": "Supplier", "fieldtype": "Link", "reqd": 1},
+        {"fieldname": "transaction_date", "label": "Date", "fieldtype": "Date", "reqd": 1},
+        {"fieldname": "schedule_date", "label": "Required By", "fieldtype": "Date"},
+        {"fieldname": "currency", "label": "Currency", "fieldtype": "Link"},
+        {"fieldname": "items", "label": "Items", "fieldtype": "Table", "reqd": 1},
+    ],
+    "Employee": [
+        {"fieldname": "first_name", "label": "First Name", "fieldtype": "Data", "reqd": 1},
+        {"fieldname": "employee_name", "label": "Full Name", "fieldtype": "Data"},
+        {"fieldname": "gender", "label": "Gender", "fieldtype": "Link", "reqd": 1},
+        {"fieldname": "date_of_birth", "label": "Date of Birth", "fieldtype": "Date", "reqd": 1},
+        {"fieldname": "date_of_joining", "label": "Date of Joining", "fieldtype": "Date", "reqd": 1},
+    ],
+}
+
+
+class _Callbacks(list):
+    """frappe.db.after_commit / after_rollback: queued until commit() / rollback()."""
+
+    def add(self, fn):
+        self.append(fn)
+
+    def run(self):
+        fns, self[:] = list(self), []
+        for fn in fns:
+            fn()
+
+
+class _DB:
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Doc]] = {}
+        self.singles: Dict[str, Dict[str, Any]] = {}
+        self.query_count = 0
+        self.db_type = "mariadb"
+        self.after_commit = _Callbacks()
+        self.after_rollback = _Callbacks()
+
+    def reset(self):
+        self.tables.clear()
+        self.query_count = 0
+
+    def insert(self, doc: Doc):
+        self.query_count += 1
+        if not doc.get("name"):
+            doc["name"] = uuid.uuid4().hex[:10]
+        for key, value in list(doc.items()):
+            if isinstance(value, list):
+                doc[key] = [v if isinstance(v, Doc) else Doc(v) if isinstance(v, dict) else v for v in value]
+        self.tables.setdefault(doc["doctype"], {})[doc["name"]] = doc
+
+    def find(self, doctype, filters):
+        self.query_count += 1
+        rows = self.tables.get(doctype, {})
+        if isinstance(filters, dict):
+            for doc in rows.values():
+                if all(doc.get(k) == v for k, v in filters.items()):
+                    return doc
+            return None
+        return rows.get(filters)
+
+    # frappe.db API subset
+    def set_value(self, doctype, name, fieldname, value=None, **kwargs):
+        doc = self.find(doctype, name)
+        if doc is None:
+            return
+        if isinstance(fieldname, dict):
+            doc.update(fieldname)
+        else:
+            doc[fieldname] = value
+
+    def get_value(self, doctype, filters, fieldname="name", as_dict=False, **kwargs):
+        doc = self.find(doctype, filters)
+        if doc is None:
+            return None
+        if isinstance(fieldname, (list, tuple)):
+            if as_dict:
+                return Doc({f: doc.get(f) for f in fieldname})
+            return tuple(doc.get(f) for f in fieldname)
+        return doc.get(fieldname)
+
+    def exists(self, doctype, filters=None, **kwargs):
+        doc = self.find(doctype, filters)
+        return doc["name"] if doc else None
+
+    def get_single_value(self, doctype, fieldname, cache=True):
+        return self.singles.get(doctype, {}).get(fieldname)
+
+    def get_all(self, doctype, filters=None, fields=None, **kwargs):
+        self.query_count += 1
+        return [Doc(d) for d in self.tables.get(doctype, {}).values()]
+
+    def sql(self, *args, **kwargs):
+        self.query_count += 1
+        return []
+
+    def count(self, doctype, filters=None, **kwargs):
+        return len(self.tables.get(doctype, {}))
+
+    def commit(self):
+        self.after_rollback.clear()
+        self.after_commit.run()
+
+    def rollback(self, save_point=None, **kwargs):
+        if save_point:
+            return
+        self.after_commit.clear()
+        self.after_rollback.run()
+
+    def savepoint(self, name):
+        pass
+
+
+class _Cache:
+    """In-memory replacement for the Redis wrapper (values and simple lists/sets/hashes)."""
+
+    def __init__(self):
+        self.data: Dict[Any, Any] = {}
+        self.lock = threading.Lock()
+
+    def make_key(self, key, user=None, shared=False):
+        return f"shim|{key}"
+
+    def get_value(self, key, generator=None, user=None, expires=False, shared=False):
+        val = self.data.get(("v", key))
+        if val is None and generator:
+            val = generator()
+            self.data[("v", key)] = val
+        return val
+
+    def set_value(self, key, val, user=None, expires_in_sec=None, shared=False):
+        self.data[("v", key)] = val
+
+    def delete_value(self, keys, user=None, make_keys=True, shared=False):
+        for k in keys if isinstance(keys, (list, tuple)) else [keys]:
+            self.data.pop(("v", k), None)
+
+    def delete_keys(self, key):
+        for k in [k for k in self.data if isinstance(k, tuple) and str(k[1]).startswith(key)]:
+            self.data.pop(k, None)
+
+    def pipeline(self):
+        return _Pipeline(self)
+
+    # raw-key structures
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, px=None, nx=False, **kwargs):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            return True
+
+    def mget(self, keys, *more):
+        return [self.data.get(k) for k in list(keys) + list(more)]
+
+    def delete(self, *keys):
+        for k in keys:
+            self.data.pop(k, None)
+
+    def incr(self, key, amount=1):
+        with self.lock:
+            self.data[key] = int(self.data.get(key) or 0) + amount
+            return self.data[key]
+
+    def expire(self, key, seconds):
+        return True
+
+    def lpush(self, key, *values):
+        lst = self.data.setdefault(key, [])
+        for v in values:
+            lst.insert(0, v)
+        return len(lst)
+
+    def ltrim(self, key, start, end):
+        lst = self.data.get(key, [])
+        self.data[key] = lst[start:None if end == -1 else end + 1]
+
+    def lrange(self, key, start, end):
+        return list(self.data.get(key, []))[start:None if end == -1 else end + 1]
+
+    def hset(self, key, field, value):
+        with self.lock:
+            self.data.setdefault(key, {})[field] = value
+
+    def hdel(self, key, *fields):
+        h = self.data.get(key, {})
+        return sum(1 for f in fields if h.pop(f, None) is not None)
+
+    def hmget(self, key, fields):
+        h = self.data.get(key, {})
+        return [h.get(f) for f in fields]
+
+    def sadd(self, key, *values):
+        self.data.setdefault(key, set()).update(values)
+
+    def srem(self, key, *values):
+        members = self.data.get(key, set())
+        return sum(1 for v in values if v in members and not members.discard(v))
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def sismember(self, key, value):
+        return value in self.data.get(key, set())
+
+    def hincrbyfloat(self, key, field, amount):
+        h = self.data.setdefault(key, {})
+        h[field] = float(h.get(field, 0)) + amount
+        return h[field]
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hscan(self, key, cursor=0, match=None, count=None):
+        return 0, dict(self.data.get(key, {}))
+
+
+class _Pipeline:
+    def __init__(self, cache: _Cache):
+        self.cache = cache
+        self.ops = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        out = [getattr(self.cache, name)(*a, **k) for name, a, k in self.ops]
+        self.ops = []
+        return out
+
+
+DB = _DB()
+CACHE = _Cache()
+SITE_DIR = tempfile.mkdtemp(prefix="alphax_bench_site_")
+
+
+def _throw(msg, exc=ShimError, title=None, **kwargs):
+    raise exc(msg)
+
+
+def _get_doc(*args, **kwargs):
+    if args and isinstance(args[0], dict):
+        return Doc(args[0])
+    if kwargs.get("doctype") and len(args) == 0:
+        return Doc(kwargs)
+    doctype = args[0]
+    name = args[1] if len(args) > 1 else doctype  # single doctypes are stored under their own name
+    doc = DB.find(doctype, name)
+    if doc is None:
+        raise ShimError(f"{doctype} {name} not found")
+    return doc
+
+
+def _whitelist(*args, **kwargs):
+    if args and callable(args[0]):
+        return args[0]
+    return lambda fn: fn
+
+
+def install() -> types.ModuleType:
+    """Register the shim as `frappe` (plus the submodules the app imports)."""
+    if "frappe" in sys.modules and getattr(sys.modules["frappe"], "__alphax_shim__", False):
+        return sys.modules["frappe"]
+
+    import os
+
+    frappe = types.ModuleType("frappe")
+    frappe.__alphax_shim__ = True
+    frappe.__path__ = []
+    frappe.db = DB
+    frappe._dict = _dict
+    frappe.local = threading.local()
+    frappe.local.site = "bench.local"
+    frappe.conf = {}
+    frappe.flags = types.SimpleNamespace()
+    frappe.session = types.SimpleNamespace(user="Administrator")
+    frappe.defaults = types.SimpleNamespace(get_user_default=lambda key, user=None: "Bench Co")
+    frappe.response = {}
+    frappe.ValidationError = ShimError
+    frappe.PermissionError = ShimError
+    frappe.DoesNotExistError = ShimError
+    frappe.throw = _throw
+    frappe._ = lambda s, *a: s
+    frappe.whitelist = _whitelist
+    frappe.get_doc = _get_doc
+    frappe.get_cached_doc = _get_doc
+    frappe.new_doc = lambda doctype: Doc({"doctype": doctype})
+    frappe.get_meta = lambda doctype: _Meta(doctype, META.get(doctype, []))
+    frappe.get_all = DB.get_all
+    frappe.get_list = DB.get_all
+    frappe.has_permission = lambda *a, **k: True
+    frappe.only_for = lambda *a, **k: None
+    frappe.get_roles = lambda user=None: ["System Manager", "System User"]
+    frappe.cache = lambda: CACHE
+    frappe.as_json = lambda obj, indent=None, **k: json.dumps(obj, default=str)
+    frappe.parse_json = lambda s: json.loads(s) if isinstance(s, str) else s
+    frappe.log_error = lambda *a, **k: None
+    frappe.get_traceback = lambda *a, **k: ""
+    frappe.get_request_header = lambda key, default=None: default
+    frappe.publish_realtime = lambda *a, **k: None
+    frappe.enqueue = lambda method, **kwargs: (method(**{k: v for k, v in kwargs.items() if k not in ("queue", "timeout", "job_id", "deduplicate", "enqueue_after_commit", "now")}) if callable(method) else None)
+    frappe.get_attr = lambda path: __import__(path.rsplit(".", 1)[0], fromlist=["_"]).__dict__[path.rsplit(".", 1)[1]]
+    frappe.get_site_path = lambda *parts: os.path.join(SITE_DIR, *parts)
+    frappe.sleep = lambda s: __import__("time").sleep(s)
+
+    import datetime
+
+    utils = types.ModuleType("frappe.utils")
+    utils.now_datetime = datetime.datetime.now
+    utils.now = lambda: datetime.datetime.now().isoformat(sep=" ")
+    utils.nowdate = lambda: datetime.date.today().isoformat()
+    utils.getdate = lambda d=None: datetime.date.today() if d is None else (d if isinstance(d, datetime.date) else datetime.date.fromisoformat(str(d)[:10]))
+    utils.get_datetime = lambda d=None: datetime.datetime.now() if d is None else (d if isinstance(d, datetime.datetime) else datetime.datetime.fromisoformat(str(d)))
+    utils.add_days = lambda d, n: d + datetime.timedelta(days=n)
+    utils.add_to_date = lambda d=None, days=0, hours=0, minutes=0, seconds=0, **_kw: (
+        utils.get_datetime(d) + datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+    )
+    utils.cint = lambda v: int(float(v or 0)) if str(v or "0").replace(".", "", 1).lstrip("-").isdigit() else 0
+    utils.flt = lambda v, precision=None: float(v or 0)
+    utils.strip_html = lambda text: re.sub(r"<[^>]*>", "", str(text or ""))
+    sys.modules["frappe.utils"] = utils
+    frappe.utils = utils
+
+    # enqueue runs jobs inline, so none is ever waiting in a queue
+    background_jobs = types.ModuleType("frappe.utils.background_jobs")
+    background_jobs.is_job_enqueued = lambda job_id: False
+    sys.modules["frappe.utils.background_jobs"] = background_jobs
+    utils.background_jobs = background_jobs
+
+    # api.history imports Order at module level; queries themselves are not emulated
+    query_builder = types.ModuleType("frappe.query_builder")
+    query_builder.Order = enum.Enum("Order", {"asc": "ASC", "desc": "DESC"})
+    sys.modules["frappe.query_builder"] = query_builder
+    frappe.query_builder = query_builder
+
+    translate = types.ModuleType("frappe.translate")
+    model = types.ModuleType("frappe.model")
+    model.__path__ = []
+    document = types.ModuleType("frappe.model.document")
+    document.Document = Doc
+
+    sys.modules["frappe"] = frappe
+    sys.modules["frappe.translate"] = translate
+    sys.modules["frappe.model"] = model
+    sys.modules["frappe.model.document"] = document
+    frappe.model = model
+    model.document = document
+
+    os.makedirs(os.path.join(SITE_DIR, "public", "files"), exist_ok=True)
+    os.makedirs(os.path.join(SITE_DIR, "private", "files"), exist_ok=True)
+    return frappe
+
+
+def add_file(file_name: str, content: bytes, content_type: Optional[str] = None) -> Doc:
+    """Write bytes under the shim site's public files and register a File doc."""
+    import os
+
+    with open(os.path.join(SITE_DIR, "public", "files", file_name), "wb") as f:
+        f.write(content)
+    doc = Doc({
+        "doctype": "File",
+        "name": file_name,
+        "file_name": file_name,
+        "file_url": f"/files/{file_name}",
+        "content_type": content_type,
+        "is_private": 0,
+    })
+    DB.insert(doc)
+    return doc
@@ -0,0 +1,435 @@
+"""Concurrent load test of a running bench (chat and ingestion).
+
+Unlike `benchmarks.run` this talks HTTP to a real site: virtual users call
+`api.chat.chat` and `api.ingest.ingest_file` with think time between
+requests, concurrency is stepped up (1, 2, 4, ... users) and each step
+reports throughput, latency percentiles, error rate and database queries per
+request. The sweep stops at the first step past the saturation point.
+
+Set up the site first (AI Platform Settings > Load Testing):
+
+  - an AI Provider of type `mock` as default (or Default Provider = mock) and
+    **Mock Provider Latency (ms)** / **Jitter (ms)** close to the real LLM's;
+  - **Report Query Counts** on, and a System Manager API key, for the
+    per-request query counts (other users get latencies only).
+
+Usage (from the repository root; only the standard library is needed):
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --host site1.local \\
+        --token <api_key>:<api_secret> --concurrency 1,2,4,8,16,32 --step-seconds 30
+    python -m benchmarks.loadtest --url ... --login user@example.com:secret \\
+        --mix chat=8,ingest=2 --file-url /private/files/po.pdf \\
+        --blueprint "Purchase Order Intake (Template)" --out bench/load.json
+
+A step counts as saturated when its error rate exceeds --max-error-rate, its
+p95 exceeds --p95-factor times the first step's, or throughput grew by less
+than --min-scaling of what the added users should have brought. The last
+step before that is reported as the sustainable concurrency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+CHAT_METHOD = "alphax_ai_platform.alphax_ai.api.chat.chat"
+INGEST_METHOD = "alphax_ai_platform.alphax_ai.api.ingest.ingest_file"
+QUERY_COUNT_HEADER = "X-AlphaX-Query-Count"
+QUERIES_HEADER = "x-alphax-queries"
+QUERY_MS_HEADER = "x-alphax-query-ms"
+MIN_ERRORS = 3
+
+DEFAULT_MESSAGES = [
+    "What is the status of this document?",
+    "Summarise the open purchase orders for this supplier.",
+    "Which items on this order are still pending delivery?",
+    "Draft a short reply to the supplier asking for an updated delivery date.",
+    "Are there duplicate invoices for this order?",
+    "List the approvals still waiting on this document.",
+]
+
+
+class Result:
+    __slots__ = ("op", "started", "ms", "ok", "error", "queries", "query_ms")
+
+    def __init__(self, op: str, started: float, ms: float, ok: bool, error: Optional[str] = None,
+                 queries: Optional[int] = None, query_ms: Optional[float] = None):
+        self.op = op
+        self.started = started
+        self.ms = ms
+        self.ok = ok
+        self.error = error
+        self.queries = queries
+        self.query_ms = query_ms
+
+
+class Client:
+    """One virtual user: a keep-alive connection and its own session."""
+
+    def __init__(self, url: str, credential: Tuple[str, str], host: Optional[str] = None,
+                 timeout: float = 60.0, query_counts: bool = True):
+        parsed = urllib.parse.urlsplit(url)
+        self.scheme = parsed.scheme or "http"
+        self.netloc = parsed.netloc
+        self.base_path = parsed.path.rstrip("/")
+        self.host = host
+        self.timeout = timeout
+        self.query_counts = query_counts
+        self.kind, self.secret = credential
+        self.cookie: Optional[str] = None
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self._conn = cls(self.netloc, timeout=self.timeout)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def post(self, method: str, params: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        """(status, response headers, decoded JSON or None)."""
+        body = json.dumps(params).encode("utf-8")
+        h = {"Content-Type": "application/json", "Accept": "application/json"}
+        if self.host:
+            h["Host"] = self.host
+        if self.kind == "token":
+            h["Authorization"] = f"token {self.secret}"
+        elif self.cookie:
+            h["Cookie"] = self.cookie
+        if self.query_counts:
+            h[QUERY_COUNT_HEADER] = "1"
+        h.update(headers or {})
+        conn = self._connection()
+        try:
+            conn.request("POST", f"{self.base_path}/api/method/{method}", body=body, headers=h)
+            resp = conn.getresponse()
+            raw = resp.read()
+        except Exception:
+            # the server may have dropped the keep-alive connection; the next call reconnects
+            self.close()
+            raise
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        headers: Dict[str, str] = {}
+        for k, v in resp.getheaders():
+            k = k.lower()
+            headers[k] = f"{headers[k]}, {v}" if k in headers else v
+        return resp.status, headers, data
+
+    def login(self) -> None:
+        if self.kind != "login":
+            return
+        usr, _, pwd = self.secret.partition(":")
+        status, headers, _ = self.post("login", {"usr": usr, "pwd": pwd})
+        if status != 200:
+            raise RuntimeError(f"login as {usr} failed: HTTP {status}")
+        for part in (headers.get("set-cookie") or "").replace(",", ";").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "sid":
+                self.cookie = f"sid={value}"
+
+
+def _error_kind(status: int, data: Any) -> str:
+    if isinstance(data, dict) and data.get("exc_type"):
+        return str(data["exc_type"])
+    return f"HTTP {status}"
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, client: Client, args, messages: List[str], stop_at: float, seed: int):
+        super().__init__(daemon=True)
+        self.client = client
+        self.args = args
+        self.messages = messages
+        self.stop_at = stop_at
+        self.rng = random.Random(seed)
+        self.results: List[Result] = []
+        self.session_id: Optional[str] = None
+        self.turns = 0
+
+    def _think(self) -> None:
+        mean = self.args.think_ms / 1000.0
+        delay = self.rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+        time.sleep(max(0.0, min(delay, self.stop_at - time.monotonic())))
+
+    def _pick(self) -> str:
+        ops, weights = zip(*self.args.mix.items())
+        return self.rng.choices(ops, weights=weights)[0]
+
+    def _call(self, op: str) -> Result:
+        key = uuid.uuid4().hex  # every request does real work, never an idempotent replay
+        if op == "chat":
+            if self.turns >= self.args.turns_per_session:
+                self.session_id, self.turns = None, 0
+            params = {
+                "agent_key": self.args.agent,
+                "message": self.rng.choice(self.messages),
+                "session_id": self.session_id,
+                "doctype": self.args.doctype,
+                "docname": self.args.docname,
+            }
+            method = CHAT_METHOD
+        else:
+            params = {
+                "file_url": self.rng.choice(self.args.file_url),
+                "blueprint_name": self.args.blueprint,
+                "create_draft": int(self.args.create_draft),
+                "idempotency_key": key,
+            }
+            method = INGEST_METHOD
+
+        started = time.monotonic()
+        try:
+            status, headers, data = self.client.post(method, params, {"Idempotency-Key": key})
+        except Exception as e:
+            return Result(op, started, (time.monotonic() - started) * 1000.0, False, type(e).__name__)
+        ms = (time.monotonic() - started) * 1000.0
+        queries = _as_float(headers.get(QUERIES_HEADER))
+        query_ms = _as_float(headers.get(QUERY_MS_HEADER))
+        if status != 200:
+            return Result(op, started, ms, False, _error_kind(status, data), queries, query_ms)
+        if op == "chat":
+            message = (data or {}).get("message") or {}
+            self.session_id = message.get("session_id") or self.session_id
+            self.turns += 1
+        return Result(op, started, ms, True, None, queries, query_ms)
+
+    def run(self) -> None:
+        # spread the first requests over one think time so users do not arrive in lockstep
+        time.sleep(self.rng.uniform(0, self.args.think_ms / 1000.0))
+        try:
+            self.client.login()
+        except Exception as e:
+            self.results.append(Result("login", time.monotonic(), 0.0, False, str(e)))
+            return
+        try:
+            while time.monotonic() < self.stop_at:
+                self.results.append(self._call(self._pick()))
+                self._think()
+        finally:
+            self.client.close()
+
+
+# --- reporting --------------------------------------------------------------
+
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    vals = sorted(values)
+    return vals[max(0, min(len(vals) - 1, int(round(q * (len(vals) - 1)))))]
+
+
+def summarize(results: List[Result], seconds: float) -> Dict[str, Any]:
+    ms = [r.ms for r in results if r.ok]
+    queries = [r.queries for r in results if r.ok and r.queries is not None]
+    query_ms = [r.query_ms for r in results if r.ok and r.query_ms is not None]
+    errors = Counter(r.error for r in results if not r.ok)
+    n = len(results)
+    return {
+        "requests": n,
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / n, 4) if n else 0.0,
+        "error_kinds": dict(errors),
+        "throughput_per_s": round(len(ms) / seconds, 2) if seconds else None,
+        "mean_ms": round(statistics.fmean(ms), 1) if ms else None,
+        "p50_ms": round(_pct(ms, 0.5), 1) if ms else None,
+        "p95_ms": round(_pct(ms, 0.95), 1) if ms else None,
+        "p99_ms": round(_pct(ms, 0.99), 1) if ms else None,
+        "queries_per_request": round(statistics.fmean(queries), 1) if queries else None,
+        "query_ms_per_request": round(statistics.fmean(query_ms), 1) if query_ms else None,
+    }
+
+
+def run_step(args, credentials: List[Tuple[str, str]], messages: List[str], concurrency: int, step_no: int) -> Dict[str, Any]:
+    start = time.monotonic()
+    stop_at = start + args.step_seconds
+    measure_from = start + args.warmup_seconds
+    users = [
+        VirtualUser(
+            Client(args.url, credentials[i % len(credentials)], args.host, args.timeout, not args.no_query_counts),
+            args, messages, stop_at, seed=args.seed * 1000003 + step_no * 1009 + i,
+        )
+        for i in range(concurrency)
+    ]
+    for u in users:
+        u.start()
+    for u in users:
+        u.join()
+
+    # requests started during warm-up (cold caches, users still arriving) are not counted
+    results = [r for u in users for r in u.results if r.started >= measure_from or r.op == "login"]
+    seconds = max(time.monotonic() - measure_from, 1e-9)
+    step = {"concurrency": concurrency, "seconds": round(seconds, 1), **summarize(results, seconds)}
+    step["ops"] = {op: summarize([r for r in results if r.op == op], seconds) for op in args.mix}
+    return step
+
+
+def saturation(steps: List[Dict[str, Any]], p95_factor: float, min_scaling: float, max_error_rate: float) -> Optional[Dict[str, Any]]:
+    """The first step past the knee, with the reason; None while the bench keeps up."""
+    if not steps:
+        return None
+    base_p95 = steps[0].get("p95_ms")
+    for prev, cur in zip([None] + steps[:-1], steps):
+        reason = None
+        # a single failed request in a short step is noise, not a trend
+        if cur["error_rate"] > max_error_rate and cur["errors"] >= MIN_ERRORS:
+            reason = f"error rate {cur['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif base_p95 and cur.get("p95_ms") and cur["p95_ms"] > p95_factor * base_p95:
+            reason = f"p95 {cur['p95_ms']:.0f} ms > {p95_factor:g} x {base_p95:.0f} ms"
+        elif prev and prev.get("throughput_per_s") and cur["concurrency"] > prev["concurrency"]:
+            expected = cur["concurrency"] / prev["concurrency"] - 1
+            observed = (cur.get("throughput_per_s") or 0) / prev["throughput_per_s"] - 1
+            if observed < min_scaling * expected:
+                reason = f"throughput +{observed:.0%} for +{expected:.0%} users"
+        if reason:
+            return {
+                "saturated_at": cur["concurrency"],
+                "sustainable_concurrency": prev["concurrency"] if prev else None,
+                "sustainable_throughput_per_s": prev.get("throughput_per_s") if prev else None,
+                "reason": reason,
+            }
+    return None
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def _fmt(value: Any, spec: str = ".1f") -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def _parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in ("chat", "ingest"):
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r} (chat, ingest)")
+        mix[op] = float(weight or 1)
+    return {op: w for op, w in mix.items() if w > 0}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="AlphaX AI load test against a running bench")
+    ap.add_argument("--url", required=True, help="bench URL, e.g. http://127.0.0.1:8000")
+    ap.add_argument("--host", help="Host header (site name) when --url is not the site's own address")
+    ap.add_argument("--token", action="append", default=[], help="api_key:api_secret (repeat for more users)")
+    ap.add_argument("--login", action="append", default=[], help="user:password (repeat for more users)")
+    ap.add_argument("--concurrency", default="1,2,4,8,16,32,64", help="comma-separated virtual user counts to step through")
+    ap.add_argument("--step-seconds", type=float, default=30.0)
+    ap.add_argument("--warmup-seconds", type=float, default=5.0, help="not measured at the start of each step")
+    ap.add_argument("--think-ms", type=float, default=2000.0, help="mean think time between a user's requests (exponential)")
+    ap.add_argument("--mix", type=_parse_mix, default={"chat": 1.0}, help="operation weights, e.g. chat=8,ingest=2")
+    ap.add_argument("--messages", help="file with one chat message per line (default: built-in set)")
+    ap.add_argument("--agent", default="default")
+    ap.add_argument("--doctype", help="document the chats are about")
+    ap.add_argument("--docname")
+    ap.add_argument("--turns-per-session", type=int, default=5, help="chat turns before a user starts a new session")
+    ap.add_argument("--file-url", action="append", default=[], help="File URL to ingest (repeat for a mix)")
+    ap.add_argument("--blueprint", help="AI Intake Blueprint for ingest requests")
+    ap.add_argument("--create-draft", action="store_true", help="let ingest requests create drafts")
+    ap.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    ap.add_argument("--no-query-counts", action="store_true", help="do not ask for X-AlphaX-Queries")
+    ap.add_argument("--p95-factor", type=float, default=3.0, help="saturated when p95 exceeds this multiple of the first step's")
+    ap.add_argument("--min-scaling", type=float, default=0.5, help="saturated when throughput grows less than this share of the added users")
+    ap.add_argument("--max-error-rate", type=float, default=0.01)
+    ap.add_argument("--keep-going", action="store_true", help="run every step even after saturation")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write results JSON to this path")
+    args = ap.parse_args(argv)
+
+    credentials = [("token", t) for t in args.token] + [("login", c) for c in args.login]
+    if not credentials:
+        ap.error("give at least one --token or --login")
+    if not args.mix:
+        ap.error("--mix has no operation with a positive weight")
+    if "ingest" in args.mix and not (args.file_url and args.blueprint):
+        ap.error("ingest in --mix needs --file-url and --blueprint")
+    if args.warmup_seconds >= args.step_seconds:
+        ap.error("--warmup-seconds must be shorter than --step-seconds")
+    levels = sorted({int(c) for c in args.concurrency.split(",") if c.strip()})
+    messages = DEFAULT_MESSAGES
+    if args.messages:
+        with open(args.messages) as f:
+            messages = [line.strip() for line in f if line.strip()] or DEFAULT_MESSAGES
+
+    steps: List[Dict[str, Any]] = []
+    knee = None
+    for i, c in enumerate(levels):
+        step = run_step(args, credentials, messages, c, i)
+        steps.append(step)
+        print(f"users {c:>4}  {_fmt(step['throughput_per_s'], '>8.2f')} req/s  "
+              f"p50 {_fmt(step['p50_ms'], '>9.1f')} ms  p95 {_fmt(step['p95_ms'], '>9.1f')} ms  "
+              f"p99 {_fmt(step['p99_ms'], '>9.1f')} ms  errors {step['error_rate']:>6.1%}  "
+              f"queries/req {_fmt(step['queries_per_request'], '>6.1f')}")
+        for kind, n in sorted(step["error_kinds"].items()):
+            print(f"           {n:>6} x {kind}")
+        knee = saturation(steps, args.p95_factor, args.min_scaling, args.max_error_rate)
+        if knee and not args.keep_going:
+            break
+
+    if knee:
+        print(f"saturated at {knee['saturated_at']} users ({knee['reason']}); "
+              f"sustainable: {knee['sustainable_concurrency']} users, "
+              f"{_fmt(knee['sustainable_throughput_per_s'], '.2f')} req/s")
+    else:
+        print(f"no saturation up to {levels[-1]} users")
+
+    if args.out:
+        report = {
+            "meta": {
+                "git_rev": _git_rev(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "url": args.url,
+                "host": args.host,
+                "mix": args.mix,
+                "think_ms": args.think_ms,
+                "step_seconds": args.step_seconds,
+                "warmup_seconds": args.warmup_seconds,
+                "users": len(credentials),
+            },
+            "steps": steps,
+            "saturation": knee,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
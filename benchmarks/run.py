@@ -0,0 +1,488 @@
+"""Offline benchmark suite for the ingestion and chat hot paths.
+
+Runs without network, MariaDB or Redis: `frappe` is replaced by the in-memory
+shim in `benchmarks/frappe_shim.py` and the chat path uses `MockProvider`
+with configurable latency.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --quick --filter parse.
+    python -m benchmarks.run --out new.json --compare old.json --threshold 0.15
+
+Results are JSON (one entry per case with mean/p50/p95 latency, throughput
+and tracemalloc peak) so two commits can be compared with `--compare`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks import frappe_shim
+
+frappe = frappe_shim.install()
+
+from benchmarks import corpus  # noqa: E402
+from alphax_ai_platform.alphax_ai.caching import warmup  # noqa: E402
+from alphax_ai_platform.alphax_ai.ingestion.extractors import extract_content  # noqa: E402
+from alphax_ai_platform.alphax_ai.ingestion import intake, segmentation, splitter  # noqa: E402
+from alphax_ai_platform.alphax_ai.mapping.engine import apply_schema_field_mapping  # noqa: E402
+from alphax_ai_platform.alphax_ai.parsing import llm_extract, normalize  # noqa: E402
+from alphax_ai_platform.alphax_ai.parsing.parsers import parse_employee, parse_purchase_order  # noqa: E402
+from alphax_ai_platform.alphax_ai.policies.model_router import route_models  # noqa: E402
+from alphax_ai_platform.alphax_ai.policies.redaction import apply_redaction  # noqa: E402
+from alphax_ai_platform.alphax_ai.providers.limiter import BACKGROUND, ProviderLimiter, RateLimitedProvider  # noqa: E402
+from alphax_ai_platform.alphax_ai.providers.mock_provider import MockProvider  # noqa: E402
+from alphax_ai_platform.alphax_ai.providers.registry import ProviderRegistry  # noqa: E402
+from alphax_ai_platform.alphax_ai.providers.router import HEALTH, ProviderRouter  # noqa: E402
+from alphax_ai_platform.alphax_ai.retrieval import dense  # noqa: E402
+from alphax_ai_platform.alphax_ai.retrieval.bm25 import BM25Index  # noqa: E402
+from alphax_ai_platform.alphax_ai.retrieval.chunking import chunk_text  # noqa: E402
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alphax_ai_platform", "fixtures")
+
+
+class Skip(Exception):
+    pass
+
+
+class Case:
+    def __init__(self, name: str, setup: Callable[[], Any], fn: Callable[[Any], Any], units: int = 1, unit: str = "op"):
+        self.name = name
+        self.setup = setup
+        self.fn = fn
+        self.units = units
+        self.unit = unit
+
+
+def _pct(values: List[float], q: float) -> float:
+    vals = sorted(values)
+    idx = max(0, min(len(vals) - 1, int(round(q * (len(vals) - 1)))))
+    return vals[idx]
+
+
+def _measure(case: Case, repeat: int, warmup: int) -> Dict[str, Any]:
+    try:
+        state = case.setup()
+    except Skip as e:
+        return {"skipped": str(e)}
+
+    try:
+        for _ in range(warmup):
+            case.fn(state)
+    except (ImportError, frappe_shim.ShimError) as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        case.fn(state)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+
+    # Peak memory on a separate run so tracing overhead does not skew timings.
+    tracemalloc.start()
+    case.fn(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean = statistics.fmean(samples)
+    return {
+        "repeat": repeat,
+        "mean_ms": round(mean, 4),
+        "p50_ms": round(_pct(samples, 0.5), 4),
+        "p95_ms": round(_pct(samples, 0.95), 4),
+        "min_ms": round(min(samples), 4),
+        "stdev_ms": round(statistics.pstdev(samples), 4),
+        "units": case.units,
+        "unit": case.unit,
+        "throughput_per_s": round(case.units / (mean / 1000.0), 2) if mean else None,
+        "peak_kb": round(peak / 1024.0, 1),
+    }
+
+
+# --- case builders ---------------------------------------------------------
+
+def _file_case(name: str, file_name: str, make: Callable[[], Optional[bytes]], content_type: Optional[str], units: int, unit: str) -> Case:
+    def setup():
+        data = make()
+        if data is None:
+            raise Skip("optional dependency for corpus generation is not installed")
+        return frappe_shim.add_file(file_name, data, content_type)
+
+    return Case(name, setup, lambda doc: extract_content(doc, ocr_engine="On-Prem", language="auto"), units, unit)
+
+
+def _load_blueprints() -> None:
+    with open(os.path.join(FIXTURES, "ai_intake_blueprint.json")) as f:
+        for bp in json.load(f):
+            frappe_shim.DB.insert(frappe_shim.Doc(dict(bp, name=bp["blueprint_name"], mapping_template=None)))
+
+
+def build_cases(quick: bool, mock_latency_ms: float) -> List[Case]:
+    small, large = (50, 500) if quick else (50, 5000)
+    pages_small, pages_large = (2, 20) if quick else (2, 100)
+
+    cases = [
+        _file_case("extract.pdf_small", "bench_small.pdf", lambda: corpus.pdf_text(pages_small), "application/pdf", pages_small, "page"),
+        _file_case("extract.pdf_large", "bench_large.pdf", lambda: corpus.pdf_text(pages_large), "application/pdf", pages_large, "page"),
+        _file_case("extract.csv_small", "bench_small.csv", lambda: corpus.po_csv(small), "text/csv", small, "row"),
+        _file_case("extract.csv_large", "bench_large.csv", lambda: corpus.po_csv(large), "text/csv", large, "row"),
+        _file_case("extract.xlsx_small", "bench_small.xlsx", lambda: corpus.po_xlsx(small), None, small, "row"),
+        _file_case("extract.xlsx_large", "bench_large.xlsx", lambda: corpus.po_xlsx(large), None, large, "row"),
+        _file_case("extract.image_ocr", "bench_scan.png", lambda: corpus.png_image(800, 600), "image/png", 1, "page"),
+        _file_case("extract.text_large", "bench_large.txt", lambda: corpus.po_text(large).encode(), "text/plain", large, "line"),
+    ]
+
+    for n in (small, large):
+        cases.append(Case(
+            f"parse.purchase_order_text_{n}",
+            lambda n=n: corpus.po_text(n),
+            lambda text: parse_purchase_order(text, []),
+            n, "line",
+        ))
+        cases.append(Case(
+            f"parse.purchase_order_table_{n}",
+            lambda n=n: [{"name": "Sheet1", "rows": [dict(r) for r in __import__("csv").DictReader(corpus.po_csv(n).decode().splitlines())]}],
+            lambda tables: parse_purchase_order("Supplier: ACME Trading Co.\nDate: 2026-01-15", tables),
+            n, "row",
+        ))
+    cases.append(Case("parse.employee", corpus.employee_text, lambda text: parse_employee(text, []), 1, "doc"))
+
+    def mapping_setup(n=large):
+        _load_blueprints()
+        bp = frappe.get_doc("AI Intake Blueprint", "Purchase Order Intake (Template)")
+        parsed = parse_purchase_order(corpus.po_text(n), [])
+        schema = list(bp.schema_fields) + [frappe_shim.Doc({"field_key": "items", "maps_to": "items.item_code"})]
+        return parsed, schema
+
+    cases.append(Case("mapping.schema_field_mapping", mapping_setup, lambda s: apply_schema_field_mapping(*s), large, "line"))
+
+    def split_setup(n=large):
+        _load_blueprints()
+        bp = frappe.get_doc("AI Intake Blueprint", "Employee Creation Intake (Template)")
+        return corpus.employee_rows(n), list(bp.schema_fields)
+
+    cases.append(Case(
+        "split.map_validate_employee_rows",
+        split_setup,
+        lambda s: splitter.map_and_validate(s[0], "Employee", s[1]),
+        large, "row",
+    ))
+
+    for column, field in (
+        ("dates", {"data_type": "Date"}),
+        ("amounts", {"data_type": "Float", "normalize_rule": "Currency Amount"}),
+        ("phones", {"normalize_rule": "Phone", "normalize_options": "966"}),
+    ):
+        cases.append(Case(
+            f"normalize.column_{column}",
+            lambda column=column: corpus.raw_cells(large)[column],
+            lambda values, field=field: normalize.normalize_column(values, normalize.compile_field(field)),
+            large, "cell",
+        ))
+
+    cases.append(Case(
+        "segment.detect_boundaries_40_invoices",
+        lambda: corpus.scan_pages(40)[0],
+        segmentation.detect_segments,
+        40, "doc",
+    ))
+
+    for n in (10, 1000):
+        cases.append(Case(f"redaction.apply_redaction_{n}", lambda n=n: corpus.redaction_context(n), apply_redaction, n, "doc"))
+
+    def limited_setup():
+        # budget far above the call count: times the shared-limiter round trips, not waiting
+        limiter = ProviderLimiter("mock", {"rpm": 10**7, "tpm": 10**9, "reserve": 20})
+        return RateLimitedProvider(MockProvider(seed=1), BACKGROUND, limiter)
+
+    cases.append(Case(
+        "provider.rate_limited_call",
+        limited_setup,
+        lambda p: p.chat([{"role": "user", "content": "What is the status of PO-00001?"}]),
+        1, "call",
+    ))
+
+    def router_setup(hedge):
+        # two providers with a heavy log-normal tail (median 5 ms), 50 calls per sample:
+        # the tail dominates the batch time, which is what hedging cuts
+        HEALTH.reset()
+        providers = [
+            MockProvider(latency_ms=5, latency_sigma=1.5, seed=1, key="bench_a"),
+            MockProvider(latency_ms=5, latency_sigma=1.5, seed=2, key="bench_b"),
+        ]
+        limiters = {p.key: ProviderLimiter(p.key, {"rpm": 0, "tpm": 0, "reserve": 20}) for p in providers}
+        return ProviderRouter(providers, hedge=hedge, timeout_s=10, limiters=limiters)
+
+    for hedge in (False, True):
+        cases.append(Case(
+            f"provider.router_{'hedged' if hedge else 'single'}_lognormal_tail",
+            lambda hedge=hedge: router_setup(hedge),
+            lambda r: [r.chat([{"role": "user", "content": "What is the status of PO-00001?"}]) for _ in range(50)],
+            50, "call",
+        ))
+
+    def model_route_setup():
+        frappe_shim.DB.reset()
+        for name, window, price_in, price_out in (("mini", 8000, 0.00015, 0.0006), ("std", 32000, 0.0025, 0.01), ("big", 128000, 0.01, 0.03)):
+            frappe_shim.DB.insert(frappe_shim.Doc({
+                "doctype": "AI Model", "name": name, "model_key": name, "provider": "mock", "model_name": name,
+                "context_window": window, "price_in_per_1k": price_in, "price_out_per_1k": price_out,
+            }))
+        return [{"role": "system", "content": "You are AlphaX AI. " * 40}, {"role": "user", "content": "Status of PO-00001?"}]
+
+    cases.append(Case(
+        "policy.route_models_cached",
+        model_route_setup,
+        lambda messages: route_models("default", messages, {"model": None}, ["mock"]),
+        1, "call",
+    ))
+
+    def llm_setup():
+        # 40 scanned pages, one prompt document each; the mock's fixed 5 ms stands in for a provider round trip
+        pages = corpus.scan_pages(40)[0]
+        docs = [{"id": str(i), "text": text} for i, text in enumerate(pages)]
+        schema = [
+            {"field_key": "supplier", "data_type": "String", "required": 1},
+            {"field_key": "invoice_no", "data_type": "String", "required": 1},
+            {"field_key": "date", "data_type": "Date"},
+            {"field_key": "total", "data_type": "Float"},
+        ]
+        return docs, schema, MockProvider(latency_ms=5, responder=llm_extract.mock_responder)
+
+    for label, max_docs in (("per_document", 1), ("batched", 8)):
+        cases.append(Case(
+            f"llm_extract.{label}_40_pages",
+            llm_setup,
+            lambda s, max_docs=max_docs: llm_extract.extract_documents(
+                s[0], s[1], "Purchase Invoice", provider=s[2], max_docs=max_docs, window=16000
+            ),
+            40, "page",
+        ))
+
+    def intake_setup(n):
+        # a watch folder whose n files were all picked up already: each scan lists, never opens
+        path = tempfile.mkdtemp(prefix="alphax_intake_")
+        for i in range(n):
+            with open(os.path.join(path, f"scan_{i:05d}.pdf"), "wb") as f:
+                f.write(b"%PDF-1.4")
+        pats = intake.patterns("*.pdf")
+        cursor = {}
+        while True:
+            taken, cursor, _left = intake.scan_directory(path, pats, cursor, 1000, min_age_s=0)
+            if not taken:
+                return path, pats, cursor
+
+    for n in (1000, 5000):
+        cases.append(Case(
+            f"intake.rescan_{n}_seen_files",
+            lambda n=n: intake_setup(n),
+            lambda s: intake.scan_directory(s[0], s[1], s[2], 20, min_age_s=0),
+            1, "scan",
+        ))
+
+    cases.extend(_startup_cases())
+    cases.extend(_retrieval_cases(large, (2000, 5000) if quick else (2000, 50000)))
+    cases.extend(_e2e_cases(small, mock_latency_ms))
+    return cases
+
+
+SHIM_PRELUDE = "from benchmarks import frappe_shim; frappe_shim.install()"
+
+
+def _startup_cases() -> List[Case]:
+    """Cold import of each endpoint module in a fresh interpreter (what a new
+    web worker pays); fails when one of them pulls in a heavy library eagerly."""
+
+    def import_once(module: str) -> None:
+        res = warmup._importtime(module, SHIM_PRELUDE)
+        if "error" in res:
+            raise RuntimeError(f"import {module} failed: {res['error']}")
+        if res["heavy"]:
+            raise RuntimeError(f"{module} imports {', '.join(sorted(res['heavy']))} eagerly")
+
+    return [
+        Case(f"startup.import_{module.rsplit('.', 2)[-2]}_{module.rsplit('.', 1)[-1]}", lambda module=module: module, import_once, 1, "import")
+        for module in warmup.ENTRY_MODULES
+    ]
+
+
+RETRIEVAL_QUERY = "what is the warranty period and the late delivery penalty"
+
+
+def _retrieval_cases(lines: int, sizes) -> List[Case]:
+    cases = [Case("retrieval.chunk_text", lambda: corpus.po_text(lines), chunk_text, lines, "line")]
+
+    def bm25_setup(n):
+        index = BM25Index()
+        for i, text in enumerate(corpus.passages(n)):
+            index.add(i, text)
+        return index
+
+    def dense_setup(n):
+        if not dense.available():
+            raise Skip("numpy is not installed")
+        store = dense.VectorStore(frappe.get_site_path("private", "alphax_ai", f"bench_vectors_{n}.f32"))
+        if os.path.exists(store.path):
+            os.remove(store.path)
+        store.append(dense.embed(corpus.passages(n)))
+        return store, {i: i for i in range(n)}
+
+    for n in sizes:
+        cases.append(Case(f"retrieval.bm25_search_{n}", lambda n=n: bm25_setup(n), lambda ix: ix.search(RETRIEVAL_QUERY, 10), 1, "query"))
+        cases.append(Case(
+            f"retrieval.dense_search_{n}",
+            lambda n=n: dense_setup(n),
+            lambda s: s[0].search(dense.embed([RETRIEVAL_QUERY]), 10, s[1]),
+            1, "query",
+        ))
+    return cases
+
+
+def _e2e_cases(lines: int, mock_latency_ms: float) -> List[Case]:
+    from alphax_ai_platform.alphax_ai.api.chat import chat
+    from alphax_ai_platform.alphax_ai.api.ingest import ingest_file
+
+    provider = MockProvider(latency_ms=mock_latency_ms, seed=1)
+    ProviderRegistry.get_default_provider = staticmethod(lambda priority=None: provider)
+
+    def set_idempotency_window(seconds):
+        frappe_shim.DB.singles.setdefault("AI Platform Settings", {})["idempotency_window_seconds"] = seconds
+
+    def chat_setup():
+        frappe_shim.DB.reset()
+        set_idempotency_window(0)  # time the work, not replays
+        return None
+
+    def ingest_setup():
+        frappe_shim.DB.reset()
+        set_idempotency_window(0)
+        _load_blueprints()
+        return frappe_shim.add_file("bench_e2e_po.txt", corpus.po_text(lines).encode(), "text/plain")
+
+    def replay_setup():
+        f = ingest_setup()
+        set_idempotency_window(120)
+        ingest_file(file_url=f.file_url, blueprint_name="Purchase Order Intake (Template)", create_draft=1)
+        frappe.db.commit()  # end of the first request: its result becomes replayable
+        return f
+
+    return [
+        Case(
+            f"e2e.chat_mock_{int(mock_latency_ms)}ms",
+            chat_setup,
+            lambda _: chat(agent_key="default", message="What is the status of PO-00001?", doctype="Purchase Order", docname="PO-00001"),
+            1, "request",
+        ),
+        Case(
+            "e2e.ingest_file_text_po",
+            ingest_setup,
+            lambda f: ingest_file(file_url=f.file_url, blueprint_name="Purchase Order Intake (Template)", create_draft=1),
+            1, "file",
+        ),
+        Case(
+            "e2e.ingest_file_replay",
+            replay_setup,
+            lambda f: ingest_file(file_url=f.file_url, blueprint_name="Purchase Order Intake (Template)", create_draft=1),
+            1, "file",
+        ),
+    ]
+
+
+# --- reporting --------------------------------------------------------------
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Return per-case p50 deltas; `regression` is set when slower by more than `threshold`."""
+    rows = []
+    for name, cur in current["results"].items():
+        base = (baseline.get("results") or {}).get(name)
+        if not base or "p50_ms" not in cur or "p50_ms" not in base or not base["p50_ms"]:
+            continue
+        delta = (cur["p50_ms"] - base["p50_ms"]) / base["p50_ms"]
+        rows.append({
+            "case": name,
+            "base_p50_ms": base["p50_ms"],
+            "p50_ms": cur["p50_ms"],
+            "delta": round(delta, 4),
+            "regression": delta > threshold,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="AlphaX AI offline benchmarks")
+    ap.add_argument("--quick", action="store_true", help="smaller corpora and fewer repeats")
+    ap.add_argument("--repeat", type=int, default=None)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--filter", default="", help="only run cases whose name contains this substring")
+    ap.add_argument("--mock-latency-ms", type=float, default=0.0, help="simulated provider latency for e2e.chat")
+    ap.add_argument("--out", help="write results JSON to this path")
+    ap.add_argument("--compare", help="baseline results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown ratio flagged as regression")
+    args = ap.parse_args(argv)
+
+    repeat = args.repeat or (5 if args.quick else 20)
+    results: Dict[str, Any] = {}
+    for case in build_cases(args.quick, args.mock_latency_ms):
+        if args.filter and args.filter not in case.name:
+            continue
+        res = _measure(case, repeat=repeat, warmup=args.warmup)
+        results[case.name] = res
+        if "skipped" in res:
+            print(f"{case.name:<40} skipped ({res['skipped']})")
+        else:
+            print(f"{case.name:<40} p50 {res['p50_ms']:>10.3f} ms  p95 {res['p95_ms']:>10.3f} ms  "
+                  f"{res['throughput_per_s']:>12} {res['unit']}/s  peak {res['peak_kb']:>9} KiB")
+
+    report = {
+        "meta": {
+            "git_rev": _git_rev(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "repeat": repeat,
+            "mock_latency_ms": args.mock_latency_ms,
+        },
+        "results": results,
+    }
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        regressions = [r for r in rows if r["regression"]]
+        for r in rows:
+            flag = "REGRESSION" if r["regression"] else ""
+            print(f"{r['case']:<40} {r['base_p50_ms']:>10.3f} -> {r['p50_ms']:>10.3f} ms ({r['delta']:+.1%}) {flag}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""pytest outside a bench: unit tests run against the offline frappe shim
+(benchmarks/frappe_shim.py). Inside a bench (`bench run-tests --app
+alphax_ai_platform`) the real frappe is importable and this does nothing."""
+
+try:
+    import frappe  # noqa: F401
+except ImportError:
+    from benchmarks import frappe_shim
+
+    frappe_shim.install()
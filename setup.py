@@ -5,7 +5,7 @@ setup(
     version="0.5.2",
     description="AlphaX AI - enterprise AI layer for ERPNext/Frappe",
     author="AlphaX",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     include_package_data=True,
     install_requires=["frappe>=15.0.0"],
     zip_safe=False,